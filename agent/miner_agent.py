@@ -27,6 +27,21 @@ from datetime import datetime
 from collections import deque
 import configparser
 
+# 可选二进制编码（云端在 X-Telemetry-Accept 响应头中声明支持后启用）
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
 # ==================== 配置和常量 ====================
 
 VERSION = "1.0.0"
@@ -36,6 +51,7 @@ CGMINER_API_PORT = 4028          # CGMiner API 端口
 CGMINER_TIMEOUT = 5              # CGMiner 连接超时
 MAX_BUFFER_SIZE = 10000          # 最大缓冲数据量
 MAX_BUFFER_HOURS = 24            # 最大缓冲时长（小时）
+COLUMNAR_SCHEMA = 'telemetry_columnar.v1'  # 列式遥测块
 
 # ==================== 日志配置 ====================
 
@@ -240,13 +256,29 @@ class CGMinerClient:
 
 # ==================== 云端 API 客户端 ====================
 
+def encode_columnar(rows: List[Dict]) -> Dict:
+    """将矿机字典列表转为列式块（每个字段一个数组，缺失值为 None）"""
+    columns: Dict[str, List] = {}
+    for index, row in enumerate(rows):
+        for key, value in row.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * len(rows)
+            column[index] = value
+    return {'schema': COLUMNAR_SCHEMA, 'count': len(rows), 'columns': columns}
+
+
 class CloudAPIClient:
     """云端 API 客户端，负责与 HashInsight 云端平台通信"""
     
-    def __init__(self, base_url: str, agent_id: str, access_token: str):
+    def __init__(self, base_url: str, agent_id: str, access_token: str, payload_format: str = 'auto'):
         self.base_url = base_url.rstrip('/')
         self.agent_id = agent_id
         self.access_token = access_token
+        # json: 始终 JSON; auto: 云端声明支持后使用列式 + msgpack/zstd
+        self.payload_format = payload_format
+        self.server_features = set()
+        self.last_status_code = None
         self.session = requests.Session()
         self.session.headers.update({
             'Authorization': f'Bearer {self.access_token}',
@@ -254,7 +286,8 @@ class CloudAPIClient:
             'User-Agent': f'MinerAgent/{VERSION}'
         })
     
-    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None) -> Optional[Dict]:
+    def _make_request(self, method: str, endpoint: str, data: Optional[Dict] = None, params: Optional[Dict] = None,
+                      body: Optional[bytes] = None, headers: Optional[Dict] = None) -> Optional[Dict]:
         """
         发送 HTTP 请求到云端 API
         
@@ -263,15 +296,20 @@ class CloudAPIClient:
             endpoint: API 端点 (如 '/heartbeat')
             data: 请求体数据
             params: URL 查询参数
+            body: 已编码的请求体（二进制格式，优先于 data）
+            headers: 额外请求头
         
         Returns:
             API 响应的 JSON 数据，失败返回 None
         """
         url = f"{self.base_url}{endpoint}"
+        self.last_status_code = None
         
         try:
             if method == 'GET':
                 response = self.session.get(url, params=params, timeout=30)
+            elif method == 'POST' and body is not None:
+                response = self.session.post(url, data=body, params=params, headers=headers, timeout=30)
             elif method == 'POST':
                 response = self.session.post(url, json=data, params=params, timeout=30)
             elif method == 'PUT':
@@ -279,6 +317,11 @@ class CloudAPIClient:
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
+            self.last_status_code = response.status_code
+            accept = response.headers.get('X-Telemetry-Accept')
+            if accept:
+                self.server_features = {f.strip() for f in accept.split(',') if f.strip()}
+            
             # 检查响应状态
             if response.status_code == 200:
                 return response.json()
@@ -313,15 +356,51 @@ class CloudAPIClient:
         }
         return self._make_request('POST', '/heartbeat', data=payload)
     
+    def _binary_features(self) -> set:
+        if self.payload_format != 'auto':
+            return set()
+        return self.server_features
+    
+    def _post_telemetry(self, endpoint: str, payload: Dict) -> Optional[Dict]:
+        """上报遥测负载；云端支持时使用 msgpack/zstd，不支持 (415) 时退回 JSON"""
+        features = self._binary_features()
+        use_msgpack = 'msgpack' in features and MSGPACK_AVAILABLE
+        use_zstd = 'zstd' in features and ZSTD_AVAILABLE
+        if not (use_msgpack or use_zstd):
+            return self._make_request('POST', endpoint, data=payload)
+        
+        headers = {}
+        if use_msgpack:
+            body = msgpack.packb(payload, use_bin_type=True)
+            headers['Content-Type'] = 'application/x-msgpack'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+        if use_zstd:
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers['Content-Encoding'] = 'zstd'
+        
+        result = self._make_request('POST', endpoint, body=body, headers=headers)
+        if result is None and self.last_status_code == 415:
+            logger.warning("Server rejected binary telemetry format, falling back to JSON")
+            self.payload_format = 'json'
+            return self._make_request('POST', endpoint, data=payload)
+        return result
+    
+    def _miners_block(self, miners_data: List[Dict]):
+        """云端支持列式块时按字段打包矿机数据"""
+        if 'columnar' in self._binary_features():
+            return encode_columnar(miners_data)
+        return miners_data
+    
     def send_telemetry(self, miners_data: List[Dict]) -> Optional[Dict]:
         """上报遥测数据"""
         payload = {
             "agent_id": self.agent_id,
             "timestamp": int(time.time()),
             "batch_size": len(miners_data),
-            "miners": miners_data
+            "miners": self._miners_block(miners_data)
         }
-        return self._make_request('POST', '/telemetry', data=payload)
+        return self._post_telemetry('/telemetry', payload)
     
     def send_telemetry_batch(self, batches: List[Dict]) -> Optional[Dict]:
         """批量上报缓冲的遥测数据"""
@@ -333,7 +412,7 @@ class CloudAPIClient:
             },
             "batches": batches
         }
-        return self._make_request('POST', '/telemetry/batch', data=payload)
+        return self._post_telemetry('/telemetry/batch', payload)
     
     def get_pending_commands(self) -> List[Dict]:
         """获取待执行的控制指令"""
@@ -537,7 +616,8 @@ class MinerAgent:
         self.cloud_client = CloudAPIClient(
             base_url=self.config['api_base_url'],
             agent_id=self.config['agent_id'],
-            access_token=self.config['access_token']
+            access_token=self.config['access_token'],
+            payload_format=self.config['payload_format']
         )
         
         self.data_buffer = DataBuffer()
@@ -572,6 +652,7 @@ class MinerAgent:
             'miner_ips': config.get('miners', 'ip_list', fallback='').split(','),
             'collection_interval': config.getint('settings', 'collection_interval', fallback=DEFAULT_COLLECTION_INTERVAL),
             'heartbeat_interval': config.getint('settings', 'heartbeat_interval', fallback=DEFAULT_HEARTBEAT_INTERVAL),
+            'payload_format': config.get('settings', 'payload_format', fallback='auto'),
         }
     
     def start(self):
@@ -5,15 +5,19 @@ Collector Data Receiving API
 接收边缘采集器上传的矿机遥测数据
 """
 
-import gzip
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import Blueprint, request, jsonify, g
 from sqlalchemy import func
 from models import db, HostingSite, HostingMiner, MinerModel, MinerBoardTelemetry
 from services.telemetry_storage import TelemetryRaw24h
+from services.live_snapshot_store import paginate_snapshot, snapshot_response
+from services.command_notifier import (
+    command_notifier, long_poll_max_seconds, long_poll_seconds, register_command_model, wait_for_commands
+)
 
 logger = logging.getLogger(__name__)
 
@@ -289,6 +293,9 @@ class MinerCommand(db.Model):
         }
 
 
+register_command_model(MinerCommand)
+
+
 class SafetyEvent(db.Model):
     """边缘设备安全事件
     
@@ -363,6 +370,15 @@ def verify_collector_key(f):
     return decorated
 
 
+# IN 列表分块大小，避免单条语句参数过多（SQLite 默认上限 999）
+RESOLVE_IN_CHUNK_SIZE = 900
+
+
+def _chunked(values: list, size: int = RESOLVE_IN_CHUNK_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
 def find_or_create_hosting_miner(site_id: int, miner_data: dict) -> HostingMiner:
     """
     查找或创建 HostingMiner 记录
@@ -372,6 +388,8 @@ def find_or_create_hosting_miner(site_id: int, miner_data: dict) -> HostingMiner
     2. IP地址匹配（miner_id 可能变化时使用）
     3. 自动创建新矿机（使用 miner_id 作为 serial_number）
     
+    单条记录版本，批量场景请使用 resolve_hosting_miners()
+    
     Args:
         site_id: 站点ID
         miner_data: 采集器上传的矿机数据
@@ -379,81 +397,153 @@ def find_or_create_hosting_miner(site_id: int, miner_data: dict) -> HostingMiner
     Returns:
         HostingMiner: 矿机对象
     """
-    miner_id = miner_data.get('miner_id', '')
-    ip_address = miner_data.get('ip_address', '')
+    return resolve_hosting_miners(site_id, [miner_data])[0]
+
+
+def resolve_hosting_miners(site_id: int, records: list) -> list:
+    """
+    批量查找或创建 HostingMiner 记录
+    Set-based HostingMiner resolution for a whole upload batch
     
-    # 1. 先尝试用 miner_id = serial_number 匹配（最可靠）
-    if miner_id:
-        miner = HostingMiner.query.filter_by(
-            site_id=site_id,
-            serial_number=miner_id
-        ).first()
-        if miner:
-            # 更新 IP 如果有变化
+    匹配规则与 find_or_create_hosting_miner 相同，但按集合执行:
+    1. 一次查询加载站点内 serial_number / ip_address 命中的全部候选矿机
+    2. 一次查询加载全局已占用的 serial_number（用于改名冲突检查和新建去重）
+    3. 在内存映射中按记录顺序解析，缺失的矿机一次性 add_all + flush 批量插入
+    
+    语句数量与批次大小无关（仅随 IN 列表分块增长），不再随矿机数量线性增长。
+    
+    Args:
+        site_id: 站点ID
+        records: 采集器上传的矿机数据列表
+    
+    Returns:
+        list: 与 records 一一对应的 HostingMiner 对象（无法识别的记录为 None）
+    """
+    if not records:
+        return []
+    
+    miner_ids = {r.get('miner_id') for r in records if r.get('miner_id')}
+    ip_addresses = {r.get('ip_address') for r in records if r.get('ip_address')}
+    
+    # 1. 站点内候选矿机（serial 或 IP 命中）
+    by_serial = {}
+    by_ip = {}
+    candidates = {}
+    for serial_chunk in _chunked(sorted(miner_ids)):
+        for miner in HostingMiner.query.filter(
+            HostingMiner.site_id == site_id,
+            HostingMiner.serial_number.in_(serial_chunk)
+        ).all():
+            candidates[miner.id] = miner
+    for ip_chunk in _chunked(sorted(ip_addresses)):
+        for miner in HostingMiner.query.filter(
+            HostingMiner.site_id == site_id,
+            HostingMiner.ip_address.in_(ip_chunk)
+        ).all():
+            candidates[miner.id] = miner
+    for miner in sorted(candidates.values(), key=lambda m: m.id):
+        by_serial.setdefault(miner.serial_number, miner)
+        if miner.ip_address:
+            by_ip.setdefault(miner.ip_address, miner)
+    
+    # 2. 全局已占用的 serial_number（跨站点唯一）
+    wanted_serials = set(miner_ids)
+    for r in records:
+        if not r.get('miner_id') and r.get('ip_address'):
+            wanted_serials.add(f"AUTO_{r['ip_address'].replace('.', '_')}_{site_id}")
+    taken_serials = set(by_serial)
+    pending = sorted(wanted_serials - taken_serials)
+    for serial_chunk in _chunked(pending):
+        rows = db.session.query(HostingMiner.serial_number).filter(
+            HostingMiner.serial_number.in_(serial_chunk)
+        ).all()
+        taken_serials.update(row[0] for row in rows)
+    
+    # 3. 按记录顺序在内存中解析
+    resolved = []
+    new_miners = []
+    default_model = None
+    default_model_loaded = False
+    
+    for miner_data in records:
+        miner_id = miner_data.get('miner_id', '')
+        ip_address = miner_data.get('ip_address', '')
+        
+        if miner_id and miner_id in by_serial:
+            miner = by_serial[miner_id]
             if ip_address and miner.ip_address != ip_address:
+                if by_ip.get(miner.ip_address) is miner:
+                    del by_ip[miner.ip_address]
                 miner.ip_address = ip_address
-            return miner
-    
-    # 2. 再尝试用 IP 地址匹配（适用于 miner_id 变化的情况）
-    if ip_address:
-        miner = HostingMiner.query.filter_by(
+                by_ip[ip_address] = miner
+            resolved.append(miner)
+            continue
+        
+        if ip_address and ip_address in by_ip:
+            miner = by_ip[ip_address]
+            if miner_id and miner.serial_number != miner_id and miner_id not in taken_serials:
+                by_serial.pop(miner.serial_number, None)
+                taken_serials.discard(miner.serial_number)
+                miner.serial_number = miner_id
+                by_serial[miner_id] = miner
+                taken_serials.add(miner_id)
+            resolved.append(miner)
+            continue
+        
+        if not miner_id and not ip_address:
+            resolved.append(None)
+            continue
+        
+        serial_number = miner_id if miner_id else f"AUTO_{ip_address.replace('.', '_')}_{site_id}"
+        if serial_number in taken_serials:
+            serial_number = f"{serial_number}_{site_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+        
+        if not default_model_loaded:
+            default_model = MinerModel.query.filter_by(id=DEFAULT_MINER_MODEL_ID).first()
+            if not default_model:
+                default_model = MinerModel.query.first()
+            default_model_loaded = True
+        
+        model_id = default_model.id if default_model else 1
+        
+        # 从上传数据推断算力和功耗
+        hashrate_ths = miner_data.get('hashrate_ghs', 0) / 1000  # GH/s -> TH/s
+        power_w = miner_data.get('power_consumption', 3250)  # 默认 3250W
+        
+        if hashrate_ths == 0:
+            # 如果没有算力数据，使用型号参考值
+            hashrate_ths = default_model.reference_hashrate if default_model else 110
+        
+        new_miner = HostingMiner(
             site_id=site_id,
-            ip_address=ip_address
-        ).first()
-        if miner:
-            # 如果通过 IP 找到，且有新的 miner_id，更新 serial_number
-            if miner_id and miner.serial_number != miner_id:
-                # 检查新 miner_id 是否与其他记录冲突
-                conflict = HostingMiner.query.filter_by(serial_number=miner_id).first()
-                if not conflict:
-                    miner.serial_number = miner_id
-            return miner
-    
-    # 3. 都没找到，自动创建新矿机
-    # 使用 miner_id 作为 serial_number（保持一致性）
-    serial_number = miner_id if miner_id else f"AUTO_{ip_address.replace('.', '_')}_{site_id}"
-    
-    # 确保 serial_number 全局唯一（跨站点）
-    existing = HostingMiner.query.filter_by(serial_number=serial_number).first()
-    if existing:
-        # 如果已存在相同 serial，添加站点ID和时间戳后缀
-        serial_number = f"{serial_number}_{site_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-    
-    # 获取默认 miner_model
-    default_model = MinerModel.query.filter_by(id=DEFAULT_MINER_MODEL_ID).first()
-    if not default_model:
-        default_model = MinerModel.query.first()
-    
-    model_id = default_model.id if default_model else 1
-    
-    # 从上传数据推断算力和功耗
-    hashrate_ths = miner_data.get('hashrate_ghs', 0) / 1000  # GH/s -> TH/s
-    power_w = miner_data.get('power_consumption', 3250)  # 默认 3250W
-    
-    if hashrate_ths == 0:
-        # 如果没有算力数据，使用型号参考值
-        hashrate_ths = default_model.reference_hashrate if default_model else 110
-    
-    new_miner = HostingMiner(
-        site_id=site_id,
-        customer_id=DEFAULT_OWNER_ID,
-        miner_model_id=model_id,
-        serial_number=serial_number,
-        actual_hashrate=hashrate_ths,
-        actual_power=power_w,
-        ip_address=ip_address,
-        status='online',
-        health_score=100,
-        approval_status='approved',
-        install_date=datetime.utcnow(),
-        cgminer_online=True,
-        last_seen=datetime.utcnow()
-    )
+            customer_id=DEFAULT_OWNER_ID,
+            miner_model_id=model_id,
+            serial_number=serial_number,
+            actual_hashrate=hashrate_ths,
+            actual_power=power_w,
+            ip_address=ip_address,
+            status='online',
+            health_score=100,
+            approval_status='approved',
+            install_date=datetime.utcnow(),
+            cgminer_online=True,
+            last_seen=datetime.utcnow()
+        )
+        new_miners.append(new_miner)
+        taken_serials.add(serial_number)
+        if miner_id:
+            by_serial[miner_id] = new_miner
+        if ip_address:
+            by_ip[ip_address] = new_miner
+        resolved.append(new_miner)
     
-    db.session.add(new_miner)
-    logger.info(f"Auto-created miner: {serial_number} at {ip_address} for site {site_id}")
+    if new_miners:
+        # 单次 flush -> 批量 INSERT ... RETURNING，新矿机立即获得 id
+        db.session.add_all(new_miners)
+        db.session.flush()
+        logger.info(f"Auto-created {len(new_miners)} miners for site {site_id}")
     
-    return new_miner
+    return resolved
 
 
 def sync_hosting_miner_telemetry(miner: HostingMiner, miner_data: dict, now: datetime):
@@ -517,6 +607,15 @@ def sync_hosting_miner_telemetry(miner: HostingMiner, miner_data: dict, now: dat
         miner.ip_address = ip
 
 
+@collector_bp.after_request
+def advertise_telemetry_formats(response):
+    """上传接口响应头声明支持的二进制格式 (X-Telemetry-Accept)"""
+    if request.endpoint == 'collector.upload_telemetry':
+        from services.telemetry_codec import add_accept_header
+        add_accept_header(response)
+    return response
+
+
 @collector_bp.route('/upload', methods=['POST'])
 @verify_collector_key
 def upload_telemetry():
@@ -525,35 +624,77 @@ def upload_telemetry():
     请求头:
         X-Collector-Key: 采集器API密钥
         X-Site-ID: 站点ID
-        Content-Encoding: gzip (可选)
+        Content-Encoding: gzip / zstd (可选)
+        Content-Type: application/x-msgpack (可选, 默认 JSON)
     
     请求体:
-        gzip压缩的JSON数组，包含矿机数据
+        gzip压缩的JSON数组，包含矿机数据；或 telemetry_columnar.v1 列式块；
+        或 telemetry_delta.v1 增量包 (见 services/telemetry_delta.py)，
+        响应中的 resync 列出需要补发关键帧的矿机
     """
     import time
     start_time = time.time()
     
+    from services.telemetry_codec import (
+        read_telemetry_body, open_telemetry_stream, UnsupportedTelemetryFormat, TelemetryStreamError,
+        ColumnarRecords
+    )
+    from services.telemetry_ingest_queue import async_ingest_requested, enqueue_ingest
+    from services.edge_ingest_service import ingest_miner_records, ingest_record_stream
     try:
-        if request.headers.get('Content-Encoding') == 'gzip':
-            raw_data = gzip.decompress(request.data)
-            data = json.loads(raw_data.decode('utf-8'))
-        else:
-            data = request.get_json()
-        
-        if not isinstance(data, list):
-            return jsonify({'success': False, 'error': 'Expected array of miner data'}), 400
-        
         site_id = g.site_id
-        miner_count = len(data)
+        resync = None
         now = datetime.utcnow()
-        
-        from services.edge_ingest_service import ingest_miner_records
-        result = ingest_miner_records(
-            site_id=site_id,
-            records=data,
-            received_at=now,
-            source='legacy'
-        )
+        async_requested = async_ingest_requested(request)
+        
+        # 大批量 JSON 数组: 边解压边解析, 按块写入 (异步模式需要完整负载入队)
+        reader = None if async_requested else open_telemetry_stream(request)
+        if reader is not None and reader.is_array():
+            result = ingest_record_stream(site_id, reader.iter_chunks(), now, source='legacy')
+            miner_count = result['received']
+            data_size_bytes = request.content_length or reader.bytes_read
+        else:
+            try:
+                data = read_telemetry_body(request, force_json=False, reader=reader)
+            except UnsupportedTelemetryFormat as e:
+                return jsonify({'success': False, 'error': str(e)}), 415
+            
+            from services.telemetry_delta import is_delta_payload, decode_delta_payload
+            if is_delta_payload(data):
+                data, resync, delta_stats = decode_delta_payload(site_id, data)
+                logger.debug(f"Delta upload: site={site_id}, keyframes={delta_stats['keyframes']}, deltas={delta_stats['deltas']}, fields={delta_stats['changed_fields']}")
+            elif not isinstance(data, (list, ColumnarRecords)):
+                return jsonify({'success': False, 'error': 'Expected array of miner data'}), 400
+            
+            miner_count = len(data)
+            data_size_bytes = request.content_length or len(request.data)
+            
+            if async_requested:
+                job = enqueue_ingest(
+                    site_id=site_id,
+                    records=data,
+                    received_at=now,
+                    source='legacy',
+                    collector_key_id=g.collector_key.id,
+                    data_size_bytes=data_size_bytes
+                )
+                response = {
+                    'success': True,
+                    'accepted': True,
+                    'receipt_id': job.id,
+                    'status_url': f'/api/collector/ingest/receipts/{job.id}',
+                    'data': {'received': miner_count}
+                }
+                if resync is not None:
+                    response['resync'] = resync
+                return jsonify(response), 202
+            
+            result = ingest_miner_records(
+                site_id=site_id,
+                records=data,
+                received_at=now,
+                source='legacy'
+            )
         
         processing_time = int((time.time() - start_time) * 1000)
         
@@ -563,7 +704,7 @@ def upload_telemetry():
             miner_count=miner_count,
             online_count=result['online_count'],
             offline_count=result['offline_count'],
-            data_size_bytes=len(request.data),
+            data_size_bytes=data_size_bytes,
             processing_time_ms=processing_time
         )
         db.session.add(upload_log)
@@ -571,7 +712,7 @@ def upload_telemetry():
         
         logger.info(f"Received telemetry: site={site_id}, miners={miner_count}, inserted={result['inserted']}, updated={result['updated']}, online={result['online_count']}")
         
-        return jsonify({
+        response = {
             'success': True,
             'inserted': result['inserted'],
             'updated': result['updated'],
@@ -583,9 +724,14 @@ def upload_telemetry():
                 'offline': result['offline_count'],
                 'processing_time_ms': processing_time
             }
-        })
+        }
+        if resync is not None:
+            # 版本不匹配的矿机需要边缘端补发关键帧
+            response['resync'] = resync
+        return jsonify(response)
         
-    except json.JSONDecodeError as e:
+    except (json.JSONDecodeError, TelemetryStreamError) as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': f'Invalid JSON: {e}'}), 400
     except Exception as e:
         logger.error(f"Upload error: {e}")
@@ -593,6 +739,33 @@ def upload_telemetry():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@collector_bp.route('/ingest/receipts/<receipt_id>', methods=['GET'])
+@verify_collector_key
+def get_ingest_receipt(receipt_id):
+    """查询异步上传回执状态"""
+    from services.telemetry_ingest_queue import get_receipt
+    
+    receipt = get_receipt(receipt_id, g.site_id)
+    if not receipt:
+        return jsonify({'success': False, 'error': 'Receipt not found'}), 404
+    
+    return jsonify({'success': True, 'receipt': receipt})
+
+
+@collector_bp.route('/ingest/queue-stats', methods=['GET'])
+@verify_collector_key
+def get_ingest_queue_stats():
+    """获取本站点在异步接收队列中的深度和延迟"""
+    try:
+        from services.telemetry_ingest_queue import get_queue_stats, telemetry_ingest_workers
+        stats = get_queue_stats(site_id=g.site_id)
+        stats['workers'] = telemetry_ingest_workers.get_status()
+        return jsonify({'success': True, 'data': stats})
+    except Exception as e:
+        logger.error(f"Get ingest queue stats error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @collector_bp.route('/status', methods=['GET'])
 @verify_collector_key
 def collector_status():
@@ -636,46 +809,40 @@ def get_live_telemetry(site_id):
         per_page = request.args.get('per_page', 50, type=int)
         online_only = request.args.get('online_only', 'false').lower() == 'true'
         
-        query = MinerTelemetryLive.query.filter_by(site_id=site_id)
-        
-        if online_only:
-            query = query.filter_by(online=True)
-        
-        query = query.order_by(MinerTelemetryLive.miner_id)
-        
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        miners = []
-        for m in pagination.items:
-            miners.append({
-                'miner_id': m.miner_id,
-                'ip_address': m.ip_address,
-                'online': m.online,
-                'last_seen': m.last_seen.isoformat() if m.last_seen else None,
-                'hashrate_ths': m.hashrate_ghs / 1000 if m.hashrate_ghs else 0,
-                'hashrate_5s_ths': m.hashrate_5s_ghs / 1000 if m.hashrate_5s_ghs else 0,
-                'temperature_avg': m.temperature_avg,
-                'temperature_max': m.temperature_max,
-                'fan_speeds': m.fan_speeds or [],
-                'accepted_shares': m.accepted_shares,
-                'rejected_shares': m.rejected_shares,
-                'uptime_hours': m.uptime_seconds / 3600 if m.uptime_seconds else 0,
-                'pool_url': m.pool_url,
-                'worker_name': m.worker_name
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'miners': miners,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': pagination.total,
-                    'pages': pagination.pages
+        def build_payload(snapshot):
+            rows = snapshot.by_miner_id()
+            if online_only:
+                rows = [m for m in rows if m.online]
+            items, pagination = paginate_snapshot(rows, page, per_page)
+            
+            miners = []
+            for m in items:
+                miners.append({
+                    'miner_id': m.miner_id,
+                    'ip_address': m.ip_address,
+                    'online': m.online,
+                    'last_seen': m.last_seen.isoformat() if m.last_seen else None,
+                    'hashrate_ths': m.hashrate_ghs / 1000 if m.hashrate_ghs else 0,
+                    'hashrate_5s_ths': m.hashrate_5s_ghs / 1000 if m.hashrate_5s_ghs else 0,
+                    'temperature_avg': m.temperature_avg,
+                    'temperature_max': m.temperature_max,
+                    'fan_speeds': m.fan_speeds or [],
+                    'accepted_shares': m.accepted_shares,
+                    'rejected_shares': m.rejected_shares,
+                    'uptime_hours': m.uptime_seconds / 3600 if m.uptime_seconds else 0,
+                    'pool_url': m.pool_url,
+                    'worker_name': m.worker_name
+                })
+            
+            return {
+                'success': True,
+                'data': {
+                    'miners': miners,
+                    'pagination': pagination
                 }
             }
-        })
+        
+        return snapshot_response(site_id, build_payload)
         
     except Exception as e:
         logger.error(f"Get live telemetry error: {e}")
@@ -705,50 +872,44 @@ def get_miners_latest(site_id):
         per_page = request.args.get('per_page', 100, type=int)
         online_only = request.args.get('online_only', 'false').lower() == 'true'
         
-        query = MinerTelemetryLive.query.filter_by(site_id=site_id)
-        
-        if online_only:
-            query = query.filter_by(online=True)
-        
-        query = query.order_by(MinerTelemetryLive.updated_at.desc())
-        
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        miners = []
-        for m in pagination.items:
-            miners.append({
-                'miner_id': m.miner_id,
-                'ip_address': m.ip_address,
-                'online': m.online,
-                'updated_at': m.updated_at.isoformat() if m.updated_at else None,
-                'last_seen': m.last_seen.isoformat() if m.last_seen else None,
-                'hashrate_ghs': m.hashrate_ghs or 0,
-                'hashrate_ths': (m.hashrate_ghs or 0) / 1000,
-                'temperature_avg': m.temperature_avg or 0,
-                'temperature_max': m.temperature_max or 0,
-                'fan_speeds': m.fan_speeds or [],
-                'accepted_shares': m.accepted_shares or 0,
-                'rejected_shares': m.rejected_shares or 0,
-                'hardware_errors': m.hardware_errors or 0,
-                'uptime_seconds': m.uptime_seconds or 0,
-                'pool_url': m.pool_url or '',
-                'worker_name': m.worker_name or '',
-                'model': m.model or '',
-                'overall_health': m.overall_health or 'unknown'
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'miners': miners,
-                'pagination': {
-                    'page': page,
-                    'per_page': per_page,
-                    'total': pagination.total,
-                    'pages': pagination.pages
+        def build_payload(snapshot):
+            rows = snapshot.by_updated_desc()
+            if online_only:
+                rows = [m for m in rows if m.online]
+            items, pagination = paginate_snapshot(rows, page, per_page)
+            
+            miners = []
+            for m in items:
+                miners.append({
+                    'miner_id': m.miner_id,
+                    'ip_address': m.ip_address,
+                    'online': m.online,
+                    'updated_at': m.updated_at.isoformat() if m.updated_at else None,
+                    'last_seen': m.last_seen.isoformat() if m.last_seen else None,
+                    'hashrate_ghs': m.hashrate_ghs or 0,
+                    'hashrate_ths': (m.hashrate_ghs or 0) / 1000,
+                    'temperature_avg': m.temperature_avg or 0,
+                    'temperature_max': m.temperature_max or 0,
+                    'fan_speeds': m.fan_speeds or [],
+                    'accepted_shares': m.accepted_shares or 0,
+                    'rejected_shares': m.rejected_shares or 0,
+                    'hardware_errors': m.hardware_errors or 0,
+                    'uptime_seconds': m.uptime_seconds or 0,
+                    'pool_url': m.pool_url or '',
+                    'worker_name': m.worker_name or '',
+                    'model': m.model or '',
+                    'overall_health': m.overall_health or 'unknown'
+                })
+            
+            return {
+                'success': True,
+                'data': {
+                    'miners': miners,
+                    'pagination': pagination
                 }
             }
-        })
+        
+        return snapshot_response(site_id, build_payload)
         
     except Exception as e:
         logger.error(f"Get miners latest error: {e}")
@@ -766,6 +927,8 @@ def get_miner_history(site_id, miner_id):
         - metric: 指标类型 (hashrate_ghs, temperature_avg, temperature_max, fan_speed_avg, power_consumption)
         - hours: 查询小时数 (默认 24)
         - layer: 强制指定层 (raw, history, daily) - 可选
+        - max_points: 最大返回点数 (默认 500, 0 = 不降采样)
+        - downsample: 降采样算法 (lttb 默认, minmax 保留每桶最高/最低点)
     
     Intelligent Layer Routing:
         - hours ≤ 24: telemetry_raw_24h (high resolution ~30s)
@@ -776,13 +939,23 @@ def get_miner_history(site_id, miner_id):
         - points: 时间序列数据点 [{timestamp, value}]
         - metric: 请求的指标名
         - layer: 使用的存储层
+        - total_points: 降采样前的点数
     """
     try:
         from services.telemetry_storage import TelemetryRaw24h, TelemetryHistory5min, TelemetryDaily
+        from services.telemetry_service import TelemetryService, CHART_MAX_POINTS, DOWNSAMPLE_METHODS
         
         metric = request.args.get('metric', 'hashrate_ghs')
         hours = request.args.get('hours', 24, type=int)
         force_layer = request.args.get('layer')
+        max_points = request.args.get('max_points', CHART_MAX_POINTS, type=int)
+        downsample = request.args.get('downsample', 'lttb')
+        
+        if downsample not in DOWNSAMPLE_METHODS:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid downsample. Valid options: {", ".join(DOWNSAMPLE_METHODS)}'
+            }), 400
         
         valid_metrics = ['hashrate_ghs', 'temperature_avg', 'temperature_max', 'fan_speed_avg', 'power_consumption']
         if metric not in valid_metrics:
@@ -889,6 +1062,9 @@ def get_miner_history(site_id, miner_id):
             if points:
                 layer_used = 'legacy_history'
         
+        total_points = len(points)
+        points = TelemetryService.downsample(points, max_points, ('value',), time_key='timestamp', method=downsample)
+        
         return jsonify({
             'success': True,
             'data': {
@@ -898,7 +1074,9 @@ def get_miner_history(site_id, miner_id):
                 'hours': hours,
                 'layer': layer_used,
                 'points': points,
-                'count': len(points)
+                'count': len(points),
+                'total_points': total_points,
+                'downsample': downsample if len(points) < total_points else None
             }
         })
         
@@ -1320,6 +1498,42 @@ def create_batch_commands():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _take_pending_commands(site_id):
+    """将站点到期命令标记为 expired, 取出待执行命令并标记为 sent"""
+    now = datetime.utcnow()
+    
+    expired_count = MinerCommand.query.filter(
+        MinerCommand.site_id == site_id,
+        MinerCommand.status == 'pending',
+        MinerCommand.expires_at < now
+    ).update({'status': 'expired'})
+    
+    if expired_count > 0:
+        db.session.commit()
+        logger.info(f"Marked {expired_count} expired commands for site {site_id}")
+    
+    commands = MinerCommand.query.filter(
+        MinerCommand.site_id == site_id,
+        MinerCommand.status == 'pending',
+        MinerCommand.expires_at >= now
+    ).order_by(
+        MinerCommand.priority.desc(),
+        MinerCommand.created_at.asc()
+    ).limit(50).all()
+    
+    command_payloads = []
+    for cmd in commands:
+        cmd.status = 'sent'
+        cmd.sent_at = now
+        command_payloads.append(cmd.to_command_payload())
+    
+    # 结束事务: 长轮询挂起期间不占用数据库连接
+    db.session.commit()
+    if commands:
+        logger.info(f"Sent {len(commands)} commands to collector for site {site_id}")
+    return command_payloads
+
+
 @collector_bp.route('/commands/pending', methods=['GET'])
 @verify_collector_key
 def fetch_pending_commands():
@@ -1327,44 +1541,28 @@ def fetch_pending_commands():
     
     边缘采集器轮询此接口获取需要执行的命令
     返回按优先级排序的待执行命令列表
+    
+    长轮询: ?wait=<秒> 没有命令时挂起请求, 直到该站点有新命令入队或超时
+    (上限 COMMAND_LONG_POLL_MAX_SECONDS, 默认 0 即立即返回)
     """
     try:
         site_id = g.site_id
-        now = datetime.utcnow()
-        
-        expired_count = MinerCommand.query.filter(
-            MinerCommand.site_id == site_id,
-            MinerCommand.status == 'pending',
-            MinerCommand.expires_at < now
-        ).update({'status': 'expired'})
+        wait = long_poll_seconds(request.args.get('wait'))
+        deadline = time.monotonic() + wait
         
-        if expired_count > 0:
-            db.session.commit()
-            logger.info(f"Marked {expired_count} expired commands for site {site_id}")
-        
-        commands = MinerCommand.query.filter(
-            MinerCommand.site_id == site_id,
-            MinerCommand.status == 'pending',
-            MinerCommand.expires_at >= now
-        ).order_by(
-            MinerCommand.priority.desc(),
-            MinerCommand.created_at.asc()
-        ).limit(50).all()
-        
-        command_payloads = []
-        for cmd in commands:
-            cmd.status = 'sent'
-            cmd.sent_at = now
-            command_payloads.append(cmd.to_command_payload())
-        
-        if commands:
-            db.session.commit()
-            logger.info(f"Sent {len(commands)} commands to collector for site {site_id}")
+        while True:
+            since = command_notifier.version(site_id)
+            command_payloads = _take_pending_commands(site_id)
+            remaining = deadline - time.monotonic()
+            if command_payloads or remaining <= 0:
+                break
+            wait_for_commands(site_id, since, remaining)
         
         return jsonify({
             'success': True,
             'commands': command_payloads,
-            'count': len(command_payloads)
+            'count': len(command_payloads),
+            'long_poll_max_seconds': long_poll_max_seconds()
         })
         
     except Exception as e:
@@ -1373,6 +1571,28 @@ def fetch_pending_commands():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _apply_command_result(command, data, now):
+    """把采集器上报的结果写入 MinerCommand (不提交)"""
+    command.status = data.get('status', 'completed')
+    command.result_code = data.get('result_code', 0)
+    command.result_message = data.get('result_message')
+    command.executed_at = now
+    command.execution_time_ms = data.get('execution_time_ms')
+    command.edge_device_id = data.get('edge_device_id')
+
+
+def _aggregate_remote_results(remote_command_id):
+    """汇总 RemoteCommand 下所有 MinerCommand 的结果"""
+    try:
+        from services.command_dispatcher import aggregate_command_results
+        aggregation_result = aggregate_command_results(remote_command_id)
+        logger.info(f"Aggregated results for RemoteCommand {remote_command_id[:8]}: {aggregation_result}")
+        return aggregation_result
+    except Exception as agg_error:
+        logger.warning(f"Failed to aggregate results: {agg_error}")
+        return None
+
+
 @collector_bp.route('/commands/<int:command_id>/result', methods=['POST'])
 @verify_collector_key
 def report_command_result(command_id):
@@ -1401,14 +1621,7 @@ def report_command_result(command_id):
             return jsonify({'success': False, 'error': 'Command not found'}), 404
         
         data = request.get_json()
-        now = datetime.utcnow()
-        
-        command.status = data.get('status', 'completed')
-        command.result_code = data.get('result_code', 0)
-        command.result_message = data.get('result_message')
-        command.executed_at = now
-        command.execution_time_ms = data.get('execution_time_ms')
-        command.edge_device_id = data.get('edge_device_id')
+        _apply_command_result(command, data, datetime.utcnow())
         
         db.session.commit()
         
@@ -1416,12 +1629,7 @@ def report_command_result(command_id):
         
         aggregation_result = None
         if command.remote_command_id:
-            try:
-                from services.command_dispatcher import aggregate_command_results
-                aggregation_result = aggregate_command_results(command.remote_command_id)
-                logger.info(f"Aggregated results for RemoteCommand {command.remote_command_id[:8]}: {aggregation_result}")
-            except Exception as agg_error:
-                logger.warning(f"Failed to aggregate results: {agg_error}")
+            aggregation_result = _aggregate_remote_results(command.remote_command_id)
         
         return jsonify({
             'success': True,
@@ -1435,6 +1643,70 @@ def report_command_result(command_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@collector_bp.route('/commands/results', methods=['POST'])
+@verify_collector_key
+def report_command_results():
+    """采集器批量报告命令执行结果 (并行下发后一次提交)
+    
+    请求体:
+    {
+        "results": [
+            {"command_id": 1, "status": "completed", "result_code": 0,
+             "result_message": "Success", "execution_time_ms": 1234},
+            ...
+        ]
+    }
+    
+    一次查询取出所有命令、一次提交; 每个关联的 RemoteCommand 只聚合一次
+    """
+    try:
+        site_id = g.site_id
+        results = (request.get_json() or {}).get('results') or []
+        by_id = {}
+        for result in results:
+            try:
+                by_id[int(result.get('command_id'))] = result
+            except (TypeError, ValueError):
+                continue
+        
+        if not by_id:
+            return jsonify({'success': False, 'error': 'results required'}), 400
+        
+        commands = MinerCommand.query.filter(
+            MinerCommand.site_id == site_id,
+            MinerCommand.id.in_(list(by_id))
+        ).all()
+        
+        now = datetime.utcnow()
+        remote_command_ids = set()
+        for command in commands:
+            _apply_command_result(command, by_id[command.id], now)
+            if command.remote_command_id:
+                remote_command_ids.add(command.remote_command_id)
+        
+        db.session.commit()
+        
+        logger.info(f"Batch command results for site {site_id}: {len(commands)} updated")
+        
+        aggregation = {
+            remote_command_id: _aggregate_remote_results(remote_command_id)
+            for remote_command_id in remote_command_ids
+        }
+        found = {command.id for command in commands}
+        
+        return jsonify({
+            'success': True,
+            'updated': len(commands),
+            'not_found': [command_id for command_id in by_id if command_id not in found],
+            'aggregation': aggregation
+        })
+        
+    except Exception as e:
+        logger.error(f"Report command results error: {e}")
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @collector_bp.route('/commands/<int:command_id>', methods=['DELETE'])
 def cancel_command(command_id):
     """取消待执行的命令"""
@@ -1912,6 +2184,10 @@ def download_package():
         except:
             zf.writestr('edge_collector/cgminer_collector.py', '# Edge Collector - See README for full version')
         
+        # cgminer_collector.py imports the combined-query helpers from cgminer_client.py
+        with open('edge_collector/cgminer_client.py', 'r') as f:
+            zf.writestr('edge_collector/cgminer_client.py', f.read())
+        
         try:
             with open('edge_collector/README.md', 'r') as f:
                 zf.writestr('edge_collector/README.md', f.read())
@@ -1932,7 +2208,11 @@ For full documentation, visit: https://calc.hashinsight.net/api/collector/manual
     "api_key": "hsc_your_api_key_here",
     "site_id": "site_001",
     "collection_interval": 30,
+    "collection_engine": "threads",
     "max_workers": 50,
+    "max_concurrent": 1000,
+    "connect_timeout": 2,
+    "timeout": 5,
     "retry_attempts": 3,
     "cache_dir": "./cache",
     "log_level": "INFO",
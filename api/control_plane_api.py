@@ -27,6 +27,7 @@ import uuid
 import hmac
 import logging
 import hashlib
+import time
 from io import StringIO
 from datetime import datetime, timedelta
 from functools import wraps
@@ -45,9 +46,14 @@ from models_control_plane import (
 from api.collector_api import MinerCommand
 from services.rate_limiter import check_rate_limit, record_command_dispatch
 from services.metrics_service import inc_commands_dispatched, inc_commands_acked, inc_commands_failed
+from services.command_notifier import (
+    command_notifier, long_poll_max_seconds, long_poll_seconds, register_command_model, wait_for_commands
+)
 
 logger = logging.getLogger(__name__)
 
+register_command_model(RemoteCommand)
+
 control_plane_bp = Blueprint('control_plane', __name__)
 
 RISK_TIER_MAP = {
@@ -265,48 +271,14 @@ def edge_register():
         return jsonify({
             'registered': True,
             'server_time': datetime.utcnow().isoformat() + 'Z',
-            'polling_hints': {'interval_seconds': 30, 'long_poll_timeout': 60}
+            'polling_hints': {'interval_seconds': 30, 'long_poll_timeout': long_poll_max_seconds()}
         })
     
     return jsonify({'error': 'Device not registered. Contact admin.'}), 403
 
 
-@control_plane_bp.route('/api/edge/v1/commands/poll', methods=['GET'])
-@require_edge_auth
-def edge_poll_commands():
-    """Poll for queued commands - production-grade with atomic lease dispatch
-    
-    Returns both MinerCommand (newer, single-miner) and RemoteCommand (legacy, multi-miner).
-    Each command is clearly labeled with command_source: 'miner' or 'remote'.
-    
-    Zone binding: Device token is bound to (site_id, zone_id).
-    If zone_id param provided, it must match device's zone_id (validation only).
-    CollectorKey auth bypasses zone binding (zone_id is None).
-    
-    Features:
-    - Atomic lease dispatch using SELECT FOR UPDATE SKIP LOCKED
-    - Rate limiting integration
-    - Optional HMAC signature for command integrity
-    - Idempotent ACK support via ack_nonce
-    - Backward compatibility with both RemoteCommand and MinerCommand
-    - CollectorKey authentication support for Remote compatibility
-    """
-    site_id = g.site_id
-    device_zone_id = g.zone_id
-    device_id = str(g.device_id) if g.device_id else f"collector_key:{getattr(g, 'collector_key', None) and g.collector_key.id or 'unknown'}"
-    requested_zone_id = request.args.get('zone_id', type=int)
-    limit = min(request.args.get('limit', 10, type=int), 50)
-    
-    if requested_zone_id and device_zone_id and requested_zone_id != device_zone_id:
-        log_audit_event(
-            event_type='security.zone_access_denied',
-            actor_type='device',
-            actor_id=device_id,
-            site_id=site_id,
-            payload={'requested_zone': requested_zone_id, 'bound_zone': device_zone_id}
-        )
-        return jsonify({'error': 'Zone access denied - device bound to different zone'}), 403
-    
+def _dispatch_edge_commands(site_id, device_zone_id, device_id, limit):
+    """Lease up to ``limit`` queued MinerCommand/RemoteCommand rows to a device; commits"""
     now = datetime.utcnow()
     lease_duration_sec = 60
     lease_until = now + timedelta(seconds=lease_duration_sec)
@@ -543,7 +515,7 @@ def edge_poll_commands():
     
     db.session.commit()
     
-    return jsonify({
+    return {
         'commands': result,
         'server_time': now.isoformat() + 'Z',
         'dispatched_count': dispatched_count,
@@ -551,7 +523,60 @@ def edge_poll_commands():
         'remote_command_count': remote_command_count,
         'rate_limited_count': rate_limited_count,
         'lease_duration_sec': lease_duration_sec,
-    })
+    }
+
+
+@control_plane_bp.route('/api/edge/v1/commands/poll', methods=['GET'])
+@require_edge_auth
+def edge_poll_commands():
+    """Poll for queued commands - production-grade with atomic lease dispatch
+    
+    Returns both MinerCommand (newer, single-miner) and RemoteCommand (legacy, multi-miner).
+    Each command is clearly labeled with command_source: 'miner' or 'remote'.
+    
+    Zone binding: Device token is bound to (site_id, zone_id).
+    If zone_id param provided, it must match device's zone_id (validation only).
+    CollectorKey auth bypasses zone binding (zone_id is None).
+    
+    Features:
+    - Atomic lease dispatch using SELECT FOR UPDATE SKIP LOCKED
+    - Rate limiting integration
+    - Optional HMAC signature for command integrity
+    - Idempotent ACK support via ack_nonce
+    - Backward compatibility with both RemoteCommand and MinerCommand
+    - CollectorKey authentication support for Remote compatibility
+    - Long polling: ``?wait=<seconds>`` parks an empty poll until a command is
+      queued for the site (capped by COMMAND_LONG_POLL_MAX_SECONDS, 0 = off)
+    """
+    site_id = g.site_id
+    device_zone_id = g.zone_id
+    device_id = str(g.device_id) if g.device_id else f"collector_key:{getattr(g, 'collector_key', None) and g.collector_key.id or 'unknown'}"
+    requested_zone_id = request.args.get('zone_id', type=int)
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    
+    if requested_zone_id and device_zone_id and requested_zone_id != device_zone_id:
+        log_audit_event(
+            event_type='security.zone_access_denied',
+            actor_type='device',
+            actor_id=device_id,
+            site_id=site_id,
+            payload={'requested_zone': requested_zone_id, 'bound_zone': device_zone_id}
+        )
+        return jsonify({'error': 'Zone access denied - device bound to different zone'}), 403
+    
+    wait = long_poll_seconds(request.args.get('wait'))
+    deadline = time.monotonic() + wait
+    
+    while True:
+        since = command_notifier.version(site_id)
+        response = _dispatch_edge_commands(site_id, device_zone_id, device_id, limit)
+        remaining = deadline - time.monotonic()
+        if response['commands'] or remaining <= 0:
+            break
+        wait_for_commands(site_id, since, remaining)
+    
+    response['long_poll_max_seconds'] = long_poll_max_seconds()
+    return jsonify(response)
 
 
 def _sync_remote_command_status(remote_command_id):
@@ -987,22 +1012,55 @@ def _handle_remote_command_ack(command, command_id):
     })
 
 
+@control_plane_bp.after_request
+def advertise_telemetry_formats(response):
+    """Tell edge clients which binary payload features the ingest endpoint accepts"""
+    if request.endpoint == 'control_plane.edge_ingest_telemetry':
+        from services.telemetry_codec import add_accept_header
+        add_accept_header(response)
+    return response
+
+
 @control_plane_bp.route('/api/edge/v1/telemetry/ingest', methods=['POST'])
 @control_plane_bp.route('/api/edge/v1/telemetry/batch', methods=['POST'])
 @require_edge_auth
 def edge_ingest_telemetry():
-    """Ingest telemetry from edge - supports gzip, envelope, and plain JSON"""
-    import gzip as gzip_mod
-    
+    """Ingest telemetry from edge - supports gzip/zstd, JSON/msgpack, envelope and columnar blocks"""
     received_at = datetime.utcnow()
     warnings = []
     
+    from services.telemetry_codec import (
+        read_telemetry_body, open_telemetry_stream, UnsupportedTelemetryFormat, ColumnarRecords
+    )
+    from services.telemetry_ingest_queue import async_ingest_requested, enqueue_ingest
+    
+    # Large plain-list bodies are gunzipped and parsed incrementally, chunk by chunk
+    reader = None if async_ingest_requested(request) else open_telemetry_stream(request)
+    if reader is not None and reader.is_array():
+        from services.edge_ingest_service import ingest_record_stream
+        edge_meta = {'device_id': str(g.device_id) if g.device_id else None, 'zone_id': g.zone_id}
+        try:
+            result = ingest_record_stream(g.site_id, reader.iter_chunks(), received_at,
+                                          source='legacy', edge_meta=edge_meta)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid payload: {e}', 'error_code': 'INVALID_PAYLOAD'}), 400
+        warnings.extend(result.get('errors', []))
+        return jsonify({
+            'success': True,
+            'processed': result['processed_count'],
+            'duplicate_skipped': result.get('duplicate_skipped', 0),
+            'received_at': received_at.isoformat() + 'Z',
+            'source': 'legacy',
+            'site_id': g.site_id,
+            'zone_id': g.zone_id,
+            'device_id': edge_meta['device_id'],
+            'warnings': warnings
+        })
+    
     try:
-        if request.headers.get('Content-Encoding') == 'gzip':
-            raw_data = gzip_mod.decompress(request.data)
-            data = json.loads(raw_data.decode('utf-8'))
-        else:
-            data = request.get_json(force=True)
+        data = read_telemetry_body(request, reader=reader)
+    except UnsupportedTelemetryFormat as e:
+        return jsonify({'error': str(e), 'error_code': 'UNSUPPORTED_MEDIA_TYPE'}), 415
     except Exception as e:
         return jsonify({'error': f'Invalid payload: {e}', 'error_code': 'INVALID_PAYLOAD'}), 400
     
@@ -1014,7 +1072,7 @@ def edge_ingest_telemetry():
     device_id = str(g.device_id) if g.device_id else None
     edge_meta = {'device_id': device_id, 'zone_id': zone_id}
     
-    if isinstance(data, list):
+    if isinstance(data, (list, ColumnarRecords)):
         records = data
         source = 'legacy'
     elif isinstance(data, dict):
@@ -1057,6 +1115,39 @@ def edge_ingest_telemetry():
             'device_id': device_id, 'warnings': warnings
         })
     
+    from services.ingest_watermark import sequence_watermarks
+    if sequence_watermarks.is_duplicate(edge_meta):
+        # Retransmit of an already-applied range: acknowledge without touching the DB
+        return jsonify({
+            'success': True, 'processed': 0, 'duplicate_skipped': len(records),
+            'received_at': received_at.isoformat() + 'Z', 'source': source,
+            'site_id': g.site_id, 'zone_id': zone_id, 'device_id': device_id,
+            'warnings': warnings
+        })
+    
+    if async_ingest_requested(request):
+        job = enqueue_ingest(
+            site_id=g.site_id,
+            records=records,
+            received_at=received_at,
+            source=source,
+            edge_meta=edge_meta,
+            data_size_bytes=request.content_length or len(request.data)
+        )
+        return jsonify({
+            'success': True,
+            'accepted': True,
+            'receipt_id': job.id,
+            'status_url': f'/api/edge/v1/telemetry/receipts/{job.id}',
+            'received': len(records),
+            'received_at': received_at.isoformat() + 'Z',
+            'source': source,
+            'site_id': g.site_id,
+            'zone_id': zone_id,
+            'device_id': device_id,
+            'warnings': warnings
+        }), 202
+    
     from services.edge_ingest_service import ingest_miner_records
     result = ingest_miner_records(
         site_id=g.site_id,
@@ -1071,6 +1162,7 @@ def edge_ingest_telemetry():
     return jsonify({
         'success': True,
         'processed': result['processed_count'],
+        'duplicate_skipped': result.get('duplicate_skipped', 0),
         'received_at': received_at.isoformat() + 'Z',
         'source': source,
         'site_id': g.site_id,
@@ -1080,6 +1172,19 @@ def edge_ingest_telemetry():
     })
 
 
+@control_plane_bp.route('/api/edge/v1/telemetry/receipts/<receipt_id>', methods=['GET'])
+@require_edge_auth
+def edge_telemetry_receipt(receipt_id):
+    """Status of an asynchronously accepted telemetry batch"""
+    from services.telemetry_ingest_queue import get_receipt
+    
+    receipt = get_receipt(receipt_id, g.site_id)
+    if not receipt:
+        return jsonify({'error': 'Receipt not found', 'error_code': 'RECEIPT_NOT_FOUND'}), 404
+    
+    return jsonify(receipt)
+
+
 @control_plane_bp.route('/api/edge/v1/events/safety/batch', methods=['POST'])
 @require_device_auth
 def edge_safety_events_batch():
@@ -23,6 +23,7 @@ from db import db
 from models import UserAccess, HostingSite, HostingMiner, MinerModel
 from models_device_encryption import EdgeDevice, IPScanJob, DiscoveredMiner, DeviceAuditEvent
 from api.device_api import require_user_auth, require_auth, log_audit_event
+from services.scan_planner import SCAN_MODES, SCAN_TYPE_INCREMENTAL, plan_incremental_scan
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +83,59 @@ def parse_ip_range_input(data: dict) -> tuple:
     return None, None, 0, "Please provide cidr, ip_range, or ip_range_start/ip_range_end"
 
 
+def upsert_discovered_miners(scan_job: IPScanJob, miners: list) -> int:
+    """
+    Insert or refresh discovered miners of a scan job (keyed by IP)
+    
+    Used for the final report and for miners streamed with progress updates,
+    so a miner reported twice is stored once. Updates
+    scan_job.discovered_miners; the caller commits.
+    
+    Returns:
+        Number of newly inserted miners
+    """
+    inserted = 0
+    
+    for miner_data in miners or []:
+        ip_address = miner_data.get('ip_address')
+        if not ip_address:
+            continue
+        
+        existing = DiscoveredMiner.query.filter_by(
+            scan_job_id=scan_job.id,
+            ip_address=ip_address
+        ).first()
+        
+        if existing:
+            existing.api_port = miner_data.get('api_port', 4028)
+            existing.detected_model = miner_data.get('detected_model')
+            existing.detected_firmware = miner_data.get('detected_firmware')
+            existing.detected_hashrate_ghs = miner_data.get('detected_hashrate_ghs')
+            existing.mac_address = miner_data.get('mac_address')
+            existing.hostname = miner_data.get('hostname')
+            existing.raw_response = miner_data.get('raw_response')
+        else:
+            discovered = DiscoveredMiner(
+                scan_job_id=scan_job.id,
+                tenant_id=scan_job.tenant_id,
+                ip_address=ip_address,
+                api_port=miner_data.get('api_port', 4028),
+                detected_model=miner_data.get('detected_model'),
+                detected_firmware=miner_data.get('detected_firmware'),
+                detected_hashrate_ghs=miner_data.get('detected_hashrate_ghs'),
+                mac_address=miner_data.get('mac_address'),
+                hostname=miner_data.get('hostname'),
+                raw_response=miner_data.get('raw_response'),
+                discovered_at=datetime.utcnow()
+            )
+            db.session.add(discovered)
+            inserted += 1
+    
+    db.session.flush()
+    scan_job.discovered_miners = scan_job.discovered.count()
+    return inserted
+
+
 @scan_bp.route('', methods=['POST'])
 @require_user_auth
 def create_scan():
@@ -95,7 +149,9 @@ def create_scan():
             "ip_range_start": "192.168.1.1",
             "ip_range_end": "192.168.1.254",
             "site_id": 123,  // optional
-            "device_id": 456  // optional - edge device to perform scan
+            "device_id": 456,  // optional - edge device to perform scan
+            "mode": "full"  // optional - "incremental": known miners first,
+                            // skip addresses empty in the last full scans
         }
     
     Response:
@@ -119,6 +175,10 @@ def create_scan():
         site_id = data.get('site_id')
         device_id = data.get('device_id')
         
+        mode = (data.get('mode') or 'full').lower()
+        if mode not in SCAN_MODES:
+            return jsonify({'error': f"Invalid mode: {mode}. Use 'full' or 'incremental'"}), 400
+        
         if site_id:
             site = HostingSite.query.filter_by(id=site_id, user_id=g.tenant_id).first()
             if not site:
@@ -135,6 +195,7 @@ def create_scan():
             device_id=device_id,
             ip_range_start=start_ip,
             ip_range_end=end_ip,
+            scan_type=SCAN_MODES[mode],
             total_ips=total_ips,
             status='PENDING',
             created_at=datetime.utcnow()
@@ -150,7 +211,8 @@ def create_scan():
                 'ip_range': f"{start_ip}-{end_ip}",
                 'total_ips': total_ips,
                 'site_id': site_id,
-                'device_id': device_id
+                'device_id': device_id,
+                'mode': mode
             }
         )
         
@@ -444,8 +506,13 @@ def start_edge_scan():
     Response:
         {
             "scan_job": {...},
-            "ip_list": ["192.168.1.1", "192.168.1.2", ...]
+            "ip_list": ["192.168.1.1", "192.168.1.2", ...],
+            "plan": {"known_ips": 12, "probe_ips": 40, "skipped_ips": 202}  // incremental jobs
         }
+    
+    For incremental jobs ip_list lists known miners first and leaves out
+    addresses confirmed empty by previous full scans; total_ips becomes the
+    number of addresses to probe.
     """
     data = request.get_json() or {}
     scan_job_id = data.get('scan_job_id')
@@ -480,11 +547,6 @@ def start_edge_scan():
         if not scan_job:
             return jsonify({'message': 'No pending scan jobs'}), 200
     
-    scan_job.status = 'RUNNING'
-    scan_job.device_id = device_id
-    scan_job.started_at = datetime.utcnow()
-    db.session.commit()
-    
     try:
         from edge_collector.ip_scanner import IPRangeParser
         parser = IPRangeParser()
@@ -493,16 +555,35 @@ def start_edge_scan():
         logger.error(f"Failed to enumerate IPs: {e}")
         ip_list = []
     
+    plan = None
+    if scan_job.scan_type == SCAN_TYPE_INCREMENTAL and ip_list:
+        try:
+            plan = plan_incremental_scan(ip_list, site_id=scan_job.site_id,
+                                         tenant_id=scan_job.tenant_id, exclude_job_id=scan_job.id)
+            ip_list = plan.ip_list
+            scan_job.total_ips = len(ip_list)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Incremental scan planning failed, scanning full range: {e}")
+    
+    scan_job.status = 'RUNNING'
+    scan_job.device_id = device_id
+    scan_job.started_at = datetime.utcnow()
+    db.session.commit()
+    
     log_audit_event(
         'SCAN_JOB_STARTED',
         device_id=device_id,
         event_data={'scan_job_id': scan_job.id}
     )
     
-    return jsonify({
+    response = {
         'scan_job': scan_job.to_dict(),
         'ip_list': ip_list
-    })
+    }
+    if plan is not None:
+        response['plan'] = plan.to_dict()
+    return jsonify(response)
 
 
 @edge_scan_bp.route('/<int:scan_id>/progress', methods=['POST'])
@@ -511,10 +592,15 @@ def update_scan_progress(scan_id):
     """
     Edge device reports scan progress
     
+    Miners found since the last report may be streamed along; they are stored
+    right away (same fields as /results), so the scan job lists them while the
+    scan is still running.
+    
     Request:
         {
             "scanned_ips": 150,
-            "discovered_miners": 5
+            "discovered_miners": 5,  // ignored when miners are sent
+            "miners": [{"ip_address": "192.168.1.10", ...}]  // optional
         }
     """
     device_id = getattr(g, 'device_id', None)
@@ -535,7 +621,9 @@ def update_scan_progress(scan_id):
     
     if 'scanned_ips' in data:
         scan_job.scanned_ips = data['scanned_ips']
-    if 'discovered_miners' in data:
+    if data.get('miners'):
+        upsert_discovered_miners(scan_job, data['miners'])
+    elif 'discovered_miners' in data:
         scan_job.discovered_miners = data['discovered_miners']
     
     db.session.commit()
@@ -596,45 +684,7 @@ def report_scan_results(scan_id):
     if status == 'FAILED':
         scan_job.error_message = data.get('error_message', 'Unknown error')
     
-    miners = data.get('miners', [])
-    discovered_count = 0
-    
-    for miner_data in miners:
-        ip_address = miner_data.get('ip_address')
-        if not ip_address:
-            continue
-        
-        existing = DiscoveredMiner.query.filter_by(
-            scan_job_id=scan_id,
-            ip_address=ip_address
-        ).first()
-        
-        if existing:
-            existing.api_port = miner_data.get('api_port', 4028)
-            existing.detected_model = miner_data.get('detected_model')
-            existing.detected_firmware = miner_data.get('detected_firmware')
-            existing.detected_hashrate_ghs = miner_data.get('detected_hashrate_ghs')
-            existing.mac_address = miner_data.get('mac_address')
-            existing.hostname = miner_data.get('hostname')
-            existing.raw_response = miner_data.get('raw_response')
-        else:
-            discovered = DiscoveredMiner(
-                scan_job_id=scan_id,
-                tenant_id=g.tenant_id,
-                ip_address=ip_address,
-                api_port=miner_data.get('api_port', 4028),
-                detected_model=miner_data.get('detected_model'),
-                detected_firmware=miner_data.get('detected_firmware'),
-                detected_hashrate_ghs=miner_data.get('detected_hashrate_ghs'),
-                mac_address=miner_data.get('mac_address'),
-                hostname=miner_data.get('hostname'),
-                raw_response=miner_data.get('raw_response'),
-                discovered_at=datetime.utcnow()
-            )
-            db.session.add(discovered)
-            discovered_count += 1
-    
-    scan_job.discovered_miners = scan_job.discovered.count() + discovered_count
+    upsert_discovered_miners(scan_job, data.get('miners', []))
     
     db.session.commit()
     
@@ -18,7 +18,7 @@ from flask import Blueprint, request, jsonify, g, session
 
 from db import db
 from models import UserAccess
-from services.telemetry_service import telemetry_service
+from services.telemetry_service import telemetry_service, DOWNSAMPLE_METHODS
 
 logger = logging.getLogger(__name__)
 
@@ -62,28 +62,37 @@ def get_live_telemetry():
     online_only = request.args.get('online', '').lower() == 'true'
     limit = min(request.args.get('limit', 1000, type=int), 5000)
     
-    miners = telemetry_service.get_live(
-        site_id=site_id,
-        miner_id=miner_id,
-        online_only=online_only,
-        limit=limit
-    )
-    
-    return jsonify({
-        'miners': miners,
-        'count': len(miners),
-        '_meta': {
-            'source': 'miner_telemetry_live',
-            'updated_at': datetime.utcnow().isoformat(),
-            'unit_definitions': {
-                'hashrate': 'TH/s (5-minute average)',
-                'temperature': 'Celsius',
-                'power': 'Watts',
-                'efficiency': 'Joules per TH',
-                'reject_rate': 'Ratio (0-1)',
+    def build_payload(snapshot=None):
+        miners = telemetry_service.get_live(
+            site_id=site_id,
+            miner_id=miner_id,
+            online_only=online_only,
+            limit=limit,
+            snapshot=snapshot
+        )
+        return {
+            'miners': miners,
+            'count': len(miners),
+            '_meta': {
+                'source': 'live_snapshot' if snapshot else 'miner_telemetry_live',
+                'updated_at': datetime.utcnow().isoformat(),
+                'version': snapshot.version if snapshot else None,
+                'unit_definitions': {
+                    'hashrate': 'TH/s (5-minute average)',
+                    'temperature': 'Celsius',
+                    'power': 'Watts',
+                    'efficiency': 'Joules per TH',
+                    'reject_rate': 'Ratio (0-1)',
+                }
             }
         }
-    })
+    
+    if site_id:
+        # Single-site reads come from the snapshot store and carry its version as ETag
+        from services.live_snapshot_store import snapshot_response
+        return snapshot_response(site_id, build_payload)
+    
+    return jsonify(build_payload())
 
 
 @telemetry_bp.route('/api/v1/telemetry/history', methods=['GET'])
@@ -97,6 +106,9 @@ def get_history_telemetry():
         start (datetime, required): Start time (ISO format)
         end (datetime, required): End time (ISO format)
         resolution (string): '5min' | 'hourly' | 'daily' (default: auto)
+        points (int, optional): Point budget per series for auto resolution (default: 300)
+        max_points (int, optional): Downsample each series to at most this many points
+        downsample (string): 'lttb' | 'minmax' (default: lttb)
     
     Returns standardized format with metadata.
     """
@@ -106,9 +118,14 @@ def get_history_telemetry():
     end_str = request.args.get('end')
     resolution = request.args.get('resolution', 'auto')
     
+    downsample = request.args.get('downsample', 'lttb')
+    
     if not site_id:
         return jsonify({'error': 'site_id is required'}), 400
     
+    if downsample not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f'downsample must be one of {", ".join(DOWNSAMPLE_METHODS)}'}), 400
+    
     if not start_str or not end_str:
         return jsonify({'error': 'start and end are required'}), 400
     
@@ -118,21 +135,15 @@ def get_history_telemetry():
     except ValueError:
         return jsonify({'error': 'Invalid datetime format. Use ISO format.'}), 400
     
-    duration = end - start
-    if resolution == 'auto':
-        if duration.days > 30:
-            resolution = 'daily'
-        elif duration.days > 2:
-            resolution = 'hourly'
-        else:
-            resolution = '5min'
-    
     result = telemetry_service.get_history(
         site_id=site_id,
         start=start,
         end=end,
         miner_id=miner_id,
-        resolution=resolution
+        resolution=resolution,
+        points=request.args.get('points', type=int),
+        max_points=request.args.get('max_points', type=int),
+        downsample=downsample
     )
     
     return jsonify(result)
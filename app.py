@@ -5886,6 +5886,21 @@ try:
 except Exception as e:
     logging.error(f"遥测存储调度器初始化异常: {e}")
 
+# 🔧 初始化遥测异步接收队列 worker (TELEMETRY_INGEST_MODE=async 时启用)
+def init_telemetry_ingest_workers():
+    """安全初始化遥测异步接收 worker 池 - 消费 telemetry_ingest_queue"""
+    try:
+        from services.telemetry_ingest_queue import telemetry_ingest_workers
+        if telemetry_ingest_workers.init_app(app):
+            logging.info("遥测异步接收 worker 池初始化完成")
+    except Exception as e:
+        logging.warning(f"遥测异步接收 worker 池初始化失败: {e}")
+
+try:
+    init_telemetry_ingest_workers()
+except Exception as e:
+    logging.error(f"遥测异步接收 worker 池初始化异常: {e}")
+
 # 🔧 初始化电力聚合调度器 - 小时/日/月用电量聚合
 def init_power_aggregation_scheduler():
     """安全初始化电力聚合调度器 - 管理站点用电量聚合任务"""
@@ -6,6 +6,7 @@ CGMiner TCP Client with Retry Mechanism
 - 自动重试 (3次 + 指数退避)
 - 连接超时处理
 - 自定义异常
+- 合并命令查询 (summary+stats+pools 一次往返, 不支持的固件自动回退)
 """
 
 import socket
@@ -17,6 +18,33 @@ from typing import Dict, Optional, Any, Tuple
 
 logger = logging.getLogger('CGMinerClient')
 
+# 固件不支持合并命令的 (host, port), 之后直接逐条查询; cgminer_collector.CGMinerAPI 共用
+COMBINED_UNSUPPORTED = set()
+
+
+def split_combined_response(response: Optional[Dict], commands) -> Dict[str, Dict]:
+    """
+    拆分合并命令的响应
+    
+    合并响应形如 {"summary": [{...}], "stats": [{...}], "pools": [{...}], "id": 1},
+    每个部分与单条命令的响应相同。缺失或返回错误状态的部分不会出现在结果中。
+    """
+    parts = {}
+    if not isinstance(response, dict):
+        return parts
+    for command in commands:
+        part = response.get(command)
+        if isinstance(part, list) and part:
+            part = part[0]
+        if not isinstance(part, dict):
+            continue
+        status = part.get('STATUS')
+        if isinstance(status, list) and status and isinstance(status[0], dict) \
+                and status[0].get('STATUS') in ('E', 'F'):
+            continue
+        parts[command] = part
+    return parts
+
 
 class CGMinerError(Exception):
     """CGMiner通信错误 / CGMiner Communication Error"""
@@ -185,6 +213,34 @@ class CGMinerClient:
                 except:
                     pass
     
+    def send_commands(self, *commands: str) -> Dict[str, Dict[str, Any]]:
+        """
+        一次往返查询多个命令 / Query several commands in one round trip
+        
+        Sends ``cmd1+cmd2+...`` and splits the response. When the firmware
+        rejects combined commands the host is remembered and queried one
+        command at a time from then on; parts missing from a combined
+        response are fetched individually.
+        
+        Raises:
+            CGMinerError: 通信失败
+        """
+        key = (self.host, self.port)
+        results = {}
+        if len(commands) > 1 and key not in COMBINED_UNSUPPORTED:
+            try:
+                results = split_combined_response(self.send_command('+'.join(commands)), commands)
+            except CGMinerError as e:
+                if e.error_type != 'parse':
+                    raise
+            if not results:
+                COMBINED_UNSUPPORTED.add(key)
+                logger.debug(f"{self.host}:{self.port} does not support combined commands")
+        for command in commands:
+            if command not in results:
+                results[command] = self.send_command(command)
+        return results
+    
     def get_summary(self) -> Dict[str, Any]:
         """获取矿机摘要信息 / Get miner summary"""
         return self.send_command("summary")
@@ -207,15 +263,12 @@ class CGMinerClient:
     
     def get_all_data(self) -> Dict[str, Any]:
         """
-        获取所有数据（合并调用）
+        获取所有数据（合并调用, 单次往返）
         Returns combined data from summary, stats, pools
         """
-        return {
-            "summary": self.get_summary(),
-            "stats": self.get_stats(),
-            "pools": self.get_pools(),
-            "latency_ms": self._last_latency_ms
-        }
+        data = self.send_commands("summary", "stats", "pools")
+        data["latency_ms"] = self._last_latency_ms
+        return data
     
     def is_alive(self) -> bool:
         """
@@ -13,6 +13,7 @@ Mining Farm Edge Data Collector
 部署: 在矿场本地服务器运行此脚本
 """
 
+import asyncio
 import socket
 import json
 import gzip
@@ -27,15 +28,36 @@ import requests
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields, replace
 from pathlib import Path
 
+# 可选二进制编码: 云端在 X-Telemetry-Accept 中声明支持后启用
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger('EdgeCollector')
 
+# 合并命令的拆分与不支持合并命令的矿机缓存 (与 CGMinerClient 共用一份)
+try:
+    from .cgminer_client import COMBINED_UNSUPPORTED, split_combined_response
+except ImportError:
+    from cgminer_client import COMBINED_UNSUPPORTED, split_combined_response
+
 # 导入板级健康解析器
 try:
     from .parsers import parse_board_health, parse_power_consumption
@@ -75,6 +97,8 @@ class MinerData:
     boards_total: int = 0
     boards_healthy: int = 0
     overall_health: str = "offline"
+    # 边缘聚合窗口统计 (SampleAggregator 生成的汇总记录才有)
+    window: Optional[Dict] = None
     
     def __post_init__(self):
         if self.temperature_chips is None:
@@ -85,6 +109,14 @@ class MinerData:
             self.boards = []
 
 
+# 合并查询: cgminer/bmminer 支持 "summary+stats+pools" 一次返回多个命令的结果
+COLLECT_COMMANDS = ('summary', 'stats', 'pools')
+
+
+class CombinedQueryUnsupported(Exception):
+    """矿机有响应但无法解析合并命令的结果"""
+
+
 class CGMinerAPI:
     """CGMiner API客户端"""
     
@@ -93,10 +125,10 @@ class CGMinerAPI:
         self.port = port
         self.timeout = timeout
     
-    def send_command(self, command: str, parameter: str = "") -> Optional[Dict]:
-        """发送API命令并返回JSON响应"""
+    def _request(self, command: str, parameter: str = "") -> Optional[Dict]:
+        """发送一次请求; 网络错误向上抛出, 空响应返回 None, 无效JSON抛出 ValueError"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(self.timeout)
             sock.connect((self.host, self.port))
             
@@ -111,12 +143,16 @@ class CGMinerAPI:
                 response += chunk
                 if b'\x00' in chunk:
                     break
-            
+        finally:
             sock.close()
-            
-            data = response.rstrip(b'\x00').decode('utf-8', errors='ignore')
-            return json.loads(data) if data else None
-            
+        
+        data = response.rstrip(b'\x00').decode('utf-8', errors='ignore')
+        return json.loads(data) if data else None
+    
+    def send_command(self, command: str, parameter: str = "") -> Optional[Dict]:
+        """发送API命令并返回JSON响应"""
+        try:
+            return self._request(command, parameter)
         except socket.timeout:
             logger.debug(f"Timeout connecting to {self.host}:{self.port}")
             return None
@@ -127,6 +163,31 @@ class CGMinerAPI:
             logger.debug(f"Error querying {self.host}: {e}")
             return None
     
+    def send_commands(self, commands=COLLECT_COMMANDS) -> Dict[str, Optional[Dict]]:
+        """
+        一次往返查询多个命令
+        
+        固件不支持合并命令时记住该矿机并改为逐条查询; 合并响应缺少的部分单独补查。
+        矿机无法连接时所有结果为 None (不再逐条重试)。
+        """
+        key = (self.host, self.port)
+        results = {}
+        if len(commands) > 1 and key not in COMBINED_UNSUPPORTED:
+            try:
+                results = split_combined_response(self._request('+'.join(commands)), commands)
+                if not results:
+                    raise CombinedQueryUnsupported()
+            except (socket.timeout, OSError) as e:
+                logger.debug(f"Error querying {self.host}: {e}")
+                return {command: None for command in commands}
+            except (ValueError, CombinedQueryUnsupported):
+                COMBINED_UNSUPPORTED.add(key)
+                logger.debug(f"{self.host}:{self.port} does not support combined commands")
+        for command in commands:
+            if command not in results:
+                results[command] = self.send_command(command)
+        return results
+    
     def get_summary(self) -> Optional[Dict]:
         """获取矿机摘要信息"""
         return self.send_command("summary")
@@ -361,22 +422,424 @@ class MinerDataParser:
     def parse_avalon(summary: Dict, stats: Dict, pools: Dict, ip: str, miner_id: str) -> MinerData:
         """解析Avalon数据"""
         return MinerDataParser.parse_antminer(summary, stats, pools, ip, miner_id)
+    
+    @staticmethod
+    def parse(miner_type: str, summary: Dict, stats: Dict, pools: Dict, ip: str, miner_id: str) -> MinerData:
+        """按矿机类型选择解析器"""
+        if miner_type == 'whatsminer':
+            return MinerDataParser.parse_whatsminer(summary, stats, pools, ip, miner_id)
+        elif miner_type == 'avalon':
+            return MinerDataParser.parse_avalon(summary, stats, pools, ip, miner_id)
+        return MinerDataParser.parse_antminer(summary, stats, pools, ip, miner_id)
+    
+    @staticmethod
+    def offline(ip: str, miner_id: str, error_message: str = "Connection failed") -> MinerData:
+        """无法连接时的离线记录"""
+        return MinerData(
+            miner_id=miner_id,
+            ip_address=ip,
+            timestamp=datetime.utcnow().isoformat(),
+            online=False,
+            error_message=error_message
+        )
+
+
+class AsyncCGMinerAPI:
+    """CGMiner API 异步客户端 (asyncio 采集引擎使用)"""
+    
+    def __init__(self, host: str, port: int = 4028, timeout: float = 5.0, connect_timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+    
+    async def _request(self, command: str, parameter: str = "") -> Optional[Dict]:
+        """发送一次请求; 连接超时与读取超时分开计算, 错误向上抛出"""
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port),
+                timeout=self.connect_timeout
+            )
+            writer.write(json.dumps({"command": command, "parameter": parameter}).encode('utf-8'))
+            await writer.drain()
+            
+            response = await asyncio.wait_for(self._read_response(reader), timeout=self.timeout)
+        finally:
+            if writer is not None:
+                writer.close()
+        
+        data = response.rstrip(b'\x00').decode('utf-8', errors='ignore')
+        return json.loads(data) if data else None
+    
+    async def send_command(self, command: str, parameter: str = "") -> Optional[Dict]:
+        """发送API命令并返回JSON响应"""
+        try:
+            return await self._request(command, parameter)
+        except asyncio.TimeoutError:
+            logger.debug(f"Timeout querying {self.host}:{self.port} ({command})")
+            return None
+        except ConnectionRefusedError:
+            logger.debug(f"Connection refused: {self.host}:{self.port}")
+            return None
+        except Exception as e:
+            logger.debug(f"Error querying {self.host}: {e}")
+            return None
+    
+    async def send_commands(self, commands=COLLECT_COMMANDS) -> Dict[str, Optional[Dict]]:
+        """一次往返查询多个命令 (回退规则同 CGMinerAPI.send_commands)"""
+        key = (self.host, self.port)
+        results = {}
+        if len(commands) > 1 and key not in COMBINED_UNSUPPORTED:
+            try:
+                results = split_combined_response(await self._request('+'.join(commands)), commands)
+                if not results:
+                    raise CombinedQueryUnsupported()
+            except (asyncio.TimeoutError, OSError) as e:
+                logger.debug(f"Error querying {self.host}: {e}")
+                return {command: None for command in commands}
+            except (ValueError, CombinedQueryUnsupported):
+                COMBINED_UNSUPPORTED.add(key)
+                logger.debug(f"{self.host}:{self.port} does not support combined commands")
+        for command in commands:
+            if command not in results:
+                results[command] = await self.send_command(command)
+        return results
+    
+    @staticmethod
+    async def _read_response(reader) -> bytes:
+        response = b''
+        while True:
+            chunk = await reader.read(4096)
+            if not chunk:
+                break
+            response += chunk
+            if b'\x00' in chunk:
+                break
+        return response
+
+
+class AsyncCollectionEngine:
+    """
+    asyncio 采集引擎
+    
+    所有矿机在一个事件循环中并发采集，不再每台矿机占用一个线程:
+    - max_concurrent: 同时采集的矿机数上限 (每台矿机同一时刻只占一个连接)
+    - connect_timeout: 单台主机 TCP 连接超时，离线矿机很快让出名额
+    - timeout: 单条命令的响应读取超时
+    解析复用 MinerDataParser。
+    """
+    
+    def __init__(self, max_concurrent: int = 1000, timeout: float = 5.0, connect_timeout: float = 2.0):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._raise_fd_limit(max_concurrent)
+    
+    @staticmethod
+    def _raise_fd_limit(needed: int):
+        """把进程文件描述符软上限提到足够容纳并发连接 (不超过硬上限)"""
+        try:
+            import resource
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+            target = needed + 256
+            if hard != resource.RLIM_INFINITY:
+                target = min(target, hard)
+            if soft != resource.RLIM_INFINITY and soft < target:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+                logger.info(f"Raised open file limit from {soft} to {target}")
+        except (ImportError, ValueError, OSError) as e:
+            logger.debug(f"Could not raise open file limit: {e}")
+    
+    async def collect_miner(self, semaphore: asyncio.Semaphore, miner_config: Dict) -> MinerData:
+        ip = miner_config.get('ip')
+        miner_id = miner_config.get('id', ip)
+        miner_type = miner_config.get('type', 'antminer').lower()
+        api = AsyncCGMinerAPI(ip, miner_config.get('port', 4028), self.timeout, self.connect_timeout)
+        
+        async with semaphore:
+            parts = await api.send_commands(COLLECT_COMMANDS)
+        if not parts['summary']:
+            return MinerDataParser.offline(ip, miner_id)
+        
+        return MinerDataParser.parse(miner_type, parts['summary'], parts['stats'], parts['pools'], ip, miner_id)
+    
+    async def collect(self, miners: List[Dict]) -> List[MinerData]:
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        results = await asyncio.gather(
+            *(self.collect_miner(semaphore, m) for m in miners),
+            return_exceptions=True
+        )
+        collected = []
+        for miner, result in zip(miners, results):
+            if isinstance(result, MinerData):
+                collected.append(result)
+            else:
+                logger.error(f"Collection error for {miner.get('ip')}: {result}")
+        return collected
+    
+    def collect_sync(self, miners: List[Dict]) -> List[MinerData]:
+        """同步入口: 在新事件循环中完成一轮采集"""
+        return asyncio.run(self.collect(miners))
+
+
+class PollScheduler:
+    """
+    自适应逐台轮询调度器
+
+    每台矿机按最近的稳定性、健康和告警状态获得自己的采集间隔:
+    - 离线: 指数退避 (base_interval * 2^n, 上限 max_interval), 不再每轮耗尽一次连接超时
+    - 问题状态 (critical/warning、温度告警、刚恢复、上下线抖动): min_interval 快速复查
+    - 连续 stable_cycles 次健康: stable_interval
+    - 其他: base_interval
+    未见过的矿机立即到期。
+    """
+
+    PROBLEM_HEALTH = ('critical', 'warning')
+
+    def __init__(self, base_interval: float = 30, min_interval: float = 10,
+                 stable_interval: float = None, max_interval: float = 600,
+                 stable_cycles: int = 5, temp_alert: float = 85.0, flap_window: int = 6):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.stable_interval = stable_interval if stable_interval is not None else base_interval * 2
+        self.max_interval = max(max_interval, base_interval)
+        self.stable_cycles = stable_cycles
+        self.temp_alert = temp_alert
+        self.flap_window = flap_window
+        self._state: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(miner_config: Dict) -> str:
+        return miner_config.get('id', miner_config.get('ip'))
+
+    def due(self, miners: List[Dict], now: float = None) -> List[Dict]:
+        """返回本轮到期需要采集的矿机"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [m for m in miners
+                    if self._state.get(self._key(m), {}).get('next_due', 0) <= now]
+
+    def next_due_in(self, miners: List[Dict], now: float = None) -> float:
+        """距下一台矿机到期的秒数 (无矿机时为 base_interval)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            due_times = [self._state.get(self._key(m), {}).get('next_due', 0) for m in miners]
+        if not due_times:
+            return self.base_interval
+        return max(0.0, min(due_times) - now)
+
+    def _is_problem(self, data: MinerData, state: Dict) -> bool:
+        if data.overall_health in self.PROBLEM_HEALTH or data.error_message:
+            return True
+        if self.temp_alert and data.temperature_max >= self.temp_alert:
+            return True
+        # 刚从离线恢复
+        if state['failures'] > 0:
+            return True
+        history = state['history']
+        flaps = sum(1 for a, b in zip(history, history[1:]) if a != b)
+        return flaps >= 2
+
+    def record(self, data: MinerData, now: float = None) -> float:
+        """记录一次采集结果, 返回该矿机的新间隔"""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._state.setdefault(data.miner_id, {
+                'failures': 0, 'stable': 0, 'history': [], 'interval': self.base_interval, 'next_due': 0
+            })
+            state['history'] = (state['history'] + [data.online])[-self.flap_window:]
+
+            if not data.online:
+                state['failures'] += 1
+                state['stable'] = 0
+                interval = min(self.base_interval * (2 ** (state['failures'] - 1)), self.max_interval)
+            elif self._is_problem(data, state):
+                state['failures'] = 0
+                state['stable'] = 0
+                interval = self.min_interval
+            else:
+                state['stable'] += 1
+                interval = self.stable_interval if state['stable'] >= self.stable_cycles else self.base_interval
+
+            state['interval'] = interval
+            state['next_due'] = now + interval
+            return interval
+
+    def forget(self, miner_id: str):
+        """移除矿机状态 (下次立即采集)"""
+        with self._lock:
+            self._state.pop(miner_id, None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            states = list(self._state.values())
+        return {
+            'tracked': len(states),
+            'backing_off': sum(1 for s in states if s['failures'] > 0),
+            'fast_poll': sum(1 for s in states if s['failures'] == 0 and s['interval'] <= self.min_interval),
+            'stable': sum(1 for s in states if s['interval'] >= self.stable_interval and s['failures'] == 0),
+        }
+
+
+class SampleAggregator:
+    """
+    边缘预聚合 - 高频采样合并为每台矿机每窗口一条汇总记录
+    
+    汇总记录沿用最后一次采样的状态字段, hashrate_ghs/temperature_avg/power_consumption
+    为窗口内在线采样的均值, temperature_max 为最大值; window 字段带 min/max/avg/last 和采样数。
+    出现阈值跨越 (离线、恢复在线、过热、算力骤降) 时立即结束该矿机的窗口,
+    返回带 window['event'] 的记录 (数值为最新采样), 不等窗口到期。
+    """
+    
+    METRICS = ('hashrate_ghs', 'temperature_avg', 'temperature_max', 'power_consumption')
+    
+    def __init__(self, window_seconds: float = 60, temp_alert: float = 85.0,
+                 hashrate_drop_ratio: float = 0.5):
+        self.window_seconds = window_seconds
+        self.temp_alert = temp_alert
+        self.hashrate_drop_ratio = hashrate_drop_ratio
+        self._windows: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.stats = {'samples': 0, 'summaries': 0, 'events': 0}
+    
+    def _new_window(self, now: float) -> Dict:
+        return {'start': now, 'samples': 0, 'online_samples': 0, 'last': None,
+                'metrics': {name: None for name in self.METRICS}}
+    
+    def _detect_event(self, window: Dict, data: MinerData) -> Optional[str]:
+        last = window['last']
+        if last is None:
+            return None
+        if last.online and not data.online:
+            return 'offline'
+        if not last.online and data.online:
+            return 'online'
+        if not data.online:
+            return None
+        if self.temp_alert and last.temperature_max < self.temp_alert <= data.temperature_max:
+            return 'overheat'
+        hashrate = window['metrics']['hashrate_ghs']
+        if hashrate and data.hashrate_ghs < hashrate['sum'] / hashrate['count'] * self.hashrate_drop_ratio:
+            return 'hashrate_drop'
+        return None
+    
+    def add(self, data: MinerData, now: float = None) -> Optional[MinerData]:
+        """加入一次采样; 触发阈值事件时返回立即上传的记录"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self.stats['samples'] += 1
+            window = self._windows.get(data.miner_id)
+            if window is None:
+                window = self._windows[data.miner_id] = self._new_window(now)
+            event = self._detect_event(window, data)
+            
+            window['samples'] += 1
+            window['last'] = data
+            if data.online:
+                window['online_samples'] += 1
+                for name in self.METRICS:
+                    value = getattr(data, name) or 0.0
+                    metric = window['metrics'][name]
+                    if metric is None:
+                        window['metrics'][name] = {'min': value, 'max': value, 'sum': value, 'count': 1}
+                    else:
+                        metric['min'] = min(metric['min'], value)
+                        metric['max'] = max(metric['max'], value)
+                        metric['sum'] += value
+                        metric['count'] += 1
+            
+            if event is None:
+                return None
+            self.stats['events'] += 1
+            self._windows[data.miner_id] = self._new_window(now)
+            # 新窗口以事件采样为基线, 下一次采样据此判断是否再次跨越
+            self._windows[data.miner_id]['last'] = data
+            return self._summarize(window, now, event)
+    
+    def flush(self, now: float = None, force: bool = False) -> List[MinerData]:
+        """返回已到期窗口的汇总记录 (force=True 时全部返回)"""
+        now = time.time() if now is None else now
+        summaries = []
+        with self._lock:
+            for miner_id, window in list(self._windows.items()):
+                if window['samples'] == 0:
+                    continue
+                if not force and now - window['start'] < self.window_seconds:
+                    continue
+                summaries.append(self._summarize(window, now))
+                fresh = self._new_window(now)
+                fresh['last'] = window['last']
+                self._windows[miner_id] = fresh
+            self.stats['summaries'] += len(summaries)
+        return summaries
+    
+    def _summarize(self, window: Dict, now: float, event: Optional[str] = None) -> MinerData:
+        last = window['last']
+        stats = {}
+        for name, metric in window['metrics'].items():
+            if metric is not None:
+                stats[name] = {'min': metric['min'], 'max': metric['max'],
+                               'avg': round(metric['sum'] / metric['count'], 3),
+                               'last': getattr(last, name)}
+        summary = {
+            'start': datetime.utcfromtimestamp(window['start']).isoformat(),
+            'end': datetime.utcfromtimestamp(now).isoformat(),
+            'samples': window['samples'],
+            'online_samples': window['online_samples'],
+            'metrics': stats,
+        }
+        if event is not None:
+            summary['event'] = event
+            return replace(last, window=summary)
+        
+        values = {}
+        if last.online and stats:
+            values = {
+                'hashrate_ghs': stats['hashrate_ghs']['avg'],
+                'temperature_avg': stats['temperature_avg']['avg'],
+                'temperature_max': stats['temperature_max']['max'],
+                'power_consumption': stats['power_consumption']['avg'],
+            }
+        return replace(last, window=summary, **values)
+    
+    def forget(self, miner_id: str):
+        with self._lock:
+            self._windows.pop(miner_id, None)
 
 
 class OfflineCache:
-    """离线缓存管理器 - 使用SQLite存储"""
+    """
+    离线缓存管理器 - 使用SQLite存储
     
-    def __init__(self, cache_dir: str = "./cache"):
+    - 单个持久连接 + WAL 模式, 采集线程写入与补传线程读取互不阻塞
+    - max_bytes 字节预算, 超出时从最旧的批次开始淘汰
+    - 失败批次按 retry_count 指数退避 (next_attempt_at), 补传按 limit 分块读取
+    """
+    
+    RETRY_BACKOFF_BASE = 30      # 秒
+    RETRY_BACKOFF_MAX = 1800
+    
+    def __init__(self, cache_dir: str = "./cache", max_bytes: int = 512 * 1024 * 1024):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.db_path = self.cache_dir / "offline_cache.db"
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
         self._init_db()
+        self.total_bytes = self._conn.execute(
+            'SELECT COALESCE(SUM(size_bytes), 0) FROM pending_uploads'
+        ).fetchone()[0]
+        self.evicted = 0
     
     def _init_db(self):
         """初始化SQLite数据库"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        cursor.execute('''
+        conn = self._conn
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('''
             CREATE TABLE IF NOT EXISTS pending_uploads (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 batch_id TEXT UNIQUE,
@@ -385,91 +848,310 @@ class OfflineCache:
                 retry_count INTEGER DEFAULT 0
             )
         ''')
+        # 旧版缓存库升级: 补充大小与退避列
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(pending_uploads)')}
+        if 'size_bytes' not in columns:
+            conn.execute('ALTER TABLE pending_uploads ADD COLUMN size_bytes INTEGER DEFAULT 0')
+            conn.execute('UPDATE pending_uploads SET size_bytes = LENGTH(data)')
+        if 'next_attempt_at' not in columns:
+            conn.execute('ALTER TABLE pending_uploads ADD COLUMN next_attempt_at REAL DEFAULT 0')
         conn.commit()
-        conn.close()
     
     def save_batch(self, batch_id: str, data: bytes):
-        """保存待上传批次"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                'INSERT OR REPLACE INTO pending_uploads (batch_id, data) VALUES (?, ?)',
-                (batch_id, data)
+        """保存待上传批次; 超出字节预算时淘汰最旧的批次"""
+        with self._lock:
+            conn = self._conn
+            row = conn.execute(
+                'SELECT size_bytes FROM pending_uploads WHERE batch_id = ?', (batch_id,)
+            ).fetchone()
+            if row:
+                self.total_bytes -= row[0]
+            conn.execute(
+                'INSERT OR REPLACE INTO pending_uploads (batch_id, data, size_bytes) VALUES (?, ?, ?)',
+                (batch_id, data, len(data))
             )
+            self.total_bytes += len(data)
+            evicted = self._evict_locked()
             conn.commit()
-            logger.info(f"Cached batch {batch_id} for later upload")
-        finally:
-            conn.close()
+        logger.info(f"Cached batch {batch_id} for later upload")
+        if evicted:
+            logger.warning(f"Offline cache over {self.max_bytes} bytes, evicted {evicted} oldest batches")
     
-    def get_pending_batches(self, max_retry: int = 5) -> List[Tuple[str, bytes]]:
-        """获取待上传批次"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                'SELECT batch_id, data FROM pending_uploads WHERE retry_count < ? ORDER BY created_at',
-                (max_retry,)
-            )
-            return cursor.fetchall()
-        finally:
-            conn.close()
+    def _evict_locked(self) -> int:
+        evicted = 0
+        while self.total_bytes > self.max_bytes:
+            row = self._conn.execute(
+                'SELECT id, size_bytes FROM pending_uploads ORDER BY id LIMIT 1'
+            ).fetchone()
+            if row is None:
+                self.total_bytes = 0
+                break
+            self._conn.execute('DELETE FROM pending_uploads WHERE id = ?', (row[0],))
+            self.total_bytes -= row[1]
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+    
+    def get_pending_batches(self, max_retry: int = 5, limit: Optional[int] = None) -> List[Tuple[str, bytes]]:
+        """获取到期的待上传批次 (最旧优先, limit 限制单次读入内存的数量)"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT batch_id, data FROM pending_uploads '
+                'WHERE retry_count < ? AND next_attempt_at <= ? ORDER BY id LIMIT ?',
+                (max_retry, time.time(), -1 if limit is None else limit)
+            ).fetchall()
     
     def mark_uploaded(self, batch_id: str):
         """标记批次已上传"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        try:
-            cursor.execute('DELETE FROM pending_uploads WHERE batch_id = ?', (batch_id,))
-            conn.commit()
-        finally:
-            conn.close()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT size_bytes FROM pending_uploads WHERE batch_id = ?', (batch_id,)
+            ).fetchone()
+            if row is None:
+                return
+            self._conn.execute('DELETE FROM pending_uploads WHERE batch_id = ?', (batch_id,))
+            self._conn.commit()
+            self.total_bytes -= row[0]
     
     def increment_retry(self, batch_id: str):
-        """增加重试次数"""
-        conn = sqlite3.connect(str(self.db_path))
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                'UPDATE pending_uploads SET retry_count = retry_count + 1 WHERE batch_id = ?',
-                (batch_id,)
+        """增加重试次数, 按指数退避推迟下次尝试"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT retry_count FROM pending_uploads WHERE batch_id = ?', (batch_id,)
+            ).fetchone()
+            if row is None:
+                return
+            delay = min(self.RETRY_BACKOFF_BASE * (2 ** row[0]), self.RETRY_BACKOFF_MAX)
+            self._conn.execute(
+                'UPDATE pending_uploads SET retry_count = retry_count + 1, next_attempt_at = ? '
+                'WHERE batch_id = ?',
+                (time.time() + delay, batch_id)
             )
-            conn.commit()
-        finally:
-            conn.close()
+            self._conn.commit()
+    
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending_uploads').fetchone()[0]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class DeltaEncoder:
+    """增量编码器 - 周期性发送关键帧, 其余周期只发送变化字段 (telemetry_delta.v1)
+    
+    每台矿机保存最后一次被云端确认的快照和版本号。上传失败时不推进,
+    云端返回 resync 的矿机下次改发关键帧。
+    """
+    
+    SCHEMA = 'telemetry_delta.v1'
+    
+    def __init__(self, keyframe_interval: int = 10):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._acked: Dict[str, Tuple[int, Dict]] = {}
+        self._since_keyframe: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def encode(self, data: List[MinerData]) -> Tuple[Dict, Dict]:
+        """编码一批矿机数据, 返回 (payload, pending); pending 在上传成功后交给 commit()"""
+        entries = []
+        pending = {}
+        
+        with self._lock:
+            for d in data:
+                snapshot = asdict(d)
+                acked = self._acked.get(d.miner_id)
+                since_key = self._since_keyframe.get(d.miner_id, 0)
+                version = acked[0] + 1 if acked else 1
+                
+                if acked is None or since_key + 1 >= self.keyframe_interval:
+                    entries.append({'miner_id': d.miner_id, 'kind': 'key', 'version': version, 'data': snapshot})
+                    pending[d.miner_id] = (version, snapshot, True)
+                    continue
+                
+                base = acked[1]
+                changed = {k: v for k, v in snapshot.items() if base.get(k) != v}
+                entry = {
+                    'miner_id': d.miner_id, 'kind': 'delta',
+                    'base_version': acked[0], 'version': version, 'changed': changed
+                }
+                removed = [k for k in base if k not in snapshot]
+                if removed:
+                    entry['removed'] = removed
+                entries.append(entry)
+                pending[d.miner_id] = (version, snapshot, False)
+        
+        return {'schema': self.SCHEMA, 'miners': entries}, pending
+    
+    def commit(self, pending: Dict, resync: Optional[List[str]] = None):
+        """上传成功后推进已确认版本; resync 中的矿机丢弃基线, 下次发送关键帧"""
+        resync_set = set(resync or [])
+        with self._lock:
+            for miner_id, (version, snapshot, is_key) in pending.items():
+                if miner_id in resync_set:
+                    self._acked.pop(miner_id, None)
+                    self._since_keyframe.pop(miner_id, None)
+                    continue
+                self._acked[miner_id] = (version, snapshot)
+                self._since_keyframe[miner_id] = 0 if is_key else self._since_keyframe.get(miner_id, 0) + 1
+    
+    def reset(self):
+        """丢弃所有基线, 下一次全部发送关键帧"""
+        with self._lock:
+            self._acked.clear()
+            self._since_keyframe.clear()
+
+
+COLUMNAR_SCHEMA = 'telemetry_columnar.v1'
+
+
+def encode_columnar(data: List[MinerData]) -> Dict:
+    """列式布局: 每个字段一个数组, 云端无需逐条构建字典"""
+    names = [f.name for f in fields(MinerData)]
+    return {
+        'schema': COLUMNAR_SCHEMA,
+        'count': len(data),
+        'columns': {name: [getattr(d, name) for d in data] for name in names}
+    }
 
 
 class CloudUploader:
-    """云端数据上传器"""
+    """云端数据上传器
+    
+    payload_format:
+        json     - 始终发送 gzip JSON 数组 (旧版云端)
+        auto     - 先发 JSON, 云端响应头 X-Telemetry-Accept 声明支持后切换到
+                   列式 + msgpack/zstd (本地安装了对应库时)
+        columnar - 直接使用列式格式
+    
+    增量上传: 云端在 X-Telemetry-Accept 中声明 delta 时, 400/415 按普通上传错误处理;
+    未声明的旧版云端拒绝增量包时, 暂停增量 DELTA_RETRY_UPLOADS 次上传 (发送完整快照) 后再试。
+    """
+    
+    DELTA_RETRY_UPLOADS = 50
     
-    def __init__(self, api_url: str, api_key: str, site_id: str):
+    def __init__(self, api_url: str, api_key: str, site_id: str,
+                 delta_encoder: Optional[DeltaEncoder] = None, payload_format: str = 'auto'):
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
         self.site_id = site_id
+        self.delta_encoder = delta_encoder
+        self.delta_paused = 0  # 剩余以完整快照发送的上传次数
+        self.payload_format = payload_format
+        self.server_features = set()
         self.session = requests.Session()
         self.session.headers.update({
             'X-Collector-Key': api_key,
             'X-Site-ID': site_id,
             'Content-Type': 'application/octet-stream',
-            'Content-Encoding': 'gzip'
+            'Content-Encoding': 'gzip',
+            # 服务器开启异步接收时立即返回 202 + 回执，否则按同步方式处理
+            'Prefer': 'respond-async'
         })
     
+    def _features(self) -> set:
+        """本次上传可用的格式特性"""
+        if self.payload_format == 'columnar':
+            return {'columnar', 'msgpack', 'zstd'}
+        if self.payload_format == 'auto':
+            return self.server_features
+        return set()
+    
+    def _serialize(self, payload) -> Tuple[bytes, Dict[str, str]]:
+        """序列化并压缩, 返回 (body, 额外请求头)"""
+        features = self._features()
+        headers = {}
+        if 'msgpack' in features and MSGPACK_AVAILABLE:
+            body = msgpack.packb(payload, use_bin_type=True)
+            headers['Content-Type'] = 'application/x-msgpack'
+        else:
+            body = json.dumps(payload).encode('utf-8')
+        if 'zstd' in features and ZSTD_AVAILABLE:
+            body = zstandard.ZstdCompressor(level=3).compress(body)
+            headers['Content-Encoding'] = 'zstd'
+        else:
+            body = gzip.compress(body)
+        return body, headers
+    
+    def _update_server_features(self, response):
+        accept = response.headers.get('X-Telemetry-Accept')
+        if accept:
+            self.server_features = {f.strip() for f in accept.split(',') if f.strip()}
+    
+    def _full_payload(self, data: List[MinerData]):
+        if 'columnar' in self._features():
+            return encode_columnar(data)
+        return [asdict(d) for d in data]
+    
+    def prepare(self, data: List[MinerData]) -> Dict:
+        """
+        序列化并压缩一批数据, 交给 send() 上传 (流水线的序列化阶段)
+        
+        增量编码依赖上一批的确认版本, 推迟到 send() 时进行。
+        """
+        prepared = {'data': data, 'body': None, 'headers': {}}
+        if self.delta_encoder is None or self.delta_paused:
+            prepared['body'], prepared['headers'] = self._serialize(self._full_payload(data))
+        return prepared
+    
     def upload(self, data: List[MinerData]) -> bool:
         """上传矿机数据到云端"""
+        return self.send(self.prepare(data))
+    
+    def send(self, prepared: Dict) -> bool:
+        """上传 prepare() 的结果"""
+        data = prepared['data']
         try:
-            json_data = json.dumps([asdict(d) for d in data])
-            compressed = gzip.compress(json_data.encode('utf-8'))
+            encoder = self.delta_encoder
+            if encoder is not None and self.delta_paused:
+                self.delta_paused -= 1
+                encoder = None
+            pending = None
+            body, headers = prepared['body'], prepared['headers']
+            if encoder is not None:
+                payload, pending = encoder.encode(data)
+                body, headers = self._serialize(payload)
+            elif body is None:
+                body, headers = self._serialize(self._full_payload(data))
             
             response = self.session.post(
                 f"{self.api_url}/api/collector/upload",
-                data=compressed,
+                data=body,
+                headers=headers,
                 timeout=30
             )
+            self._update_server_features(response)
             
-            if response.status_code == 200:
+            if response.status_code == 415 and self.payload_format != 'json':
+                # 云端无法解码二进制格式, 退回 JSON
+                logger.warning("Server rejected binary payload format, falling back to JSON")
+                self.payload_format = 'json'
+                return self.upload(data)
+            
+            if response.status_code in (400, 415) and encoder is not None and 'delta' not in self.server_features:
+                # 云端未声明支持增量协议 (旧版): 暂时退回完整快照, 稍后重试 (云端可能已升级)
+                logger.warning(f"Server rejected delta payload, sending full snapshots "
+                               f"for the next {self.DELTA_RETRY_UPLOADS} uploads")
+                self.delta_paused = self.DELTA_RETRY_UPLOADS
+                encoder.reset()
+                return self.upload(data)
+            
+            if response.status_code in (200, 202):
                 result = response.json()
                 if result.get('success'):
-                    logger.info(f"Uploaded {len(data)} miner records successfully")
+                    if response.status_code == 202:
+                        logger.info(f"Uploaded {len(data)} miner records, queued as receipt {result.get('receipt_id')}")
+                    else:
+                        logger.info(f"Uploaded {len(data)} miner records successfully")
+                    if encoder is not None:
+                        resync = result.get('resync') or []
+                        encoder.commit(pending, resync)
+                        if resync:
+                            # 版本不匹配: 立即补发这些矿机的关键帧
+                            logger.info(f"Re-sending keyframes for {len(resync)} miners")
+                            resync_set = set(resync)
+                            return self.upload([d for d in data if d.miner_id in resync_set])
                     return True
                 else:
                     logger.error(f"Upload failed: {result.get('error')}")
@@ -486,11 +1168,91 @@ class CloudUploader:
             return False
 
 
+class CommandFanout:
+    """
+    命令并行下发
+    
+    - 不同矿机并行执行 (max_workers), 同一矿机的命令按下发顺序串行
+    - 同一 PDU (矿机配置的 pdu 字段) 或同一 /24 网段同时执行的命令不超过 group_limit,
+      相邻两次启动至少间隔 1/group_rate 秒 (0 不限速), 避免整排矿机同时重启造成电流冲击
+    """
+    
+    def __init__(self, max_workers: int = 64, group_limit: int = 16, group_rate: float = 0.0):
+        self.max_workers = max(1, max_workers)
+        self.group_limit = max(1, group_limit)
+        self.group_rate = group_rate
+        self._lock = threading.Lock()
+        self._slots: Dict[str, threading.Semaphore] = {}
+        self._next_start: Dict[str, float] = {}
+    
+    @staticmethod
+    def group_of(ip: Optional[str], miner_config: Optional[Dict] = None) -> str:
+        """限流分组: 优先 PDU, 其次 /24 网段"""
+        if miner_config and miner_config.get('pdu'):
+            return f"pdu:{miner_config['pdu']}"
+        if ip:
+            return 'net:' + '.'.join(ip.split('.')[:3])
+        return 'default'
+    
+    def _slot(self, group: str) -> threading.Semaphore:
+        with self._lock:
+            slot = self._slots.get(group)
+            if slot is None:
+                slot = self._slots[group] = threading.Semaphore(self.group_limit)
+            return slot
+    
+    def _wait_for_rate(self, group: str):
+        if self.group_rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(group, 0.0))
+            self._next_start[group] = start + 1.0 / self.group_rate
+        if start > now:
+            time.sleep(start - now)
+    
+    def run(self, jobs: List[Tuple[str, str, Any]]) -> List[Any]:
+        """
+        执行 (miner_key, group, fn) 列表, 返回与 jobs 同序的 fn() 结果
+        
+        fn 抛出的异常作为该位置的结果返回, 不影响其他矿机。
+        """
+        results: List[Any] = [None] * len(jobs)
+        per_miner: Dict[str, List[int]] = {}
+        for index, (miner_key, _, _) in enumerate(jobs):
+            per_miner.setdefault(miner_key, []).append(index)
+        
+        def run_miner(indices: List[int]):
+            for index in indices:
+                _, group, fn = jobs[index]
+                slot = self._slot(group)
+                with slot:
+                    self._wait_for_rate(group)
+                    try:
+                        results[index] = fn()
+                    except Exception as e:
+                        results[index] = e
+        
+        if not per_miner:
+            return results
+        workers = min(self.max_workers, len(per_miner))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(run_miner, indices) for indices in per_miner.values()]:
+                future.result()
+        return results
+
+
 class CommandExecutor:
     """命令执行器 - 从云端获取并执行控制命令"""
     
-    def __init__(self, api_url: str, api_key: str, site_id: str, miner_map: Dict[str, Dict]):
+    def __init__(self, api_url: str, api_key: str, site_id: str, miner_map: Dict[str, Dict],
+                 long_poll_wait: float = 25, fanout: Optional[CommandFanout] = None):
         self.api_url = api_url.rstrip('/')
+        self.fanout = fanout or CommandFanout()
+        self._stats_lock = threading.Lock()
+        # 长轮询: 请求在云端挂起直到有命令入队; 云端未开启时退回定时轮询
+        self.long_poll_wait = long_poll_wait
+        self.server_long_poll = 0
         self.api_key = api_key
         self.site_id = site_id
         self.miner_map = miner_map
@@ -511,14 +1273,18 @@ class CommandExecutor:
     def fetch_pending_commands(self) -> List[Dict]:
         """从云端获取待执行命令"""
         try:
+            self.server_long_poll = 0
+            params = {'wait': self.long_poll_wait} if self.long_poll_wait else None
             response = self.session.get(
                 f"{self.api_url}/api/collector/commands/pending",
-                timeout=10
+                params=params,
+                timeout=10 + (self.long_poll_wait or 0)
             )
             
             if response.status_code == 200:
                 result = response.json()
                 if result.get('success'):
+                    self.server_long_poll = result.get('long_poll_max_seconds', 0) if self.long_poll_wait else 0
                     commands = result.get('commands', [])
                     self.stats['commands_fetched'] += len(commands)
                     self.stats['last_poll'] = datetime.utcnow().isoformat()
@@ -579,34 +1345,193 @@ class CommandExecutor:
         
         success, message = api.execute_control_command(command_type, params)
         
+        with self._stats_lock:
+            self.stats['commands_executed' if success else 'commands_failed'] += 1
         if success:
-            self.stats['commands_executed'] += 1
             logger.info(f"Command {command_id} succeeded: {message}")
         else:
-            self.stats['commands_failed'] += 1
             logger.error(f"Command {command_id} failed: {message}")
         
         return success, message
     
+    def report_results(self, results: List[Dict]) -> bool:
+        """批量报告命令执行结果; 旧版云端没有批量接口时逐条报告"""
+        if not results:
+            return True
+        try:
+            response = self.session.post(
+                f"{self.api_url}/api/collector/commands/results",
+                json={'results': results},
+                timeout=30
+            )
+            if response.status_code == 200:
+                logger.debug(f"Reported {len(results)} command results")
+                return True
+            if response.status_code not in (404, 405):
+                logger.warning(f"Batch result report failed: HTTP {response.status_code}")
+                return False
+        except Exception as e:
+            logger.error(f"Batch result report error: {e}")
+            return False
+        
+        for result in results:
+            self.report_result(result['command_id'], result['status'] == 'completed', result['result_message'])
+        return True
+    
+    def _timed_execute(self, cmd: Dict) -> Dict:
+        start = time.time()
+        try:
+            success, message = self.execute_command(cmd)
+        except Exception as e:
+            logger.error(f"Command {cmd.get('command_id')} execution error: {e}")
+            success, message = False, str(e)
+        return {
+            'command_id': cmd.get('command_id'),
+            'status': 'completed' if success else 'failed',
+            'result_code': 0 if success else 1,
+            'result_message': message,
+            'execution_time_ms': int((time.time() - start) * 1000)
+        }
+    
     def process_commands(self) -> int:
-        """处理所有待执行命令"""
+        """处理所有待执行命令: 按矿机并行执行, 结果批量报告"""
         commands = self.fetch_pending_commands()
         
         if not commands:
             return 0
         
+        jobs = []
         for cmd in commands:
-            command_id = cmd.get('command_id')
-            try:
-                success, message = self.execute_command(cmd)
-                self.report_result(command_id, success, message)
-            except Exception as e:
-                logger.error(f"Command {command_id} execution error: {e}")
-                self.report_result(command_id, False, str(e))
+            miner_id = cmd.get('miner_id')
+            miner_config = self.miner_map.get(miner_id, {})
+            ip = cmd.get('ip_address') or miner_config.get('ip')
+            jobs.append((
+                miner_id or ip or str(cmd.get('command_id')),
+                CommandFanout.group_of(ip, miner_config),
+                lambda cmd=cmd: self._timed_execute(cmd)
+            ))
         
+        self.report_results(self.fanout.run(jobs))
         return len(commands)
 
 
+class UploadPipeline:
+    """
+    采集/序列化/上传流水线
+    
+    采集阶段调用 submit() 把一轮数据按 chunk_size 台矿机切块放入有界队列后立即返回;
+    序列化线程压缩, 上传线程逐块上传, 上传失败的块交给 on_failure (写入离线缓存)。
+    队列满时新块直接交给 on_failure, 广域网再慢也不会拖慢采集节奏。
+    每个阶段记录自己的延迟和积压。
+    """
+    
+    STAGES = ('collect', 'serialize', 'upload')
+    
+    def __init__(self, uploader: CloudUploader, on_failure, chunk_size: int = 500, queue_size: int = 8):
+        self.uploader = uploader
+        self.on_failure = on_failure
+        self.chunk_size = max(1, chunk_size)
+        self.serialize_queue = queue.Queue(maxsize=queue_size)
+        self.upload_queue = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self._threads = []
+        self._lock = threading.Lock()
+        self.stats = {name: {'processed': 0, 'failed': 0, 'last_ms': 0.0, 'avg_ms': 0.0}
+                      for name in self.STAGES}
+        self.stats['collect']['spilled'] = 0
+    
+    def record(self, stage: str, elapsed: float, ok: bool = True):
+        """记录一个阶段的耗时 (秒), avg_ms 为指数滑动平均"""
+        ms = elapsed * 1000
+        with self._lock:
+            entry = self.stats[stage]
+            entry['processed' if ok else 'failed'] += 1
+            entry['last_ms'] = round(ms, 1)
+            entry['avg_ms'] = round(ms if not entry['avg_ms'] else entry['avg_ms'] * 0.8 + ms * 0.2, 1)
+    
+    def start(self):
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._serialize_loop, name='pipeline-serialize', daemon=True),
+            threading.Thread(target=self._upload_loop, name='pipeline-upload', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self, timeout: float = 5.0):
+        self.running = False
+        for thread in self._threads:
+            thread.join(timeout)
+    
+    def submit(self, data: List[MinerData]) -> int:
+        """采集阶段: 切块入队, 不等待上传; 返回入队的块数"""
+        queued = 0
+        for i in range(0, len(data), self.chunk_size):
+            chunk = data[i:i + self.chunk_size]
+            try:
+                self.serialize_queue.put_nowait(chunk)
+                queued += 1
+            except queue.Full:
+                with self._lock:
+                    self.stats['collect']['spilled'] += 1
+                self.on_failure(chunk)
+        return queued
+    
+    def _get(self, q: queue.Queue):
+        while self.running:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+    
+    def _serialize_loop(self):
+        while self.running:
+            chunk = self._get(self.serialize_queue)
+            if chunk is None:
+                break
+            start = time.time()
+            try:
+                prepared = self.uploader.prepare(chunk)
+            except Exception as e:
+                logger.error(f"Serialize error: {e}")
+                self.record('serialize', time.time() - start, ok=False)
+                self.on_failure(chunk)
+                continue
+            self.record('serialize', time.time() - start)
+            # 上传阶段积压时在此阻塞, 背压传递到有界的序列化队列
+            while self.running:
+                try:
+                    self.upload_queue.put(prepared, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                self.on_failure(chunk)
+    
+    def _upload_loop(self):
+        while self.running:
+            prepared = self._get(self.upload_queue)
+            if prepared is None:
+                break
+            start = time.time()
+            try:
+                ok = self.uploader.send(prepared)
+            except Exception as e:
+                logger.error(f"Upload stage error: {e}")
+                ok = False
+            self.record('upload', time.time() - start, ok=ok)
+            if not ok:
+                self.on_failure(prepared['data'])
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = {name: dict(entry) for name, entry in self.stats.items()}
+        stats['serialize']['backlog'] = self.serialize_queue.qsize()
+        stats['upload']['backlog'] = self.upload_queue.qsize()
+        return stats
+
+
 class EdgeCollector:
     """边缘采集器主类"""
     
@@ -616,16 +1541,72 @@ class EdgeCollector:
         self.collection_interval = config.get('collection_interval', 30)
         self.command_poll_interval = config.get('command_poll_interval', 5)
         self.max_workers = config.get('max_workers', 50)
+        # 采集引擎: threads (线程池, 默认) / asyncio (单事件循环, 适合数千台矿机)
+        self.collection_engine = config.get('collection_engine', 'threads')
+        self.async_engine = None
+        if self.collection_engine == 'asyncio':
+            self.async_engine = AsyncCollectionEngine(
+                max_concurrent=config.get('max_concurrent', 1000),
+                timeout=config.get('timeout', 5.0),
+                connect_timeout=config.get('connect_timeout', 2.0)
+            )
+        # 自适应轮询: 每台矿机按稳定性/健康/告警状态获得自己的间隔
+        self.scheduler = None
+        if config.get('adaptive_polling', False):
+            self.scheduler = PollScheduler(
+                base_interval=self.collection_interval,
+                min_interval=config.get('min_poll_interval', 10),
+                stable_interval=config.get('stable_poll_interval'),
+                max_interval=config.get('max_poll_interval', 600),
+                stable_cycles=config.get('stable_poll_cycles', 5),
+                temp_alert=config.get('temp_alert', 85.0)
+            )
         self.api_url = config.get('api_url', 'http://localhost:5000')
         self.api_key = config.get('api_key', '')
         self.site_id = config.get('site_id', 'default')
         
-        self.cache = OfflineCache(config.get('cache_dir', './cache'))
-        self.uploader = CloudUploader(self.api_url, self.api_key, self.site_id)
+        self.cache = OfflineCache(
+            config.get('cache_dir', './cache'),
+            max_bytes=int(config.get('cache_max_mb', 512) * 1024 * 1024)
+        )
+        # 后台补传: 每次最多读取 drain_batch_size 个批次, 云端不可达时指数退避
+        self.drain_batch_size = config.get('drain_batch_size', 20)
+        self.drain_interval = config.get('drain_interval', 5)
+        self.drain_max_backoff = config.get('drain_max_backoff', 300)
+        self._drain_thread = None
+        # 边缘预聚合: aggregate_window 秒内的采样合并为一条汇总, 阈值事件立即上传
+        self.aggregator = None
+        if config.get('aggregate_window', 0):
+            self.aggregator = SampleAggregator(
+                window_seconds=config['aggregate_window'],
+                temp_alert=config.get('temp_alert', 85.0),
+                hashrate_drop_ratio=config.get('hashrate_drop_ratio', 0.5)
+            )
+        delta_encoder = None
+        if config.get('delta_upload', False):
+            delta_encoder = DeltaEncoder(config.get('delta_keyframe_interval', 10))
+        self.uploader = CloudUploader(
+            self.api_url, self.api_key, self.site_id, delta_encoder,
+            payload_format=config.get('payload_format', 'auto')
+        )
+        # 流水线模式: 采集、序列化、上传并发进行, 每次请求最多 upload_chunk_size 台矿机
+        self.pipeline = None
+        if config.get('pipeline_upload', True):
+            self.pipeline = UploadPipeline(
+                self.uploader, self._cache_data,
+                chunk_size=config.get('upload_chunk_size', 500),
+                queue_size=config.get('pipeline_queue_size', 8)
+            )
         
         self.miner_map = {m.get('id', m.get('ip')): m for m in self.miners}
         self.command_executor = CommandExecutor(
-            self.api_url, self.api_key, self.site_id, self.miner_map
+            self.api_url, self.api_key, self.site_id, self.miner_map,
+            long_poll_wait=config.get('command_long_poll', 25),
+            fanout=CommandFanout(
+                max_workers=config.get('command_workers', 64),
+                group_limit=config.get('command_group_limit', 16),
+                group_rate=config.get('command_group_rate', 0.0)
+            )
         )
         
         self.running = False
@@ -644,56 +1625,61 @@ class EdgeCollector:
         miner_type = miner_config.get('type', 'antminer').lower()
         port = miner_config.get('port', 4028)
         
-        api = CGMinerAPI(ip, port)
+        api = CGMinerAPI(ip, port, self.config.get('timeout', 5.0))
         
-        summary = api.get_summary()
-        if not summary:
-            return MinerData(
-                miner_id=miner_id,
-                ip_address=ip,
-                timestamp=datetime.utcnow().isoformat(),
-                online=False,
-                error_message="Connection failed"
-            )
+        parts = api.send_commands(COLLECT_COMMANDS)
+        if not parts['summary']:
+            return MinerDataParser.offline(ip, miner_id)
         
-        stats = api.get_stats()
-        pools = api.get_pools()
-        
-        if miner_type == 'whatsminer':
-            return MinerDataParser.parse_whatsminer(summary, stats, pools, ip, miner_id)
-        elif miner_type == 'avalon':
-            return MinerDataParser.parse_avalon(summary, stats, pools, ip, miner_id)
-        else:
-            return MinerDataParser.parse_antminer(summary, stats, pools, ip, miner_id)
+        return MinerDataParser.parse(miner_type, parts['summary'], parts['stats'], parts['pools'], ip, miner_id)
     
     def collect_all(self) -> List[MinerData]:
         """并行采集所有矿机数据"""
         results = []
         start_time = time.time()
         
-        logger.info(f"Starting collection for {len(self.miners)} miners...")
+        miners = self.miners
+        if self.scheduler is not None:
+            miners = self.scheduler.due(self.miners, start_time)
+            if not miners:
+                return results
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_miner = {
-                executor.submit(self.collect_single_miner, m): m
-                for m in self.miners
-            }
-            
-            for future in as_completed(future_to_miner):
-                miner = future_to_miner[future]
-                try:
-                    data = future.result()
-                    if data:
-                        results.append(data)
-                        if data.online:
-                            self.stats['successful'] += 1
-                        else:
-                            self.stats['failed'] += 1
-                except Exception as e:
-                    logger.error(f"Collection error for {miner.get('ip')}: {e}")
+        logger.info(f"Starting collection for {len(miners)}/{len(self.miners)} miners ({self.collection_engine})...")
+        
+        if self.async_engine is not None:
+            results = self.async_engine.collect_sync(miners)
+            self.stats['failed'] += len(miners) - len(results)
+            for data in results:
+                if data.online:
+                    self.stats['successful'] += 1
+                else:
                     self.stats['failed'] += 1
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                future_to_miner = {
+                    executor.submit(self.collect_single_miner, m): m
+                    for m in miners
+                }
+                
+                for future in as_completed(future_to_miner):
+                    miner = future_to_miner[future]
+                    try:
+                        data = future.result()
+                        if data:
+                            results.append(data)
+                            if data.online:
+                                self.stats['successful'] += 1
+                            else:
+                                self.stats['failed'] += 1
+                    except Exception as e:
+                        logger.error(f"Collection error for {miner.get('ip')}: {e}")
+                        self.stats['failed'] += 1
         
         elapsed = time.time() - start_time
+        if self.scheduler is not None:
+            finished = time.time()
+            for data in results:
+                self.scheduler.record(data, finished)
         self.stats['total_collected'] += len(results)
         self.stats['last_collection'] = datetime.utcnow().isoformat()
         
@@ -710,20 +1696,30 @@ class EdgeCollector:
         if self.uploader.upload(data):
             return True
         else:
-            batch_id = f"{self.site_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
-            json_data = json.dumps([asdict(d) for d in data])
-            compressed = gzip.compress(json_data.encode('utf-8'))
-            self.cache.save_batch(batch_id, compressed)
+            self._cache_data(data)
             return False
     
-    def retry_pending_uploads(self):
-        """重试待上传的缓存数据"""
-        pending = self.cache.get_pending_batches()
+    def _cache_data(self, data: List[MinerData]):
+        """上传失败的数据写入离线缓存 (完整快照, gzip JSON)"""
+        batch_id = f"{self.site_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}_{os.urandom(3).hex()}"
+        json_data = json.dumps([asdict(d) for d in data])
+        compressed = gzip.compress(json_data.encode('utf-8'))
+        self.cache.save_batch(batch_id, compressed)
+    
+    def retry_pending_uploads(self, limit: Optional[int] = None) -> Tuple[int, bool]:
+        """
+        补传一块缓存数据 (最多 limit 个批次, 默认 drain_batch_size)
+        
+        Returns:
+            (uploaded, reachable) - 云端连接失败时立即停止本块, reachable=False
+        """
+        pending = self.cache.get_pending_batches(limit=limit or self.drain_batch_size)
         if not pending:
-            return
+            return 0, True
         
         logger.info(f"Retrying {len(pending)} cached batches...")
         
+        uploaded = 0
         for batch_id, compressed_data in pending:
             try:
                 response = self.uploader.session.post(
@@ -732,20 +1728,53 @@ class EdgeCollector:
                     timeout=30
                 )
                 
-                if response.status_code == 200 and response.json().get('success'):
+                if response.status_code in (200, 202) and response.json().get('success'):
                     self.cache.mark_uploaded(batch_id)
+                    uploaded += 1
                     logger.info(f"Cached batch {batch_id} uploaded successfully")
                 else:
                     self.cache.increment_retry(batch_id)
+            except requests.exceptions.ConnectionError:
+                logger.debug("Cloud unreachable, pausing cached batch replay")
+                return uploaded, False
             except Exception as e:
                 logger.error(f"Retry upload error for {batch_id}: {e}")
                 self.cache.increment_retry(batch_id)
+        return uploaded, True
+    
+    def _drain_loop(self):
+        """缓存补传线程: 分块补传, 不阻塞采集循环"""
+        backoff = self.drain_interval
+        while self.running:
+            try:
+                uploaded, reachable = self.retry_pending_uploads()
+            except Exception as e:
+                logger.error(f"Cache drain error: {e}")
+                uploaded, reachable = 0, False
+            
+            if not reachable:
+                backoff = min(backoff * 2, self.drain_max_backoff)
+            else:
+                backoff = self.drain_interval
+                if uploaded:
+                    continue  # 还有积压, 立即补传下一块
+            time.sleep(backoff)
+    
+    def _aggregate(self, data: List[MinerData]) -> List[MinerData]:
+        """未开启预聚合时原样上传; 否则返回阈值事件记录和到期窗口的汇总"""
+        if self.aggregator is None:
+            return data
+        now = time.time()
+        outgoing = [event for event in (self.aggregator.add(d, now) for d in data) if event is not None]
+        outgoing.extend(self.aggregator.flush(now))
+        return outgoing
     
     def run_once(self) -> Dict:
         """执行单次采集和上传"""
         data = self.collect_all()
-        success = self.upload_data(data)
-        self.retry_pending_uploads()
+        success = self.upload_data(self._aggregate(data))
+        if self._drain_thread is None:
+            self.retry_pending_uploads()
         
         return {
             'collected': len(data),
@@ -755,6 +1784,24 @@ class EdgeCollector:
             'timestamp': datetime.utcnow().isoformat()
         }
     
+    def run_pipelined_cycle(self) -> Dict:
+        """流水线模式的采集阶段: 采集后入队即返回, 上传由流水线线程完成"""
+        start = time.time()
+        data = self.collect_all()
+        self.pipeline.record('collect', time.time() - start)
+        outgoing = self._aggregate(data)
+        chunks = self.pipeline.submit(outgoing) if outgoing else 0
+        
+        return {
+            'collected': len(data),
+            'uploaded': len(outgoing),
+            'online': sum(1 for d in data if d.online),
+            'offline': sum(1 for d in data if not d.online),
+            'chunks_queued': chunks,
+            'pipeline': self.pipeline.get_stats(),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
     def _command_poll_loop(self):
         """命令轮询线程"""
         logger.info(f"Command polling started. Interval: {self.command_poll_interval}s")
@@ -766,26 +1813,53 @@ class EdgeCollector:
                     logger.info(f"Processed {processed} commands")
             except Exception as e:
                 logger.error(f"Command poll error: {e}")
+                self.command_executor.server_long_poll = 0
             
-            time.sleep(self.command_poll_interval)
+            # 长轮询生效时请求本身就是等待, 立即发起下一次
+            if not self.command_executor.server_long_poll:
+                time.sleep(self.command_poll_interval)
     
     def run(self):
         """持续运行采集循环"""
         self.running = True
         logger.info(f"Edge Collector started. Site: {self.site_id}, Miners: {len(self.miners)}")
-        logger.info(f"Collection interval: {self.collection_interval}s, Workers: {self.max_workers}")
+        if self.async_engine is not None:
+            logger.info(f"Collection interval: {self.collection_interval}s, Engine: asyncio, "
+                        f"Max concurrent: {self.async_engine.max_concurrent}")
+        else:
+            logger.info(f"Collection interval: {self.collection_interval}s, Workers: {self.max_workers}")
+        if self.scheduler is not None:
+            logger.info(f"Adaptive polling: {self.scheduler.min_interval}s-{self.scheduler.max_interval}s")
         
         if self.enable_commands:
             command_thread = threading.Thread(target=self._command_poll_loop, daemon=True)
             command_thread.start()
             logger.info("Command execution enabled - polling for control commands")
         
+        self._drain_thread = threading.Thread(target=self._drain_loop, daemon=True)
+        self._drain_thread.start()
+        
+        if self.pipeline is not None:
+            self.pipeline.start()
+            logger.info(f"Pipelined upload enabled, chunk size: {self.pipeline.chunk_size}")
+        
         while self.running:
             try:
-                result = self.run_once()
-                logger.info(f"Collection cycle complete: {result}")
+                cycle_start = time.time()
+                if self.pipeline is not None:
+                    result = self.run_pipelined_cycle()
+                else:
+                    result = self.run_once()
+                if result['collected']:
+                    logger.info(f"Collection cycle complete: {result}")
                 
-                time.sleep(self.collection_interval)
+                if self.scheduler is not None:
+                    time.sleep(max(1.0, self.scheduler.next_due_in(self.miners)))
+                elif self.pipeline is not None:
+                    # 固定节奏: 扣除本轮采集耗时
+                    time.sleep(max(0.0, self.collection_interval - (time.time() - cycle_start)))
+                else:
+                    time.sleep(self.collection_interval)
                 
             except KeyboardInterrupt:
                 logger.info("Collector stopped by user")
@@ -797,6 +1871,8 @@ class EdgeCollector:
     def stop(self):
         """停止采集器"""
         self.running = False
+        if self.pipeline is not None:
+            self.pipeline.stop()
     
     def get_command_stats(self) -> Dict:
         """获取命令执行统计"""
@@ -857,8 +1933,26 @@ def create_sample_config(output_path: str = "collector_config.json"):
         "api_key": "your-collector-api-key",
         "site_id": "site_001",
         "collection_interval": 30,
+        "collection_engine": "asyncio",
+        "max_concurrent": 1000,
+        "connect_timeout": 2,
+        "timeout": 5,
         "max_workers": 50,
         "cache_dir": "./cache",
+        "cache_max_mb": 512,
+        "drain_batch_size": 20,
+        "pipeline_upload": True,
+        "command_long_poll": 25,
+        "command_workers": 64,
+        "command_group_limit": 16,
+        "command_group_rate": 0,
+        "aggregate_window": 60,
+        "upload_chunk_size": 500,
+        "delta_upload": False,
+        "delta_keyframe_interval": 10,
+        "adaptive_polling": True,
+        "min_poll_interval": 10,
+        "max_poll_interval": 600,
         "miners": [
             {"id": "S19_0001", "ip": "192.168.1.100", "port": 4028, "type": "antminer"},
             {"id": "S19_0002", "ip": "192.168.1.101", "port": 4028, "type": "antminer"},
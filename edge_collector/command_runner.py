@@ -16,6 +16,10 @@ Environment:
     EDGE_MINER_MODE: simulated|cgminer (default: simulated)
     EDGE_EXECUTION_ENABLED: true|false (default: true)
     EDGE_POLL_INTERVAL: Polling interval in seconds (default: 5)
+    EDGE_LONG_POLL: Long-poll wait in seconds, 0 disables (default: 25)
+    EDGE_COMMAND_WORKERS: Miners commanded in parallel (default: 64)
+    EDGE_COMMAND_GROUP_LIMIT: Concurrent commands per /24 subnet (default: 16)
+    EDGE_COMMAND_GROUP_RATE: Command starts per second per subnet, 0 = unlimited (default: 0)
 """
 
 import os
@@ -29,6 +33,8 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from edge_collector.cgminer_collector import CommandFanout
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -42,6 +48,10 @@ EDGE_AUTH_TOKEN = os.environ.get('EDGE_AUTH_TOKEN', '')
 EDGE_MINER_MODE = os.environ.get('EDGE_MINER_MODE', 'simulated')
 EDGE_EXECUTION_ENABLED = os.environ.get('EDGE_EXECUTION_ENABLED', 'true').lower() == 'true'
 EDGE_POLL_INTERVAL = int(os.environ.get('EDGE_POLL_INTERVAL', '5'))
+EDGE_LONG_POLL = int(os.environ.get('EDGE_LONG_POLL', '25'))
+EDGE_COMMAND_WORKERS = int(os.environ.get('EDGE_COMMAND_WORKERS', '64'))
+EDGE_COMMAND_GROUP_LIMIT = int(os.environ.get('EDGE_COMMAND_GROUP_LIMIT', '16'))
+EDGE_COMMAND_GROUP_RATE = float(os.environ.get('EDGE_COMMAND_GROUP_RATE', '0'))
 
 EXECUTED_COMMANDS_FILE = Path('.edge_executed_commands.json')
 
@@ -91,13 +101,23 @@ class EdgeCommandRunner:
                  auth_token: str = EDGE_AUTH_TOKEN,
                  site_id: str = EDGE_SITE_ID,
                  device_id: str = EDGE_DEVICE_ID,
-                 miner_mode: str = EDGE_MINER_MODE):
+                 miner_mode: str = EDGE_MINER_MODE,
+                 long_poll_wait: int = EDGE_LONG_POLL,
+                 fanout: Optional[CommandFanout] = None):
         self.api_base_url = api_base_url.rstrip('/')
         self.auth_token = auth_token
         self.site_id = site_id
         self.device_id = device_id
         self.miner_mode = miner_mode
         self.deduplicator = CommandDeduplicator()
+        # Server parks empty polls up to this many seconds when it supports long polling
+        self.long_poll_wait = long_poll_wait
+        self.server_long_poll = 0
+        self.fanout = fanout or CommandFanout(
+            max_workers=EDGE_COMMAND_WORKERS,
+            group_limit=EDGE_COMMAND_GROUP_LIMIT,
+            group_rate=EDGE_COMMAND_GROUP_RATE
+        )
         
         self._miner_ips: Dict[str, str] = {}
     
@@ -113,11 +133,15 @@ class EdgeCommandRunner:
         try:
             url = f"{self.api_base_url}/api/edge/v1/commands/poll"
             params = {'site_id': self.site_id, 'limit': 10}
+            if self.long_poll_wait:
+                params['wait'] = self.long_poll_wait
             
-            response = requests.get(url, headers=self._headers(), params=params, timeout=30)
+            response = requests.get(url, headers=self._headers(), params=params,
+                                    timeout=30 + self.long_poll_wait)
             
             if response.status_code == 200:
                 data = response.json()
+                self.server_long_poll = data.get('long_poll_max_seconds', 0) if self.long_poll_wait else 0
                 return data.get('commands', [])
             elif response.status_code == 401:
                 logger.error("Authentication failed - check EDGE_AUTH_TOKEN")
@@ -127,6 +151,7 @@ class EdgeCommandRunner:
         except requests.RequestException as e:
             logger.error(f"Network error polling commands: {e}")
         
+        self.server_long_poll = 0
         return []
     
     def ack_command(self, command_id: str, results: List[Dict[str, Any]]) -> bool:
@@ -169,53 +194,56 @@ class EdgeCommandRunner:
         
         return None
     
-    def execute_command(self, command: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Execute a single command on all target miners"""
-        command_id = command.get('command_id')
+    def _execute_target(self, command: Dict[str, Any], miner_id: str) -> Dict[str, Any]:
+        """Execute a command on one target miner"""
         command_type = command.get('command_type')
         payload = command.get('payload', {})
-        target_ids = command.get('target_ids', [])
         encrypted_credentials = command.get('encrypted_credentials', {})
         
-        logger.info(f"Executing {command_type} on {len(target_ids)} miners")
+        ip_address = self._resolve_miner_ip(miner_id)
+        if not ip_address:
+            return {
+                'miner_id': miner_id,
+                'status': 'FAILED',
+                'message': 'Could not resolve miner IP address'
+            }
         
-        results = []
-        for miner_id in target_ids:
-            miner_id_str = str(miner_id)
-            
-            ip_address = self._resolve_miner_ip(miner_id_str)
-            if not ip_address:
-                results.append({
-                    'miner_id': miner_id_str,
-                    'status': 'FAILED',
-                    'message': 'Could not resolve miner IP address'
-                })
-                continue
-            
-            credentials = None
-            if miner_id_str in encrypted_credentials:
-                credentials = self._decrypt_credentials(encrypted_credentials[miner_id_str])
-            
-            try:
-                adapter = self._get_adapter(ip_address, credentials)
-                result = adapter.execute(command_type, payload)
-                
-                results.append({
-                    'miner_id': miner_id_str,
-                    **result.to_dict()
-                })
-                
-                logger.info(f"  {miner_id_str}: {'SUCCESS' if result.success else 'FAILED'} - {result.message}")
-                
-            except Exception as e:
-                logger.error(f"  {miner_id_str}: ERROR - {e}")
-                results.append({
-                    'miner_id': miner_id_str,
-                    'status': 'FAILED',
-                    'message': str(e)
-                })
+        credentials = None
+        if miner_id in encrypted_credentials:
+            credentials = self._decrypt_credentials(encrypted_credentials[miner_id])
         
-        return results
+        try:
+            adapter = self._get_adapter(ip_address, credentials)
+            result = adapter.execute(command_type, payload)
+            logger.info(f"  {miner_id}: {'SUCCESS' if result.success else 'FAILED'} - {result.message}")
+            return {
+                'miner_id': miner_id,
+                **result.to_dict()
+            }
+        except Exception as e:
+            logger.error(f"  {miner_id}: ERROR - {e}")
+            return {
+                'miner_id': miner_id,
+                'status': 'FAILED',
+                'message': str(e)
+            }
+    
+    def _target_jobs(self, command: Dict[str, Any]) -> list:
+        """(miner_key, rate-limit group, fn) jobs for CommandFanout, one per target"""
+        jobs = []
+        for miner_id in command.get('target_ids', []):
+            miner_id_str = str(miner_id)
+            jobs.append((
+                miner_id_str,
+                CommandFanout.group_of(self._resolve_miner_ip(miner_id_str)),
+                lambda miner_id_str=miner_id_str: self._execute_target(command, miner_id_str)
+            ))
+        return jobs
+    
+    def execute_command(self, command: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Execute a single command on all target miners (in parallel)"""
+        logger.info(f"Executing {command.get('command_type')} on {len(command.get('target_ids', []))} miners")
+        return self.fanout.run(self._target_jobs(command))
     
     def _decrypt_credentials(self, encrypted_cred: Dict[str, Any]) -> Optional[Dict]:
         """Decrypt credentials using device private key"""
@@ -241,6 +269,10 @@ class EdgeCommandRunner:
         commands = self.poll_commands()
         processed = 0
         
+        # All targets of all fetched commands run in one fan-out: miners in
+        # parallel, each miner's commands in the order they were fetched
+        pending = []
+        jobs = []
         for command in commands:
             command_id = command.get('command_id')
             
@@ -248,9 +280,15 @@ class EdgeCommandRunner:
                 logger.debug(f"Skipping already executed command {command_id[:8]}")
                 continue
             
-            results = self.execute_command(command)
-            
-            if self.ack_command(command_id, results):
+            logger.info(f"Executing {command.get('command_type')} on {len(command.get('target_ids', []))} miners")
+            command_jobs = self._target_jobs(command)
+            pending.append((command_id, len(jobs), len(jobs) + len(command_jobs)))
+            jobs.extend(command_jobs)
+        
+        results = self.fanout.run(jobs)
+        
+        for command_id, start, end in pending:
+            if self.ack_command(command_id, results[start:end]):
                 self.deduplicator.mark_executed(command_id)
                 processed += 1
         
@@ -264,6 +302,7 @@ class EdgeCommandRunner:
         logger.info(f"  API URL: {self.api_base_url}")
         logger.info(f"  Mode: {self.miner_mode}")
         logger.info(f"  Poll interval: {poll_interval}s")
+        logger.info(f"  Long poll: {self.long_poll_wait}s")
         
         while True:
             try:
@@ -275,8 +314,11 @@ class EdgeCommandRunner:
                 break
             except Exception as e:
                 logger.error(f"Unexpected error: {e}")
+                self.server_long_poll = 0
             
-            time.sleep(poll_interval)
+            # A long poll already waited on the server; poll again right away
+            if not self.server_long_poll:
+                time.sleep(poll_interval)
 
 
 def main():
@@ -288,6 +330,8 @@ def main():
     parser.add_argument('--token', default=EDGE_AUTH_TOKEN, help='Device auth token')
     parser.add_argument('--poll-interval', type=int, default=EDGE_POLL_INTERVAL,
                        help='Polling interval in seconds')
+    parser.add_argument('--long-poll', type=int, default=EDGE_LONG_POLL,
+                       help='Long-poll wait in seconds (0 disables)')
     parser.add_argument('--once', action='store_true', help='Run once and exit')
     
     args = parser.parse_args()
@@ -296,7 +340,8 @@ def main():
         api_base_url=args.api_url,
         auth_token=args.token,
         site_id=args.site_id,
-        miner_mode=args.mode
+        miner_mode=args.mode,
+        long_poll_wait=0 if args.once else args.long_poll
     )
     
     if args.once:
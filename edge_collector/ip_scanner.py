@@ -8,6 +8,8 @@ Features:
 - Enumerate all IPs in a range
 - Validate IP addresses
 - Async concurrent probing with configurable concurrency
+- Scan engine for large ranges (a whole /16): TCP-connect pre-filter on the
+  CGMiner port, adaptive concurrency, results streamed as they are found
 
 Usage:
     from edge_collector.ip_scanner import IPRangeParser, MinerScanner
@@ -19,15 +21,21 @@ Usage:
     # Scan for miners
     scanner = MinerScanner(max_concurrent=50)
     results = await scanner.scan_range(ips, progress_callback=my_callback)
+    
+    # Stream discovered miners while the scan is running
+    async for miner in scanner.scan_stream(parser.enumerate_from_input("10.0.0.0/16")):
+        save(miner)
 """
 
 import asyncio
+import errno
 import ipaddress
 import logging
 import re
 import socket
 import json
-from typing import List, Optional, Dict, Any, Callable, Tuple, Iterator
+import time
+from typing import List, Optional, Dict, Any, Callable, Tuple, Iterator, Iterable, AsyncIterator
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -38,12 +46,34 @@ DEFAULT_HTTP_PORT = 80
 DEFAULT_TIMEOUT = 3.0
 MAX_CONCURRENT = 50
 
+# Scan engine: dead addresses are dropped after a short TCP connect, so the
+# connect timeout (not the API timeout) bounds the time spent per empty IP
+DEFAULT_CONNECT_TIMEOUT = 1.0
+MAX_ADAPTIVE_CONCURRENT = 2048
+MIN_ADAPTIVE_CONCURRENT = 16
+OVERLOAD_RETRIES = 3
+PROBE_COMMAND = "summary+stats+version+pools"
+
+# Local resource exhaustion (sockets, file descriptors, ephemeral ports):
+# the scanner is going too fast for this host, not the target being down
+OVERLOAD_ERRNOS = frozenset(
+    code for code in (
+        getattr(errno, name, None)
+        for name in ('EMFILE', 'ENFILE', 'ENOBUFS', 'ENOMEM', 'EAGAIN', 'EADDRNOTAVAIL')
+    ) if code is not None
+)
+
 
 class IPRangeError(Exception):
     """Exception for IP range parsing errors"""
     pass
 
 
+class ScanOverload(Exception):
+    """Connect attempt failed for lack of local sockets / descriptors"""
+    pass
+
+
 @dataclass
 class MinerProbeResult:
     """Result of probing a single IP for miners"""
@@ -353,11 +383,101 @@ class MinerDetector:
         return result
 
 
+def flatten_combined_response(response: Optional[Dict]) -> Optional[Dict]:
+    """
+    Flatten a combined CGMiner response for MinerDetector
+    
+    "summary+stats+version" answers {"summary": [{"SUMMARY": [...]}], "stats": [...], ...};
+    the sections are lifted to the top level ({"SUMMARY": [...], "STATS": [...], ...}).
+    Single-command responses are returned unchanged.
+    """
+    if not isinstance(response, dict) or 'SUMMARY' in response or 'STATS' in response:
+        return response
+    flat = {}
+    for part in response.values():
+        if isinstance(part, list) and part:
+            part = part[0]
+        if not isinstance(part, dict):
+            continue
+        for key, value in part.items():
+            if key not in ('STATUS', 'id'):
+                flat[key] = value
+    return flat or response
+
+
+class AdaptiveLimiter:
+    """
+    Adaptive concurrency limit for connect attempts
+    
+    Starts at ``initial`` and doubles after each round of ``limit`` attempts
+    until the host first runs short of sockets/descriptors (OVERLOAD_ERRNOS);
+    from then on it grows by ``step`` per round and halves on overload (at
+    most once per round), between ``minimum`` and ``maximum``.
+    """
+    
+    def __init__(self, initial: int, minimum: int = MIN_ADAPTIVE_CONCURRENT,
+                 maximum: int = MAX_ADAPTIVE_CONCURRENT, step: int = 32):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.step = max(1, step)
+        self.active = 0
+        self.peak = 0
+        self.overloads = 0
+        self._slow_start = True
+        self._healthy = 0
+        self._since_cut = 0
+        self._cond = asyncio.Condition()
+    
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+    
+    async def release(self, overloaded: bool = False):
+        async with self._cond:
+            self.active -= 1
+            self._since_cut += 1
+            if overloaded:
+                self.overloads += 1
+                self._healthy = 0
+                self._slow_start = False
+                # Attempts started before the last cut fail the same way; cut once per round
+                if self._since_cut >= self.limit // 2:
+                    self.limit = max(self.minimum, self.limit // 2)
+                    self._since_cut = 0
+            else:
+                self._healthy += 1
+                if self._healthy >= self.limit and self.limit < self.maximum:
+                    self._healthy = 0
+                    grown = self.limit * 2 if self._slow_start else self.limit + self.step
+                    self.limit = min(self.maximum, grown)
+            self._cond.notify_all()
+
+
+def _descriptor_budget(default: int = MAX_ADAPTIVE_CONCURRENT) -> int:
+    """Sockets the scanner may hold: the soft RLIMIT_NOFILE minus headroom"""
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, ValueError, OSError):
+        return default
+    if soft == resource.RLIM_INFINITY:
+        return default
+    return max(MIN_ADAPTIVE_CONCURRENT, soft - 128)
+
+
 class MinerScanner:
     """
     Async network scanner for miner discovery
     
-    Uses asyncio for concurrent probing with configurable limits
+    Uses asyncio for concurrent probing with configurable limits.
+    scan_stream() is the scan engine for large ranges: every address gets a
+    TCP connect on the CGMiner port with ``connect_timeout``; addresses that
+    accept are queried on the same connection, the rest are done without an
+    API or HTTP probe. Concurrency adapts between ``max_concurrent`` (start)
+    and ``max_concurrent_limit``.
     """
     
     def __init__(
@@ -366,35 +486,40 @@ class MinerScanner:
         cgminer_port: int = DEFAULT_CGMINER_PORT,
         http_port: int = DEFAULT_HTTP_PORT,
         timeout: float = DEFAULT_TIMEOUT,
-        try_http: bool = True
+        try_http: bool = True,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        adaptive: bool = True,
+        max_concurrent_limit: int = MAX_ADAPTIVE_CONCURRENT
     ):
         """
         Initialize scanner
         
         Args:
-            max_concurrent: Maximum concurrent connections
+            max_concurrent: Maximum concurrent connections (scan_stream: starting concurrency)
             cgminer_port: CGMiner API port (default 4028)
             http_port: HTTP port for web interface detection
             timeout: Connection timeout in seconds
             try_http: Whether to try HTTP if CGMiner fails
+            connect_timeout: scan_stream pre-filter connect timeout in seconds
+            adaptive: Let scan_stream grow/shrink concurrency (False: fixed max_concurrent)
+            max_concurrent_limit: Upper bound for adaptive concurrency (capped by RLIMIT_NOFILE)
         """
         self.max_concurrent = max_concurrent
         self.cgminer_port = cgminer_port
         self.http_port = http_port
         self.timeout = timeout
         self.try_http = try_http
+        self.connect_timeout = connect_timeout
+        self.adaptive = adaptive
+        self.max_concurrent_limit = max_concurrent_limit
         self._semaphore = None
+        self._limiter = None
+        self._stats = {}
     
-    async def _probe_cgminer(self, ip: str) -> Optional[Dict]:
-        """Probe CGMiner API on given IP"""
+    async def _query_cgminer(self, reader, writer) -> Optional[Dict]:
+        """Send the probe command on an open connection and close it"""
         try:
-            reader, writer = await asyncio.wait_for(
-                asyncio.open_connection(ip, self.cgminer_port),
-                timeout=self.timeout
-            )
-            
-            request = json.dumps({"command": "summary+stats+version"}).encode('utf-8')
-            writer.write(request)
+            writer.write(json.dumps({"command": PROBE_COMMAND}).encode('utf-8'))
             await writer.drain()
             
             response = b''
@@ -409,16 +534,26 @@ class MinerScanner:
             except asyncio.TimeoutError:
                 pass
             
+            if response:
+                data = response.rstrip(b'\x00').decode('utf-8', errors='ignore')
+                return flatten_combined_response(json.loads(data))
+        finally:
             writer.close()
             try:
                 await writer.wait_closed()
             except Exception:
                 pass
-            
-            if response:
-                data = response.rstrip(b'\x00').decode('utf-8', errors='ignore')
-                return json.loads(data)
-                
+        
+        return None
+    
+    async def _probe_cgminer(self, ip: str) -> Optional[Dict]:
+        """Probe CGMiner API on given IP"""
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, self.cgminer_port),
+                timeout=self.timeout
+            )
+            return await self._query_cgminer(reader, writer)
         except Exception as e:
             logger.debug(f"CGMiner probe failed for {ip}: {e}")
         
@@ -463,6 +598,49 @@ class MinerScanner:
         
         return None
     
+    async def _identify(self, ip: str, cgminer_response: Optional[Dict], start_time: float) -> MinerProbeResult:
+        """Build the result from a CGMiner response, falling back to the web interface"""
+        loop = asyncio.get_event_loop()
+        if cgminer_response:
+            probe_time = (loop.time() - start_time) * 1000
+            detected = MinerDetector.detect_from_cgminer_response(cgminer_response)
+            
+            return MinerProbeResult(
+                ip_address=ip,
+                is_miner=True,
+                api_port=self.cgminer_port,
+                detected_model=detected.get('detected_model'),
+                detected_firmware=detected.get('detected_firmware'),
+                detected_hashrate_ghs=detected.get('detected_hashrate_ghs'),
+                mac_address=detected.get('mac_address'),
+                raw_response=cgminer_response,
+                probe_time_ms=probe_time,
+            )
+        
+        if self.try_http:
+            http_result = await self._probe_http(ip)
+            if http_result:
+                content, headers = http_result
+                detected = MinerDetector.detect_from_http_response(content, headers)
+                
+                if detected.get('detected_model'):
+                    probe_time = (loop.time() - start_time) * 1000
+                    return MinerProbeResult(
+                        ip_address=ip,
+                        is_miner=True,
+                        api_port=self.http_port,
+                        detected_model=detected.get('detected_model'),
+                        detected_firmware=detected.get('detected_firmware'),
+                        probe_time_ms=probe_time,
+                    )
+        
+        probe_time = (loop.time() - start_time) * 1000
+        return MinerProbeResult(
+            ip_address=ip,
+            is_miner=False,
+            probe_time_ms=probe_time,
+        )
+    
     async def probe_ip(self, ip: str) -> MinerProbeResult:
         """
         Probe a single IP for miners
@@ -477,46 +655,147 @@ class MinerScanner:
         
         async with self._semaphore:
             cgminer_response = await self._probe_cgminer(ip)
-            
-            if cgminer_response:
-                probe_time = (asyncio.get_event_loop().time() - start_time) * 1000
-                detected = MinerDetector.detect_from_cgminer_response(cgminer_response)
-                
-                return MinerProbeResult(
-                    ip_address=ip,
-                    is_miner=True,
-                    api_port=self.cgminer_port,
-                    detected_model=detected.get('detected_model'),
-                    detected_firmware=detected.get('detected_firmware'),
-                    detected_hashrate_ghs=detected.get('detected_hashrate_ghs'),
-                    mac_address=detected.get('mac_address'),
-                    raw_response=cgminer_response,
-                    probe_time_ms=probe_time,
-                )
-            
-            if self.try_http:
-                http_result = await self._probe_http(ip)
-                if http_result:
-                    content, headers = http_result
-                    detected = MinerDetector.detect_from_http_response(content, headers)
-                    
-                    if detected.get('detected_model'):
-                        probe_time = (asyncio.get_event_loop().time() - start_time) * 1000
-                        return MinerProbeResult(
-                            ip_address=ip,
-                            is_miner=True,
-                            api_port=self.http_port,
-                            detected_model=detected.get('detected_model'),
-                            detected_firmware=detected.get('detected_firmware'),
-                            probe_time_ms=probe_time,
-                        )
-            
-            probe_time = (asyncio.get_event_loop().time() - start_time) * 1000
-            return MinerProbeResult(
-                ip_address=ip,
-                is_miner=False,
-                probe_time_ms=probe_time,
+            return await self._identify(ip, cgminer_response, start_time)
+    
+    async def _check_ip(self, ip: str) -> MinerProbeResult:
+        """
+        Pre-filter connect on the CGMiner port, then probe on the same connection
+        
+        Raises:
+            ScanOverload: the connect failed for lack of local resources
+        """
+        start_time = asyncio.get_event_loop().time()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, self.cgminer_port),
+                timeout=self.connect_timeout
             )
+        except OSError as e:
+            if e.errno in OVERLOAD_ERRNOS:
+                raise ScanOverload(str(e)) from e
+            return MinerProbeResult(ip_address=ip, is_miner=False,
+                                    probe_time_ms=(asyncio.get_event_loop().time() - start_time) * 1000)
+        except asyncio.TimeoutError:
+            return MinerProbeResult(ip_address=ip, is_miner=False,
+                                    probe_time_ms=self.connect_timeout * 1000)
+        
+        self._stats['open'] = self._stats.get('open', 0) + 1
+        try:
+            cgminer_response = await self._query_cgminer(reader, writer)
+        except Exception as e:
+            logger.debug(f"CGMiner probe failed for {ip}: {e}")
+            cgminer_response = None
+        return await self._identify(ip, cgminer_response, start_time)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters of the running / last scan_stream (for progress reporting)"""
+        stats = dict(self._stats)
+        if self._limiter is not None:
+            stats['concurrency'] = self._limiter.limit
+            stats['active'] = self._limiter.active
+            stats['peak_concurrency'] = self._limiter.peak
+            stats['overloads'] = self._limiter.overloads
+        elapsed = stats.get('elapsed_s') or 0
+        stats['ips_per_second'] = round(stats.get('scanned', 0) / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+    
+    async def scan_stream(
+        self,
+        ips: Iterable[str],
+        progress_callback: Optional[Callable[[int, int, Optional[MinerProbeResult]], None]] = None,
+        total: Optional[int] = None,
+        include_all: bool = False
+    ) -> AsyncIterator[MinerProbeResult]:
+        """
+        Scan addresses and yield results as they complete (completion order)
+        
+        ``ips`` is consumed lazily, so a generator over a /16 never materialises
+        65k pending tasks: a new address is started only when the adaptive limiter
+        has a free slot. Attempts that hit local resource limits are retried
+        (up to OVERLOAD_RETRIES) after the limiter has backed off.
+        
+        Args:
+            ips: IP addresses to scan (any iterable)
+            progress_callback: Optional callback(scanned, total, result or None)
+            total: Number of addresses for progress (defaults to len(ips) when available)
+            include_all: Also yield non-miner results
+            
+        Yields:
+            MinerProbeResult for each discovered miner (every address with include_all)
+        """
+        if total is None:
+            total = len(ips) if hasattr(ips, '__len__') else 0
+        
+        if self.adaptive:
+            maximum = min(self.max_concurrent_limit, _descriptor_budget(self.max_concurrent_limit))
+            limiter = AdaptiveLimiter(self.max_concurrent, maximum=maximum)
+        else:
+            limiter = AdaptiveLimiter(self.max_concurrent, minimum=self.max_concurrent, maximum=self.max_concurrent)
+        self._limiter = limiter
+        self._stats = {'scanned': 0, 'open': 0, 'miners': 0, 'total': total, 'elapsed_s': 0.0}
+        started = time.monotonic()
+        
+        done: asyncio.Queue = asyncio.Queue()
+        tasks = set()
+        finished = object()
+        
+        async def attempt(ip: str):
+            # The slot was acquired by feed(); re-acquired for each retry
+            for retry in range(OVERLOAD_RETRIES + 1):
+                if retry:
+                    await asyncio.sleep(min(self.connect_timeout, 0.1 * 2 ** retry))
+                    await limiter.acquire()
+                overloaded = False
+                try:
+                    result = await self._check_ip(ip)
+                except ScanOverload as e:
+                    overloaded = True
+                    result = MinerProbeResult(ip_address=ip, is_miner=False, error=str(e))
+                except Exception as e:
+                    result = MinerProbeResult(ip_address=ip, is_miner=False, error=str(e))
+                finally:
+                    await limiter.release(overloaded)
+                if not overloaded:
+                    break
+            done.put_nowait(result)
+        
+        async def feed():
+            try:
+                for ip in ips:
+                    await limiter.acquire()
+                    task = asyncio.ensure_future(attempt(ip))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                if tasks:
+                    await asyncio.gather(*list(tasks))
+            finally:
+                done.put_nowait(finished)
+        
+        feeder = asyncio.ensure_future(feed())
+        try:
+            while True:
+                result = await done.get()
+                if result is finished:
+                    break
+                self._stats['scanned'] += 1
+                self._stats['elapsed_s'] = time.monotonic() - started
+                if result.is_miner:
+                    self._stats['miners'] += 1
+                if progress_callback:
+                    try:
+                        progress_callback(self._stats['scanned'], total, result if result.is_miner else None)
+                    except Exception as e:
+                        logger.warning(f"Progress callback error: {e}")
+                if result.is_miner or include_all:
+                    yield result
+            await feeder
+        finally:
+            self._stats['elapsed_s'] = time.monotonic() - started
+            if not feeder.done():
+                feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+            await asyncio.gather(feeder, *list(tasks), return_exceptions=True)
     
     async def scan_range(
         self,
@@ -531,35 +810,12 @@ class MinerScanner:
             progress_callback: Optional callback(scanned, total, result)
             
         Returns:
-            List of MinerProbeResult for each IP
+            List of MinerProbeResult for each IP (input order)
         """
-        self._semaphore = asyncio.Semaphore(self.max_concurrent)
-        total = len(ips)
-        results = []
-        scanned = 0
-        
-        async def scan_with_progress(ip: str) -> MinerProbeResult:
-            nonlocal scanned
-            result = await self.probe_ip(ip)
-            scanned += 1
-            if progress_callback:
-                try:
-                    progress_callback(scanned, total, result if result.is_miner else None)
-                except Exception as e:
-                    logger.warning(f"Progress callback error: {e}")
-            return result
-        
-        tasks = [scan_with_progress(ip) for ip in ips]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        valid_results = []
-        for r in results:
-            if isinstance(r, MinerProbeResult):
-                valid_results.append(r)
-            else:
-                logger.warning(f"Scan task exception: {r}")
-        
-        return valid_results
+        results = {}
+        async for result in self.scan_stream(ips, progress_callback, total=len(ips), include_all=True):
+            results[result.ip_address] = result
+        return [results[ip] for ip in ips if ip in results]
     
     def scan_range_sync(
         self,
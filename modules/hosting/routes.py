@@ -16,7 +16,7 @@ from common.rbac import (
 )
 from sqlalchemy import or_
 from models import db, HostingSite, HostingMiner, HostingTicket, HostingIncident, HostingUsageRecord, HostingUsageItem, MinerTelemetry, HostingBill, HostingBillItem, HostingMinerOperationLog, HostingOwnerEncryption, MinerModel, SiteElectricityRateHistory
-from api.collector_api import MinerTelemetryLive, MinerCommand, CollectorKey
+from api.collector_api import MinerCommand, CollectorKey
 from models import CurtailmentPlan, CurtailmentStrategy, CurtailmentExecution
 from models import ExecutionMode, PlanStatus, ExecutionAction, ExecutionStatus, StrategyType
 from models import AutomationRule, AutomationRuleLog, AutomationRuleCooldown
@@ -1872,11 +1872,10 @@ def get_miners():
         telemetry_map = {}
         if miner_identifiers:
             try:
-                telemetry_records = MinerTelemetryLive.query.filter(
-                    MinerTelemetryLive.site_id.in_(site_ids)
-                ).all()
-                for t in telemetry_records:
-                    telemetry_map[(t.miner_id, t.site_id)] = t
+                from services.live_snapshot_store import live_snapshots
+                for snapshot in live_snapshots.get_sites(site_ids).values():
+                    for t in snapshot.miners.values():
+                        telemetry_map[(t.miner_id, t.site_id)] = t
             except Exception as tel_err:
                 logger.warning(f"获取遥测数据失败: {tel_err}")
         
@@ -2375,12 +2374,29 @@ def get_miner_telemetry_history(miner_id):
             # 重新按时间正序排列
             telemetry_records = sorted(telemetry_records, key=lambda x: x.recorded_at)
         
+        # 服务端降采样：每个指标各自保留峰谷点，合并后按时间排序
+        from services.telemetry_service import CHART_MAX_POINTS, DOWNSAMPLE_METHODS, downsample_indices, time_axis
+        max_points = request.args.get('max_points', CHART_MAX_POINTS, type=int)
+        method = request.args.get('downsample', 'lttb')
+        if method not in DOWNSAMPLE_METHODS:
+            return jsonify({'success': False, 'error': f'downsample must be one of {", ".join(DOWNSAMPLE_METHODS)}'}), 400
+        total_points = len(telemetry_records)
+        if max_points and total_points > max_points:
+            x = time_axis([record.recorded_at for record in telemetry_records])
+            per_metric = max(max_points // 3, 3)
+            keep = sorted(set().union(*(
+                downsample_indices(x, [getattr(record, attr) for record in telemetry_records], per_metric, method).tolist()
+                for attr in ('hashrate', 'temperature', 'power_consumption')
+            )))
+            telemetry_records = [telemetry_records[i] for i in keep]
+        
         # 构建时间序列数据
         data = {
             'timestamps': [record.recorded_at.strftime('%Y-%m-%d %H:%M:%S') for record in telemetry_records],
             'hashrate': [record.hashrate for record in telemetry_records],
             'temperature': [record.temperature for record in telemetry_records],
-            'power_consumption': [record.power_consumption for record in telemetry_records]
+            'power_consumption': [record.power_consumption for record in telemetry_records],
+            'total_points': total_points
         }
         
         return jsonify({'success': True, 'data': data})
@@ -7897,14 +7913,24 @@ def api_scan_start():
         "password": "root"
     }
     
+    "mode": "incremental" (optional) 先复核已知矿机, 跳过最近几次完整扫描
+    均为空的地址, 其余地址随后扫描 (services.scan_planner)
+    
+    每次扫描记录为 IPScanJob (scan_type DISCOVERY / INCREMENTAL), 发现的矿机在扫描
+    过程中分批写入 DiscoveredMiner, 作为之后增量扫描的依据。
+    
     Response:
     {
         "success": true,
         "scan_id": "scan_1_20251214_abc123",
+        "scan_job_id": 42,
         "total_ips": 254
     }
     """
+    from flask import current_app
     from services.ip_scanner import get_scanner
+    from services.scan_planner import SCAN_MODES, plan_incremental_scan
+    from models_device_encryption import IPScanJob
     
     try:
         data = request.get_json()
@@ -7917,10 +7943,14 @@ def api_scan_start():
         cidr = data.get('cidr', '').strip()
         username = data.get('username', 'root')
         password = data.get('password', 'root')
+        mode = (data.get('mode') or 'full').lower()
         
         if not site_id:
             return jsonify({'success': False, 'error': 'site_id is required'}), 400
         
+        if mode not in SCAN_MODES:
+            return jsonify({'success': False, 'error': f'Invalid mode: {mode}'}), 400
+        
         site = HostingSite.query.get(site_id)
         if not site:
             return jsonify({'success': False, 'error': 'Site not found'}), 404
@@ -7940,22 +7970,99 @@ def api_scan_start():
         except ValueError as e:
             return jsonify({'success': False, 'error': str(e)}), 400
         
-        scan_id = scanner.scan_range_async(start_ip, end_ip, site_id, username, password)
+        plan = plan_incremental_scan(ip_list, site_id=site_id) if mode == 'incremental' else None
+        if plan is not None:
+            ip_list = plan.ip_list
+        
+        scan_job = IPScanJob(
+            tenant_id=session.get('user_id'),
+            site_id=site_id,
+            ip_range_start=start_ip,
+            ip_range_end=end_ip,
+            scan_type=SCAN_MODES[mode],
+            total_ips=len(ip_list),
+            status='RUNNING',
+            started_at=datetime.utcnow()
+        )
+        db.session.add(scan_job)
+        db.session.commit()
         
-        logger.info(f"IP scan started: {scan_id}, range: {start_ip} - {end_ip}, total: {len(ip_list)}")
+        on_discovered, on_complete = _scan_job_recorder(current_app._get_current_object(), scan_job.id)
+        scan_id = scanner.scan_range_async(
+            start_ip, end_ip, site_id, username, password, plan=plan,
+            on_discovered=on_discovered, on_complete=on_complete
+        )
         
-        return jsonify({
+        logger.info(f"IP scan started: {scan_id}, job {scan_job.id}, range: {start_ip} - {end_ip}, total: {len(ip_list)}, mode: {mode}")
+        
+        response = {
             'success': True,
             'scan_id': scan_id,
+            'scan_job_id': scan_job.id,
             'total_ips': len(ip_list),
             'message': f'Scanning {len(ip_list)} IP addresses'
-        })
+        }
+        if plan is not None:
+            response['plan'] = plan.to_dict()
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"IP scan start error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _scan_job_recorder(app, scan_job_id: int):
+    """
+    在扫描线程中把扫描结果写入 IPScanJob / DiscoveredMiner
+    
+    返回 (on_discovered, on_complete): 发现的矿机与已扫描数在扫描过程中分批写入,
+    扫描中途中断时已发现的矿机不会丢失; 扫描结束时记录最终状态。
+    """
+    from models_device_encryption import IPScanJob
+    
+    def update(apply):
+        with app.app_context():
+            try:
+                scan_job = IPScanJob.query.get(scan_job_id)
+                if scan_job is not None:
+                    apply(scan_job)
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+    
+    def on_discovered(scanned_ips, miners):
+        from api.scan_api import upsert_discovered_miners
+        
+        def apply(scan_job):
+            scan_job.scanned_ips = scanned_ips
+            upsert_discovered_miners(scan_job, [{
+                'ip_address': m.ip_address,
+                'api_port': m.port,
+                'detected_model': m.model,
+                'detected_firmware': m.firmware,
+                'detected_hashrate_ghs': m.hashrate_ths * 1000,
+                'mac_address': m.mac_address or None,
+                'raw_response': m.to_dict(),
+            } for m in miners])
+        
+        update(apply)
+    
+    def on_complete(status, scanned_ips, error):
+        def apply(scan_job):
+            scan_job.status = 'COMPLETED' if status == 'completed' else 'FAILED'
+            scan_job.error_message = error
+            scan_job.completed_at = datetime.utcnow()
+            scan_job.scanned_ips = scanned_ips
+            logger.info(f"Scan job {scan_job_id} {scan_job.status}: {scan_job.discovered_miners} miners discovered")
+        
+        update(apply)
+    
+    return on_discovered, on_complete
+
+
 @hosting_bp.route('/api/scan/<scan_id>/status', methods=['GET'])
 @login_required
 @requires_module_access(Module.HOSTING_SITE_MGMT, require_full=False)
@@ -232,48 +232,48 @@ def api_live_data(site_id):
         return jsonify({'success': False, 'error': 'Telemetry not available'})
     
     try:
-        stats = db.session.query(
-            func.count(MinerTelemetryLive.id).label('total'),
-            func.sum(db.case((MinerTelemetryLive.online == True, 1), else_=0)).label('online'),
-            func.sum(MinerTelemetryLive.hashrate_ghs).label('hashrate'),
-            func.avg(MinerTelemetryLive.temperature_avg).label('temp'),
-            func.max(MinerTelemetryLive.temperature_max).label('max_temp')
-        ).filter(MinerTelemetryLive.site_id == site_id).first()
-        
-        recent_miners = MinerTelemetryLive.query.filter_by(
-            site_id=site_id
-        ).order_by(desc(MinerTelemetryLive.updated_at)).limit(20).all()
+        from services.live_snapshot_store import snapshot_response
         
-        miners_data = []
-        for m in recent_miners:
-            miners_data.append({
-                'miner_id': m.miner_id,
-                'ip_address': m.ip_address,
-                'online': m.online,
-                'hashrate_ths': m.hashrate_ghs / 1000 if m.hashrate_ghs else 0,
-                'temperature': m.temperature_avg,
-                'temp_max': m.temperature_max,
-                'fan_speeds': m.fan_speeds or [],
-                'uptime_hours': m.uptime_seconds / 3600 if m.uptime_seconds else 0,
-                'updated': m.updated_at.strftime('%H:%M:%S') if m.updated_at else '-'
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'stats': {
-                    'total': stats.total or 0,
-                    'online': int(stats.online or 0),
-                    'offline': (stats.total or 0) - int(stats.online or 0),
-                    'hashrate_ths': round((stats.hashrate or 0) / 1000, 2),
-                    'avg_temp': round(stats.temp or 0, 1),
-                    'max_temp': round(stats.max_temp or 0, 1),
-                    'online_rate': round(int(stats.online or 0) / max(stats.total or 1, 1) * 100, 1)
-                },
-                'miners': miners_data,
-                'timestamp': datetime.utcnow().isoformat()
+        def build_payload(snapshot):
+            miners = snapshot.by_updated_desc()
+            total = len(miners)
+            online = sum(1 for m in miners if m.online)
+            hashrate = sum(m.hashrate_ghs or 0 for m in miners)
+            temps = [m.temperature_avg for m in miners if m.temperature_avg is not None]
+            max_temps = [m.temperature_max for m in miners if m.temperature_max is not None]
+            
+            miners_data = []
+            for m in miners[:20]:
+                miners_data.append({
+                    'miner_id': m.miner_id,
+                    'ip_address': m.ip_address,
+                    'online': m.online,
+                    'hashrate_ths': m.hashrate_ghs / 1000 if m.hashrate_ghs else 0,
+                    'temperature': m.temperature_avg,
+                    'temp_max': m.temperature_max,
+                    'fan_speeds': m.fan_speeds or [],
+                    'uptime_hours': m.uptime_seconds / 3600 if m.uptime_seconds else 0,
+                    'updated': m.updated_at.strftime('%H:%M:%S') if m.updated_at else '-'
+                })
+            
+            return {
+                'success': True,
+                'data': {
+                    'stats': {
+                        'total': total,
+                        'online': online,
+                        'offline': total - online,
+                        'hashrate_ths': round(hashrate / 1000, 2),
+                        'avg_temp': round(sum(temps) / len(temps), 1) if temps else 0,
+                        'max_temp': round(max(max_temps), 1) if max_temps else 0,
+                        'online_rate': round(online / max(total, 1) * 100, 1)
+                    },
+                    'miners': miners_data,
+                    'timestamp': datetime.utcnow().isoformat()
+                }
             }
-        })
+        
+        return snapshot_response(site_id, build_payload)
         
     except Exception as e:
         logger.error(f"API live data error: {e}")
@@ -0,0 +1,201 @@
+"""
+Command Wakeup Notifier
+命令入队唤醒（边缘长轮询）
+
+Edge collectors long-poll the command endpoints with ``?wait=<seconds>``.
+Instead of re-running the dispatch query every few seconds, a parked request
+sleeps on a per-site wakeup that fires once a command for that site is
+committed, then runs the dispatch query again.
+
+- Every insert of a MinerCommand / RemoteCommand (and every update that puts
+  one back into its dispatchable status) stages the site id on the session;
+  the wakeup is sent only after the transaction commits, so a woken poll
+  always sees the row.
+- Redis (``REDIS_URL`` set): wakeups are published on
+  ``commands:wakeup:<site_id>`` and a subscriber thread relays them to the
+  local waiters, so a command created in one gunicorn worker wakes polls
+  parked in any other. Redis errors fall back to in-process wakeups.
+- In-process: a version counter + condition per site. Without Redis, commands
+  created by another worker are only picked up when the parked poll re-checks
+  the table every ``COMMAND_LONG_POLL_RECHECK_SECONDS``.
+
+A parked request holds its worker thread, so long polling is only honoured
+when ``COMMAND_LONG_POLL_MAX_SECONDS`` > 0 (default 0: answer immediately),
+which should be set only with threaded or async gunicorn workers.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+COMMAND_LONG_POLL_MAX_SECONDS = float(os.environ.get('COMMAND_LONG_POLL_MAX_SECONDS', '0'))
+COMMAND_LONG_POLL_RECHECK_SECONDS = float(os.environ.get('COMMAND_LONG_POLL_RECHECK_SECONDS', '15'))
+
+_CHANNEL_PREFIX = 'commands:wakeup:'
+_PENDING_KEY = 'pending_command_wakeups'
+
+
+class CommandNotifier:
+    """Per-site command wakeups (Redis pub/sub across workers when configured)"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._cond = threading.Condition()
+            cls._instance._versions = {}
+            cls._instance._redis = None
+            cls._instance._redis_checked = False
+            cls._instance._listener = None
+        return cls._instance
+
+    def _client(self):
+        if not self._redis_checked:
+            self._redis_checked = True
+            redis_url = os.environ.get('REDIS_URL')
+            if REDIS_AVAILABLE and redis_url:
+                try:
+                    client = redis.from_url(redis_url, decode_responses=True)
+                    client.ping()
+                    self._redis = client
+                    self._listener = threading.Thread(target=self._listen, name='command-wakeups', daemon=True)
+                    self._listener.start()
+                    logger.info("Command wakeups relayed through Redis")
+                except Exception as e:
+                    logger.warning(f"Redis unavailable for command wakeups, using in-process wakeups: {e}")
+        return self._redis
+
+    @property
+    def backend(self) -> str:
+        return 'redis' if self._client() is not None else 'memory'
+
+    def _listen(self):
+        """Relay Redis wakeups to local waiters; reconnects after errors"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{_CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    try:
+                        site_id = int(message['channel'][len(_CHANNEL_PREFIX):])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    self._bump(site_id)
+            except Exception as e:
+                logger.warning(f"Command wakeup subscription lost, retrying: {e}")
+                time.sleep(1)
+
+    def _bump(self, site_id: int):
+        with self._cond:
+            self._versions[site_id] = self._versions.get(site_id, 0) + 1
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def version(self, site_id: int) -> int:
+        """Wakeup counter of a site; take it before querying, pass it to wait()"""
+        self._client()
+        with self._cond:
+            return self._versions.get(site_id, 0)
+
+    def wait(self, site_id: int, since: int, timeout: float) -> bool:
+        """Block until a wakeup after ``since`` arrives; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._versions.get(site_id, 0) == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def notify(self, site_id: int):
+        """Wake polls parked for a site (all workers when Redis is configured)"""
+        client = self._client()
+        if client is not None:
+            try:
+                client.publish(f"{_CHANNEL_PREFIX}{site_id}", '1')
+            except Exception as e:
+                logger.warning(f"Redis command wakeup failed for site {site_id}: {e}")
+        # The local bump makes same-worker wakeups independent of the Redis round trip
+        self._bump(site_id)
+
+    def stage(self, session, site_id: Optional[int]):
+        """Queue a wakeup for a site; sent when the session commits"""
+        if site_id is not None and session is not None:
+            session.info.setdefault(_PENDING_KEY, set()).add(site_id)
+
+
+command_notifier = CommandNotifier()
+
+
+def wait_for_commands(site_id: int, since: int, timeout: float) -> bool:
+    """Park a poll for up to ``timeout`` seconds; True when woken by a command"""
+    recheck = COMMAND_LONG_POLL_RECHECK_SECONDS
+    if command_notifier.backend == 'memory' and recheck > 0:
+        timeout = min(timeout, recheck)
+    return command_notifier.wait(site_id, since, timeout)
+
+
+def long_poll_max_seconds() -> float:
+    """Longest wait a poll may ask for (advertised to edge clients)"""
+    return COMMAND_LONG_POLL_MAX_SECONDS
+
+
+def long_poll_seconds(requested) -> float:
+    """Seconds a poll may be parked for: the requested wait capped by configuration"""
+    try:
+        requested = float(requested or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return max(0.0, min(requested, long_poll_max_seconds()))
+
+
+# Statuses the poll endpoints dispatch: MinerCommand 'pending', RemoteCommand 'QUEUED'
+DISPATCHABLE_STATUSES = ('pending', 'QUEUED')
+
+
+def _stage_command(mapper, connection, target):
+    status = getattr(target, 'status', None)
+    if getattr(status, 'value', status) in DISPATCHABLE_STATUSES:
+        command_notifier.stage(object_session(target), target.site_id)
+
+
+def register_command_model(model):
+    """Send wakeups when rows of a command model become dispatchable (idempotent)"""
+    for name in ('after_insert', 'after_update'):
+        if not event.contains(model, name, _stage_command):
+            event.listen(model, name, _stage_command)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _send_committed_wakeups(session):
+    for site_id in session.info.pop(_PENDING_KEY, set()):
+        try:
+            command_notifier.notify(site_id)
+        except Exception as e:
+            logger.warning(f"Command wakeup failed for site {site_id}: {e}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_rolled_back_wakeups(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -5,35 +5,90 @@ Extracted from collector_api.py for reuse by Edge v1 and legacy endpoints
 
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from api.collector_api import (
     MinerTelemetryLive, MinerTelemetryHistory, CollectorUploadLog,
-    find_or_create_hosting_miner, sync_hosting_miner_telemetry
+    resolve_hosting_miners, sync_hosting_miner_telemetry
 )
 from services.telemetry_storage import TelemetryRaw24h
+from services.telemetry_copy_writer import copy_insert_mappings
+from services.ingest_watermark import sequence_watermarks
+from services.live_snapshot_store import live_snapshots
+from services.telemetry_codec import ColumnarRecords
 from models import db, MinerBoardTelemetry
 
 logger = logging.getLogger(__name__)
 
+# Edge window timestamps older than the raw tier's retention fall back to the receive time
+WINDOW_TS_MAX_AGE = timedelta(hours=24)
 
-def ingest_miner_records(site_id: int, records: list, received_at: datetime, source: str = 'legacy', edge_meta: dict = None) -> dict:
+
+def _window_sample_ts(window, received_at: datetime) -> datetime:
+    """Sample time of an edge pre-aggregated record (its window end), bounded by the receive time"""
+    try:
+        end = datetime.fromisoformat(window['end'])
+    except (KeyError, TypeError, ValueError):
+        return received_at
+    if end.tzinfo is not None or end < received_at - WINDOW_TS_MAX_AGE:
+        return received_at
+    return min(end, received_at)
+
+
+def _window_metric(window, name: str, stat: str, default):
+    metric = ((window or {}).get('metrics') or {}).get(name) or {}
+    value = metric.get(stat)
+    return default if value is None else value
+
+
+def ingest_miner_records(site_id: int, records: list, received_at: datetime, source: str = 'legacy', edge_meta: dict = None, commit: bool = True) -> dict:
     """
     Core ingest logic for miner telemetry records.
 
     Args:
         site_id: The hosting site ID
-        records: List of miner record dicts
+        records: List of miner record dicts, or ColumnarRecords row views from a
+            binary/columnar upload
         received_at: Timestamp when data was received
         source: Source identifier ('legacy', 'v1', etc.)
         edge_meta: Optional dict with device_id, zone_id, sent_at, source_seq_start, source_seq_end
+        commit: Commit the session when done; the async ingest worker passes False
+            to coalesce several payloads into one transaction
 
     Returns:
-        dict with processed_count, online_count, offline_count, inserted, updated, errors
+        dict with processed_count, online_count, offline_count, inserted, updated, errors,
+        duplicate_skipped
     """
     if edge_meta is None:
         edge_meta = {}
 
+    # 重传去重: 已应用的序列区间整批丢弃或裁掉前缀
+    seq_filter = sequence_watermarks.filter_batch(records, edge_meta)
+    duplicate_skipped = 0
+    if seq_filter is not None:
+        records = seq_filter.records
+        duplicate_skipped = seq_filter.skipped
+        for note in seq_filter.notes:
+            logger.warning(f"Ingest [{source}]: site={site_id}, device={edge_meta.get('device_id')}: {note}")
+        if seq_filter.duplicate:
+            if commit:
+                # Release the watermark row lock taken by the DB backstop
+                db.session.commit()
+            logger.info(
+                f"Ingest [{source}]: site={site_id}, device={edge_meta.get('device_id')} "
+                f"seq<={seq_filter.seq_end} already applied (watermark={seq_filter.watermark}), "
+                f"skipped {duplicate_skipped} records"
+            )
+            return {
+                'processed_count': 0,
+                'online_count': 0,
+                'offline_count': 0,
+                'inserted': 0,
+                'updated': 0,
+                'errors': [],
+                'duplicate_skipped': duplicate_skipped,
+            }
+
     scrub_ip = os.environ.get('EDGE_SCRUB_IP', '').lower() == 'true'
 
     now = received_at
@@ -41,7 +96,10 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
     offline_count = 0
     errors = []
 
-    miner_ids = [m.get('miner_id') for m in records if m.get('miner_id')]
+    if isinstance(records, ColumnarRecords):
+        miner_ids = [m for m in records.column('miner_id') if m]
+    else:
+        miner_ids = [m.get('miner_id') for m in records if m.get('miner_id')]
 
     existing_records = MinerTelemetryLive.query.filter(
         MinerTelemetryLive.site_id == site_id,
@@ -54,6 +112,8 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
     history_inserts = []
     raw_24h_inserts = []
     board_telemetry_inserts = []
+    resolve_records = []
+    changed_columns = set()
 
     for miner_data in records:
         try:
@@ -72,6 +132,17 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
 
             existing_record = existing_map.get(miner_id)
 
+            # Edge pre-aggregation (SampleAggregator): the record summarizes a window of samples
+            window = miner_data.get('window')
+            if not isinstance(window, dict):
+                window = None
+            sample_ts = _window_sample_ts(window, now) if window else now
+            if window and window.get('event'):
+                logger.info(
+                    f"Ingest [{source}]: site={site_id}, miner={miner_id} edge event "
+                    f"{window['event']} at {window.get('end')} ({window.get('samples', 0)} samples in window)"
+                )
+            
             record_data = {
                 'site_id': site_id,
                 'miner_id': miner_id,
@@ -108,6 +179,11 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
             }
 
             if existing_record:
+                changed = {
+                    key for key, value in record_data.items()
+                    if key != 'updated_at' and getattr(existing_record, key) != value
+                }
+                changed_columns.update(changed)
                 record_data['id'] = existing_record.id
                 updates.append(record_data)
             else:
@@ -121,7 +197,7 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
             reject_rate = (rejected / (accepted + rejected) * 100) if (accepted + rejected) > 0 else 0
 
             raw_24h_inserts.append({
-                'ts': now,
+                'ts': sample_ts,
                 'site_id': site_id,
                 'miner_id': miner_id,
                 'status': 'online' if is_online else 'offline',
@@ -137,11 +213,14 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
                 history_inserts.append({
                     'miner_id': miner_id,
                     'site_id': site_id,
-                    'timestamp': now,
+                    'timestamp': sample_ts,
                     'hashrate_ghs': miner_data.get('hashrate_ghs', 0),
                     'temperature_avg': miner_data.get('temperature_avg', 0),
-                    'temperature_min': miner_data.get('temperature_min', miner_data.get('temperature_avg', 0)),
-                    'temperature_max': miner_data.get('temperature_max', 0),
+                    'temperature_min': _window_metric(
+                        window, 'temperature_avg', 'min',
+                        miner_data.get('temperature_min', miner_data.get('temperature_avg', 0))
+                    ),
+                    'temperature_max': _window_metric(window, 'temperature_max', 'max', miner_data.get('temperature_max', 0)),
                     'fan_speed_avg': fan_speed_avg,
                     'power_consumption': miner_data.get('power_consumption', 0),
                     'accepted_shares': miner_data.get('accepted_shares', 0),
@@ -154,57 +233,77 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
                     'revenue_usd': 0.0,
                 })
 
-            try:
-                hosting_miner = find_or_create_hosting_miner(site_id, miner_data)
-                sync_hosting_miner_telemetry(hosting_miner, miner_data, now)
-
-                boards = miner_data.get('boards', miner_data.get('boards_data', []))
-                if boards and is_online:
-                    for board in boards:
-                        if isinstance(board, dict):
-                            board_telemetry_inserts.append({
-                                'miner_id': hosting_miner.id,
-                                'site_id': site_id,
-                                'board_index': board.get('board_index', board.get('index', 0)),
-                                'hashrate_ths': board.get('hashrate_ths', 0),
-                                'temperature_c': board.get('temperature_c', 0),
-                                'chips_total': board.get('chips_total', 0),
-                                'chips_ok': board.get('chips_ok', 0),
-                                'chips_failed': board.get('chips_failed', 0),
-                                'chip_status': (board.get('chip_status', '') or '')[:200] or None,
-                                'frequency_mhz': board.get('frequency_mhz', 0),
-                                'voltage_mv': board.get('voltage_mv', 0),
-                                'health': board.get('health', 'offline'),
-                                'recorded_at': now,
-                            })
-            except Exception as sync_err:
-                logger.warning(f"Failed to sync hosting miner {miner_id}: {sync_err}")
+            resolve_records.append(miner_data)
 
         except Exception as e:
             logger.error(f"Error processing miner {miner_data.get('miner_id')}: {e}")
             errors.append(f"miner {miner_data.get('miner_id')}: {e}")
             continue
 
+    # Resolve every HostingMiner for the batch in a fixed number of statements
+    try:
+        hosting_miners = resolve_hosting_miners(site_id, resolve_records)
+    except Exception as resolve_err:
+        logger.warning(f"Failed to resolve hosting miners for site {site_id}: {resolve_err}")
+        hosting_miners = [None] * len(resolve_records)
+
+    for miner_data, hosting_miner in zip(resolve_records, hosting_miners):
+        if hosting_miner is None:
+            continue
+        try:
+            sync_hosting_miner_telemetry(hosting_miner, miner_data, now)
+
+            boards = miner_data.get('boards', miner_data.get('boards_data', []))
+            if boards and miner_data.get('online', False):
+                for board in boards:
+                    if isinstance(board, dict):
+                        board_telemetry_inserts.append({
+                            'miner_id': hosting_miner.id,
+                            'site_id': site_id,
+                            'board_index': board.get('board_index', board.get('index', 0)),
+                            'hashrate_ths': board.get('hashrate_ths', 0),
+                            'temperature_c': board.get('temperature_c', 0),
+                            'chips_total': board.get('chips_total', 0),
+                            'chips_ok': board.get('chips_ok', 0),
+                            'chips_failed': board.get('chips_failed', 0),
+                            'chip_status': (board.get('chip_status', '') or '')[:200] or None,
+                            'frequency_mhz': board.get('frequency_mhz', 0),
+                            'voltage_mv': board.get('voltage_mv', 0),
+                            'health': board.get('health', 'offline'),
+                            'recorded_at': now,
+                        })
+        except Exception as sync_err:
+            logger.warning(f"Failed to sync hosting miner {miner_data.get('miner_id')}: {sync_err}")
+
     if updates:
-        db.session.bulk_update_mappings(MinerTelemetryLive, updates)
+        # Only write columns that changed for at least one miner; a shared column
+        # set keeps this a single executemany instead of one statement per key set
+        update_keys = ['id', 'updated_at'] + sorted(changed_columns)
+        db.session.bulk_update_mappings(
+            MinerTelemetryLive, [{key: row[key] for key in update_keys} for row in updates]
+        )
     if inserts:
         db.session.bulk_insert_mappings(MinerTelemetryLive, inserts)
     if history_inserts:
-        db.session.bulk_insert_mappings(MinerTelemetryHistory, history_inserts)
+        copy_insert_mappings(MinerTelemetryHistory, history_inserts)
 
     if raw_24h_inserts:
         try:
-            db.session.bulk_insert_mappings(TelemetryRaw24h, raw_24h_inserts)
+            copy_insert_mappings(TelemetryRaw24h, raw_24h_inserts)
         except Exception as raw_err:
             logger.warning(f"Raw telemetry insert failed (non-critical): {raw_err}")
 
     if board_telemetry_inserts:
         try:
-            db.session.bulk_insert_mappings(MinerBoardTelemetry, board_telemetry_inserts)
+            copy_insert_mappings(MinerBoardTelemetry, board_telemetry_inserts)
         except Exception as board_err:
             logger.warning(f"Board telemetry insert failed (non-critical): {board_err}")
 
-    db.session.commit()
+    sequence_watermarks.advance(seq_filter)
+    live_snapshots.stage(site_id, updates + inserts)
+
+    if commit:
+        db.session.commit()
 
     processed_count = online_count + offline_count
 
@@ -217,4 +316,49 @@ def ingest_miner_records(site_id: int, records: list, received_at: datetime, sou
         'inserted': len(inserts),
         'updated': len(updates),
         'errors': errors,
+        'duplicate_skipped': duplicate_skipped,
     }
+
+
+def ingest_record_stream(site_id: int, chunks, received_at: datetime, source: str = 'legacy', edge_meta: dict = None) -> dict:
+    """
+    Ingest record chunks from a streamed upload in a single transaction.
+
+    Each chunk is written as soon as it is parsed, so only one chunk of
+    records is held in memory at a time; the transaction commits once the
+    whole body has been read and rolls back on any error.
+
+    Args:
+        chunks: Iterable of record lists (e.g. JSONArrayStreamReader.iter_chunks())
+
+    Returns:
+        Same keys as ingest_miner_records, plus received (total records) and chunks
+    """
+    totals = {
+        'processed_count': 0,
+        'online_count': 0,
+        'offline_count': 0,
+        'inserted': 0,
+        'updated': 0,
+        'errors': [],
+        'duplicate_skipped': 0,
+        'received': 0,
+        'chunks': 0,
+    }
+
+    try:
+        for chunk in chunks:
+            result = ingest_miner_records(site_id, chunk, received_at, source, edge_meta, commit=False)
+            for key in ('processed_count', 'online_count', 'offline_count', 'inserted', 'updated', 'duplicate_skipped'):
+                totals[key] += result[key]
+            totals['errors'].extend(result['errors'])
+            totals['received'] += len(chunk)
+            totals['chunks'] += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Streamed ingest [{source}]: site={site_id}, records={totals['received']}, chunks={totals['chunks']}")
+
+    return totals
@@ -244,17 +244,55 @@ class FeatureStoreJob:
             return {'error': str(e)}
 
     def _run_pipeline(self):
+        """Stream the live layer chunk by chunk and evaluate one site at a time.
+
+        Chunks arrive ordered by (site_id, miner_id). Features and baselines
+        are computed per chunk; mode inference, fleet baselines and rules work
+        on peer groups that never cross a site, so each site is evaluated as
+        soon as its last miner has been read. Only the compact features of
+        the current site are kept, never the whole fleet's live records.
+        """
         start_time = datetime.utcnow()
         logger.info("FeatureStoreJob started")
 
-        live_records = self._fetch_live_data()
-        if not live_records:
+        result = {}
+        miners = 0
+        chunks = 0
+        sites = 0
+        site_features = []
+        site_baselines = {}
+
+        for chunk in self._iter_live_chunks():
+            chunks += 1
+            miners += len(chunk)
+            features, baselines = self._process_chunk(chunk)
+            for f in features:
+                if site_features and f['site_id'] != site_features[0]['site_id']:
+                    self._merge_summary(result, self._evaluate_site(site_features, site_baselines))
+                    sites += 1
+                    site_features, site_baselines = [], {}
+                site_features.append(f)
+                if f['miner_id'] in baselines:
+                    site_baselines[f['miner_id']] = baselines[f['miner_id']]
+
+        if site_features:
+            self._merge_summary(result, self._evaluate_site(site_features, site_baselines))
+            sites += 1
+
+        if not miners:
             logger.info("FeatureStoreJob: no live records, skipping")
             return {'skipped': True, 'reason': 'no_live_records'}
 
-        logger.info(f"Step 1: Fetched {len(live_records)} live records")
+        elapsed = (datetime.utcnow() - start_time).total_seconds()
+        logger.info(
+            f"FeatureStore batch complete in {elapsed:.1f}s: {miners} miners, "
+            f"{sites} sites, {chunks} chunks: {result}"
+        )
+        return result
 
-        all_features = []
+    def _process_chunk(self, live_records: list) -> tuple:
+        """Steps 1-3 for one chunk: features and baseline updates."""
+        features_list = []
         for record in live_records:
             features = self.baseline_service.extract_features(record)
             features['miner_id'] = record.get('miner_id')
@@ -267,12 +305,18 @@ class FeatureStoreJob:
             if fan_speed_min is not None:
                 features['fan_speed_min'] = fan_speed_min
 
-            all_features.append(features)
-
-        logger.info(f"Step 2: Extracted features for {len(all_features)} miners")
+            features_list.append(features)
 
         baselines_map = self.baseline_service.bulk_update(live_records)
-        logger.info(f"Step 3: Updated baselines for {len(baselines_map)} miners")
+        logger.debug(
+            f"Extracted features for {len(features_list)} miners, "
+            f"updated baselines for {len(baselines_map)}"
+        )
+        return features_list, baselines_map
+
+    def _evaluate_site(self, all_features: list, baselines_map: dict) -> dict:
+        """Steps 4-6 for one site: modes, fleet baselines, rules and events."""
+        site_id = all_features[0]['site_id']
 
         mode_results = self.mode_service.infer_modes(all_features)
         for f in all_features:
@@ -281,7 +325,6 @@ class FeatureStoreJob:
                 f['inferred_mode'] = mode_results[mid]['inferred_mode']
             else:
                 f['inferred_mode'] = 'unknown'
-        logger.info(f"Step 4: Inferred modes for {len(mode_results)} miners")
 
         fleet_metrics = self.fleet_service.compute_all_groups(all_features)
         for f in all_features:
@@ -292,7 +335,6 @@ class FeatureStoreJob:
             else:
                 z = 0.0
             f['fleet_z_hashrate'] = z
-        logger.info(f"Step 5: Computed fleet baselines for {len(fleet_metrics)} groups")
 
         detections = []
         healthy = []
@@ -333,24 +375,25 @@ class FeatureStoreJob:
                     })
 
         logger.info(
-            f"Step 6: Generated {len(detections)} detections, "
+            f"Site {site_id}: {len(all_features)} miners, {len(mode_results)} modes, "
+            f"{len(fleet_metrics)} peer groups, {len(detections)} detections, "
             f"{len(healthy)} healthy signals"
         )
 
-        result = self.event_engine.bulk_process(detections, healthy)
-        elapsed = (datetime.utcnow() - start_time).total_seconds()
-        logger.info(
-            f"FeatureStore batch complete in {elapsed:.1f}s: {result}"
-        )
-        return result
+        return self.event_engine.bulk_process(detections, healthy)
+
+    @staticmethod
+    def _merge_summary(total: dict, summary: dict):
+        for key, value in summary.items():
+            if isinstance(value, (int, float)):
+                total[key] = total.get(key, 0) + value
 
-    def _fetch_live_data(self) -> list:
+    def _iter_live_chunks(self):
         from services.telemetry_service import TelemetryService
         try:
-            return TelemetryService.get_live()
+            yield from TelemetryService.iter_live()
         except Exception as e:
             logger.error(f"Failed to fetch live data: {e}", exc_info=True)
-            return []
 
     def _build_group_key(self, features: dict) -> str:
         site = features.get('site_id', 0)
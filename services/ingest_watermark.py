@@ -0,0 +1,201 @@
+"""
+Edge Ingest Sequence Watermarks
+边缘遥测序列水位线（重传去重）
+
+The edge envelope carries ``source_seq_start``/``source_seq_end``, an inclusive,
+monotonically increasing range covering the records of the batch. After an
+outage the edge OfflineCache replays batches that may already have been
+applied; this module keeps the highest applied sequence per
+(device_id, zone_id) and drops or trims replays without any per-row check.
+
+- Fast path: an in-process cache rejects fully-applied ranges with no SQL.
+- Backstop: ``edge_ingest_watermarks`` is read with SELECT ... FOR UPDATE and
+  advanced inside the ingest transaction, so it is authoritative across
+  gunicorn workers and the cache only moves forward after a commit.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import event
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = 'pending_ingest_watermarks'
+
+
+class EdgeIngestWatermark(db.Model):
+    """边缘设备已应用的最大序列号"""
+    __tablename__ = 'edge_ingest_watermarks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(50), nullable=False)
+    zone_key = db.Column(db.String(50), nullable=False, default='')  # '' when the device has no zone
+    last_seq_end = db.Column(db.BigInteger, nullable=False, default=-1)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('device_id', 'zone_key', name='uq_edge_ingest_watermark'),
+    )
+
+
+@dataclass
+class SequenceFilterResult:
+    """Outcome of checking one batch against the watermark"""
+    key: tuple
+    seq_end: int
+    records: list
+    skipped: int = 0
+    watermark: int = -1
+    duplicate: bool = False
+    notes: list = field(default_factory=list)
+
+
+def _parse_seq(value) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def watermark_key(edge_meta: dict) -> Optional[tuple]:
+    """(device_id, zone_key) or None when the batch cannot be deduplicated"""
+    if not edge_meta or not edge_meta.get('device_id'):
+        return None
+    zone_id = edge_meta.get('zone_id')
+    return (str(edge_meta['device_id']), '' if zone_id is None else str(zone_id))
+
+
+class SequenceWatermarkStore:
+    """In-memory watermark cache with a database backstop"""
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def cached(self, key: tuple) -> int:
+        with self._lock:
+            return self._cache.get(key, -1)
+
+    def remember(self, key: tuple, seq_end: int):
+        with self._lock:
+            if seq_end > self._cache.get(key, -1):
+                self._cache[key] = seq_end
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def is_duplicate(self, edge_meta: dict) -> bool:
+        """Cache-only check: the whole range was already applied (no SQL)"""
+        key = watermark_key(edge_meta)
+        seq_end = _parse_seq((edge_meta or {}).get('source_seq_end'))
+        if key is None or seq_end is None:
+            return False
+        return seq_end <= self.cached(key)
+
+    def _lock_db_watermark(self, key: tuple) -> int:
+        """Read the authoritative watermark, locking the row for this transaction"""
+        device_id, zone_key = key
+        query = EdgeIngestWatermark.query.filter_by(device_id=device_id, zone_key=zone_key)
+        # populate_existing: an earlier batch in the same transaction may have advanced the row
+        row = query.with_for_update().populate_existing().first()
+        if row is None:
+            dialect = db.session.get_bind().dialect.name
+            values = {'device_id': device_id, 'zone_key': zone_key,
+                      'last_seq_end': -1, 'updated_at': datetime.utcnow()}
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            elif dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                insert = None
+            if insert is not None:
+                db.session.execute(
+                    insert(EdgeIngestWatermark).values(**values).on_conflict_do_nothing()
+                )
+            else:
+                db.session.add(EdgeIngestWatermark(**values))
+                db.session.flush()
+            row = query.with_for_update().populate_existing().first()
+        return row.last_seq_end if row else -1
+
+    def filter_batch(self, records: list, edge_meta: dict) -> Optional[SequenceFilterResult]:
+        """
+        Drop or trim records whose sequence numbers were already applied
+
+        Records are matched to sequence numbers by their own ``seq`` field if
+        present, otherwise positionally when the range length equals the
+        record count. Otherwise a partially-overlapping batch is accepted whole.
+
+        Returns:
+            SequenceFilterResult, or None when the batch carries no usable range
+        """
+        key = watermark_key(edge_meta)
+        seq_start = _parse_seq((edge_meta or {}).get('source_seq_start'))
+        seq_end = _parse_seq((edge_meta or {}).get('source_seq_end'))
+        if key is None or seq_end is None:
+            return None
+        if seq_start is None or seq_start > seq_end:
+            seq_start = seq_end - len(records) + 1
+
+        cached = self.cached(key)
+        if seq_end <= cached:
+            return SequenceFilterResult(key=key, seq_end=seq_end, records=[],
+                                        skipped=len(records), watermark=cached, duplicate=True)
+
+        watermark = self._lock_db_watermark(key)
+        if watermark > cached:
+            self.remember(key, watermark)
+
+        result = SequenceFilterResult(key=key, seq_end=seq_end, records=records, watermark=watermark)
+        if seq_end <= watermark:
+            result.records = []
+            result.skipped = len(records)
+            result.duplicate = True
+        elif seq_start <= watermark:
+            if records and all(_parse_seq(r.get('seq')) is not None for r in records):
+                result.records = [r for r in records if _parse_seq(r.get('seq')) > watermark]
+            elif seq_end - seq_start + 1 == len(records):
+                result.records = records[watermark - seq_start + 1:]
+            else:
+                result.notes.append(
+                    f'seq range {seq_start}-{seq_end} overlaps watermark {watermark} '
+                    f'but cannot be mapped to {len(records)} records; accepted whole batch'
+                )
+            result.skipped = len(records) - len(result.records)
+        return result
+
+    def advance(self, result: SequenceFilterResult):
+        """Move the DB watermark forward in the current transaction"""
+        if result is None or result.seq_end <= result.watermark:
+            return
+        device_id, zone_key = result.key
+        EdgeIngestWatermark.query.filter(
+            EdgeIngestWatermark.device_id == device_id,
+            EdgeIngestWatermark.zone_key == zone_key,
+            EdgeIngestWatermark.last_seq_end < result.seq_end
+        ).update({'last_seq_end': result.seq_end, 'updated_at': datetime.utcnow()},
+                 synchronize_session=False)
+        db.session.info.setdefault(_PENDING_KEY, []).append((result.key, result.seq_end))
+
+
+sequence_watermarks = SequenceWatermarkStore()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_watermarks(session):
+    for key, seq_end in session.info.pop(_PENDING_KEY, []):
+        sequence_watermarks.remember(key, seq_end)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending_watermarks(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -4,7 +4,12 @@ IP扫描自动发现矿机服务
 
 Features:
 - IP range parsing (start-end or CIDR format)
-- Concurrent scanning with thread pool
+- Concurrent scanning with the async scan engine (edge_collector.ip_scanner):
+  TCP-connect pre-filter on 4028, adaptive concurrency, whole /16 ranges
+- Discovered miners are visible in the scan results while the scan runs and
+  are handed to an on_discovered hook in small batches (persisted scan jobs)
+- Incremental mode: known miners first, confirmed-empty addresses skipped
+  (services.scan_planner)
 - Miner type identification (Antminer, Whatsminer, BraiinsOS, etc.)
 - Progress tracking for async operations
 - Batch registration support
@@ -16,6 +21,7 @@ Usage:
     results = scanner.scan_range("192.168.1.1", "192.168.1.254")
 """
 
+import asyncio
 import socket
 import logging
 import ipaddress
@@ -26,11 +32,11 @@ import hashlib
 import threading
 from typing import Dict, List, Optional, Any, Tuple, Callable
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, asdict
 from enum import Enum
 
-from services.cgminer_client import CGMinerClient, quick_probe, CGMinerError
+from edge_collector.ip_scanner import MinerScanner, MinerProbeResult
+from services.scan_planner import ScanPlan
 
 logger = logging.getLogger('IPScanner')
 
@@ -80,6 +86,11 @@ class ScanProgress:
     start_time: str
     end_time: Optional[str] = None
     error: Optional[str] = None
+    concurrency: int = 0
+    ips_per_second: float = 0.0
+    mode: str = 'full'
+    known_ips: int = 0
+    skipped_ips: int = 0
     
     @property
     def progress_percent(self) -> float:
@@ -97,6 +108,12 @@ class IPScanner:
     HTTP_PORTS = [80, 443, 8080]
     DEFAULT_TIMEOUT = 3.0
     MAX_WORKERS = 50
+    CONNECT_TIMEOUT = 1.0
+    MAX_CONCURRENCY = 1024
+    MAX_SCAN_IPS = 65536  # a whole /16
+    HTTP_PROBE_SLOTS = 8
+    RECORD_BATCH_SIZE = 50  # on_discovered: miners per batch
+    RECORD_INTERVAL = 2.0  # on_discovered: seconds between batches
     
     # Known miner signatures for identification
     MINER_SIGNATURES = {
@@ -127,9 +144,19 @@ class IPScanner:
         }
     }
     
-    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_workers: int = MAX_WORKERS):
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_workers: int = MAX_WORKERS,
+                 connect_timeout: float = CONNECT_TIMEOUT, max_concurrency: int = MAX_CONCURRENCY):
+        """
+        Args:
+            timeout: CGMiner / HTTP API timeout in seconds
+            max_workers: Starting scan concurrency
+            connect_timeout: Port 4028 pre-filter connect timeout in seconds
+            max_concurrency: Upper bound of the adaptive scan concurrency
+        """
         self.timeout = timeout
         self.max_workers = max_workers
+        self.connect_timeout = connect_timeout
+        self.max_concurrency = max_concurrency
         self._scan_sessions: Dict[str, ScanProgress] = {}
         self._scan_results: Dict[str, List[DiscoveredMiner]] = {}
         self._lock = threading.Lock()
@@ -157,8 +184,8 @@ class IPScanner:
             current = int(start)
             end_int = int(end)
             
-            max_ips = 10000
-            if end_int - current > max_ips:
+            max_ips = IPScanner.MAX_SCAN_IPS
+            if end_int - current >= max_ips:
                 raise ValueError(f"IP range too large. Maximum {max_ips} IPs allowed.")
             
             while current <= end_int:
@@ -184,7 +211,7 @@ class IPScanner:
         try:
             network = ipaddress.IPv4Network(cidr.strip(), strict=False)
             
-            max_ips = 10000
+            max_ips = IPScanner.MAX_SCAN_IPS
             if network.num_addresses > max_ips:
                 raise ValueError(f"Network too large. Maximum {max_ips} IPs allowed.")
             
@@ -199,19 +226,9 @@ class IPScanner:
         random_part = hashlib.md5(f"{site_id}{timestamp}{time.time()}".encode()).hexdigest()[:8]
         return f"scan_{site_id}_{timestamp}_{random_part}"
     
-    def _probe_single_ip(self, ip: str, username: str = "root", password: str = "root") -> Optional[DiscoveredMiner]:
-        """
-        Probe a single IP for miner
-        
-        Args:
-            ip: IP address to probe
-            username: Auth username for HTTP API
-            password: Auth password for HTTP API
-            
-        Returns:
-            DiscoveredMiner if found, None otherwise
-        """
-        miner_info = {
+    def _blank_miner_info(self, ip: str) -> Dict[str, Any]:
+        """DiscoveredMiner fields before anything is known about the host"""
+        return {
             'ip_address': ip,
             'port': self.CGMINER_PORT,
             'miner_type': MinerType.UNKNOWN.value,
@@ -228,73 +245,6 @@ class IPScanner:
             'scan_time': datetime.utcnow().isoformat() + 'Z',
             'error': None
         }
-        
-        try:
-            probe_result = quick_probe(ip, self.CGMINER_PORT, self.timeout)
-            
-            if probe_result['result'] == 'OK':
-                miner_info['online'] = True
-                miner_info['hashrate_ths'] = probe_result.get('hashrate_ghs', 0) / 1000
-                miner_info['temperature'] = probe_result.get('temp_max', 0)
-                miner_info['latency_ms'] = probe_result.get('latency_ms', 0)
-                
-                try:
-                    client = CGMinerClient(ip, self.CGMINER_PORT, self.timeout, max_retries=1)
-                    
-                    version_info = client.get_version()
-                    if 'VERSION' in version_info and version_info['VERSION']:
-                        v = version_info['VERSION'][0]
-                        miner_type = v.get('Type', v.get('Miner', ''))
-                        miner_info['miner_type'] = self._identify_type_from_string(miner_type)
-                        miner_info['model'] = miner_type
-                        miner_info['firmware'] = v.get('CGMiner', v.get('API', 'Unknown'))
-                    
-                    stats = client.get_stats()
-                    if 'STATS' in stats and stats['STATS']:
-                        for stat in stats['STATS']:
-                            if 'miner_id' in stat:
-                                miner_info['mac_address'] = stat.get('miner_id', '')
-                            if not miner_info['model'] or miner_info['model'] == 'Unknown':
-                                type_str = stat.get('Type', stat.get('ID', ''))
-                                if type_str:
-                                    miner_info['model'] = type_str
-                                    miner_info['miner_type'] = self._identify_type_from_string(type_str)
-                    
-                    pools = client.get_pools()
-                    if 'POOLS' in pools and pools['POOLS']:
-                        for pool in pools['POOLS']:
-                            if pool.get('Status') == 'Alive' or pool.get('Stratum Active'):
-                                miner_info['pool_url'] = pool.get('URL', '')
-                                miner_info['worker'] = pool.get('User', '')
-                                break
-                    
-                    summary = client.get_summary()
-                    if 'SUMMARY' in summary and summary['SUMMARY']:
-                        s = summary['SUMMARY'][0]
-                        elapsed = s.get('Elapsed', 0)
-                        miner_info['uptime_hours'] = elapsed / 3600 if elapsed else 0
-                        
-                except CGMinerError as e:
-                    logger.debug(f"CGMiner details fetch failed for {ip}: {e}")
-                
-                if miner_info['miner_type'] == MinerType.UNKNOWN.value:
-                    http_result = self._probe_http_api(ip, username, password)
-                    if http_result:
-                        miner_info.update(http_result)
-                
-                return DiscoveredMiner(**miner_info)
-            
-            else:
-                http_result = self._probe_http_api(ip, username, password)
-                if http_result and http_result.get('online'):
-                    miner_info.update(http_result)
-                    return DiscoveredMiner(**miner_info)
-                
-        except Exception as e:
-            logger.debug(f"Probe failed for {ip}: {e}")
-            miner_info['error'] = str(e)
-        
-        return None
     
     def _probe_http_api(self, ip: str, username: str = "root", password: str = "root") -> Optional[Dict]:
         """Try HTTP API endpoints to identify miner"""
@@ -366,6 +316,153 @@ class IPScanner:
         
         return MinerType.UNKNOWN.value
     
+    def _miner_from_probe(self, result: MinerProbeResult) -> Dict[str, Any]:
+        """DiscoveredMiner fields from a scan engine result (summary+stats+version+pools)"""
+        info = self._blank_miner_info(result.ip_address)
+        raw = result.raw_response or {}
+        
+        info['port'] = result.api_port or self.CGMINER_PORT
+        info['online'] = True
+        info['latency_ms'] = round(result.probe_time_ms, 1)
+        info['hashrate_ths'] = (result.detected_hashrate_ghs or 0) / 1000
+        if result.detected_model:
+            info['model'] = result.detected_model
+            info['miner_type'] = self._identify_type_from_string(result.detected_model)
+        if result.detected_firmware:
+            info['firmware'] = str(result.detected_firmware)
+        if result.mac_address:
+            info['mac_address'] = result.mac_address
+        
+        summary = raw.get('SUMMARY') or []
+        if summary and isinstance(summary[0], dict):
+            elapsed = summary[0].get('Elapsed', 0) or 0
+            info['uptime_hours'] = elapsed / 3600
+        
+        temps = []
+        for stat in raw.get('STATS') or []:
+            if not isinstance(stat, dict):
+                continue
+            if 'miner_id' in stat and not info['mac_address']:
+                info['mac_address'] = stat.get('miner_id', '')
+            for key, value in stat.items():
+                if 'temp' in key.lower() and isinstance(value, (int, float)) and value > 0:
+                    temps.append(value)
+        if temps:
+            info['temperature'] = max(temps)
+        
+        for pool in raw.get('POOLS') or []:
+            if isinstance(pool, dict) and (pool.get('Status') == 'Alive' or pool.get('Stratum Active')):
+                info['pool_url'] = pool.get('URL', '')
+                info['worker'] = pool.get('User', '')
+                break
+        
+        return info
+    
+    def _run_scan(
+        self,
+        progress: ScanProgress,
+        ip_list: List[str],
+        username: str,
+        password: str,
+        callback: Optional[Callable] = None,
+        on_discovered: Optional[Callable] = None
+    ) -> List[DiscoveredMiner]:
+        """
+        Scan with the async engine, publishing miners as they are found
+        
+        Every discovered miner is appended to the session results as soon as it
+        is identified, so get_scan_results() serves a growing list while the
+        scan runs. Miners the CGMiner API cannot identify are looked up through
+        the HTTP signatures on a few worker threads, off the scan loop.
+        
+        on_discovered(scanned_ips, miners) receives the miners found since its
+        last call, every RECORD_BATCH_SIZE miners or RECORD_INTERVAL seconds and
+        once more when the scan ends or fails. A batch whose handler raises is
+        handed over again with the next one.
+        """
+        engine = MinerScanner(
+            max_concurrent=self.max_workers,
+            cgminer_port=self.CGMINER_PORT,
+            timeout=self.timeout,
+            connect_timeout=self.connect_timeout,
+            max_concurrent_limit=self.max_concurrency,
+        )
+        with self._lock:
+            discovered = self._scan_results.setdefault(progress.scan_id, [])
+        unrecorded = {'miners': [], 'at': time.monotonic()}
+        
+        def record(force: bool = False):
+            if not on_discovered:
+                return
+            now = time.monotonic()
+            with self._lock:
+                if not force and len(unrecorded['miners']) < self.RECORD_BATCH_SIZE \
+                        and now - unrecorded['at'] < self.RECORD_INTERVAL:
+                    return
+                batch, unrecorded['miners'], unrecorded['at'] = unrecorded['miners'], [], now
+                scanned = progress.scanned_ips
+            try:
+                on_discovered(scanned, batch)
+            except Exception as e:
+                logger.error(f"Scan {progress.scan_id} record handler failed: {e}")
+                with self._lock:
+                    unrecorded['miners'][:0] = batch
+        
+        def report(scanned: int, total: int):
+            if callback:
+                try:
+                    callback(scanned, total, len(discovered))
+                except Exception:
+                    pass
+        
+        def on_progress(scanned: int, total: int, result):
+            stats = engine.get_stats()
+            with self._lock:
+                progress.scanned_ips = scanned
+                progress.concurrency = stats.get('concurrency', 0)
+                progress.ips_per_second = stats.get('ips_per_second', 0.0)
+            report(scanned, total)
+            record()
+        
+        def publish(miner_info: Dict[str, Any]):
+            miner = DiscoveredMiner(**miner_info)
+            with self._lock:
+                discovered.append(miner)
+                unrecorded['miners'].append(miner)
+                progress.discovered_miners = len(discovered)
+            logger.info(f"Discovered miner at {miner.ip_address}: {miner.model}")
+            record()
+        
+        async def identify_and_publish(miner_info: Dict[str, Any], http_slots: asyncio.Semaphore):
+            try:
+                async with http_slots:
+                    http_result = await asyncio.to_thread(
+                        self._probe_http_api, miner_info['ip_address'], username, password
+                    )
+                if http_result:
+                    miner_info.update(http_result)
+            except Exception as e:
+                logger.debug(f"HTTP identification failed for {miner_info['ip_address']}: {e}")
+            publish(miner_info)
+        
+        async def run():
+            http_slots = asyncio.Semaphore(self.HTTP_PROBE_SLOTS)
+            pending = []
+            async for result in engine.scan_stream(ip_list, on_progress, total=len(ip_list)):
+                miner_info = self._miner_from_probe(result)
+                if miner_info['miner_type'] == MinerType.UNKNOWN.value:
+                    pending.append(asyncio.ensure_future(identify_and_publish(miner_info, http_slots)))
+                else:
+                    publish(miner_info)
+            await asyncio.gather(*pending)
+            report(len(ip_list), len(ip_list))
+        
+        try:
+            asyncio.run(run())
+        finally:
+            record(force=True)
+        return discovered
+    
     def scan_range(
         self,
         start_ip: str,
@@ -406,43 +503,13 @@ class IPScanner:
             self._scan_sessions[scan_id] = progress
             self._scan_results[scan_id] = []
         
-        discovered = []
-        scanned = 0
-        
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_ip = {
-                executor.submit(self._probe_single_ip, ip, username, password): ip
-                for ip in ip_list
-            }
-            
-            for future in as_completed(future_to_ip):
-                scanned += 1
-                ip = future_to_ip[future]
-                
-                try:
-                    result = future.result()
-                    if result:
-                        discovered.append(result)
-                        logger.info(f"Discovered miner at {ip}: {result.model}")
-                except Exception as e:
-                    logger.debug(f"Scan failed for {ip}: {e}")
-                
-                with self._lock:
-                    progress.scanned_ips = scanned
-                    progress.discovered_miners = len(discovered)
-                
-                if callback:
-                    try:
-                        callback(scanned, len(ip_list), len(discovered))
-                    except:
-                        pass
+        discovered = self._run_scan(progress, ip_list, username, password, callback)
         
         with self._lock:
             progress.status = 'completed'
             progress.end_time = datetime.utcnow().isoformat() + 'Z'
-            self._scan_results[scan_id] = discovered
         
-        return scan_id, discovered
+        return scan_id, list(discovered)
     
     def scan_range_async(
         self,
@@ -450,7 +517,10 @@ class IPScanner:
         end_ip: str,
         site_id: int,
         username: str = "root",
-        password: str = "root"
+        password: str = "root",
+        plan: Optional[ScanPlan] = None,
+        on_discovered: Optional[Callable] = None,
+        on_complete: Optional[Callable] = None
     ) -> str:
         """
         Start async scan and return scan_id immediately
@@ -461,11 +531,17 @@ class IPScanner:
             site_id: Site ID
             username: Auth username
             password: Auth password
+            plan: Incremental scan plan of the range (probe plan.ip_list only)
+            on_discovered: Called from the scan thread with batches of new miners
+                as on_discovered(scanned_ips, miners) (see _run_scan)
+            on_complete: Called from the scan thread when the scan ends as
+                on_complete(status, scanned_ips, error); scanned_ips is the number
+                of addresses actually probed, short of the total when the scan failed
             
         Returns:
             scan_id for tracking progress
         """
-        ip_list = self.parse_ip_range(start_ip, end_ip)
+        ip_list = plan.ip_list if plan is not None else self.parse_ip_range(start_ip, end_ip)
         scan_id = self.generate_scan_id(site_id)
         
         progress = ScanProgress(
@@ -475,7 +551,10 @@ class IPScanner:
             scanned_ips=0,
             discovered_miners=0,
             status='pending',
-            start_time=datetime.utcnow().isoformat() + 'Z'
+            start_time=datetime.utcnow().isoformat() + 'Z',
+            mode='incremental' if plan is not None else 'full',
+            known_ips=len(plan.known) if plan is not None else 0,
+            skipped_ips=len(plan.skipped) if plan is not None else 0
         )
         
         with self._lock:
@@ -484,35 +563,26 @@ class IPScanner:
         
         def run_scan():
             with self._lock:
-                self._scan_sessions[scan_id].status = 'scanning'
+                progress.status = 'scanning'
             
-            discovered = []
-            scanned = 0
-            
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                future_to_ip = {
-                    executor.submit(self._probe_single_ip, ip, username, password): ip
-                    for ip in ip_list
-                }
-                
-                for future in as_completed(future_to_ip):
-                    scanned += 1
-                    
-                    try:
-                        result = future.result()
-                        if result:
-                            discovered.append(result)
-                    except:
-                        pass
-                    
-                    with self._lock:
-                        self._scan_sessions[scan_id].scanned_ips = scanned
-                        self._scan_sessions[scan_id].discovered_miners = len(discovered)
+            try:
+                self._run_scan(progress, ip_list, username, password, on_discovered=on_discovered)
+                status, error = 'completed', None
+            except Exception as e:
+                logger.error(f"Scan {scan_id} failed: {e}")
+                status, error = 'failed', str(e)
             
             with self._lock:
-                self._scan_sessions[scan_id].status = 'completed'
-                self._scan_sessions[scan_id].end_time = datetime.utcnow().isoformat() + 'Z'
-                self._scan_results[scan_id] = discovered
+                progress.status = status
+                progress.error = error
+                progress.end_time = datetime.utcnow().isoformat() + 'Z'
+                scanned = progress.scanned_ips
+            
+            if on_complete:
+                try:
+                    on_complete(status, scanned, error)
+                except Exception as e:
+                    logger.error(f"Scan {scan_id} completion handler failed: {e}")
         
         thread = threading.Thread(target=run_scan, daemon=True)
         thread.start()
@@ -534,7 +604,12 @@ class IPScanner:
                     'status': progress.status,
                     'start_time': progress.start_time,
                     'end_time': progress.end_time,
-                    'error': progress.error
+                    'error': progress.error,
+                    'concurrency': progress.concurrency,
+                    'ips_per_second': progress.ips_per_second,
+                    'mode': progress.mode,
+                    'known_ips': progress.known_ips,
+                    'skipped_ips': progress.skipped_ips
                 }
         return None
     
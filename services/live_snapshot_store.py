@@ -0,0 +1,364 @@
+"""
+Live Telemetry Snapshot Store
+实时遥测快照存储（监控接口免查库）
+
+Dashboards poll the live miner list of a site every few seconds. Instead of
+re-reading ``miner_telemetry_live`` on each refresh, the latest row of every
+miner is kept in a per-site snapshot that ingest updates in place once its
+transaction commits. The table stays the durable copy; a snapshot is loaded
+from it on first read (or after a restart) and served from memory afterwards.
+
+- Redis (``REDIS_URL`` set): one hash per site ``telemetry:live:<site_id>``
+  (miner_id -> JSON row) plus a version counter incremented on every write,
+  shared by all gunicorn workers. Keys expire after
+  ``LIVE_SNAPSHOT_TTL_SECONDS`` without writes so sites that stop reporting
+  are reloaded from the table. Redis errors fall back to the in-process store.
+- In-process: a dict per site. Ingests committed by other workers are not
+  visible here, so a snapshot is re-read from the table at most every
+  ``LIVE_SNAPSHOT_REFRESH_SECONDS`` (0 disables the refresh for single-process
+  deployments); its version only moves when the content changed.
+
+Every snapshot carries a version; read endpoints send it as an ETag and answer
+``If-None-Match`` with 304 so unchanged polls cost neither SQL nor a body. The
+version is checked on its own first (``current_etag``), so a 304 does not read
+or decode the miners either.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+LIVE_SNAPSHOT_TTL_SECONDS = int(os.environ.get('LIVE_SNAPSHOT_TTL_SECONDS', '3600'))
+LIVE_SNAPSHOT_REFRESH_SECONDS = float(os.environ.get('LIVE_SNAPSHOT_REFRESH_SECONDS', '15'))
+
+_KEY_PREFIX = 'telemetry:live:'
+_PENDING_KEY = 'pending_live_snapshots'
+
+# miner_telemetry_live columns served by the monitor endpoints
+SNAPSHOT_FIELDS = (
+    'miner_id', 'site_id', 'ip_address', 'online', 'last_seen', 'updated_at',
+    'hashrate_ghs', 'hashrate_5s_ghs', 'hashrate_expected_ghs',
+    'temperature_avg', 'temperature_max', 'temperature_min', 'fan_speeds', 'frequency_avg',
+    'accepted_shares', 'rejected_shares', 'hardware_errors', 'uptime_seconds',
+    'power_consumption', 'efficiency', 'pool_url', 'worker_name', 'pool_latency_ms',
+    'model', 'firmware_version', 'error_message', 'boards_healthy', 'boards_total', 'overall_health',
+)
+_DATETIME_FIELDS = ('last_seen', 'updated_at')
+
+# Attribute-compatible with MinerTelemetryLive rows for the fields above
+LiveMinerSnapshot = namedtuple('LiveMinerSnapshot', SNAPSHOT_FIELDS)
+
+
+def snapshot_from_row(row) -> LiveMinerSnapshot:
+    """Build a snapshot from a MinerTelemetryLive row or an ingest record dict"""
+    if isinstance(row, dict):
+        return LiveMinerSnapshot(*(row.get(name) for name in SNAPSHOT_FIELDS))
+    return LiveMinerSnapshot(*(getattr(row, name) for name in SNAPSHOT_FIELDS))
+
+
+def _encode(miner: LiveMinerSnapshot) -> str:
+    data = miner._asdict()
+    for name in _DATETIME_FIELDS:
+        if data[name] is not None:
+            data[name] = data[name].isoformat()
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _decode(raw: str) -> LiveMinerSnapshot:
+    data = json.loads(raw)
+    for name in _DATETIME_FIELDS:
+        if data.get(name):
+            data[name] = datetime.fromisoformat(data[name])
+    return LiveMinerSnapshot(*(data.get(name) for name in SNAPSHOT_FIELDS))
+
+
+def _etag(origin: str, site_id: int, version: int) -> str:
+    return f"live-{origin}-{site_id}-{version}"
+
+
+@dataclass
+class SiteSnapshot:
+    """All live miners of one site at one version"""
+    site_id: int
+    version: int
+    miners: Dict[str, LiveMinerSnapshot]
+    origin: str  # 'redis' or the process token of the in-process store
+
+    @property
+    def etag(self) -> str:
+        return _etag(self.origin, self.site_id, self.version)
+
+    def by_updated_desc(self) -> list:
+        return sorted(self.miners.values(), key=lambda m: m.updated_at or datetime.min, reverse=True)
+
+    def by_miner_id(self) -> list:
+        return [self.miners[key] for key in sorted(self.miners)]
+
+
+def _load_site_rows(site_id: int) -> Dict[str, LiveMinerSnapshot]:
+    from api.collector_api import MinerTelemetryLive
+    rows = MinerTelemetryLive.query.filter_by(site_id=site_id).all()
+    return {row.miner_id: snapshot_from_row(row) for row in rows}
+
+
+class _LocalSnapshots:
+    """Per-process snapshots, refreshed from the table on an interval"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites = {}  # site_id -> [version, miners, loaded_at]
+        # Versions are per process: the token keeps ETags from two workers apart
+        self.token = uuid.uuid4().hex[:8]
+
+    @staticmethod
+    def _stale(entry) -> bool:
+        return entry is None or (
+            LIVE_SNAPSHOT_REFRESH_SECONDS > 0 and time.monotonic() - entry[2] >= LIVE_SNAPSHOT_REFRESH_SECONDS
+        )
+
+    def etag(self, site_id: int) -> Optional[str]:
+        """ETag of a loaded, fresh snapshot; None when get() would read the table"""
+        with self._lock:
+            entry = self._sites.get(site_id)
+            if self._stale(entry):
+                return None
+            return _etag(self.token, site_id, entry[0])
+
+    def get(self, site_id: int) -> SiteSnapshot:
+        with self._lock:
+            stale = self._stale(self._sites.get(site_id))
+        if stale:
+            miners = _load_site_rows(site_id)
+            with self._lock:
+                entry = self._sites.get(site_id)
+                if entry is None:
+                    entry = self._sites[site_id] = [1, miners, time.monotonic()]
+                else:
+                    if entry[1] != miners:
+                        entry[0] += 1
+                        entry[1] = miners
+                    entry[2] = time.monotonic()
+        with self._lock:
+            version, miners, _ = self._sites[site_id]
+            return SiteSnapshot(site_id, version, dict(miners), self.token)
+
+    def apply(self, site_id: int, miners: Iterable[LiveMinerSnapshot]):
+        with self._lock:
+            entry = self._sites.get(site_id)
+            if entry is None:
+                return  # not loaded yet: the first read loads the committed rows
+            updated = dict(entry[1])
+            updated.update((m.miner_id, m) for m in miners)
+            entry[0] += 1
+            entry[1] = updated
+
+    def clear(self):
+        with self._lock:
+            self._sites.clear()
+
+
+class LiveSnapshotStore:
+    """Per-site live miner snapshots (Redis when configured, else in-process)"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._local = _LocalSnapshots()
+            cls._instance._redis = None
+            cls._instance._redis_checked = False
+        return cls._instance
+
+    def _client(self):
+        if not self._redis_checked:
+            self._redis_checked = True
+            redis_url = os.environ.get('REDIS_URL')
+            if REDIS_AVAILABLE and redis_url:
+                try:
+                    client = redis.from_url(redis_url, decode_responses=True)
+                    client.ping()
+                    self._redis = client
+                    logger.info("Live telemetry snapshots stored in Redis")
+                except Exception as e:
+                    logger.warning(f"Redis unavailable for live snapshots, using in-process store: {e}")
+        return self._redis
+
+    @property
+    def backend(self) -> str:
+        return 'redis' if self._client() is not None else 'memory'
+
+    # ------------------------------------------------------------------
+    # Redis backend
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _keys(site_id: int) -> tuple:
+        return f"{_KEY_PREFIX}{site_id}", f"{_KEY_PREFIX}{site_id}:version"
+
+    def _redis_etag(self, client, site_id: int) -> Optional[str]:
+        hash_key, version_key = self._keys(site_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.get(version_key)
+        pipe.exists(hash_key)
+        version, loaded = pipe.execute()
+        if version is None or not loaded:
+            return None
+        return _etag('redis', site_id, int(version))
+
+    def _redis_get(self, client, site_id: int) -> SiteSnapshot:
+        hash_key, version_key = self._keys(site_id)
+        pipe = client.pipeline(transaction=True)
+        pipe.get(version_key)
+        pipe.hgetall(hash_key)
+        version, raw = pipe.execute()
+        if not raw:
+            miners = _load_site_rows(site_id)
+            pipe = client.pipeline(transaction=True)
+            if miners:
+                pipe.hset(hash_key, mapping={key: _encode(m) for key, m in miners.items()})
+                pipe.expire(hash_key, LIVE_SNAPSHOT_TTL_SECONDS)
+            pipe.incr(version_key)
+            pipe.expire(version_key, LIVE_SNAPSHOT_TTL_SECONDS)
+            version = pipe.execute()[-2]
+            return SiteSnapshot(site_id, int(version), miners, 'redis')
+        return SiteSnapshot(site_id, int(version or 0), {key: _decode(value) for key, value in raw.items()}, 'redis')
+
+    def _redis_apply(self, client, site_id: int, miners: list):
+        hash_key, version_key = self._keys(site_id)
+        pipe = client.pipeline(transaction=True)
+        if not client.exists(hash_key):
+            # Never start a partial hash; the next read loads the whole site
+            pipe.incr(version_key)
+        else:
+            pipe.hset(hash_key, mapping={m.miner_id: _encode(m) for m in miners})
+            pipe.expire(hash_key, LIVE_SNAPSHOT_TTL_SECONDS)
+            pipe.incr(version_key)
+        pipe.expire(version_key, LIVE_SNAPSHOT_TTL_SECONDS)
+        pipe.execute()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def get_site(self, site_id: int) -> SiteSnapshot:
+        """Snapshot of a site, loaded from miner_telemetry_live on a miss"""
+        client = self._client()
+        if client is not None:
+            try:
+                return self._redis_get(client, site_id)
+            except Exception as e:
+                logger.warning(f"Redis live snapshot read failed for site {site_id}: {e}")
+        return self._local.get(site_id)
+
+    def current_etag(self, site_id: int) -> Optional[str]:
+        """ETag of the current site snapshot without reading its miners; None when not loaded"""
+        client = self._client()
+        if client is not None:
+            try:
+                return self._redis_etag(client, site_id)
+            except Exception as e:
+                logger.warning(f"Redis live snapshot version read failed for site {site_id}: {e}")
+                return None
+        return self._local.etag(site_id)
+
+    def get_sites(self, site_ids: Iterable[int]) -> Dict[int, SiteSnapshot]:
+        return {site_id: self.get_site(site_id) for site_id in site_ids}
+
+    def apply(self, site_id: int, miners: list):
+        """Write committed miner rows into the site snapshot"""
+        if not miners:
+            return
+        client = self._client()
+        if client is not None:
+            try:
+                self._redis_apply(client, site_id, miners)
+            except Exception as e:
+                logger.warning(f"Redis live snapshot update failed for site {site_id}: {e}")
+        self._local.apply(site_id, miners)
+
+    def clear(self):
+        """Forget in-process snapshots (tests)"""
+        self._local.clear()
+
+    def stage(self, site_id: int, records: list):
+        """Queue ingest records for the snapshot; applied when the session commits"""
+        if records:
+            db.session.info.setdefault(_PENDING_KEY, []).append(
+                (site_id, [snapshot_from_row(record) for record in records])
+            )
+
+
+live_snapshots = LiveSnapshotStore()
+
+
+def snapshot_response(site_id: int, build_payload):
+    """
+    JSON response for a site snapshot, tagged with its version
+
+    Returns 304 when If-None-Match already names the current version, checked
+    before the miners are read; otherwise reads the snapshot and returns
+    build_payload(snapshot).
+    """
+    from flask import jsonify, make_response, request
+
+    etag = live_snapshots.current_etag(site_id)
+    snapshot = None
+    if etag is None or not request.if_none_match.contains(etag):
+        snapshot = live_snapshots.get_site(site_id)
+        etag = snapshot.etag
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build_payload(snapshot))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def paginate_snapshot(miners: list, page: int, per_page: int) -> tuple:
+    """(page items, pagination dict) with the same fields as Flask-SQLAlchemy paginate"""
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    total = len(miners)
+    items = miners[(page - 1) * per_page:page * per_page]
+    return items, {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+    }
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_committed_snapshots(session):
+    for site_id, miners in session.info.pop(_PENDING_KEY, []):
+        try:
+            live_snapshots.apply(site_id, miners)
+        except Exception as e:
+            logger.warning(f"Live snapshot update failed for site {site_id}: {e}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_pending_snapshots(session):
+    session.info.pop(_PENDING_KEY, None)
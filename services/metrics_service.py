@@ -57,6 +57,26 @@ telemetry_ingest_lag_seconds = Gauge(
     labelnames=['site_id']
 )
 
+# Telemetry Ingest Queue Depth - payloads accepted with 202 but not yet ingested
+telemetry_ingest_queue_depth = Gauge(
+    'telemetry_ingest_queue_depth',
+    'Number of queued telemetry ingest jobs',
+    labelnames=['status']  # status: queued/processing
+)
+
+# Telemetry Ingest Queue Lag - age of the oldest queued payload
+telemetry_ingest_queue_lag_seconds = Gauge(
+    'telemetry_ingest_queue_lag_seconds',
+    'Age in seconds of the oldest queued telemetry ingest job'
+)
+
+# Telemetry Rollup Lag - seconds since a rollup tier last had no backlog
+telemetry_rollup_lag_seconds = Gauge(
+    'telemetry_rollup_lag_seconds',
+    'Seconds since the telemetry rollup tier last caught up with its source',
+    labelnames=['tier']  # tier: 5min/hourly/daily
+)
+
 # Command Dispatch Duration - time taken to dispatch commands (histogram for percentiles)
 command_dispatch_duration_seconds = Histogram(
     'command_dispatch_duration_seconds',
@@ -168,6 +188,39 @@ def set_telemetry_lag(site_id, lag_seconds):
         logger.error(f"Error setting telemetry_ingest_lag: {e}")
 
 
+def set_ingest_queue_stats(queued, processing, lag_seconds):
+    """
+    Set the telemetry ingest queue depth and lag gauges.
+    
+    Args:
+        queued: Number of jobs waiting for a worker
+        processing: Number of jobs currently claimed by workers
+        lag_seconds: Age of the oldest queued job in seconds (float)
+    """
+    try:
+        telemetry_ingest_queue_depth.labels(status='queued').set(int(queued))
+        telemetry_ingest_queue_depth.labels(status='processing').set(int(processing))
+        telemetry_ingest_queue_lag_seconds.set(float(lag_seconds))
+        logger.debug(f"Set ingest queue stats: queued={queued}, processing={processing}, lag={lag_seconds}s")
+    except Exception as e:
+        logger.error(f"Error setting ingest queue stats: {e}")
+
+
+def set_rollup_lag(tier, lag_seconds):
+    """
+    Set the telemetry rollup lag gauge.
+    
+    Args:
+        tier: Rollup tier name (e.g., '5min', 'daily')
+        lag_seconds: Seconds since the tier last caught up (float)
+    """
+    try:
+        telemetry_rollup_lag_seconds.labels(tier=str(tier)).set(float(lag_seconds))
+        logger.debug(f"Set telemetry_rollup_lag for tier {tier} to {lag_seconds}s")
+    except Exception as e:
+        logger.error(f"Error setting telemetry_rollup_lag: {e}")
+
+
 def observe_dispatch_duration(command_type, duration_seconds):
     """
     Record a command dispatch duration observation.
@@ -0,0 +1,190 @@
+"""
+Incremental Scan Planner
+增量扫描规划（已知主机表）
+
+Routine inventory scans mostly re-discover the same miners and the same empty
+addresses. An incremental scan orders and trims the address list from what is
+already known about the range:
+
+1. Known miners first: ``HostingMiner.ip_address`` of the site plus miners
+   discovered by completed scan jobs within ``SCAN_EVIDENCE_MAX_AGE_DAYS``.
+2. Addresses confirmed empty are skipped: not a known miner and not found by
+   each of the last ``SCAN_EMPTY_CONFIRMATIONS`` completed full scans
+   (scan_type DISCOVERY) covering them.
+3. Everything else is probed after the known miners.
+
+Only full scans count as evidence of an empty address, since an incremental
+scan does not probe the addresses it skips. Evidence older than the age limit
+is ignored, so a range without a recent full scan is probed completely.
+"""
+
+import ipaddress
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCAN_EMPTY_CONFIRMATIONS = int(os.environ.get('SCAN_EMPTY_CONFIRMATIONS', '3'))
+SCAN_EVIDENCE_MAX_AGE_DAYS = int(os.environ.get('SCAN_EVIDENCE_MAX_AGE_DAYS', '30'))
+# Completed jobs read per plan; older jobs only matter past this many scans
+SCAN_EVIDENCE_MAX_JOBS = 50
+
+SCAN_TYPE_FULL = 'DISCOVERY'
+SCAN_TYPE_INCREMENTAL = 'INCREMENTAL'
+SCAN_MODES = {'full': SCAN_TYPE_FULL, 'incremental': SCAN_TYPE_INCREMENTAL}
+
+
+def _ip_int(ip: str) -> Optional[int]:
+    try:
+        return int(ipaddress.ip_address(ip.strip()))
+    except (AttributeError, ValueError):
+        return None
+
+
+@dataclass
+class ScanPlan:
+    """Ordered address list of an incremental scan"""
+    known: List[str] = field(default_factory=list)
+    unknown: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def ip_list(self) -> List[str]:
+        """Addresses to probe: known miners first, then the rest"""
+        return self.known + self.unknown
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'known_ips': len(self.known),
+            'probe_ips': len(self.unknown),
+            'skipped_ips': len(self.skipped),
+        }
+
+
+@dataclass
+class _FullScan:
+    start: int
+    end: int
+    found: Set[int]
+
+
+class KnownHostMap:
+    """
+    What previous scans and the miner inventory say about an address range
+
+    Args:
+        known_ips: Miner addresses (inventory and recent discoveries)
+        full_scans: (start_ip, end_ip, found_ips) of completed full scans, newest first
+        confirmations: Consecutive empty full scans before an address is skipped
+    """
+
+    def __init__(self, known_ips: Iterable[str], full_scans: Iterable[Tuple[str, str, Iterable[str]]],
+                 confirmations: int = SCAN_EMPTY_CONFIRMATIONS):
+        self.confirmations = max(1, confirmations)
+        self.known: Set[int] = {n for n in map(_ip_int, known_ips) if n is not None}
+        self.full_scans: List[_FullScan] = []
+        for start_ip, end_ip, found in full_scans:
+            start, end = _ip_int(start_ip), _ip_int(end_ip)
+            if start is None or end is None:
+                continue
+            self.full_scans.append(_FullScan(start, end, {n for n in map(_ip_int, found) if n is not None}))
+
+    def confirmed_empty(self, ip_int: int) -> bool:
+        """Empty in each of the last ``confirmations`` full scans covering the address"""
+        seen = 0
+        for scan in self.full_scans:
+            if not scan.start <= ip_int <= scan.end:
+                continue
+            if ip_int in scan.found:
+                return False
+            seen += 1
+            if seen >= self.confirmations:
+                return True
+        return False
+
+    def plan(self, ip_list: Iterable[str]) -> ScanPlan:
+        plan = ScanPlan()
+        for ip in ip_list:
+            ip_int = _ip_int(ip)
+            if ip_int in self.known:
+                plan.known.append(ip)
+            elif ip_int is not None and self.confirmed_empty(ip_int):
+                plan.skipped.append(ip)
+            else:
+                plan.unknown.append(ip)
+        return plan
+
+    @classmethod
+    def load(
+        cls,
+        start_ip: str,
+        end_ip: str,
+        site_id: Optional[int] = None,
+        tenant_id: Optional[int] = None,
+        confirmations: int = SCAN_EMPTY_CONFIRMATIONS,
+        max_age_days: int = SCAN_EVIDENCE_MAX_AGE_DAYS,
+        exclude_job_id: Optional[int] = None
+    ) -> 'KnownHostMap':
+        """
+        Build the map from hosting_miners and the completed ip_scan_jobs of a site
+
+        Jobs are scoped to ``site_id`` when given (else to the tenant's jobs
+        without a site) and must overlap [start_ip, end_ip].
+        """
+        from models import HostingMiner
+        from models_device_encryption import IPScanJob, DiscoveredMiner
+
+        start, end = _ip_int(start_ip), _ip_int(end_ip)
+
+        query = IPScanJob.query.filter(
+            IPScanJob.status == 'COMPLETED',
+            IPScanJob.completed_at >= datetime.utcnow() - timedelta(days=max_age_days),
+            IPScanJob.site_id == site_id,
+        )
+        if tenant_id is not None:
+            query = query.filter(IPScanJob.tenant_id == tenant_id)
+        if exclude_job_id is not None:
+            query = query.filter(IPScanJob.id != exclude_job_id)
+        jobs = [
+            job for job in query.order_by(IPScanJob.completed_at.desc()).limit(SCAN_EVIDENCE_MAX_JOBS).all()
+            if _ip_int(job.ip_range_start) is not None and _ip_int(job.ip_range_end) is not None
+            and _ip_int(job.ip_range_start) <= end and _ip_int(job.ip_range_end) >= start
+        ]
+
+        found_by_job: Dict[int, List[str]] = {job.id: [] for job in jobs}
+        if jobs:
+            rows = DiscoveredMiner.query.with_entities(
+                DiscoveredMiner.scan_job_id, DiscoveredMiner.ip_address
+            ).filter(DiscoveredMiner.scan_job_id.in_(list(found_by_job))).all()
+            for job_id, ip_address in rows:
+                found_by_job[job_id].append(ip_address)
+
+        known = [ip for found in found_by_job.values() for ip in found]
+        if site_id is not None:
+            known.extend(
+                ip for (ip,) in HostingMiner.query.with_entities(HostingMiner.ip_address).filter(
+                    HostingMiner.site_id == site_id,
+                    HostingMiner.ip_address.isnot(None),
+                ).all()
+            )
+
+        full_scans = [
+            (job.ip_range_start, job.ip_range_end, found_by_job[job.id])
+            for job in jobs if (job.scan_type or SCAN_TYPE_FULL) == SCAN_TYPE_FULL
+        ]
+        return cls(known, full_scans, confirmations)
+
+
+def plan_incremental_scan(ip_list: List[str], site_id: Optional[int] = None,
+                          tenant_id: Optional[int] = None, exclude_job_id: Optional[int] = None) -> ScanPlan:
+    """Known miners first, confirmed-empty addresses dropped (see module docstring)"""
+    if not ip_list:
+        return ScanPlan()
+    known_hosts = KnownHostMap.load(ip_list[0], ip_list[-1], site_id=site_id, tenant_id=tenant_id,
+                                    exclude_job_id=exclude_job_id)
+    plan = known_hosts.plan(ip_list)
+    logger.info(f"Incremental scan plan (site {site_id}): {plan.to_dict()}")
+    return plan
@@ -0,0 +1,251 @@
+"""
+Telemetry Cold Archive (Parquet)
+遥测冷归档 (Parquet, 本地磁盘或 S3 兼容存储)
+
+Before retention drops 5-minute / hourly history from PostgreSQL, each expired
+day is written to zstd-compressed Parquet, one file per site and day, in a
+Hive-style layout::
+
+    <TELEMETRY_ARCHIVE_URI>/<table>/site_id=<id>/day=<YYYY-MM-DD>/part-0.parquet
+
+``TELEMETRY_ARCHIVE_URI`` is a local directory or an S3 URI understood by
+pyarrow (``s3://bucket/prefix?endpoint_override=minio:9000&scheme=http`` for
+S3-compatible stores; credentials come from the usual AWS environment).
+Archiving is enabled when the URI is set and pyarrow is installed; otherwise
+retention keeps deleting as before.
+
+Archived (table, site, day) files are recorded in ``telemetry_archive_manifest``
+so readers know where PostgreSQL stops and the archive begins without listing
+the store. Reads go through ``pyarrow.dataset`` with the site/day partition
+keys and bucket_ts / miner_id pushed down as filters.
+"""
+
+import logging
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DateTime, text
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.fs as pa_fs
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = pa_dataset = pa_fs = pq = None
+    PARQUET_AVAILABLE = False
+
+ARCHIVE_URI = os.environ.get('TELEMETRY_ARCHIVE_URI', '')
+ARCHIVE_COMPRESSION = os.environ.get('TELEMETRY_ARCHIVE_COMPRESSION', 'zstd')
+# Rows fetched from PostgreSQL and written per Parquet row group
+ARCHIVE_BATCH_ROWS = 100000
+
+# Tables whose rows share the history layout (bucket_ts + aggregate columns)
+ARCHIVE_TABLES = ('telemetry_history_5min', 'telemetry_history_hourly')
+ARCHIVE_COLUMNS = (
+    'miner_id', 'bucket_ts', 'avg_hashrate_ths', 'max_hashrate_ths', 'min_hashrate_ths',
+    'avg_temp_c', 'max_temp_c', 'avg_power_w', 'avg_fan_rpm', 'online_ratio', 'samples',
+)
+
+# Same fields as the get_history SELECT so archived and live rows merge directly
+ArchivedRow = namedtuple('ArchivedRow', [
+    'miner_id', 'ts', 'hashrate_ths', 'max_hashrate_ths', 'min_hashrate_ths',
+    'temp_c', 'max_temp_c', 'power_w', 'online_ratio', 'samples',
+])
+
+
+class TelemetryArchiveManifest(db.Model):
+    """已归档的 (表, 站点, 日) 文件清单"""
+    __tablename__ = 'telemetry_archive_manifest'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    site_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    path = db.Column(db.String(500), nullable=False)
+    rows = db.Column(db.Integer, default=0)
+    size_bytes = db.Column(db.BigInteger, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('table_name', 'site_id', 'day', name='uq_archive_manifest_day'),
+        db.Index('idx_archive_manifest_table_day', 'table_name', 'day'),
+    )
+
+
+def _arrow_schema():
+    return pa.schema([
+        ('miner_id', pa.string()),
+        ('bucket_ts', pa.timestamp('us')),
+        ('avg_hashrate_ths', pa.float64()),
+        ('max_hashrate_ths', pa.float64()),
+        ('min_hashrate_ths', pa.float64()),
+        ('avg_temp_c', pa.float64()),
+        ('max_temp_c', pa.float64()),
+        ('avg_power_w', pa.float64()),
+        ('avg_fan_rpm', pa.float64()),
+        ('online_ratio', pa.float64()),
+        ('samples', pa.int64()),
+    ])
+
+
+class TelemetryArchiver:
+    """Writes expired history days to Parquet and reads them back"""
+
+    def __init__(self, uri: str = ARCHIVE_URI):
+        self.uri = uri
+        self._fs = None
+        self._root = None
+
+    @property
+    def enabled(self) -> bool:
+        return PARQUET_AVAILABLE and bool(self.uri)
+
+    def _filesystem(self):
+        if self._fs is None:
+            if '://' in self.uri:
+                self._fs, self._root = pa_fs.FileSystem.from_uri(self.uri)
+            else:
+                self._fs, self._root = pa_fs.LocalFileSystem(), os.path.abspath(self.uri)
+            self._root = self._root.rstrip('/')
+        return self._fs, self._root
+
+    def file_path(self, table: str, site_id: int, day: date) -> str:
+        _, root = self._filesystem()
+        return f"{root}/{table}/site_id={site_id}/day={day.isoformat()}/part-0.parquet"
+
+    # ------------------------------------------------------------------
+    # Write path
+    # ------------------------------------------------------------------
+
+    def archived_through(self, table: str) -> Optional[date]:
+        """First day not covered by the archive (None when nothing is archived)"""
+        last = db.session.execute(
+            text("SELECT MAX(day) FROM telemetry_archive_manifest WHERE table_name = :table"),
+            {'table': table}
+        ).scalar()
+        if last is None:
+            return None
+        if isinstance(last, str):
+            last = date.fromisoformat(last)
+        return last + timedelta(days=1)
+
+    def archive_day(self, table: str, day: date) -> int:
+        """
+        Write one day of a history table to Parquet (one file per site)
+
+        Returns:
+            Number of rows archived
+        """
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        params = {'start': start, 'end': end}
+        site_ids = [r[0] for r in db.session.execute(text(
+            f"SELECT DISTINCT site_id FROM {table} WHERE bucket_ts >= :start AND bucket_ts < :end"
+        ), params).fetchall()]
+
+        fs, _ = self._filesystem()
+        schema = _arrow_schema()
+        total = 0
+        for site_id in site_ids:
+            path = self.file_path(table, site_id, day)
+            fs.create_dir(path.rsplit('/', 1)[0], recursive=True)
+            result = db.session.execute(text(f"""
+                SELECT {', '.join(ARCHIVE_COLUMNS)} FROM {table}
+                WHERE site_id = :site_id AND bucket_ts >= :start AND bucket_ts < :end
+                ORDER BY miner_id, bucket_ts
+            """).columns(bucket_ts=DateTime()).execution_options(stream_results=True),
+                dict(params, site_id=site_id))
+
+            rows = 0
+            with fs.open_output_stream(path) as sink:
+                with pq.ParquetWriter(sink, schema, compression=ARCHIVE_COMPRESSION) as writer:
+                    while True:
+                        batch = result.fetchmany(ARCHIVE_BATCH_ROWS)
+                        if not batch:
+                            break
+                        columns = list(zip(*batch))
+                        writer.write_table(pa.Table.from_arrays(
+                            [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                            schema=schema
+                        ))
+                        rows += len(batch)
+            size = fs.get_file_info(path).size or 0
+
+            entry = TelemetryArchiveManifest.query.filter_by(table_name=table, site_id=site_id, day=day).first()
+            if entry is None:
+                entry = TelemetryArchiveManifest(table_name=table, site_id=site_id, day=day)
+                db.session.add(entry)
+            entry.path, entry.rows, entry.size_bytes, entry.created_at = path, rows, size, datetime.utcnow()
+            total += rows
+
+        db.session.commit()
+        logger.info(f"Archived {total} rows of {table} for {day} ({len(site_ids)} sites)")
+        return total
+
+    def archive_before(self, table: str, cutoff: datetime) -> bool:
+        """
+        Archive every whole day that ends at or before cutoff and is not archived yet
+
+        Returns:
+            True when retention may drop those days (archive complete or disabled)
+        """
+        if not self.enabled:
+            return True
+        try:
+            oldest = db.session.execute(text(f"SELECT MIN(bucket_ts) FROM {table}")).scalar()
+            if oldest is None:
+                return True
+            if isinstance(oldest, str):
+                oldest = datetime.fromisoformat(oldest)
+            day = max(oldest.date(), self.archived_through(table) or oldest.date())
+            while datetime.combine(day + timedelta(days=1), datetime.min.time()) <= cutoff:
+                self.archive_day(table, day)
+                day += timedelta(days=1)
+            return True
+        except Exception as e:
+            logger.error(f"Archiving {table} failed, keeping expired rows: {e}")
+            db.session.rollback()
+            return False
+
+    # ------------------------------------------------------------------
+    # Read path
+    # ------------------------------------------------------------------
+
+    def read_range(self, table: str, site_id: int, start: datetime, end: datetime,
+                   miner_id: Optional[str] = None) -> list:
+        """Archived rows in [start, end] as ArchivedRow, ordered by miner_id, ts"""
+        if not self.enabled:
+            return []
+        fs, root = self._filesystem()
+        base = f"{root}/{table}"
+        if fs.get_file_info(base).type == pa_fs.FileType.NotFound:
+            return []
+
+        partitioning = pa_dataset.partitioning(
+            pa.schema([('site_id', pa.int32()), ('day', pa.date32())]), flavor='hive'
+        )
+        dataset = pa_dataset.dataset(base, format='parquet', filesystem=fs, partitioning=partitioning)
+        field = pa_dataset.field
+        expr = ((field('site_id') == site_id)
+                & (field('day') >= start.date()) & (field('day') <= end.date())
+                & (field('bucket_ts') >= pa.scalar(start, pa.timestamp('us')))
+                & (field('bucket_ts') <= pa.scalar(end, pa.timestamp('us'))))
+        if miner_id:
+            expr = expr & (field('miner_id') == miner_id)
+
+        data = dataset.to_table(filter=expr, columns=[
+            'miner_id', 'bucket_ts', 'avg_hashrate_ths', 'max_hashrate_ths', 'min_hashrate_ths',
+            'avg_temp_c', 'max_temp_c', 'avg_power_w', 'online_ratio', 'samples',
+        ]).sort_by([('miner_id', 'ascending'), ('bucket_ts', 'ascending')])
+        return [ArchivedRow(*values) for values in zip(*(col.to_pylist() for col in data.columns))]
+
+
+telemetry_archiver = TelemetryArchiver()
@@ -0,0 +1,397 @@
+"""
+Telemetry Payload Codec
+遥测上传负载解码（JSON / MessagePack, gzip / zstd, 列式布局）
+
+Besides the historical gzip'd JSON array of record dicts, ingest endpoints
+accept:
+
+- ``Content-Type: application/x-msgpack`` bodies (any payload shape)
+- ``Content-Encoding: zstd`` next to gzip
+- a columnar block in place of a record list, one array per field::
+
+    {"schema": "telemetry_columnar.v1", "count": 2,
+     "columns": {"miner_id": ["A", "B"], "hashrate_ghs": [110.1, 0.0], ...}}
+
+A columnar block can be the whole body or any top-level value of an envelope
+(e.g. ``records``). It is exposed as ``ColumnarRecords``: a sequence of
+lightweight row views over the column arrays, so decoding a 5,000-miner batch
+does not build 5,000 dicts.
+
+Servers advertise what they accept in the ``X-Telemetry-Accept`` response
+header; clients keep sending JSON until they see it. ``delta`` tells edge
+collectors that telemetry_delta.v1 uploads are understood, so a rejected delta
+upload is an ordinary error rather than a reason to stop sending deltas.
+
+Large gzip/plain JSON array bodies are not buffered: ``JSONArrayStreamReader``
+gunzips ``request.stream`` incrementally and yields fixed-size record chunks,
+so peak memory depends on the chunk size rather than the batch size.
+"""
+
+import codecs
+import gzip
+import io
+import json
+import logging
+import os
+import zlib
+from collections.abc import Mapping, Sequence
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_SCHEMA = 'telemetry_columnar.v1'
+MSGPACK_CONTENT_TYPE = 'application/x-msgpack'
+TELEMETRY_ACCEPT_HEADER = 'X-Telemetry-Accept'
+
+# Streaming ingest of JSON array bodies
+STREAM_ENABLED = os.environ.get('TELEMETRY_STREAM_INGEST', 'true').lower() != 'false'
+STREAM_MIN_BYTES = int(os.environ.get('TELEMETRY_STREAM_MIN_BYTES', str(256 * 1024)))
+STREAM_CHUNK_RECORDS = int(os.environ.get('TELEMETRY_STREAM_CHUNK_RECORDS', '2000'))
+STREAM_READ_BYTES = 64 * 1024
+STREAM_MAX_RECORD_BYTES = 1024 * 1024
+
+
+class UnsupportedTelemetryFormat(ValueError):
+    """Body uses a content type or encoding this server cannot decode (HTTP 415)"""
+
+
+class TelemetryStreamError(ValueError):
+    """Streamed JSON array body is malformed (HTTP 400)"""
+
+
+def accepted_features() -> list:
+    """Features advertised in X-Telemetry-Accept"""
+    features = ['columnar', 'delta', 'gzip']
+    if MSGPACK_AVAILABLE:
+        features.append('msgpack')
+    if ZSTD_AVAILABLE:
+        features.append('zstd')
+    return features
+
+
+def add_accept_header(response):
+    """after_request hook: advertise binary formats on ingest responses"""
+    response.headers[TELEMETRY_ACCEPT_HEADER] = ', '.join(accepted_features())
+    return response
+
+
+class _ColumnarRow(Mapping):
+    """Read-mostly dict view of one row; ``None`` cells read as missing keys"""
+
+    __slots__ = ('_columns', '_index', '_overrides')
+
+    def __init__(self, columns: dict, index: int):
+        self._columns = columns
+        self._index = index
+        self._overrides = None
+
+    def get(self, key, default=None):
+        if self._overrides is not None and key in self._overrides:
+            return self._overrides[key]
+        column = self._columns.get(key)
+        if column is None:
+            return default
+        value = column[self._index]
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if self._overrides is None:
+            self._overrides = {}
+        self._overrides[key] = value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return (key for key in self._keys() if key in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _keys(self):
+        keys = list(self._columns)
+        if self._overrides:
+            keys.extend(k for k in self._overrides if k not in self._columns)
+        return keys
+
+
+_MISSING = object()
+
+
+class ColumnarRecords(Sequence):
+    """Sequence of row views over a telemetry_columnar.v1 block"""
+
+    def __init__(self, columns: dict, count: int):
+        self.columns = columns
+        self.count = count
+
+    @classmethod
+    def from_block(cls, block: dict) -> 'ColumnarRecords':
+        columns = block.get('columns') or {}
+        count = block.get('count')
+        if count is None:
+            count = max((len(values) for values in columns.values()), default=0)
+        for name, values in columns.items():
+            if len(values) != count:
+                raise ValueError(f"column {name!r} has {len(values)} values, expected {count}")
+        return cls(columns, count)
+
+    def column(self, name: str) -> list:
+        """Raw array for one field (empty list when absent)"""
+        return self.columns.get(name) or []
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ColumnarRecords(
+                {name: values[index] for name, values in self.columns.items()},
+                len(range(*index.indices(self.count)))
+            )
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return _ColumnarRow(self.columns, index)
+
+    def to_dicts(self) -> list:
+        """Materialize plain dicts (async queue payloads, debugging)"""
+        return [dict(row) for row in self]
+
+
+def is_columnar_block(value) -> bool:
+    return isinstance(value, dict) and value.get('schema') == COLUMNAR_SCHEMA and 'columns' in value
+
+
+def expand_columnar(data):
+    """Replace columnar blocks (whole body or top-level envelope values) with ColumnarRecords"""
+    if is_columnar_block(data):
+        envelope = {k: v for k, v in data.items() if k not in ('schema', 'columns', 'count')}
+        records = ColumnarRecords.from_block(data)
+        if not envelope:
+            return records
+        envelope['records'] = records
+        return envelope
+    if isinstance(data, dict):
+        for key, value in list(data.items()):
+            if is_columnar_block(value):
+                data[key] = ColumnarRecords.from_block(value)
+    return data
+
+
+def decompress_body(body: bytes, content_encoding: str) -> bytes:
+    encoding = (content_encoding or '').strip().lower()
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise UnsupportedTelemetryFormat('zstd encoding requires the zstandard package')
+        # Streaming reader: frames written without a content size are accepted too
+        return zstandard.ZstdDecompressor().stream_reader(body).read()
+    raise UnsupportedTelemetryFormat(f'Unsupported Content-Encoding: {content_encoding}')
+
+
+class JSONArrayStreamReader:
+    """
+    Incremental gunzip + JSON array parser over a file-like stream
+
+    ``iter_chunks`` yields lists of at most ``chunk_records`` decoded elements
+    while the body is still being received. Bodies that are not a top-level
+    array are read whole with ``read_document``.
+    """
+
+    def __init__(self, stream, content_encoding: str = None, read_bytes: int = STREAM_READ_BYTES):
+        encoding = (content_encoding or '').strip().lower()
+        if encoding not in ('', 'identity', 'gzip'):
+            raise UnsupportedTelemetryFormat(f'Cannot stream Content-Encoding: {content_encoding}')
+        self._stream = stream
+        self._gzip = encoding == 'gzip'
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if self._gzip else None
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._read_bytes = read_bytes
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+
+    def _decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            out.append(self._decompressor.decompress(data))
+            if not self._decompressor.eof:
+                break
+            # Concatenated gzip members, as accepted by gzip.decompress
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b''.join(out)
+
+    def _fill(self) -> bool:
+        """Append the next block of decoded text; False once the stream is exhausted"""
+        if self._eof:
+            return False
+        data = self._stream.read(self._read_bytes)
+        if not data:
+            self._eof = True
+            if self._gzip:
+                tail = self._decompressor.flush()
+                self._buf = self._buf[self._pos:] + self._text.decode(tail, final=True)
+                self._pos = 0
+            return False
+        self.bytes_read += len(data)
+        if self._gzip:
+            data = self._decompress(data)
+        # Drop the consumed prefix so the buffer stays bounded
+        self._buf = self._buf[self._pos:] + self._text.decode(data)
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character ('' at end of stream) without consuming it"""
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in ' \t\r\n':
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def is_array(self) -> bool:
+        return self._peek() == '['
+
+    def iter_chunks(self, chunk_records: int = None):
+        """Yield lists of up to ``chunk_records`` (default STREAM_CHUNK_RECORDS) array elements"""
+        chunk_records = chunk_records or STREAM_CHUNK_RECORDS
+        if self._peek() != '[':
+            raise TelemetryStreamError('Expected a JSON array')
+        self._pos += 1
+        chunk = []
+        expect_value = True
+
+        while True:
+            char = self._peek()
+            if char == '':
+                raise TelemetryStreamError('Unexpected end of JSON array')
+            if char == ']':
+                self._pos += 1
+                break
+            if not expect_value:
+                if char != ',':
+                    raise TelemetryStreamError(f'Expected "," or "]" in JSON array, got {char!r}')
+                self._pos += 1
+                expect_value = True
+                continue
+
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Element is split across reads: pull more data and retry
+                if len(self._buf) - self._pos > STREAM_MAX_RECORD_BYTES:
+                    raise TelemetryStreamError('JSON array element exceeds the streaming record limit')
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buf) and not self._eof and not isinstance(value, (dict, list, str)):
+                # A bare number may continue in the next read
+                if self._fill():
+                    continue
+            self._pos = end
+            expect_value = False
+            chunk.append(value)
+            if len(chunk) >= chunk_records:
+                yield chunk
+                chunk = []
+
+        if self._peek() != '':
+            raise TelemetryStreamError('Unexpected data after JSON array')
+        if chunk:
+            yield chunk
+
+    def read_document(self):
+        """Buffer the rest of the body and decode it as a single JSON document"""
+        while self._fill():
+            pass
+        return json.loads(self._buf[self._pos:])
+
+
+def open_telemetry_stream(req):
+    """
+    Streaming reader for a large gzip/plain JSON ingest body
+
+    Returns:
+        JSONArrayStreamReader, or None when the body should be buffered
+        (msgpack, zstd, small bodies, streaming disabled)
+    """
+    if not STREAM_ENABLED:
+        return None
+    if (req.mimetype or '').lower() == MSGPACK_CONTENT_TYPE:
+        return None
+    encoding = (req.headers.get('Content-Encoding') or '').strip().lower()
+    if encoding not in ('', 'identity', 'gzip'):
+        return None
+    if req.content_length is not None and req.content_length < STREAM_MIN_BYTES:
+        return None
+    cached = getattr(req, '_cached_data', None)
+    if cached is not None:
+        # Something already buffered the body; request.stream is exhausted
+        return JSONArrayStreamReader(io.BytesIO(cached), encoding)
+    return JSONArrayStreamReader(req.stream, encoding)
+
+
+def read_telemetry_body(req, force_json: bool = True, reader: JSONArrayStreamReader = None):
+    """
+    Decode an ingest request body
+
+    Plain JSON requests keep using ``request.get_json``; compressed or
+    msgpack bodies are decoded here. Columnar blocks are expanded.
+
+    Args:
+        reader: Stream reader already opened on this request (its body is
+            finished with ``read_document``)
+
+    Raises:
+        UnsupportedTelemetryFormat: unknown content type / encoding
+        ValueError: malformed body
+    """
+    if reader is not None:
+        return expand_columnar(reader.read_document())
+
+    mimetype = (req.mimetype or '').lower()
+    encoding = (req.headers.get('Content-Encoding') or '').lower()
+
+    if mimetype != MSGPACK_CONTENT_TYPE and not encoding:
+        return expand_columnar(req.get_json(force=force_json))
+
+    raw = decompress_body(req.get_data(), encoding)
+    if mimetype == MSGPACK_CONTENT_TYPE:
+        if not MSGPACK_AVAILABLE:
+            raise UnsupportedTelemetryFormat('application/x-msgpack requires the msgpack package')
+        data = msgpack.unpackb(raw, raw=False)
+    else:
+        data = json.loads(raw.decode('utf-8'))
+    return expand_columnar(data)
@@ -0,0 +1,144 @@
+"""
+Telemetry COPY Writer
+遥测批量写入器（PostgreSQL COPY）
+
+Streams append-only telemetry rows (telemetry_raw_24h, miner_telemetry_history,
+miner_board_telemetry) into PostgreSQL with ``COPY ... FROM STDIN (FORMAT csv)``
+on the session's own connection, so the rows commit or roll back together with
+the rest of the ingest transaction.
+
+Non-PostgreSQL backends (SQLite in tests/dev) and environments where the
+DBAPI connection has no ``copy_expert`` fall back to ``bulk_insert_mappings``.
+"""
+
+import io
+import json
+import logging
+import os
+from datetime import date, datetime
+
+from sqlalchemy import Integer
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+COPY_NULL = r'\N'
+
+# Set TELEMETRY_COPY_ENABLED=false to force the ORM path (e.g. for pgbouncer setups without COPY)
+COPY_ENABLED = os.environ.get('TELEMETRY_COPY_ENABLED', 'true').lower() != 'false'
+
+
+def _copy_columns(model) -> list:
+    """Columns written by COPY: everything except autoincrement primary keys"""
+    columns = []
+    for column in model.__table__.columns:
+        if column.primary_key and column.autoincrement in (True, 'auto'):
+            continue
+        columns.append(column)
+    return columns
+
+
+def _column_default(column):
+    default = column.default
+    if default is None:
+        return None
+    if default.is_scalar:
+        return default.arg
+    if default.is_callable:
+        return default.arg(None)
+    return None
+
+
+def _encode_value(value) -> str:
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    text_value = str(value)
+    # Always quote text so that empty strings and a literal \N stay distinct from NULL
+    return '"' + text_value.replace('"', '""') + '"'
+
+
+def encode_copy_csv(model, rows: list) -> tuple:
+    """
+    Encode row mappings as COPY CSV
+
+    Args:
+        model: SQLAlchemy model class
+        rows: List of dicts keyed by column name (missing keys use column defaults)
+
+    Returns:
+        (column_names, StringIO buffer positioned at 0)
+    """
+    columns = _copy_columns(model)
+    defaults = {c.key: _column_default(c) for c in columns}
+    keys = [c.key for c in columns]
+    # PostgreSQL rejects '5500.0' for integer columns in COPY, unlike bound parameters
+    integer_keys = {c.key for c in columns if isinstance(c.type, Integer)}
+
+    buf = io.StringIO()
+    write = buf.write
+    for row in rows:
+        values = []
+        for key in keys:
+            value = row[key] if key in row else defaults[key]
+            if key in integer_keys and isinstance(value, float):
+                value = int(round(value))
+            values.append(_encode_value(value))
+        write(','.join(values))
+        write('\n')
+    buf.seek(0)
+
+    return [c.name for c in columns], buf
+
+
+def _dbapi_connection():
+    """Raw DBAPI connection bound to the current session transaction"""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+    raw = connection.connection.dbapi_connection
+    if not hasattr(raw, 'cursor'):
+        return None
+    return raw
+
+
+def copy_insert_mappings(model, rows: list) -> int:
+    """
+    Insert rows with COPY FROM STDIN, falling back to bulk_insert_mappings
+
+    Args:
+        model: SQLAlchemy model class (TelemetryRaw24h, MinerTelemetryHistory, ...)
+        rows: List of dicts keyed by column name
+
+    Returns:
+        Number of rows written
+    """
+    if not rows:
+        return 0
+
+    raw = _dbapi_connection() if COPY_ENABLED else None
+    if raw is not None:
+        cursor = raw.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            column_names, buf = encode_copy_csv(model, rows)
+            sql = (
+                f"COPY {model.__tablename__} ({', '.join(column_names)}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+            )
+            try:
+                cursor.copy_expert(sql, buf)
+            finally:
+                cursor.close()
+            return len(rows)
+        cursor.close()
+
+    db.session.bulk_insert_mappings(model, rows)
+    return len(rows)
@@ -0,0 +1,126 @@
+"""
+Telemetry Delta Protocol
+遥测增量上传协议（关键帧 + 增量）
+
+The edge sends a keyframe (full MinerData) per miner periodically and only the
+changed fields in between::
+
+    {
+      "schema": "telemetry_delta.v1",
+      "miners": [
+        {"miner_id": "S19_0001", "kind": "key", "version": 12, "data": {...}},
+        {"miner_id": "S19_0002", "kind": "delta", "base_version": 7, "version": 8,
+         "changed": {"hashrate_ghs": 110234.5, "timestamp": "..."}, "removed": []}
+      ]
+    }
+
+The server keeps the last reconstructed snapshot and version per
+(site_id, miner_id) in process memory. A delta whose ``base_version`` does not
+match (server restart, another web worker, evicted snapshot) is not applied;
+its miner_id is returned in ``resync`` and the edge re-sends a keyframe.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DELTA_SCHEMA = 'telemetry_delta.v1'
+
+# Upper bound on cached snapshots (LRU); roughly 2 KB each
+DELTA_MAX_SNAPSHOTS = int(os.environ.get('TELEMETRY_DELTA_MAX_SNAPSHOTS', '200000'))
+
+
+def is_delta_payload(data) -> bool:
+    return isinstance(data, dict) and data.get('schema') == DELTA_SCHEMA
+
+
+class DeltaSnapshotStore:
+    """Last applied snapshot per (site_id, miner_id), LRU bounded"""
+
+    def __init__(self, max_snapshots: int = DELTA_MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._snapshots.get(key)
+            if entry is not None:
+                self._snapshots.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, version: int, record: dict):
+        with self._lock:
+            self._snapshots[key] = (version, record)
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+
+    def __len__(self):
+        return len(self._snapshots)
+
+
+delta_snapshots = DeltaSnapshotStore()
+
+
+def decode_delta_payload(site_id: int, payload: dict) -> tuple:
+    """
+    Reconstruct full miner records from a telemetry_delta.v1 payload
+
+    Args:
+        site_id: Hosting site ID (snapshots are scoped per site)
+        payload: Decoded delta envelope
+
+    Returns:
+        (records, resync_miner_ids, stats) where records are full MinerData dicts
+        ready for ingest_miner_records
+    """
+    records = []
+    resync = []
+    stats = {'keyframes': 0, 'deltas': 0, 'changed_fields': 0}
+
+    for entry in payload.get('miners') or []:
+        miner_id = entry.get('miner_id')
+        if not miner_id:
+            continue
+        key = (site_id, miner_id)
+        version = entry.get('version')
+        kind = entry.get('kind')
+
+        if kind == 'key':
+            record = dict(entry.get('data') or {})
+            record['miner_id'] = miner_id
+            stats['keyframes'] += 1
+        elif kind == 'delta':
+            base = delta_snapshots.get(key)
+            if base is None or base[0] != entry.get('base_version'):
+                resync.append(miner_id)
+                continue
+            record = dict(base[1])
+            changed = entry.get('changed') or {}
+            record.update(changed)
+            for field_name in entry.get('removed') or []:
+                record.pop(field_name, None)
+            stats['deltas'] += 1
+            stats['changed_fields'] += len(changed)
+        else:
+            logger.warning(f"Unknown delta entry kind {kind!r} for miner {miner_id}")
+            resync.append(miner_id)
+            continue
+
+        if version is not None:
+            delta_snapshots.put(key, version, record)
+        # ingest_miner_records mutates records (scrub_ip), keep the snapshot intact
+        records.append(dict(record))
+
+    if resync:
+        logger.info(f"Delta upload site={site_id}: {len(resync)} miners need a keyframe (version mismatch)")
+
+    return records, resync, stats
@@ -0,0 +1,436 @@
+"""
+Telemetry Ingest Queue
+遥测异步接收队列
+
+Async ingest mode for /api/collector/upload and /api/edge/v1/telemetry/batch:
+the endpoint validates the payload, stores it in the durable
+``telemetry_ingest_queue`` table and answers 202 with a receipt id. A pool of
+ingest worker threads drains the queue with SELECT ... FOR UPDATE SKIP LOCKED
+and coalesces payloads from several sites into one transaction.
+
+Enabled with TELEMETRY_INGEST_MODE=async. Clients opt in per request with
+``Prefer: respond-async`` so collectors that only understand 200 keep the
+synchronous path.
+"""
+
+import gzip
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODE = os.environ.get('TELEMETRY_INGEST_MODE', 'sync').lower()
+INGEST_WORKERS = int(os.environ.get('TELEMETRY_INGEST_WORKERS', '2'))
+# Coalescing limits per worker transaction
+INGEST_BATCH_JOBS = int(os.environ.get('TELEMETRY_INGEST_BATCH_JOBS', '20'))
+INGEST_BATCH_RECORDS = int(os.environ.get('TELEMETRY_INGEST_BATCH_RECORDS', '20000'))
+INGEST_POLL_INTERVAL = float(os.environ.get('TELEMETRY_INGEST_POLL_INTERVAL', '0.5'))
+INGEST_MAX_ATTEMPTS = 3
+# Jobs stuck in 'processing' longer than this are handed back to the queue
+INGEST_LEASE_SECONDS = 300
+# Completed/failed receipts stay queryable for this long
+RECEIPT_RETENTION_HOURS = 24
+
+
+class TelemetryIngestJob(db.Model):
+    """遥测异步接收任务（持久化队列）"""
+    __tablename__ = 'telemetry_ingest_queue'
+
+    id = db.Column(db.String(36), primary_key=True)  # receipt id
+    site_id = db.Column(db.Integer, nullable=False)
+    source = db.Column(db.String(20), default='legacy')
+    collector_key_id = db.Column(db.Integer, nullable=True)
+
+    status = db.Column(db.String(20), default='queued', nullable=False)  # queued/processing/completed/failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker_id = db.Column(db.String(100), nullable=True)
+
+    payload = db.Column(db.LargeBinary, nullable=False)  # gzip JSON array of records
+    record_count = db.Column(db.Integer, default=0)
+    data_size_bytes = db.Column(db.Integer, default=0)
+    edge_meta = db.Column(db.JSON)
+
+    received_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    result = db.Column(db.JSON)
+    error_message = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_ingest_queue_status_received', 'status', 'received_at'),
+        db.Index('ix_ingest_queue_site', 'site_id'),
+    )
+
+    def to_receipt(self):
+        return {
+            'receipt_id': self.id,
+            'site_id': self.site_id,
+            'status': self.status,
+            'record_count': self.record_count,
+            'attempts': self.attempts,
+            'received_at': self.received_at.isoformat() + 'Z' if self.received_at else None,
+            'started_at': self.started_at.isoformat() + 'Z' if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() + 'Z' if self.finished_at else None,
+            'result': self.result,
+            'error': self.error_message,
+        }
+
+
+def async_ingest_requested(req) -> bool:
+    """Async mode enabled on the server and requested by the client"""
+    if INGEST_MODE != 'async':
+        return False
+    return 'respond-async' in req.headers.get('Prefer', '').lower()
+
+
+def enqueue_ingest(site_id: int, records: list, received_at: datetime, source: str = 'legacy',
+                   edge_meta: dict = None, collector_key_id: int = None,
+                   data_size_bytes: int = 0) -> TelemetryIngestJob:
+    """
+    Persist a validated payload and return its receipt
+
+    Args:
+        site_id: The hosting site ID
+        records: List of miner record dicts
+        received_at: Timestamp when data was received
+        source: Source identifier ('legacy', 'v1', etc.)
+        edge_meta: Optional edge envelope metadata
+        collector_key_id: CollectorKey id for the upload log (legacy endpoint)
+        data_size_bytes: Original request body size
+
+    Returns:
+        TelemetryIngestJob (committed)
+    """
+    if not isinstance(records, list):
+        # ColumnarRecords row views from binary uploads
+        records = [dict(r) for r in records]
+    job = TelemetryIngestJob(
+        id=str(uuid.uuid4()),
+        site_id=site_id,
+        source=source,
+        collector_key_id=collector_key_id,
+        status='queued',
+        payload=gzip.compress(json.dumps(records).encode('utf-8'), compresslevel=1),
+        record_count=len(records),
+        data_size_bytes=data_size_bytes,
+        edge_meta=edge_meta or {},
+        received_at=received_at,
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def get_receipt(receipt_id: str, site_id: int):
+    """Receipt status for a job, scoped to the caller's site"""
+    job = db.session.get(TelemetryIngestJob, receipt_id)
+    if not job or job.site_id != site_id:
+        return None
+    return job.to_receipt()
+
+
+def get_queue_stats(site_id: int = None) -> dict:
+    """Queue depth and lag (age of the oldest queued job), optionally for one site"""
+    from sqlalchemy import func
+
+    def scoped(query):
+        return query if site_id is None else query.filter(TelemetryIngestJob.site_id == site_id)
+
+    now = datetime.utcnow()
+    counts = dict(
+        scoped(db.session.query(TelemetryIngestJob.status, func.count(TelemetryIngestJob.id)))
+        .filter(TelemetryIngestJob.status.in_(['queued', 'processing']))
+        .group_by(TelemetryIngestJob.status)
+        .all()
+    )
+    oldest = scoped(db.session.query(func.min(TelemetryIngestJob.received_at))).filter(
+        TelemetryIngestJob.status == 'queued'
+    ).scalar()
+    queued_records = scoped(
+        db.session.query(func.coalesce(func.sum(TelemetryIngestJob.record_count), 0))
+    ).filter(
+        TelemetryIngestJob.status == 'queued'
+    ).scalar()
+
+    return {
+        'mode': INGEST_MODE,
+        'queued': counts.get('queued', 0),
+        'processing': counts.get('processing', 0),
+        'queued_records': int(queued_records or 0),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'oldest_received_at': oldest.isoformat() + 'Z' if oldest else None,
+    }
+
+
+def claim_jobs(worker_id: str, max_jobs: int = INGEST_BATCH_JOBS,
+               max_records: int = INGEST_BATCH_RECORDS) -> list:
+    """
+    Atomically claim queued jobs (oldest first) for one coalesced transaction
+
+    Returns:
+        List of claimed job ids
+    """
+    now = datetime.utcnow()
+    candidates = TelemetryIngestJob.query.filter(
+        TelemetryIngestJob.status == 'queued'
+    ).order_by(
+        TelemetryIngestJob.received_at.asc(), TelemetryIngestJob.id.asc()
+    ).with_for_update(skip_locked=True).limit(max_jobs).all()
+
+    claimed = []
+    total_records = 0
+    for job in candidates:
+        if claimed and total_records + (job.record_count or 0) > max_records:
+            break
+        job.status = 'processing'
+        job.worker_id = worker_id
+        job.started_at = now
+        job.attempts = (job.attempts or 0) + 1
+        claimed.append(job.id)
+        total_records += job.record_count or 0
+
+    db.session.commit()
+    return claimed
+
+
+def _ingest_job(job: TelemetryIngestJob, commit: bool) -> dict:
+    from services.edge_ingest_service import ingest_miner_records
+
+    records = json.loads(gzip.decompress(job.payload).decode('utf-8'))
+    return ingest_miner_records(
+        site_id=job.site_id,
+        records=records,
+        received_at=job.received_at,
+        source=job.source,
+        edge_meta=job.edge_meta or {},
+        commit=commit,
+    )
+
+
+def _complete_job(job: TelemetryIngestJob, result: dict, elapsed_ms: int):
+    from api.collector_api import CollectorUploadLog
+
+    job.status = 'completed'
+    job.finished_at = datetime.utcnow()
+    job.payload = b''
+    job.result = {
+        'processed': result['processed_count'],
+        'inserted': result['inserted'],
+        'updated': result['updated'],
+        'online': result['online_count'],
+        'offline': result['offline_count'],
+        'errors': result.get('errors', [])[:20],
+    }
+    job.error_message = None
+
+    if job.collector_key_id:
+        db.session.add(CollectorUploadLog(
+            site_id=job.site_id,
+            collector_key_id=job.collector_key_id,
+            miner_count=job.record_count,
+            online_count=result['online_count'],
+            offline_count=result['offline_count'],
+            data_size_bytes=job.data_size_bytes,
+            processing_time_ms=elapsed_ms,
+        ))
+
+
+def _fail_job(job_id: str, error: Exception):
+    job = db.session.get(TelemetryIngestJob, job_id)
+    if not job:
+        return
+    job.error_message = str(error)[:2000]
+    if job.attempts >= INGEST_MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+    else:
+        job.status = 'queued'
+        job.worker_id = None
+    db.session.commit()
+
+
+def process_claimed_jobs(job_ids: list) -> int:
+    """
+    Ingest claimed jobs in a single transaction
+
+    Jobs are applied in claim order (received_at): ingest stamps live rows
+    with the job's received_at, so an older job applied last would move
+    miner_telemetry_live backwards. If the coalesced transaction fails, every job is retried in its own
+    transaction so one bad payload cannot block the rest of the batch.
+
+    Returns:
+        Number of jobs completed
+    """
+    if not job_ids:
+        return 0
+
+    start = time.time()
+    try:
+        position = {job_id: i for i, job_id in enumerate(job_ids)}
+        jobs = sorted(
+            TelemetryIngestJob.query.filter(TelemetryIngestJob.id.in_(job_ids)).all(),
+            key=lambda job: position[job.id]
+        )
+        results = [(job, _ingest_job(job, commit=False)) for job in jobs]
+        elapsed_ms = int((time.time() - start) * 1000)
+        for job, result in results:
+            _complete_job(job, result, elapsed_ms)
+        db.session.commit()
+        return len(results)
+    except Exception as e:
+        db.session.rollback()
+        if len(job_ids) == 1:
+            logger.error(f"Ingest job {job_ids[0]} failed: {e}")
+            _fail_job(job_ids[0], e)
+            return 0
+        logger.warning(f"Coalesced ingest of {len(job_ids)} jobs failed, retrying individually: {e}")
+
+    completed = 0
+    for job_id in job_ids:
+        start = time.time()
+        try:
+            job = db.session.get(TelemetryIngestJob, job_id)
+            result = _ingest_job(job, commit=False)
+            _complete_job(job, result, int((time.time() - start) * 1000))
+            db.session.commit()
+            completed += 1
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Ingest job {job_id} failed: {e}")
+            _fail_job(job_id, e)
+    return completed
+
+
+def recover_stale_jobs() -> int:
+    """Requeue jobs whose worker died mid-transaction; purge expired receipts"""
+    now = datetime.utcnow()
+    lease_cutoff = now - timedelta(seconds=INGEST_LEASE_SECONDS)
+    requeued = TelemetryIngestJob.query.filter(
+        TelemetryIngestJob.status == 'processing',
+        TelemetryIngestJob.started_at < lease_cutoff
+    ).update({'status': 'queued', 'worker_id': None}, synchronize_session=False)
+
+    retention_cutoff = now - timedelta(hours=RECEIPT_RETENTION_HOURS)
+    TelemetryIngestJob.query.filter(
+        TelemetryIngestJob.status.in_(['completed', 'failed']),
+        TelemetryIngestJob.finished_at < retention_cutoff
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale telemetry ingest jobs")
+    return requeued
+
+
+class TelemetryIngestWorkerPool:
+    """
+    Background ingest workers draining telemetry_ingest_queue
+
+    Every process that starts the pool competes for jobs through
+    SKIP LOCKED, so no scheduler lock is needed.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._app = None
+            cls._instance._threads = []
+            cls._instance._stop_event = threading.Event()
+            cls._instance._last_maintenance = 0.0
+            cls._instance._maintenance_lock = threading.Lock()
+            cls._instance.stats = {
+                'jobs_completed': 0,
+                'batches': 0,
+                'last_batch_at': None,
+            }
+        return cls._instance
+
+    def init_app(self, app, workers: int = INGEST_WORKERS):
+        """Start worker threads (only in async ingest mode)"""
+        if INGEST_MODE != 'async':
+            logger.info("Telemetry ingest mode is sync, workers not started")
+            return False
+        if self._threads:
+            return True
+
+        self._app = app
+        with app.app_context():
+            TelemetryIngestJob.__table__.create(db.engine, checkfirst=True)
+
+        self._stop_event.clear()
+        base_id = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(max(workers, 1)):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                args=(f"{base_id}:{i}",),
+                name=f"telemetry-ingest-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f"Telemetry ingest worker pool started with {len(self._threads)} workers")
+        return True
+
+    def _run_maintenance(self):
+        """Stale-lease recovery and metrics, at most every 30s per process"""
+        now = time.time()
+        with self._maintenance_lock:
+            if now - self._last_maintenance < 30:
+                return
+            self._last_maintenance = now
+
+        recover_stale_jobs()
+        stats = get_queue_stats()
+        try:
+            from services.metrics_service import set_ingest_queue_stats
+            set_ingest_queue_stats(stats['queued'], stats['processing'], stats['lag_seconds'])
+        except ImportError:
+            pass
+
+    def _worker_loop(self, worker_id: str):
+        while not self._stop_event.is_set():
+            claimed = []
+            try:
+                with self._app.app_context():
+                    self._run_maintenance()
+                    claimed = claim_jobs(worker_id)
+                    if claimed:
+                        completed = process_claimed_jobs(claimed)
+                        self.stats['jobs_completed'] += completed
+                        self.stats['batches'] += 1
+                        self.stats['last_batch_at'] = datetime.utcnow().isoformat()
+                    db.session.remove()
+            except Exception as e:
+                logger.error(f"[IngestWorker {worker_id}] loop error: {e}")
+
+            if not claimed:
+                self._stop_event.wait(INGEST_POLL_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def get_status(self) -> dict:
+        return {
+            'mode': INGEST_MODE,
+            'running': bool(self._threads),
+            'workers': len(self._threads),
+            **self.stats,
+        }
+
+
+telemetry_ingest_workers = TelemetryIngestWorkerPool()
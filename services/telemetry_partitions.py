@@ -0,0 +1,306 @@
+"""
+Telemetry Table Partition Manager
+遥测表时间分区管理器
+
+PostgreSQL native range partitioning for the time-series telemetry tables:
+
+- telemetry_raw_24h       partitioned by hour on ``ts``
+- telemetry_history_5min  partitioned by day on ``bucket_ts``
+- telemetry_history_hourly partitioned by day on ``bucket_ts``
+
+Retention becomes ``DROP TABLE <partition>`` (no WAL per row, no bloat, no
+VACUUM) instead of ``DELETE ... WHERE ts < cutoff``. Future partitions are
+pre-created so inserts never wait on DDL; a ``<table>_default`` partition
+catches rows outside the pre-created window (edge clock skew) and is trimmed
+with a small DELETE.
+
+On other dialects (SQLite in tests) every method is a no-op and callers keep
+the DELETE fallback.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import UniqueConstraint, text
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key serialising partition DDL across gunicorn workers
+_PARTITION_LOCK_KEY = 0x7E1E0009
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    """Partitioning layout of one telemetry table"""
+    table: str
+    column: str
+    granularity: str  # 'hour' | 'day'
+    retention: timedelta
+    premake: int  # number of future partitions kept ahead of now
+
+    @property
+    def step(self) -> timedelta:
+        return timedelta(hours=1) if self.granularity == 'hour' else timedelta(days=1)
+
+
+PARTITION_SPECS = {
+    'telemetry_raw_24h': PartitionSpec('telemetry_raw_24h', 'ts', 'hour',
+                                       timedelta(hours=26), premake=24),
+    'telemetry_history_5min': PartitionSpec('telemetry_history_5min', 'bucket_ts', 'day',
+                                            timedelta(days=60), premake=7),
+    'telemetry_history_hourly': PartitionSpec('telemetry_history_hourly', 'bucket_ts', 'day',
+                                              timedelta(days=180), premake=7),
+}
+
+
+def partition_floor(ts: datetime, granularity: str) -> datetime:
+    """Start of the partition containing ts"""
+    ts = ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        ts = ts.replace(hour=0)
+    return ts
+
+
+def partition_name(table: str, start: datetime, granularity: str) -> str:
+    """e.g. telemetry_raw_24h_p2026101612 / telemetry_history_5min_p20261016"""
+    fmt = '%Y%m%d%H' if granularity == 'hour' else '%Y%m%d'
+    return f"{table}_p{start.strftime(fmt)}"
+
+
+def parse_partition_name(table: str, name: str, granularity: str) -> Optional[datetime]:
+    """Start of the range encoded in a partition name, None for default/foreign tables"""
+    digits = 10 if granularity == 'hour' else 8
+    match = re.fullmatch(rf'{re.escape(table)}_p(\d{{{digits}}})', name)
+    if not match:
+        return None
+    fmt = '%Y%m%d%H' if granularity == 'hour' else '%Y%m%d'
+    return datetime.strptime(match.group(1), fmt)
+
+
+def partition_ranges(spec: PartitionSpec, start: datetime, end: datetime) -> list:
+    """[(name, lower, upper)] covering [start, end]"""
+    ranges = []
+    lower = partition_floor(start, spec.granularity)
+    while lower <= end:
+        upper = lower + spec.step
+        ranges.append((partition_name(spec.table, lower, spec.granularity), lower, upper))
+        lower = upper
+    return ranges
+
+
+class TelemetryPartitionManager:
+    """Creates, migrates and drops telemetry partitions (PostgreSQL only)"""
+
+    def __init__(self, specs: dict = None):
+        self.specs = specs or PARTITION_SPECS
+
+    @staticmethod
+    def is_supported() -> bool:
+        return db.session.get_bind().dialect.name == 'postgresql'
+
+    def is_partitioned(self, table: str) -> bool:
+        if not self.is_supported():
+            return False
+        row = db.session.execute(text("""
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = :table AND pg_table_is_visible(c.oid)
+        """), {'table': table}).first()
+        return row is not None
+
+    def list_partitions(self, table: str) -> list:
+        rows = db.session.execute(text("""
+            SELECT child.relname FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = :table AND pg_table_is_visible(parent.oid)
+            ORDER BY child.relname
+        """), {'table': table}).fetchall()
+        return [r[0] for r in rows]
+
+    def _lock(self):
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _PARTITION_LOCK_KEY})
+
+    def _create_partition(self, spec: PartitionSpec, name: str, lower: datetime, upper: datetime,
+                          existing: set) -> bool:
+        if name in existing:
+            return False
+        bounds = f"FROM ('{lower.isoformat(sep=' ')}') TO ('{upper.isoformat(sep=' ')}')"
+        default = f"{spec.table}_default"
+        stray = default in existing and db.session.execute(
+            text(f"SELECT 1 FROM {default} WHERE {spec.column} >= :lo AND {spec.column} < :hi LIMIT 1"),
+            {'lo': lower, 'hi': upper}
+        ).first()
+        if stray:
+            # Rows already landed in the default partition: PostgreSQL refuses
+            # PARTITION OF until they are moved into the new table
+            db.session.execute(text(
+                f"CREATE TABLE {name} (LIKE {spec.table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+            ))
+            db.session.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM {default} WHERE {spec.column} >= :lo AND {spec.column} < :hi RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """), {'lo': lower, 'hi': upper})
+            db.session.execute(text(f"ALTER TABLE {spec.table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        else:
+            db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {spec.table} FOR VALUES {bounds}"))
+        existing.add(name)
+        return True
+
+    def _create_range(self, spec: PartitionSpec, start: datetime, end: datetime) -> int:
+        existing = set(self.list_partitions(spec.table))
+        if f"{spec.table}_default" not in existing:
+            db.session.execute(text(f"CREATE TABLE IF NOT EXISTS {spec.table}_default PARTITION OF {spec.table} DEFAULT"))
+            existing.add(f"{spec.table}_default")
+        return sum(self._create_partition(spec, name, lower, upper, existing)
+                   for name, lower, upper in partition_ranges(spec, start, end))
+
+    def ensure_partitions(self, table: str, now: datetime = None) -> int:
+        """
+        Pre-create partitions from the current one up to ``premake`` ahead
+
+        Returns:
+            Number of partitions created
+        """
+        spec = self.specs[table]
+        if not self.is_partitioned(table):
+            return 0
+        now = now or datetime.utcnow()
+        try:
+            self._lock()
+            created = self._create_range(spec, now, now + spec.step * spec.premake)
+            db.session.commit()
+            if created:
+                logger.info(f"Created {created} partitions for {table}")
+            return created
+        except Exception as e:
+            logger.error(f"Failed to create partitions for {table}: {e}")
+            db.session.rollback()
+            return 0
+
+    def drop_expired(self, table: str, cutoff: datetime = None) -> int:
+        """
+        Drop partitions whose whole range is older than cutoff
+
+        Rows of the default partition older than cutoff are deleted (it only
+        holds out-of-window stragglers).
+
+        Returns:
+            Number of partitions dropped
+        """
+        spec = self.specs[table]
+        if not self.is_partitioned(table):
+            return 0
+        cutoff = cutoff or (datetime.utcnow() - spec.retention)
+        try:
+            self._lock()
+            dropped = 0
+            partitions = self.list_partitions(table)
+            for name in partitions:
+                lower = parse_partition_name(table, name, spec.granularity)
+                if lower is not None and lower + spec.step <= cutoff:
+                    db.session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    dropped += 1
+            if f"{table}_default" in partitions:
+                db.session.execute(
+                    text(f"DELETE FROM {table}_default WHERE {spec.column} < :cutoff"),
+                    {'cutoff': cutoff}
+                )
+            db.session.commit()
+            if dropped:
+                logger.info(f"Dropped {dropped} expired partitions of {table} (before {cutoff})")
+            return dropped
+        except Exception as e:
+            logger.error(f"Failed to drop expired partitions of {table}: {e}")
+            db.session.rollback()
+            return 0
+
+    def maintain(self, table: str) -> dict:
+        """Pre-create upcoming partitions and drop expired ones"""
+        return {
+            'created': self.ensure_partitions(table),
+            'dropped': self.drop_expired(table),
+        }
+
+    def migrate_table(self, model, now: datetime = None) -> bool:
+        """
+        Convert an existing plain table into a partitioned one
+
+        Runs in one transaction: the old table is renamed, a partitioned table
+        with the same columns is created, rows inside the retention window are
+        copied, the id sequence is re-owned and the old table dropped. Indexes
+        and unique constraints are recreated from the model; the primary key
+        becomes (id, <partition column>) because PostgreSQL requires the
+        partition key in every unique index.
+
+        Returns:
+            True if the table was migrated
+        """
+        table = model.__tablename__
+        spec = self.specs[table]
+        if not self.is_supported():
+            return False
+        now = now or datetime.utcnow()
+        legacy = f"{table}_unpartitioned"
+        try:
+            self._lock()
+            if self.is_partitioned(table):
+                db.session.commit()
+                return False
+
+            logger.warning(f"Migrating {table} to range partitioning by {spec.granularity}")
+            db.session.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+            db.session.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+            db.session.execute(text(
+                f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) "
+                f"PARTITION BY RANGE ({spec.column})"
+            ))
+
+            cutoff = now - spec.retention
+            self._create_range(spec, cutoff, now + spec.step * spec.premake)
+            copied = db.session.execute(
+                text(f"INSERT INTO {table} SELECT * FROM {legacy} WHERE {spec.column} >= :cutoff"),
+                {'cutoff': cutoff}
+            ).rowcount
+
+            sequence = db.session.execute(
+                text("SELECT pg_get_serial_sequence(:legacy, 'id')"), {'legacy': legacy}
+            ).scalar()
+            if sequence:
+                db.session.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+            db.session.execute(text(f"DROP TABLE {legacy}"))
+
+            db.session.execute(text(
+                f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, {spec.column})"
+            ))
+            for constraint in model.__table__.constraints:
+                if not isinstance(constraint, UniqueConstraint) or not constraint.name:
+                    continue
+                columns = [c.name for c in constraint.columns]
+                if spec.column not in columns:
+                    logger.warning(f"Skipping {constraint.name}: unique constraints must include {spec.column}")
+                    continue
+                db.session.execute(text(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {constraint.name} UNIQUE ({', '.join(columns)})"
+                ))
+            connection = db.session.connection()
+            for index in model.__table__.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+            db.session.commit()
+            logger.warning(f"Migrated {table} to partitioned layout ({copied} rows kept)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to migrate {table} to partitioned layout: {e}")
+            db.session.rollback()
+            return False
+
+
+partition_manager = TelemetryPartitionManager()
@@ -0,0 +1,476 @@
+"""
+Incremental Telemetry Rollup Engine
+增量遥测聚合引擎（水位线 + 迟到数据处理）
+
+Single rollup path for the telemetry tiers (raw -> 5min -> hourly / daily).
+It replaces the fixed-lookback rescans of TelemetryStorageManager.rollup_to_5min
+/ TelemetryService.aggregate_to_5min and the full-day recompute of
+rollup_to_daily.
+
+- raw -> 5min: ``telemetry_rollup_watermarks`` stores the highest
+  ``telemetry_raw_24h.id`` already rolled up. Each run reads only rows with a
+  larger id, collects the (site, miner, bucket) keys they touch and
+  re-aggregates exactly those buckets from raw, so a sample arriving late
+  (old ``ts``, new id) refreshes its own bucket.
+- Derived tiers (5min -> hourly, 5min -> daily): every bucket written by the
+  tier below marks its parent buckets in ``telemetry_rollup_dirty`` inside the
+  same transaction. Each tier re-aggregates its dirty buckets (daily waits
+  until the day has closed) and clears them, so late data reaches every tier
+  without a time-window rescan.
+
+Ids come from a sequence, so a slow ingest transaction can commit an id below
+one already rolled up. Each run first finds the contiguous id range after the
+watermark and aggregates only that range; rows past the first hole wait until
+it fills or settles. A hole is only skipped as a rolled-back insert on evidence
+that nothing can fill it any more: on PostgreSQL the run that first sees it
+stores the transaction id horizon (``pg_snapshot_xmax``), and the hole settles
+once the oldest running transaction (``pg_snapshot_xmin``) is past that
+horizon, i.e. every transaction that could have drawn a missing id has
+committed or rolled back. The horizon is read before the ids, so the
+aggregation after it sees every row committed into a settled hole.
+``TELEMETRY_ROLLUP_GAP_SETTLE_SECONDS`` is a lower bound on top of that
+evidence, and ``TELEMETRY_ROLLUP_GAP_MAX_WAIT_SECONDS`` (the only rule where
+there is no transaction horizon, e.g. SQLite) bounds how long an unrelated
+long-running transaction can hold the watermark back.
+
+Rollup lag (seconds since a tier last had no backlog) is exported as
+``telemetry_rollup_lag_seconds{tier=...}``.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+
+from db import db
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on raw ids handled per run so a backlog is worked off in slices
+ROLLUP_MAX_BATCH_ROWS = int(os.environ.get('TELEMETRY_ROLLUP_MAX_BATCH_ROWS', '500000'))
+ROLLUP_GAP_SETTLE_SECONDS = int(os.environ.get('TELEMETRY_ROLLUP_GAP_SETTLE_SECONDS', '120'))
+ROLLUP_GAP_MAX_WAIT_SECONDS = int(os.environ.get('TELEMETRY_ROLLUP_GAP_MAX_WAIT_SECONDS', '3600'))
+# First run on an existing deployment starts this far back instead of at id 0
+ROLLUP_INITIAL_LOOKBACK_MINUTES = 15
+
+# pg_try_advisory_xact_lock key: one rollup run at a time across processes
+_ROLLUP_LOCK_KEY = 0x7E1E0010
+
+
+class TelemetryRollupWatermark(db.Model):
+    """每个聚合层的处理进度"""
+    __tablename__ = 'telemetry_rollup_watermarks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tier = db.Column(db.String(20), nullable=False, unique=True)
+    last_source_id = db.Column(db.BigInteger, nullable=False, default=0)  # source ids <= this are rolled up
+    high_source_id = db.Column(db.BigInteger, nullable=False, default=0)  # highest source id seen
+    gap_since = db.Column(db.DateTime, nullable=True)  # first run that saw an id hole
+    gap_source_id = db.Column(db.BigInteger, nullable=True)  # highest source id read at gap_since
+    gap_xmax = db.Column(db.BigInteger, nullable=True)  # transaction id horizon at gap_since (PostgreSQL)
+    caught_up_at = db.Column(db.DateTime, nullable=True)  # last run that left no backlog
+    last_run_at = db.Column(db.DateTime, nullable=True)
+    last_rows = db.Column(db.Integer, default=0)
+    last_buckets = db.Column(db.Integer, default=0)
+    last_duration_ms = db.Column(db.Integer, default=0)
+
+
+class TelemetryRollupDirty(db.Model):
+    """待重新聚合的上层桶（迟到数据 / 新数据触达）"""
+    __tablename__ = 'telemetry_rollup_dirty'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tier = db.Column(db.String(20), nullable=False)
+    site_id = db.Column(db.Integer, nullable=False)
+    miner_id = db.Column(db.String(50), nullable=False)
+    bucket_ts = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('tier', 'site_id', 'miner_id', 'bucket_ts', name='uq_rollup_dirty_bucket'),
+        db.Index('idx_rollup_dirty_tier_bucket', 'tier', 'bucket_ts'),
+    )
+
+
+@dataclass(frozen=True)
+class RollupTier:
+    """One aggregation tier"""
+    name: str
+    target: str
+    bucket_seconds: int
+    source: str
+    parents: tuple = ()  # tiers whose buckets this tier's writes mark dirty
+    closed_only: bool = False  # wait until a dirty bucket has ended before aggregating it
+
+
+ROLLUP_TIERS = (
+    RollupTier('5min', 'telemetry_history_5min', 300, source='telemetry_raw_24h', parents=('hourly', 'daily')),
+    # The open hour is refreshed every run (at most 12 source rows per miner)
+    RollupTier('hourly', 'telemetry_history_hourly', 3600, source='telemetry_history_5min'),
+    RollupTier('daily', 'telemetry_daily', 86400, source='telemetry_history_5min', closed_only=True),
+)
+
+
+# SQLAlchemy's SQLite DateTime text format, so computed buckets compare equal to bound datetimes
+_SQLITE_TS = '%Y-%m-%d %H:%M:%S.000000'
+
+
+class _SqlDialect:
+    """Bucket arithmetic for PostgreSQL and SQLite (tests)"""
+
+    def __init__(self, name: str):
+        self.pg = name == 'postgresql'
+
+    def bucket(self, col: str, seconds: int) -> str:
+        if self.pg:
+            if seconds == 86400:
+                return f"date_trunc('day', {col})"
+            if seconds == 3600:
+                return f"date_trunc('hour', {col})"
+            minutes = seconds // 60
+            return (f"(date_trunc('hour', {col}) + "
+                    f"(EXTRACT(minute FROM {col})::int / {minutes}) * INTERVAL '{minutes} minutes')")
+        return (f"strftime('{_SQLITE_TS}', (CAST(strftime('%s', {col}) AS INTEGER) / {seconds}) * {seconds}, "
+                f"'unixepoch')")
+
+    def bucket_end(self, expr: str, seconds: int) -> str:
+        if self.pg:
+            return f"({expr} + INTERVAL '{seconds} seconds')"
+        return f"strftime('{_SQLITE_TS}', {expr}, '+{seconds} seconds')"
+
+    def day(self, expr: str) -> str:
+        return f"CAST({expr} AS DATE)" if self.pg else f"date({expr})"
+
+
+class TelemetryRollupEngine:
+    """Runs the rollup tiers in order; one instance per process"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._lock = threading.Lock()
+            cls._instance.tiers = {tier.name: tier for tier in ROLLUP_TIERS}
+        return cls._instance
+
+    # ------------------------------------------------------------------
+    # Watermarks
+    # ------------------------------------------------------------------
+
+    def _watermark(self, tier: RollupTier) -> TelemetryRollupWatermark:
+        row = TelemetryRollupWatermark.query.filter_by(tier=tier.name).with_for_update().first()
+        if row is None:
+            row = TelemetryRollupWatermark(tier=tier.name, last_source_id=0, high_source_id=0)
+            if tier.source == 'telemetry_raw_24h':
+                row.last_source_id = row.high_source_id = self._initial_source_id()
+            db.session.add(row)
+            db.session.flush()
+        return row
+
+    @staticmethod
+    def _initial_source_id() -> int:
+        """Start just before recent raw rows; the legacy rollups already covered older ones"""
+        since = datetime.utcnow() - timedelta(minutes=ROLLUP_INITIAL_LOOKBACK_MINUTES)
+        first_recent = db.session.execute(
+            text("SELECT MIN(id) FROM telemetry_raw_24h WHERE ts >= :since"), {'since': since}
+        ).scalar()
+        if first_recent is not None:
+            return int(first_recent) - 1
+        return int(db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM telemetry_raw_24h")).scalar())
+
+    @staticmethod
+    def _first_gap(lo: int, hi: int) -> int:
+        """Highest id h in [lo, hi] such that every id in (lo, h] exists (one pass over the batch)"""
+        gap, top = db.session.execute(text("""
+            SELECT MIN(CASE WHEN id <> prev_id + 1 THEN prev_id END), MAX(id)
+            FROM (SELECT id, LAG(id, 1, :lo) OVER (ORDER BY id) AS prev_id
+                  FROM telemetry_raw_24h WHERE id > :lo AND id <= :hi) batch
+        """), {'lo': lo, 'hi': hi}).first()
+        if gap is not None:
+            return int(gap)
+        return lo if top is None else int(top)
+
+    @staticmethod
+    def _xid_horizon(sql: _SqlDialect, bound: str = 'xmax') -> Optional[int]:
+        """pg_snapshot_xmax / pg_snapshot_xmin of a fresh snapshot; None without PostgreSQL"""
+        if not sql.pg:
+            return None
+        return int(db.session.execute(
+            text(f"SELECT pg_snapshot_{bound}(pg_current_snapshot())::text::bigint")
+        ).scalar())
+
+    @staticmethod
+    def _gap_settled(wm: TelemetryRollupWatermark, xmin: Optional[int], now: datetime) -> bool:
+        """Whether the id hole first seen at ``wm.gap_since`` can no longer be filled
+
+        ``xmin`` must come from a snapshot taken before the ids were read.
+        """
+        waited = (now - wm.gap_since).total_seconds()
+        if waited < ROLLUP_GAP_SETTLE_SECONDS:
+            return False
+        if wm.gap_xmax is not None and xmin is not None and xmin >= int(wm.gap_xmax):
+            return True
+        if waited >= ROLLUP_GAP_MAX_WAIT_SECONDS:
+            logger.warning(f"Rollup: id hole open for {int(waited)}s without transaction evidence, skipping it")
+            return True
+        return False
+
+    def _try_lock(self) -> bool:
+        if db.session.get_bind().dialect.name != 'postgresql':
+            return True
+        return bool(db.session.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': _ROLLUP_LOCK_KEY}
+        ).scalar())
+
+    # ------------------------------------------------------------------
+    # Tier SQL
+    # ------------------------------------------------------------------
+
+    def _mark_parents_dirty(self, sql: _SqlDialect, tier: RollupTier, touched_sql: str, params: dict):
+        for parent in (self.tiers[name] for name in tier.parents):
+            db.session.execute(text(f"""
+            INSERT INTO telemetry_rollup_dirty (tier, site_id, miner_id, bucket_ts, created_at)
+                SELECT DISTINCT CAST(:parent AS VARCHAR(20)), site_id, miner_id,
+                       {sql.bucket('bucket_ts', parent.bucket_seconds)}, :now
+                FROM ({touched_sql}) touched
+                WHERE true
+                ON CONFLICT (tier, site_id, miner_id, bucket_ts) DO NOTHING
+            """), dict(params, parent=parent.name))
+
+    def _aggregate_raw(self, tier: RollupTier, sql: _SqlDialect, lo: int, hi: int, now: datetime) -> tuple:
+        """Re-aggregate the buckets touched by raw ids in (lo, hi]; returns (rows, buckets)"""
+        params = {'lo': lo, 'hi': hi, 'now': now}
+        rows = db.session.execute(
+            text("SELECT COUNT(*) FROM telemetry_raw_24h WHERE id > :lo AND id <= :hi"), params
+        ).scalar() or 0
+        touched_sql = (f"SELECT DISTINCT site_id, miner_id, {sql.bucket('ts', tier.bucket_seconds)} AS bucket_ts "
+                       f"FROM telemetry_raw_24h WHERE id > :lo AND id <= :hi")
+
+        buckets = db.session.execute(text(f"""
+            INSERT INTO telemetry_history_5min
+                (bucket_ts, site_id, miner_id, avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
+                 avg_temp_c, max_temp_c, avg_power_w, avg_fan_rpm, online_ratio, samples, created_at)
+            SELECT
+                t.bucket_ts, t.site_id, t.miner_id,
+                AVG(r.hashrate_ths), MAX(r.hashrate_ths), MIN(r.hashrate_ths),
+                AVG(r.temperature_c), MAX(r.temperature_c), AVG(r.power_w), AVG(r.fan_rpm),
+                SUM(CASE WHEN r.status = 'online' THEN 1.0 ELSE 0.0 END) / COUNT(*),
+                COUNT(*), :now
+            FROM ({touched_sql}) t
+            JOIN telemetry_raw_24h r
+              ON r.site_id = t.site_id AND r.miner_id = t.miner_id
+             AND r.ts >= t.bucket_ts AND r.ts < {sql.bucket_end('t.bucket_ts', tier.bucket_seconds)}
+            WHERE true
+            GROUP BY t.bucket_ts, t.site_id, t.miner_id
+            ON CONFLICT (site_id, miner_id, bucket_ts) DO UPDATE SET
+                avg_hashrate_ths = excluded.avg_hashrate_ths,
+                max_hashrate_ths = excluded.max_hashrate_ths,
+                min_hashrate_ths = excluded.min_hashrate_ths,
+                avg_temp_c = excluded.avg_temp_c,
+                max_temp_c = excluded.max_temp_c,
+                avg_power_w = excluded.avg_power_w,
+                avg_fan_rpm = excluded.avg_fan_rpm,
+                online_ratio = excluded.online_ratio,
+                samples = excluded.samples
+        """), params).rowcount
+        self._mark_parents_dirty(sql, tier, touched_sql, params)
+        return rows, buckets
+
+    def _rollup_raw(self, tier: RollupTier, sql: _SqlDialect, now: datetime) -> dict:
+        wm = self._watermark(tier)
+        lo = int(wm.last_source_id)
+        head = db.session.execute(text("SELECT COALESCE(MAX(id), 0) FROM telemetry_raw_24h")).scalar()
+        hi = min(int(head), lo + ROLLUP_MAX_BATCH_ROWS)
+        result = {'tier': tier.name, 'rows': 0, 'buckets': 0, 'from_id': lo, 'to_id': lo}
+        if hi <= lo:
+            wm.caught_up_at = now
+            return result
+
+        # Horizon before the ids are read, so the read sees every row of a settled hole
+        xmin = self._xid_horizon(sql, 'xmin') if wm.gap_xmax is not None else None
+
+        # Advance the watermark only over a contiguous id range (see module docstring)
+        safe = self._first_gap(lo, hi)
+        if safe < hi:
+            if wm.gap_since is not None and self._gap_settled(wm, xmin, now):
+                # Only ids drawn before the hole was seen (<= gap_source_id) are covered by the evidence
+                limit = min(int(wm.gap_source_id), hi)
+                logger.info(f"Rollup {tier.name}: skipping id holes in ({safe}, {limit}] as rolled back")
+                safe = max(safe, self._first_gap(limit, hi) if limit < hi else hi)
+                wm.gap_since = None
+            if safe < hi and wm.gap_since is None:
+                wm.gap_since = now
+                wm.gap_source_id = hi
+                wm.gap_xmax = self._xid_horizon(sql)
+        if safe == hi:
+            wm.gap_since = wm.gap_source_id = wm.gap_xmax = None
+
+        # Only ids up to the watermark: rows past a hole are read once it fills or settles
+        rows, buckets = self._aggregate_raw(tier, sql, lo, safe, now) if safe > lo else (0, 0)
+
+        wm.last_source_id = safe
+        wm.high_source_id = max(int(wm.high_source_id or 0), hi)
+        if hi == int(head):
+            wm.caught_up_at = now
+
+        result.update(rows=rows, buckets=max(buckets or 0, 0), to_id=safe)
+        return result
+
+    @staticmethod
+    def _hourly_upsert(sql: _SqlDialect, tier: RollupTier, due: str) -> str:
+        return f"""
+            INSERT INTO telemetry_history_hourly
+                (bucket_ts, site_id, miner_id, avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
+                 avg_temp_c, max_temp_c, avg_power_w, avg_fan_rpm, online_ratio, samples, created_at)
+            SELECT
+                d.bucket_ts, d.site_id, d.miner_id,
+                AVG(h.avg_hashrate_ths), MAX(h.max_hashrate_ths), MIN(h.min_hashrate_ths),
+                AVG(h.avg_temp_c), MAX(h.max_temp_c), AVG(h.avg_power_w), AVG(h.avg_fan_rpm),
+                AVG(h.online_ratio), SUM(h.samples), :now
+            FROM (SELECT site_id, miner_id, bucket_ts FROM telemetry_rollup_dirty WHERE {due}) d
+            JOIN telemetry_history_5min h
+              ON h.site_id = d.site_id AND h.miner_id = d.miner_id
+             AND h.bucket_ts >= d.bucket_ts AND h.bucket_ts < {sql.bucket_end('d.bucket_ts', tier.bucket_seconds)}
+            WHERE true
+            GROUP BY d.bucket_ts, d.site_id, d.miner_id
+            ON CONFLICT (site_id, miner_id, bucket_ts) DO UPDATE SET
+                avg_hashrate_ths = excluded.avg_hashrate_ths,
+                max_hashrate_ths = excluded.max_hashrate_ths,
+                min_hashrate_ths = excluded.min_hashrate_ths,
+                avg_temp_c = excluded.avg_temp_c,
+                max_temp_c = excluded.max_temp_c,
+                avg_power_w = excluded.avg_power_w,
+                avg_fan_rpm = excluded.avg_fan_rpm,
+                online_ratio = excluded.online_ratio,
+                samples = excluded.samples
+        """
+
+    @staticmethod
+    def _daily_upsert(sql: _SqlDialect, tier: RollupTier, due: str) -> str:
+        return f"""
+            INSERT INTO telemetry_daily
+                (day, site_id, miner_id, avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
+                 avg_temp_c, max_temp_c, avg_power_w, total_power_kwh, online_ratio,
+                 uptime_hours, samples, created_at)
+            SELECT
+                {sql.day('d.bucket_ts')}, d.site_id, d.miner_id,
+                AVG(h.avg_hashrate_ths), MAX(h.max_hashrate_ths), MIN(h.min_hashrate_ths),
+                AVG(h.avg_temp_c), MAX(h.max_temp_c), AVG(h.avg_power_w),
+                SUM(h.avg_power_w * 5 / 60 / 1000), AVG(h.online_ratio),
+                SUM(h.online_ratio * 5 / 60), SUM(h.samples), :now
+            FROM (SELECT site_id, miner_id, bucket_ts FROM telemetry_rollup_dirty WHERE {due}) d
+            JOIN telemetry_history_5min h
+              ON h.site_id = d.site_id AND h.miner_id = d.miner_id
+             AND h.bucket_ts >= d.bucket_ts AND h.bucket_ts < {sql.bucket_end('d.bucket_ts', tier.bucket_seconds)}
+            WHERE true
+            GROUP BY d.bucket_ts, d.site_id, d.miner_id
+            ON CONFLICT (site_id, miner_id, day) DO UPDATE SET
+                avg_hashrate_ths = excluded.avg_hashrate_ths,
+                max_hashrate_ths = excluded.max_hashrate_ths,
+                min_hashrate_ths = excluded.min_hashrate_ths,
+                avg_temp_c = excluded.avg_temp_c,
+                max_temp_c = excluded.max_temp_c,
+                avg_power_w = excluded.avg_power_w,
+                total_power_kwh = excluded.total_power_kwh,
+                online_ratio = excluded.online_ratio,
+                uptime_hours = excluded.uptime_hours,
+                samples = excluded.samples
+        """
+
+    def _rollup_dirty(self, tier: RollupTier, sql: _SqlDialect, now: datetime) -> dict:
+        wm = self._watermark(tier)
+        params = {'tier': tier.name, 'now': now}
+        due = "tier = :tier"
+        if tier.closed_only:
+            epoch = datetime(1970, 1, 1)
+            elapsed = int((now - epoch).total_seconds())
+            params['closed_before'] = epoch + timedelta(seconds=elapsed - elapsed % tier.bucket_seconds)
+            due += " AND bucket_ts < :closed_before"
+
+        upsert = self._hourly_upsert if tier.name == 'hourly' else self._daily_upsert
+        buckets = db.session.execute(text(upsert(sql, tier, due)), params).rowcount
+        cleared = db.session.execute(text(f"DELETE FROM telemetry_rollup_dirty WHERE {due}"), params).rowcount
+        wm.caught_up_at = now
+        return {'tier': tier.name, 'rows': cleared or 0, 'buckets': max(buckets or 0, 0)}
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def run_tier(self, name: str) -> dict:
+        """Roll up one tier in its own transaction"""
+        tier = self.tiers[name]
+        with self._lock:
+            started = time.time()
+            now = datetime.utcnow()
+            try:
+                if not self._try_lock():
+                    db.session.rollback()
+                    return {'tier': name, 'skipped': 'locked'}
+                sql = _SqlDialect(db.session.get_bind().dialect.name)
+                if tier.source == 'telemetry_raw_24h':
+                    result = self._rollup_raw(tier, sql, now)
+                else:
+                    result = self._rollup_dirty(tier, sql, now)
+
+                wm = self._watermark(tier)
+                wm.last_run_at = now
+                wm.last_rows = result['rows']
+                wm.last_buckets = result['buckets']
+                wm.last_duration_ms = int((time.time() - started) * 1000)
+                db.session.commit()
+                result['duration_ms'] = wm.last_duration_ms
+                if result['buckets']:
+                    logger.info(f"Rollup {name}: {result['rows']} source rows -> {result['buckets']} buckets "
+                                f"in {result['duration_ms']}ms")
+                return result
+            except Exception as e:
+                logger.error(f"Rollup {name} failed: {e}")
+                db.session.rollback()
+                return {'tier': name, 'error': str(e)}
+            finally:
+                self._export_lag(name)
+
+    def run(self) -> list:
+        """Roll up every tier, lowest first, so late data flows up in one pass"""
+        return [self.run_tier(tier.name) for tier in ROLLUP_TIERS]
+
+    def get_status(self) -> dict:
+        now = datetime.utcnow()
+        rows = {row.tier: row for row in TelemetryRollupWatermark.query.all()}
+        pending = dict(db.session.execute(
+            text("SELECT tier, COUNT(*) FROM telemetry_rollup_dirty GROUP BY tier")
+        ).fetchall())
+        status = {}
+        for tier in ROLLUP_TIERS:
+            row = rows.get(tier.name)
+            caught_up = row.caught_up_at if row else None
+            status[tier.name] = {
+                'target': tier.target,
+                'last_source_id': row.last_source_id if row else None,
+                'high_source_id': row.high_source_id if row else None,
+                'pending_buckets': int(pending.get(tier.name, 0)),
+                'last_run_at': row.last_run_at.isoformat() if row and row.last_run_at else None,
+                'last_duration_ms': row.last_duration_ms if row else None,
+                'lag_seconds': round((now - caught_up).total_seconds(), 1) if caught_up else None,
+            }
+        return status
+
+    def _export_lag(self, name: str):
+        try:
+            row = TelemetryRollupWatermark.query.filter_by(tier=name).first()
+            if row is None or row.caught_up_at is None:
+                return
+            from services.metrics_service import set_rollup_lag
+            set_rollup_lag(name, (datetime.utcnow() - row.caught_up_at).total_seconds())
+        except Exception as e:
+            logger.debug(f"Rollup lag export skipped: {e}")
+
+
+rollup_engine = TelemetryRollupEngine()
@@ -4,8 +4,7 @@ Telemetry Scheduler Service
 
 Scheduled jobs for:
 - Partition cleanup (hourly)
-- 5-minute rollup (every 5 minutes)
-- Daily rollup (daily at 00:30 UTC)
+- Incremental rollup raw -> 5min -> hourly / daily (every 5 minutes)
 - History cleanup (daily)
 """
 
@@ -119,18 +118,10 @@ class TelemetrySchedulerService:
         )
         
         self._scheduler.add_job(
-            self._rollup_5min_job,
+            self._rollup_job,
             IntervalTrigger(minutes=5),
-            id='telemetry_rollup_5min',
-            name='Rollup to 5-minute buckets',
-            replace_existing=True
-        )
-        
-        self._scheduler.add_job(
-            self._rollup_daily_job,
-            CronTrigger(hour=0, minute=30),
-            id='telemetry_rollup_daily',
-            name='Rollup to daily aggregates',
+            id='telemetry_rollup',
+            name='Incremental rollup (5min, hourly, daily)',
             replace_existing=True
         )
         
@@ -153,7 +144,7 @@ class TelemetrySchedulerService:
         self._scheduler.start()
         self._is_running = True
         atexit.register(self.stop)
-        logger.info("Telemetry scheduler started successfully with 5 jobs")
+        logger.info("Telemetry scheduler started successfully with 4 jobs")
         
         return True
     
@@ -170,32 +161,19 @@ class TelemetrySchedulerService:
             except Exception as e:
                 logger.error(f"[TelemetryScheduler] Raw cleanup failed: {e}")
     
-    def _rollup_5min_job(self):
-        """Aggregate raw data into 5-minute buckets"""
+    def _rollup_job(self):
+        """Roll new raw data up through every tier (late data included)"""
         if not self._app:
             return
         
         with self._app.app_context():
             try:
-                from services.telemetry_storage import TelemetryStorageManager
-                affected = TelemetryStorageManager.rollup_to_5min()
-                if affected > 0:
-                    logger.debug(f"[TelemetryScheduler] 5-min rollup: {affected} buckets")
-            except Exception as e:
-                logger.error(f"[TelemetryScheduler] 5-min rollup failed: {e}")
-    
-    def _rollup_daily_job(self):
-        """Aggregate 5-minute history into daily summaries"""
-        if not self._app:
-            return
-        
-        with self._app.app_context():
-            try:
-                from services.telemetry_storage import TelemetryStorageManager
-                affected = TelemetryStorageManager.rollup_to_daily()
-                logger.info(f"[TelemetryScheduler] Daily rollup completed: {affected} records")
+                from services.telemetry_rollup import rollup_engine
+                for result in rollup_engine.run():
+                    if result.get('buckets'):
+                        logger.debug(f"[TelemetryScheduler] {result['tier']} rollup: {result['buckets']} buckets")
             except Exception as e:
-                logger.error(f"[TelemetryScheduler] Daily rollup failed: {e}")
+                logger.error(f"[TelemetryScheduler] Rollup failed: {e}")
     
     def _cleanup_history_job(self):
         """Cleanup 5-minute history older than 60 days"""
@@ -10,14 +10,17 @@ Data Layers:
 - telemetry_raw_24h: Raw data, 24h retention
 - miner_telemetry_live: Current snapshot, one record per miner
 - telemetry_history_5min: 5-minute aggregates, 90 day retention
+- telemetry_history_hourly: hourly aggregates, 180 day retention
 - telemetry_daily: Daily aggregates, 365 day retention
 """
 
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Sequence
+
+import numpy as np
 from flask import current_app
-from sqlalchemy import text, func
+from sqlalchemy import DateTime, JSON, text, func
 from db import db
 
 logger = logging.getLogger(__name__)
@@ -27,9 +30,108 @@ class TelemetryLayer:
     RAW_24H = 'telemetry_raw_24h'
     LIVE = 'miner_telemetry_live'
     HISTORY_5MIN = 'telemetry_history_5min'
+    HISTORY_HOURLY = 'telemetry_history_hourly'
     DAILY = 'telemetry_daily'
 
 
+# History tiers, finest first: (resolution, table, time column, bucket seconds, retention days)
+HISTORY_TIERS = (
+    ('5min', TelemetryLayer.HISTORY_5MIN, 'bucket_ts', 300, 60),
+    ('hourly', TelemetryLayer.HISTORY_HOURLY, 'bucket_ts', 3600, 180),
+    ('daily', TelemetryLayer.DAILY, 'day', 86400, None),
+)
+
+# Default points per series when get_history picks the resolution itself
+HISTORY_POINT_BUDGET = 300
+
+# Rows per keyset page when streaming the whole live layer (iter_live)
+LIVE_CHUNK_SIZE = 1000
+
+LIVE_COLUMNS = """
+    miner_id, site_id, online, last_seen,
+    hashrate_ghs, hashrate_5s_ghs, hashrate_expected_ghs,
+    temperature_avg, temperature_max, temperature_min,
+    fan_speeds, frequency_avg,
+    accepted_shares, rejected_shares, hardware_errors,
+    uptime_seconds, power_consumption, efficiency,
+    pool_url, worker_name, model, firmware_version,
+    error_message, boards_healthy, boards_total,
+    pool_latency_ms, overall_health, updated_at
+"""
+
+
+# Chart downsampling: default points per series and supported methods
+CHART_MAX_POINTS = 500
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of n_out points that keep the shape
+    
+    The first and last points are always kept; the rest is split into
+    n_out - 2 equal buckets and each bucket keeps the point forming the
+    largest triangle with the previously kept point and the next bucket's
+    mean. Bucket means are computed at once; the per-bucket areas are
+    vectorized, only the chain of selected points is sequential.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n) if n <= n_out else np.array([0, n - 1])
+    
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # The bucket after the last one is the final point itself
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+    
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[prev], y[prev]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        prev = lo + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min/max envelope: the lowest and highest point of n_out // 2 equal buckets"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(n_out // 2, 1)
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample_indices(x: Sequence, y: Sequence, max_points: int, method: str = 'lttb') -> np.ndarray:
+    """Indices (ascending) of at most max_points samples of y; None values are skipped"""
+    y = np.array([np.nan if v is None else v for v in y], dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max_points:
+        return valid
+    x = np.asarray(x, dtype=float)[valid]
+    y = y[valid]
+    if method == 'minmax':
+        return valid[minmax_indices(y, max_points)]
+    return valid[lttb_indices(x, y, max_points)]
+
+
+def time_axis(timestamps: Sequence) -> np.ndarray:
+    """Milliseconds since epoch for LTTB, sample positions when not parseable"""
+    try:
+        return np.array(timestamps, dtype='datetime64[ms]').astype(np.int64).astype(float)
+    except (TypeError, ValueError):
+        return np.arange(len(timestamps), dtype=float)
+
+
 class TelemetryService:
     """Unified Telemetry Service - Single Source of Truth"""
     
@@ -68,17 +170,28 @@ class TelemetryService:
     
     @staticmethod
     def get_live(site_id: Optional[int] = None, miner_id: Optional[str] = None, 
-                 online_only: bool = False, limit: int = 1000) -> List[Dict]:
+                 online_only: bool = False, limit: int = 1000, snapshot=None) -> List[Dict]:
         """Get current miner status from live layer
         
+        A single site is served from the live snapshot store (no SQL once the
+        snapshot is loaded); pass ``snapshot`` to reuse one already fetched for
+        an ETag check. Cross-site queries read miner_telemetry_live.
+        
         Returns standardized format with metadata.
         """
+        if site_id:
+            from services.live_snapshot_store import live_snapshots
+            snapshot = snapshot or live_snapshots.get_site(site_id)
+            rows = snapshot.by_updated_desc()
+            if miner_id:
+                rows = [row for row in rows if row.miner_id == miner_id]
+            if online_only:
+                rows = [row for row in rows if row.online]
+            return TelemetryService._format_live(rows[:limit])
+        
         conditions = []
         params = {'limit': limit}
         
-        if site_id:
-            conditions.append("site_id = :site_id")
-            params['site_id'] = site_id
         if miner_id:
             conditions.append("miner_id = :miner_id")
             params['miner_id'] = miner_id
@@ -88,16 +201,7 @@ class TelemetryService:
         where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
         
         sql = text(f"""
-            SELECT 
-                miner_id, site_id, online, last_seen,
-                hashrate_ghs, hashrate_5s_ghs, hashrate_expected_ghs,
-                temperature_avg, temperature_max, temperature_min,
-                fan_speeds, frequency_avg,
-                accepted_shares, rejected_shares, hardware_errors,
-                uptime_seconds, power_consumption, efficiency,
-                pool_url, worker_name, model, firmware_version,
-                error_message, boards_healthy, boards_total,
-                pool_latency_ms, overall_health, updated_at
+            SELECT {LIVE_COLUMNS}
             FROM miner_telemetry_live
             {where_clause}
             ORDER BY updated_at DESC NULLS LAST
@@ -105,8 +209,49 @@ class TelemetryService:
         """)
         
         result = db.session.execute(sql, params)
-        rows = result.fetchall()
+        return TelemetryService._format_live(result.fetchall())
+    
+    @staticmethod
+    def iter_live(site_id: Optional[int] = None, online_only: bool = False,
+                  chunk_size: int = LIVE_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        """Stream the live layer in chunks ordered by (site_id, miner_id)
+        
+        Each page resumes after the last (site_id, miner_id) of the previous
+        one (keyset on uq_site_miner), so every miner is visited exactly once
+        whatever the fleet size and only one chunk is held at a time. Miners of
+        a site are contiguous across chunks.
         
+        Yields:
+            Lists of at most chunk_size records in the get_live format
+        """
+        conditions = ["(site_id, miner_id) > (:after_site, :after_miner)"]
+        params = {'limit': chunk_size, 'after_site': -1, 'after_miner': ''}
+        if site_id:
+            conditions.append("site_id = :site_id")
+            params['site_id'] = site_id
+        if online_only:
+            conditions.append("online = true")
+        
+        sql = text(f"""
+            SELECT {LIVE_COLUMNS}
+            FROM miner_telemetry_live
+            WHERE {' AND '.join(conditions)}
+            ORDER BY site_id, miner_id
+            LIMIT :limit
+        """).columns(last_seen=DateTime(), updated_at=DateTime(), fan_speeds=JSON())
+        
+        while True:
+            rows = db.session.execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield TelemetryService._format_live(rows)
+            if len(rows) < chunk_size:
+                return
+            params['after_site'], params['after_miner'] = rows[-1].site_id, rows[-1].miner_id
+    
+    @staticmethod
+    def _format_live(rows) -> List[Dict]:
+        """Live rows (SQL rows or LiveMinerSnapshot) to the standardized format"""
         miners = []
         for row in rows:
             hashrate_ths = (row.hashrate_ghs or 0) / 1000  # Convert GH/s to TH/s
@@ -165,10 +310,50 @@ class TelemetryService:
         
         return miners
     
+    @staticmethod
+    def select_resolution(start: datetime, end: datetime, points: Optional[int] = None,
+                          resolution: str = 'auto', now: Optional[datetime] = None,
+                          archived: tuple = ()) -> tuple:
+        """Pick the history tier for a time range
+        
+        Only tiers whose retention still covers ``start`` (or that have a cold
+        archive, listed in ``archived``) are considered. An
+        explicit resolution is honoured when it covers the range, otherwise the
+        next coarser tier is used. ``'auto'`` picks the coarsest tier that still
+        yields at least ``points`` buckets per series (the finest available
+        tier when none does), so long ranges read a few hundred pre-aggregated
+        rows per miner instead of thousands of 5-minute rows.
+        
+        Returns:
+            (resolution, table, time_col, bucket_seconds)
+        """
+        now = now or datetime.utcnow()
+        budget = points or HISTORY_POINT_BUDGET
+        covering = [
+            tier for tier in HISTORY_TIERS
+            if tier[4] is None or tier[0] in archived or start >= now - timedelta(days=tier[4])
+        ]
+        names = [tier[0] for tier in HISTORY_TIERS]
+        
+        if resolution in names:
+            wanted = names.index(resolution)
+            for tier in covering:
+                if names.index(tier[0]) >= wanted:
+                    return tier[:4]
+        
+        span = max((end - start).total_seconds(), 0)
+        for tier in reversed(covering):
+            if span / tier[3] >= budget:
+                return tier[:4]
+        return covering[0][:4]
+    
     @staticmethod
     def get_history(site_id: int, start: datetime, end: datetime,
                     miner_id: Optional[str] = None,
-                    resolution: str = '5min') -> Dict:
+                    resolution: str = 'auto',
+                    points: Optional[int] = None,
+                    max_points: Optional[int] = None,
+                    downsample: str = 'lttb') -> Dict:
         """Get historical telemetry data
         
         Args:
@@ -176,27 +361,35 @@ class TelemetryService:
             start: Start time
             end: End time
             miner_id: Optional miner filter
-            resolution: '5min', 'hourly', 'daily'
+            resolution: 'auto', '5min', 'hourly', 'daily'
+            points: Point budget per series for 'auto' (default HISTORY_POINT_BUDGET)
+            max_points: Downsample each series to at most this many points
+            downsample: 'lttb' or 'minmax' (see TelemetryService.downsample)
         
         Returns standardized format with metadata.
         """
-        duration = end - start
-        
-        if resolution == 'daily' or duration.days > 60:
-            table = 'telemetry_daily'
-            time_col = 'day'
-            source = 'telemetry_daily'
-        elif resolution == 'hourly':
-            table = 'telemetry_history_5min'
-            time_col = 'bucket_ts'
-            source = 'telemetry_history_5min (hourly aggregated)'
-        else:
-            table = 'telemetry_history_5min'
-            time_col = 'bucket_ts'
-            source = 'telemetry_history_5min'
+        from services.telemetry_archive import telemetry_archiver, ARCHIVE_TABLES
+        archived = tuple(
+            tier[0] for tier in HISTORY_TIERS if tier[1] in ARCHIVE_TABLES
+        ) if telemetry_archiver.enabled else ()
+        chosen, table, time_col, _ = TelemetryService.select_resolution(
+            start, end, points=points, resolution=resolution, archived=archived
+        )
+        
+        # Days before the archive boundary come from Parquet, the rest from PostgreSQL
+        archive_rows = []
+        db_start = start
+        boundary = telemetry_archiver.archived_through(table) if chosen in archived else None
+        if boundary is not None:
+            boundary_ts = datetime.combine(boundary, datetime.min.time())
+            if start < boundary_ts:
+                archive_rows = telemetry_archiver.read_range(
+                    table, site_id, start, min(end, boundary_ts - timedelta(microseconds=1)), miner_id
+                )
+                db_start = boundary_ts
         
         conditions = [f"{time_col} >= :start", f"{time_col} <= :end", "site_id = :site_id"]
-        params = {'start': start, 'end': end, 'site_id': site_id}
+        params = {'start': db_start, 'end': end, 'site_id': site_id}
         
         if miner_id:
             conditions.append("miner_id = :miner_id")
@@ -204,47 +397,26 @@ class TelemetryService:
         
         where_clause = ' AND '.join(conditions)
         
-        if resolution == 'hourly' and table == 'telemetry_history_5min':
-            sql = text(f"""
-                SELECT 
-                    miner_id,
-                    date_trunc('hour', bucket_ts) AS ts,
-                    AVG(avg_hashrate_ths) AS hashrate_ths,
-                    MAX(max_hashrate_ths) AS max_hashrate_ths,
-                    AVG(avg_temp_c) AS temp_c,
-                    MAX(max_temp_c) AS max_temp_c,
-                    AVG(avg_power_w) AS power_w,
-                    AVG(online_ratio) AS online_ratio,
-                    SUM(samples) AS samples
-                FROM {table}
-                WHERE {where_clause}
-                GROUP BY miner_id, date_trunc('hour', bucket_ts)
-                ORDER BY miner_id, ts
-            """)
-        else:
-            hashrate_col = 'avg_hashrate_ths'
-            temp_col = 'avg_temp_c'
-            power_col = 'avg_power_w' if table == 'telemetry_history_5min' else 'avg_power_w'
-            
-            sql = text(f"""
-                SELECT 
-                    miner_id,
-                    {time_col} AS ts,
-                    {hashrate_col} AS hashrate_ths,
-                    max_hashrate_ths,
-                    min_hashrate_ths,
-                    {temp_col} AS temp_c,
-                    max_temp_c,
-                    {power_col} AS power_w,
-                    online_ratio,
-                    samples
-                FROM {table}
-                WHERE {where_clause}
-                ORDER BY miner_id, {time_col}
-            """)
+        sql = text(f"""
+            SELECT 
+                miner_id,
+                {time_col} AS ts,
+                avg_hashrate_ths AS hashrate_ths,
+                max_hashrate_ths,
+                min_hashrate_ths,
+                avg_temp_c AS temp_c,
+                max_temp_c,
+                avg_power_w AS power_w,
+                online_ratio,
+                samples
+            FROM {table}
+            WHERE {where_clause}
+            ORDER BY miner_id, {time_col}
+        """)
         
-        result = db.session.execute(sql, params)
-        rows = result.fetchall()
+        rows = db.session.execute(sql, params).fetchall() if db_start <= end else []
+        if archive_rows:
+            rows = sorted(archive_rows + list(rows), key=lambda r: r.miner_id)
         
         series_map = {}
         for row in rows:
@@ -264,17 +436,48 @@ class TelemetryService:
                 'samples': row.samples if hasattr(row, 'samples') else None,
             })
         
+        total_points = sum(len(data) for data in series_map.values())
+        if max_points:
+            for mid, data in series_map.items():
+                series_map[mid] = TelemetryService.downsample(
+                    data, max_points, ('hashrate_ths', 'temp_c', 'power_w'), method=downsample
+                )
+        
         return {
             'series': [{'miner_id': mid, 'data': data} for mid, data in series_map.items()],
             '_meta': {
-                'source': source,
-                'resolution': resolution,
+                'source': table,
+                'resolution': chosen,
+                'total_points': total_points,
+                'max_points': max_points,
+                'downsample': downsample if max_points else None,
+                'requested_resolution': resolution,
+                'archived_rows': len(archive_rows),
                 'start': start.isoformat(),
                 'end': end.isoformat(),
                 'site_id': site_id,
             }
         }
     
+    @staticmethod
+    def downsample(points: List[Dict], max_points: Optional[int], value_keys: Sequence[str],
+                   time_key: str = 'ts', method: str = 'lttb') -> List[Dict]:
+        """Thin a time-ordered point list for charting
+        
+        Each value key is downsampled on its own share of max_points and the
+        kept indices are merged, so peaks and drops of every plotted metric
+        survive. max_points of 0/None returns the points unchanged.
+        """
+        if not max_points or len(points) <= max_points:
+            return points
+        x = time_axis([p[time_key] for p in points])
+        per_key = max(max_points // len(value_keys), 3)
+        keep = np.unique(np.concatenate([
+            downsample_indices(x, [p.get(key) for p in points], per_key, method)
+            for key in value_keys
+        ]))
+        return [points[i] for i in keep]
+    
     @staticmethod
     def get_site_summary(site_id: int) -> Dict:
         """Get site-level summary from live data"""
@@ -390,59 +593,35 @@ class TelemetryService:
     def aggregate_to_5min():
         """Background job: Aggregate raw data to 5-min buckets
         
-        Should be called every 5 minutes by APScheduler.
+        Delegates to the incremental rollup engine shared with
+        TelemetryStorageManager, so both entry points produce the same buckets.
         """
-        try:
-            sql = text("""
-                INSERT INTO telemetry_history_5min (
-                    bucket_ts, site_id, miner_id,
-                    avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
-                    avg_temp_c, max_temp_c, avg_power_w, avg_fan_rpm,
-                    online_ratio, samples, created_at
-                )
-                SELECT 
-                    date_trunc('minute', ts) - (EXTRACT(MINUTE FROM ts)::INT % 5) * INTERVAL '1 minute' AS bucket_ts,
-                    site_id, miner_id,
-                    AVG(hashrate_ths) AS avg_hashrate_ths,
-                    MAX(hashrate_ths) AS max_hashrate_ths,
-                    MIN(hashrate_ths) AS min_hashrate_ths,
-                    AVG(temperature_c) AS avg_temp_c,
-                    MAX(temperature_c) AS max_temp_c,
-                    AVG(power_w) AS avg_power_w,
-                    AVG(fan_rpm) AS avg_fan_rpm,
-                    COUNT(CASE WHEN status = 'online' THEN 1 END)::FLOAT / NULLIF(COUNT(*), 0) AS online_ratio,
-                    COUNT(*) AS samples,
-                    NOW() AS created_at
-                FROM telemetry_raw_24h
-                WHERE ts >= NOW() - INTERVAL '10 minutes'
-                  AND ts < NOW() - INTERVAL '5 minutes'
-                GROUP BY bucket_ts, site_id, miner_id
-                ON CONFLICT (bucket_ts, site_id, miner_id) DO NOTHING
-            """)
-            
-            db.session.execute(sql)
-            db.session.commit()
-            logger.debug("Aggregated telemetry to 5-min buckets")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to aggregate telemetry: {e}")
-            db.session.rollback()
-            return False
+        from services.telemetry_rollup import rollup_engine
+        result = rollup_engine.run_tier('5min')
+        return 'error' not in result
     
     @staticmethod
     def cleanup_old_data():
         """Background job: Clean up old data based on retention policy
         
-        Should be called daily by APScheduler.
+        Should be called daily by APScheduler. Partitioned tables drop whole
+        expired partitions instead of deleting rows.
         """
+        from services.telemetry_partitions import partition_manager
         try:
-            db.session.execute(text(
-                "DELETE FROM telemetry_raw_24h WHERE ts < NOW() - INTERVAL '24 hours'"
-            ))
-            
-            db.session.execute(text(
-                "DELETE FROM telemetry_history_5min WHERE bucket_ts < NOW() - INTERVAL '90 days'"
-            ))
+            now = datetime.utcnow()
+            retention = (
+                ('telemetry_raw_24h', 'ts', now - timedelta(hours=24)),
+                ('telemetry_history_5min', 'bucket_ts', now - timedelta(days=90)),
+            )
+            for table, column, cutoff in retention:
+                if partition_manager.is_partitioned(table):
+                    partition_manager.drop_expired(table, cutoff)
+                else:
+                    db.session.execute(
+                        text(f"DELETE FROM {table} WHERE {column} < :cutoff"),
+                        {'cutoff': cutoff}
+                    )
             
             db.session.execute(text(
                 "DELETE FROM telemetry_daily WHERE day < NOW() - INTERVAL '365 days'"
@@ -5,6 +5,7 @@
 Layer 1: telemetry_raw_24h - Partitioned by hour, TTL 24h (DROP PARTITION)
 Layer 2: miner_telemetry_live - Latest status per miner (existing)
 Layer 3: telemetry_history_5min - 5-minute rollups, 60 days retention
+         telemetry_history_hourly - hourly rollups, 180 days retention
 Layer 4: telemetry_daily - Daily aggregates, long-term archive
 
 Storage estimate for 6000 miners @ 30s polling:
@@ -16,11 +17,15 @@ Storage estimate for 6000 miners @ 30s polling:
 
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy import text
+from sqlalchemy import BigInteger, Integer, text
 from db import db
+from services.telemetry_copy_writer import copy_insert_mappings
 
 logger = logging.getLogger(__name__)
 
+# BIGINT on PostgreSQL; INTEGER on SQLite so the id aliases ROWID and autoincrements
+BigIntegerPK = BigInteger().with_variant(Integer(), 'sqlite')
+
 
 class TelemetryRaw24h(db.Model):
     """
@@ -29,7 +34,7 @@ class TelemetryRaw24h(db.Model):
     """
     __tablename__ = 'telemetry_raw_24h'
     
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     ts = db.Column(db.DateTime, nullable=False, index=True)
     site_id = db.Column(db.Integer, nullable=False)
     miner_id = db.Column(db.String(50), nullable=False)
@@ -55,7 +60,7 @@ class TelemetryHistory5min(db.Model):
     """
     __tablename__ = 'telemetry_history_5min'
     
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     bucket_ts = db.Column(db.DateTime, nullable=False)
     site_id = db.Column(db.Integer, nullable=False)
     miner_id = db.Column(db.String(50), nullable=False)
@@ -79,13 +84,44 @@ class TelemetryHistory5min(db.Model):
     )
 
 
+class TelemetryHistoryHourly(db.Model):
+    """
+    Layer 3b: Hourly rollup aggregates (from 5-minute history)
+    180-day retention; serves week-to-quarter range charts
+    """
+    __tablename__ = 'telemetry_history_hourly'
+    
+    id = db.Column(BigIntegerPK, primary_key=True)
+    bucket_ts = db.Column(db.DateTime, nullable=False)
+    site_id = db.Column(db.Integer, nullable=False)
+    miner_id = db.Column(db.String(50), nullable=False)
+    
+    avg_hashrate_ths = db.Column(db.Float, default=0)
+    max_hashrate_ths = db.Column(db.Float, default=0)
+    min_hashrate_ths = db.Column(db.Float, default=0)
+    avg_temp_c = db.Column(db.Float, default=0)
+    max_temp_c = db.Column(db.Float, default=0)
+    avg_power_w = db.Column(db.Float, default=0)
+    avg_fan_rpm = db.Column(db.Float, default=0)
+    online_ratio = db.Column(db.Float, default=1.0)
+    samples = db.Column(db.Integer, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_history_hourly_site_miner_bucket', 'site_id', 'miner_id', 'bucket_ts'),
+        db.Index('idx_history_hourly_bucket', 'bucket_ts'),
+        db.UniqueConstraint('site_id', 'miner_id', 'bucket_ts', name='uq_history_hourly_bucket'),
+    )
+
+
 class TelemetryDaily(db.Model):
     """
     Layer 4: Daily aggregates for long-term archive
     """
     __tablename__ = 'telemetry_daily'
     
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     day = db.Column(db.Date, nullable=False)
     site_id = db.Column(db.Integer, nullable=False)
     miner_id = db.Column(db.String(50), nullable=False)
@@ -117,17 +153,35 @@ class TelemetryStorageManager:
     
     RAW_RETENTION_HOURS = 26  # Keep 26 hours to ensure full 24h window
     HISTORY_RETENTION_DAYS = 60
+    HOURLY_RETENTION_DAYS = 180
     
     @staticmethod
     def ensure_tables_exist():
-        """Create tables if they don't exist (non-partitioned fallback)"""
+        """
+        Create tables if they don't exist
+
+        On PostgreSQL telemetry_raw_24h / telemetry_history_5min are converted
+        to range-partitioned tables (a plain table left by an older release is
+        migrated in place) and upcoming partitions are pre-created. Other
+        dialects keep the plain tables.
+        """
+        # Register the rollup / archive bookkeeping models before create_all
+        import services.telemetry_rollup  # noqa: F401
+        import services.telemetry_archive  # noqa: F401
         try:
             db.create_all()
             logger.info("Telemetry storage tables created/verified")
-            return True
         except Exception as e:
             logger.error(f"Failed to create telemetry tables: {e}")
             return False
+
+        from services.telemetry_partitions import partition_manager
+        if partition_manager.is_supported():
+            for model in (TelemetryRaw24h, TelemetryHistory5min, TelemetryHistoryHourly):
+                if not partition_manager.is_partitioned(model.__tablename__):
+                    partition_manager.migrate_table(model)
+                partition_manager.ensure_partitions(model.__tablename__)
+        return True
     
     @staticmethod
     def batch_insert_raw(records: list) -> int:
@@ -161,7 +215,7 @@ class TelemetryStorageManager:
                     'pool_url': r.get('pool_url', '')[:200] if r.get('pool_url') else None,
                 })
             
-            db.session.bulk_insert_mappings(TelemetryRaw24h, inserts)
+            copy_insert_mappings(TelemetryRaw24h, inserts)
             db.session.commit()
             
             logger.debug(f"Inserted {len(inserts)} raw telemetry records")
@@ -176,14 +230,20 @@ class TelemetryStorageManager:
     def cleanup_old_raw_data() -> int:
         """
         Delete raw data older than retention period
+        Partitioned table: pre-create upcoming hourly partitions and DROP expired ones
         For non-partitioned table, use DELETE (less efficient but works)
         
         Returns:
-            Number of records deleted
+            Number of records deleted (partitions dropped when partitioned)
         """
+        from services.telemetry_partitions import partition_manager
         try:
             cutoff = datetime.utcnow() - timedelta(hours=TelemetryStorageManager.RAW_RETENTION_HOURS)
             
+            if partition_manager.is_partitioned('telemetry_raw_24h'):
+                partition_manager.ensure_partitions('telemetry_raw_24h')
+                return partition_manager.drop_expired('telemetry_raw_24h', cutoff)
+            
             result = db.session.execute(
                 text("DELETE FROM telemetry_raw_24h WHERE ts < :cutoff"),
                 {'cutoff': cutoff}
@@ -204,156 +264,77 @@ class TelemetryStorageManager:
     @staticmethod
     def rollup_to_5min() -> int:
         """
-        Aggregate raw data into 5-minute buckets
+        Aggregate new raw data into 5-minute buckets
+        Delegates to the incremental rollup engine (services/telemetry_rollup.py)
         
         Returns:
             Number of buckets created/updated
         """
-        try:
-            now = datetime.utcnow()
-            bucket_start = now.replace(second=0, microsecond=0)
-            bucket_start = bucket_start.replace(minute=(bucket_start.minute // 5) * 5)
-            bucket_end = bucket_start + timedelta(minutes=5)
-            lookback = bucket_start - timedelta(minutes=10)
-            
-            sql = text("""
-                INSERT INTO telemetry_history_5min 
-                    (bucket_ts, site_id, miner_id, avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
-                     avg_temp_c, max_temp_c, avg_power_w, avg_fan_rpm, online_ratio, samples, created_at)
-                SELECT 
-                    date_trunc('hour', ts) + 
-                        (EXTRACT(minute FROM ts)::int / 5 * INTERVAL '5 minutes') as bucket_ts,
-                    site_id,
-                    miner_id,
-                    AVG(hashrate_ths) as avg_hashrate_ths,
-                    MAX(hashrate_ths) as max_hashrate_ths,
-                    MIN(hashrate_ths) as min_hashrate_ths,
-                    AVG(temperature_c) as avg_temp_c,
-                    MAX(temperature_c) as max_temp_c,
-                    AVG(power_w) as avg_power_w,
-                    AVG(fan_rpm) as avg_fan_rpm,
-                    SUM(CASE WHEN status = 'online' THEN 1 ELSE 0 END)::float / COUNT(*) as online_ratio,
-                    COUNT(*) as samples,
-                    NOW() as created_at
-                FROM telemetry_raw_24h
-                WHERE ts >= :lookback AND ts < :bucket_end
-                GROUP BY bucket_ts, site_id, miner_id
-                ON CONFLICT (site_id, miner_id, bucket_ts) 
-                DO UPDATE SET
-                    avg_hashrate_ths = EXCLUDED.avg_hashrate_ths,
-                    max_hashrate_ths = EXCLUDED.max_hashrate_ths,
-                    min_hashrate_ths = EXCLUDED.min_hashrate_ths,
-                    avg_temp_c = EXCLUDED.avg_temp_c,
-                    max_temp_c = EXCLUDED.max_temp_c,
-                    avg_power_w = EXCLUDED.avg_power_w,
-                    avg_fan_rpm = EXCLUDED.avg_fan_rpm,
-                    online_ratio = EXCLUDED.online_ratio,
-                    samples = EXCLUDED.samples
-            """)
-            
-            result = db.session.execute(sql, {'lookback': lookback, 'bucket_end': bucket_end})
-            db.session.commit()
-            
-            affected = result.rowcount
-            if affected > 0:
-                logger.info(f"Rolled up {affected} 5-minute buckets")
-            
-            return affected
-            
-        except Exception as e:
-            logger.error(f"Rollup to 5min failed: {e}")
-            db.session.rollback()
-            return 0
+        from services.telemetry_rollup import rollup_engine
+        return rollup_engine.run_tier('5min').get('buckets', 0)
     
     @staticmethod
     def rollup_to_daily() -> int:
         """
-        Aggregate 5-minute history into daily summaries
+        Aggregate closed days touched by new 5-minute buckets into daily summaries
+        Delegates to the incremental rollup engine (services/telemetry_rollup.py)
         
         Returns:
             Number of daily records created/updated
         """
-        try:
-            yesterday = (datetime.utcnow() - timedelta(days=1)).date()
-            
-            sql = text("""
-                INSERT INTO telemetry_daily 
-                    (day, site_id, miner_id, avg_hashrate_ths, max_hashrate_ths, min_hashrate_ths,
-                     avg_temp_c, max_temp_c, avg_power_w, total_power_kwh, online_ratio, 
-                     uptime_hours, samples, created_at)
-                SELECT 
-                    DATE(bucket_ts) as day,
-                    site_id,
-                    miner_id,
-                    AVG(avg_hashrate_ths) as avg_hashrate_ths,
-                    MAX(max_hashrate_ths) as max_hashrate_ths,
-                    MIN(min_hashrate_ths) as min_hashrate_ths,
-                    AVG(avg_temp_c) as avg_temp_c,
-                    MAX(max_temp_c) as max_temp_c,
-                    AVG(avg_power_w) as avg_power_w,
-                    SUM(avg_power_w * 5 / 60 / 1000) as total_power_kwh,
-                    AVG(online_ratio) as online_ratio,
-                    SUM(online_ratio * 5 / 60) as uptime_hours,
-                    SUM(samples) as samples,
-                    NOW() as created_at
-                FROM telemetry_history_5min
-                WHERE DATE(bucket_ts) = :yesterday
-                GROUP BY day, site_id, miner_id
-                ON CONFLICT (site_id, miner_id, day) 
-                DO UPDATE SET
-                    avg_hashrate_ths = EXCLUDED.avg_hashrate_ths,
-                    max_hashrate_ths = EXCLUDED.max_hashrate_ths,
-                    min_hashrate_ths = EXCLUDED.min_hashrate_ths,
-                    avg_temp_c = EXCLUDED.avg_temp_c,
-                    max_temp_c = EXCLUDED.max_temp_c,
-                    avg_power_w = EXCLUDED.avg_power_w,
-                    total_power_kwh = EXCLUDED.total_power_kwh,
-                    online_ratio = EXCLUDED.online_ratio,
-                    uptime_hours = EXCLUDED.uptime_hours,
-                    samples = EXCLUDED.samples
-            """)
-            
-            result = db.session.execute(sql, {'yesterday': yesterday})
-            db.session.commit()
-            
-            affected = result.rowcount
-            if affected > 0:
-                logger.info(f"Created {affected} daily aggregate records for {yesterday}")
-            
-            return affected
-            
-        except Exception as e:
-            logger.error(f"Rollup to daily failed: {e}")
-            db.session.rollback()
-            return 0
+        from services.telemetry_rollup import rollup_engine
+        return rollup_engine.run_tier('daily').get('buckets', 0)
     
     @staticmethod
     def cleanup_old_history() -> int:
         """
-        Delete 5-minute history older than retention period
+        Delete 5-minute and hourly history older than their retention periods
+        Partitioned table: pre-create upcoming daily partitions and DROP expired ones
+        With TELEMETRY_ARCHIVE_URI set, expired whole days are written to Parquet
+        first and nothing is removed until the archive succeeded
         
         Returns:
-            Number of records deleted
+            Number of records deleted (partitions dropped when partitioned)
         """
-        try:
-            cutoff = datetime.utcnow() - timedelta(days=TelemetryStorageManager.HISTORY_RETENTION_DAYS)
-            
-            result = db.session.execute(
-                text("DELETE FROM telemetry_history_5min WHERE bucket_ts < :cutoff"),
-                {'cutoff': cutoff}
-            )
-            db.session.commit()
-            
-            deleted = result.rowcount
-            if deleted > 0:
-                logger.info(f"Cleaned up {deleted} old 5-minute history records")
-            
-            return deleted
-            
-        except Exception as e:
-            logger.error(f"Cleanup old history failed: {e}")
-            db.session.rollback()
-            return 0
+        from services.telemetry_archive import telemetry_archiver
+        from services.telemetry_partitions import partition_manager
+        now = datetime.utcnow()
+        retention = (
+            ('telemetry_history_5min', TelemetryStorageManager.HISTORY_RETENTION_DAYS),
+            ('telemetry_history_hourly', TelemetryStorageManager.HOURLY_RETENTION_DAYS),
+        )
+        total = 0
+        for table, days in retention:
+            try:
+                cutoff = now - timedelta(days=days)
+                
+                if telemetry_archiver.enabled:
+                    # Only whole days are archived; keep the partial day in PostgreSQL
+                    cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+                    if not telemetry_archiver.archive_before(table, cutoff):
+                        continue
+                
+                if partition_manager.is_partitioned(table):
+                    partition_manager.ensure_partitions(table)
+                    total += partition_manager.drop_expired(table, cutoff)
+                    continue
+                
+                result = db.session.execute(
+                    text(f"DELETE FROM {table} WHERE bucket_ts < :cutoff"),
+                    {'cutoff': cutoff}
+                )
+                db.session.commit()
+                
+                deleted = result.rowcount
+                if deleted > 0:
+                    logger.info(f"Cleaned up {deleted} old {table} records")
+                total += deleted
+                
+            except Exception as e:
+                logger.error(f"Cleanup old history ({table}) failed: {e}")
+                db.session.rollback()
+        
+        return total
     
     @staticmethod
     def get_storage_stats() -> dict:
@@ -364,6 +345,7 @@ class TelemetryStorageManager:
             tables = [
                 ('telemetry_raw_24h', 'ts'),
                 ('telemetry_history_5min', 'bucket_ts'),
+                ('telemetry_history_hourly', 'bucket_ts'),
                 ('telemetry_daily', 'day'),
                 ('miner_telemetry_live', 'updated_at'),
                 ('miner_telemetry_history', 'timestamp'),
@@ -383,8 +365,10 @@ class TelemetryStorageManager:
                         text(f"SELECT MAX({time_col}) as newest FROM {table}")
                     ).fetchone()
                     
+                    # pg_partition_tree also covers plain tables; a partitioned parent has no storage itself
                     size_result = db.session.execute(
-                        text(f"SELECT pg_size_pretty(pg_total_relation_size('{table}')) as size")
+                        text(f"SELECT pg_size_pretty(COALESCE(SUM(pg_total_relation_size(relid)), 0)) as size "
+                             f"FROM pg_partition_tree('{table}')")
                     ).fetchone()
                     
                     stats[table] = {
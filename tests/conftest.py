@@ -7,6 +7,10 @@ Provides pytest fixtures for Flask integration testing with in-memory SQLite.
 
 import os
 import sys
+import json
+import socket
+import threading
+import time
 import uuid
 import pytest
 from datetime import datetime, timedelta
@@ -408,3 +412,112 @@ def queued_command(app, test_site, test_user, test_miner_asset, test_edge_device
         db.session.commit()
         
     yield {'id': command_id, 'target_ids': [test_miner_asset]}
+
+
+class MockCGMinerServer:
+    """Mock TCP server simulating CGMiner API"""
+    
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.server_socket = None
+        self.running = False
+        self.responses = {}
+        self.commands = []
+        self._thread = None
+    
+    def set_response(self, command: str, response: dict):
+        """Set response for a command"""
+        self.responses[command] = response
+    
+    def start(self):
+        """Start the mock server"""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.port = self.server_socket.getsockname()[1]
+        self.server_socket.listen(5)
+        self.server_socket.settimeout(1.0)
+        self.running = True
+        
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+        time.sleep(0.1)
+    
+    def _serve(self):
+        """Server loop"""
+        while self.running:
+            try:
+                client_socket, addr = self.server_socket.accept()
+                client_socket.settimeout(1.0)
+                
+                data = client_socket.recv(1024)
+                if data:
+                    request = json.loads(data.decode('utf-8'))
+                    command = request.get('command', '')
+                    self.commands.append(command)
+                    
+                    response = self.responses.get(command, {
+                        'STATUS': [{'STATUS': 'E', 'Msg': 'Unknown command'}]
+                    })
+                    
+                    response_bytes = json.dumps(response).encode('utf-8') + b'\x00'
+                    client_socket.sendall(response_bytes)
+                
+                client_socket.close()
+            except socket.timeout:
+                continue
+            except Exception:
+                break
+    
+    def stop(self):
+        """Stop the mock server"""
+        self.running = False
+        if self.server_socket:
+            self.server_socket.close()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+@pytest.fixture
+def mock_server():
+    """Fixture providing a mock CGMiner server"""
+    server = MockCGMinerServer()
+    server.set_response('summary', {
+        'STATUS': [{'STATUS': 'S', 'Msg': 'Summary'}],
+        'SUMMARY': [{
+            'GHS 5s': 95.5,
+            'GHS av': 94.2,
+            'Elapsed': 86400,
+            'Accepted': 1000,
+            'Rejected': 5
+        }]
+    })
+    server.set_response('stats', {
+        'STATUS': [{'STATUS': 'S'}],
+        'STATS': [{
+            'temp1': 65.0,
+            'temp2': 68.0,
+            'temp3': 67.0,
+            'fan1': 4200,
+            'fan2': 4100
+        }]
+    })
+    server.set_response('pools', {
+        'STATUS': [{'STATUS': 'S'}],
+        'POOLS': [{
+            'URL': 'stratum+tcp://pool.example.com:3333',
+            'User': 'worker1',
+            'Status': 'Alive',
+            'Stratum Active': True
+        }]
+    })
+    server.set_response('version', {
+        'STATUS': [{'STATUS': 'S'}],
+        'VERSION': [{'CGMiner': '4.11.1', 'API': '3.7'}]
+    })
+    
+    server.start()
+    yield server
+    server.stop()
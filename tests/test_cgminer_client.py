@@ -2,14 +2,10 @@
 Unit Tests for CGMiner Client
 CGMiner客户端单元测试
 
-Uses mock TCP server to simulate CGMiner responses
+Uses mock TCP server to simulate CGMiner responses (mock_server, tests/conftest.py)
 """
 
 import pytest
-import socket
-import threading
-import json
-import time
 from unittest.mock import patch, MagicMock
 
 import sys
@@ -22,113 +18,6 @@ from services.cgminer_client import (
 )
 
 
-class MockCGMinerServer:
-    """Mock TCP server simulating CGMiner API"""
-    
-    def __init__(self, host='127.0.0.1', port=0):
-        self.host = host
-        self.port = port
-        self.server_socket = None
-        self.running = False
-        self.responses = {}
-        self._thread = None
-    
-    def set_response(self, command: str, response: dict):
-        """Set response for a command"""
-        self.responses[command] = response
-    
-    def start(self):
-        """Start the mock server"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.port = self.server_socket.getsockname()[1]
-        self.server_socket.listen(5)
-        self.server_socket.settimeout(1.0)
-        self.running = True
-        
-        self._thread = threading.Thread(target=self._serve)
-        self._thread.daemon = True
-        self._thread.start()
-        time.sleep(0.1)
-    
-    def _serve(self):
-        """Server loop"""
-        while self.running:
-            try:
-                client_socket, addr = self.server_socket.accept()
-                client_socket.settimeout(1.0)
-                
-                data = client_socket.recv(1024)
-                if data:
-                    request = json.loads(data.decode('utf-8'))
-                    command = request.get('command', '')
-                    
-                    response = self.responses.get(command, {
-                        'STATUS': [{'STATUS': 'E', 'Msg': 'Unknown command'}]
-                    })
-                    
-                    response_bytes = json.dumps(response).encode('utf-8') + b'\x00'
-                    client_socket.sendall(response_bytes)
-                
-                client_socket.close()
-            except socket.timeout:
-                continue
-            except Exception:
-                break
-    
-    def stop(self):
-        """Stop the mock server"""
-        self.running = False
-        if self.server_socket:
-            self.server_socket.close()
-        if self._thread:
-            self._thread.join(timeout=2)
-
-
-@pytest.fixture
-def mock_server():
-    """Fixture providing a mock CGMiner server"""
-    server = MockCGMinerServer()
-    server.set_response('summary', {
-        'STATUS': [{'STATUS': 'S', 'Msg': 'Summary'}],
-        'SUMMARY': [{
-            'GHS 5s': 95.5,
-            'GHS av': 94.2,
-            'Elapsed': 86400,
-            'Accepted': 1000,
-            'Rejected': 5
-        }]
-    })
-    server.set_response('stats', {
-        'STATUS': [{'STATUS': 'S'}],
-        'STATS': [{
-            'temp1': 65.0,
-            'temp2': 68.0,
-            'temp3': 67.0,
-            'fan1': 4200,
-            'fan2': 4100
-        }]
-    })
-    server.set_response('pools', {
-        'STATUS': [{'STATUS': 'S'}],
-        'POOLS': [{
-            'URL': 'stratum+tcp://pool.example.com:3333',
-            'User': 'worker1',
-            'Status': 'Alive',
-            'Stratum Active': True
-        }]
-    })
-    server.set_response('version', {
-        'STATUS': [{'STATUS': 'S'}],
-        'VERSION': [{'CGMiner': '4.11.1', 'API': '3.7'}]
-    })
-    
-    server.start()
-    yield server
-    server.stop()
-
-
 class TestCGMinerClientValidation:
     """Test input validation"""
     
@@ -272,5 +161,65 @@ class TestErrorHandling:
         assert exc_info.value.error_type == 'connection'
 
 
+
+class TestCombinedQuery:
+    """summary+stats+pools in one round trip (edge collector clients)"""
+    
+    COMMANDS = ('summary', 'stats', 'pools')
+    
+    def _combine(self, server):
+        combined = {c: [server.responses[c]] for c in self.COMMANDS}
+        combined['id'] = 1
+        server.set_response('+'.join(self.COMMANDS), combined)
+    
+    def test_client_single_round_trip(self, mock_server):
+        from edge_collector.cgminer_client import CGMinerClient as EdgeClient
+        self._combine(mock_server)
+        
+        data = EdgeClient('127.0.0.1', mock_server.port, max_retries=1).get_all_data()
+        
+        assert mock_server.commands == ['summary+stats+pools']
+        assert data['summary']['SUMMARY'][0]['GHS av'] == 94.2
+        assert data['pools']['POOLS'][0]['User'] == 'worker1'
+    
+    def test_client_falls_back_when_firmware_rejects_combined(self, mock_server):
+        from edge_collector.cgminer_client import CGMinerClient as EdgeClient
+        client = EdgeClient('127.0.0.1', mock_server.port, max_retries=1)
+        
+        data = client.get_all_data()
+        assert data['stats']['STATS'][0]['temp2'] == 68.0
+        assert mock_server.commands == ['summary+stats+pools', 'summary', 'stats', 'pools']
+        
+        # Host remembered: no further combined attempts
+        mock_server.commands.clear()
+        client.get_all_data()
+        assert mock_server.commands == ['summary', 'stats', 'pools']
+    
+    def test_collector_api_fetches_missing_parts(self, mock_server):
+        from edge_collector.cgminer_collector import CGMinerAPI
+        combined = {'summary': [mock_server.responses['summary']],
+                    'stats': [{'STATUS': [{'STATUS': 'E', 'Msg': 'Not allowed'}]}],
+                    'pools': [mock_server.responses['pools']]}
+        mock_server.set_response('+'.join(self.COMMANDS), combined)
+        
+        parts = CGMinerAPI('127.0.0.1', mock_server.port).send_commands(self.COMMANDS)
+        
+        assert mock_server.commands == ['summary+stats+pools', 'stats']
+        assert parts['stats']['STATS'][0]['fan1'] == 4200
+    
+    def test_collector_api_offline_miner_not_retried(self):
+        from edge_collector.cgminer_collector import CGMinerAPI
+        parts = CGMinerAPI('127.0.0.1', 59997, timeout=1).send_commands(self.COMMANDS)
+        assert parts == {'summary': None, 'stats': None, 'pools': None}
+    
+    def test_client_does_not_load_collector_app(self):
+        import subprocess
+        import sys
+        code = ("import logging, sys, edge_collector.cgminer_client; "
+                "assert 'edge_collector.cgminer_collector' not in sys.modules; "
+                "assert not logging.getLogger().handlers")
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
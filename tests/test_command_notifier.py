@@ -0,0 +1,170 @@
+"""
+Command Notifier Tests
+命令唤醒通知测试
+
+Covers services/command_notifier.py without the app fixtures: per-site
+version/wait/notify, wakeups staged on the session and sent after commit,
+and the long-poll wait cap.
+"""
+
+import os
+import threading
+import time
+import uuid
+import pytest
+from datetime import datetime, timedelta
+
+os.environ.setdefault('SESSION_SECRET', 'test-secret-key-for-testing-only')
+
+
+@pytest.fixture
+def notifier(monkeypatch):
+    """The process notifier with in-process wakeups only (no Redis)"""
+    from services.command_notifier import command_notifier
+    monkeypatch.setattr(command_notifier, '_redis_checked', True)
+    monkeypatch.setattr(command_notifier, '_redis', None)
+    return command_notifier
+
+
+@pytest.fixture
+def site_id():
+    """Fresh site id: the notifier is a process singleton and keeps its counters"""
+    return uuid.uuid4().int % 10 ** 9
+
+
+@pytest.fixture
+def command_app(notifier):
+    from flask import Flask
+    from db import db
+    import models  # noqa: F401
+    import models_hi  # noqa: F401
+    import models_device_encryption  # noqa: F401
+    import models_remote_control  # noqa: F401
+    import api.collector_api  # noqa: F401  (registers MinerCommand with the notifier)
+
+    test_app = Flask(__name__)
+    test_app.config['TESTING'] = True
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        db.metadata.create_all(db.engine, tables=[db.metadata.tables['miner_commands']])
+        yield test_app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _command(site_id, status='pending'):
+    from api.collector_api import MinerCommand
+    now = datetime.utcnow()
+    return MinerCommand(miner_id='M1', site_id=site_id, command_type='reboot', status=status,
+                        priority=5, created_at=now, expires_at=now + timedelta(hours=1))
+
+
+class TestCommandNotifier:
+
+    def test_wait_times_out_without_wakeup(self, notifier, site_id):
+        since = notifier.version(site_id)
+        start = time.monotonic()
+        assert notifier.wait(site_id, since, 0.1) is False
+        assert time.monotonic() - start >= 0.1
+        assert notifier.version(site_id) == since
+
+    def test_notify_wakes_parked_wait(self, notifier, site_id):
+        since = notifier.version(site_id)
+        timer = threading.Timer(0.1, notifier.notify, args=(site_id,))
+        timer.start()
+        start = time.monotonic()
+        assert notifier.wait(site_id, since, 5) is True
+        assert time.monotonic() - start < 2
+        timer.join()
+        assert notifier.version(site_id) == since + 1
+
+    def test_wakeup_before_wait_is_not_lost(self, notifier, site_id):
+        since = notifier.version(site_id)
+        notifier.notify(site_id)
+        start = time.monotonic()
+        assert notifier.wait(site_id, since, 5) is True
+        assert time.monotonic() - start < 0.5
+
+    def test_notify_only_wakes_its_site(self, notifier, site_id):
+        other = site_id + 1
+        since = notifier.version(site_id)
+        notifier.notify(other)
+        assert notifier.wait(site_id, since, 0.05) is False
+
+    def test_memory_backend_rechecks_periodically(self, notifier, site_id, monkeypatch):
+        import services.command_notifier as module
+        monkeypatch.setattr(module, 'COMMAND_LONG_POLL_RECHECK_SECONDS', 0.1)
+
+        assert notifier.backend == 'memory'
+        start = time.monotonic()
+        assert module.wait_for_commands(site_id, notifier.version(site_id), 30) is False
+        assert time.monotonic() - start < 2
+
+
+class TestCommitWakeups:
+
+    def test_wakeup_sent_only_after_commit(self, command_app, notifier, site_id):
+        from db import db
+
+        since = notifier.version(site_id)
+        db.session.add(_command(site_id))
+        db.session.flush()
+        assert notifier.version(site_id) == since
+
+        db.session.commit()
+        assert notifier.version(site_id) == since + 1
+        assert 'pending_command_wakeups' not in db.session.info
+
+    def test_rollback_drops_staged_wakeups(self, command_app, notifier, site_id):
+        from db import db
+
+        since = notifier.version(site_id)
+        db.session.add(_command(site_id))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert notifier.version(site_id) == since
+
+    def test_only_dispatchable_commands_wake_polls(self, command_app, notifier, site_id):
+        from db import db
+
+        since = notifier.version(site_id)
+        command = _command(site_id, status='sent')
+        db.session.add(command)
+        db.session.commit()
+        assert notifier.version(site_id) == since
+
+        # Put back into the queue (e.g. retry): dispatchable again
+        command.status = 'pending'
+        db.session.commit()
+        assert notifier.version(site_id) == since + 1
+
+    def test_stage_ignores_missing_site_or_session(self, command_app, notifier):
+        from db import db
+
+        notifier.stage(None, 1)
+        notifier.stage(db.session, None)
+        assert 'pending_command_wakeups' not in db.session.info
+
+
+class TestLongPollSeconds:
+
+    def test_requested_wait_is_capped(self, monkeypatch):
+        import services.command_notifier as module
+        monkeypatch.setattr(module, 'COMMAND_LONG_POLL_MAX_SECONDS', 20.0)
+
+        assert module.long_poll_max_seconds() == 20.0
+        assert module.long_poll_seconds('5') == 5.0
+        assert module.long_poll_seconds(45) == 20.0
+        assert module.long_poll_seconds(-3) == 0.0
+        assert module.long_poll_seconds(None) == 0.0
+        assert module.long_poll_seconds('soon') == 0.0
+
+    def test_disabled_by_default(self, monkeypatch):
+        import services.command_notifier as module
+        monkeypatch.setattr(module, 'COMMAND_LONG_POLL_MAX_SECONDS', 0.0)
+
+        assert module.long_poll_seconds(30) == 0.0
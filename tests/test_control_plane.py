@@ -550,3 +550,62 @@ class TestPollLeaseExpiration:
             cmd = MinerCommand.query.get(command_id)
             assert cmd.lease_owner == str(test_edge_device['id'])
             assert cmd.lease_until > datetime.utcnow()
+
+
+class TestLongPoll:
+    """Test long-poll command delivery woken by command commits"""
+
+    def test_parked_poll_wakes_on_new_command(self, app, test_edge_device, test_site, monkeypatch):
+        """
+        An empty poll with ?wait= is parked and returns as soon as a command
+        for the site is committed, well before the wait expires
+        """
+        import threading
+        import time
+        from db import db
+        from api.collector_api import MinerCommand
+        import services.command_notifier as notifier
+
+        monkeypatch.setattr(notifier, 'COMMAND_LONG_POLL_MAX_SECONDS', 10.0)
+
+        def enqueue():
+            time.sleep(0.3)
+            with app.app_context():
+                now = datetime.utcnow()
+                db.session.add(MinerCommand(
+                    miner_id='test-miner-lp', site_id=test_site, command_type='reboot',
+                    status='pending', priority=5, created_at=now,
+                    expires_at=now + timedelta(hours=1), next_attempt_at=now
+                ))
+                db.session.commit()
+
+        thread = threading.Thread(target=enqueue)
+        thread.start()
+        start = time.monotonic()
+        response = app.test_client().get(
+            '/api/edge/v1/commands/poll?wait=10',
+            headers={'Authorization': f'Bearer {test_edge_device["token"]}'}
+        )
+        elapsed = time.monotonic() - start
+        thread.join()
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['dispatched_count'] == 1
+        assert data['commands'][0]['miner_id'] == 'test-miner-lp'
+        assert data['long_poll_max_seconds'] == 10.0
+        assert 0.3 <= elapsed < 5
+
+    def test_wait_ignored_when_long_poll_disabled(self, app, test_edge_device, monkeypatch):
+        import time
+        import services.command_notifier as notifier
+
+        monkeypatch.setattr(notifier, 'COMMAND_LONG_POLL_MAX_SECONDS', 0.0)
+        start = time.monotonic()
+        response = app.test_client().get(
+            '/api/edge/v1/commands/poll?wait=30',
+            headers={'Authorization': f'Bearer {test_edge_device["token"]}'}
+        )
+        assert response.status_code == 200
+        assert response.get_json()['long_poll_max_seconds'] == 0.0
+        assert time.monotonic() - start < 2
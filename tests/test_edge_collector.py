@@ -0,0 +1,306 @@
+"""
+Edge Collector Tests
+边缘采集器测试
+
+Unit tests for edge_collector/cgminer_collector.py: asyncio collection engine,
+adaptive poll scheduling, offline cache, upload pipeline, edge
+pre-aggregation and command fan-out. Miners are local fake cgminer servers;
+no database is involved.
+"""
+
+import os
+
+os.environ.setdefault('SESSION_SECRET', 'test-secret-key-for-testing-only')
+
+
+class TestAsyncCollectionEngine:
+    """asyncio engine against a fake cgminer API"""
+
+    RESPONSES = {
+        'summary': {'SUMMARY': [{'GHS av': 95000.0, 'GHS 5s': 96000.0, 'Accepted': 10, 'Elapsed': 3600}]},
+        'stats': {'STATS': [{'temp1': 60, 'temp2': 70, 'fan1': 5000}]},
+        'pools': {'POOLS': [{'URL': 'stratum+tcp://pool:3333', 'User': 'worker.1'}]},
+    }
+
+    def test_collects_many_miners_and_marks_unreachable_offline(self):
+        import asyncio
+        import json
+        import socket
+        from edge_collector.cgminer_collector import AsyncCollectionEngine
+
+        requests_seen = []
+
+        async def handle(reader, writer):
+            commands = json.loads(await reader.read(1024))['command'].split('+')
+            requests_seen.append(commands)
+            response = {c: [self.RESPONSES[c]] for c in commands} if len(commands) > 1 \
+                else self.RESPONSES[commands[0]]
+            writer.write(json.dumps(response).encode() + b'\x00')
+            await writer.drain()
+            writer.close()
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            closed_port = probe.getsockname()[1]
+
+        async def run():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            miners = [{'id': f'M{i}', 'ip': '127.0.0.1', 'port': port} for i in range(200)]
+            miners.append({'id': 'DOWN', 'ip': '127.0.0.1', 'port': closed_port})
+            engine = AsyncCollectionEngine(max_concurrent=50, timeout=2, connect_timeout=1)
+            async with server:
+                return await engine.collect(miners)
+
+        results = {r.miner_id: r for r in asyncio.run(run())}
+        assert len(results) == 201
+        assert results['DOWN'].online is False
+        miner = results['M199']
+        assert miner.online and miner.hashrate_ghs == 95000.0
+        assert miner.temperature_max == 70 and miner.fan_speeds == [5000]
+        # One combined summary+stats+pools round trip per reachable miner
+        assert len(requests_seen) == 200
+
+
+class TestPollScheduler:
+    """Adaptive per-miner polling intervals at the edge"""
+
+    def _data(self, miner_id, online=True, **kwargs):
+        from edge_collector.cgminer_collector import MinerData
+        kwargs.setdefault('overall_health', 'healthy' if online else 'offline')
+        return MinerData(miner_id=miner_id, ip_address='10.0.0.1', timestamp='2026-01-01T00:00:00',
+                         online=online, **kwargs)
+
+    def test_intervals_follow_state(self):
+        from edge_collector.cgminer_collector import PollScheduler
+
+        scheduler = PollScheduler(base_interval=30, min_interval=10, max_interval=240, stable_cycles=2)
+        miners = [{'id': 'A', 'ip': '10.0.0.1'}, {'id': 'B', 'ip': '10.0.0.2'}, {'id': 'C', 'ip': '10.0.0.3'}]
+        assert scheduler.due(miners, 0) == miners
+
+        # Unreachable: exponential backoff capped at max_interval
+        assert [scheduler.record(self._data('A', online=False), 0) for _ in range(5)] == [30, 60, 120, 240, 240]
+        # Recovered miners are re-polled fast
+        assert scheduler.record(self._data('A'), 0) == 10
+
+        # Healthy miners relax to stable_interval; alerts snap back to min_interval
+        assert [scheduler.record(self._data('B'), 0) for _ in range(3)] == [30, 60, 60]
+        assert scheduler.record(self._data('B', temperature_max=90.0), 0) == 10
+        assert scheduler.record(self._data('B', overall_health='critical'), 0) == 10
+
+        scheduler.record(self._data('C'), 100)
+        assert [m['id'] for m in scheduler.due(miners, 15)] == ['A', 'B']
+        assert scheduler.next_due_in(miners, 15) == 0
+        assert [m['id'] for m in scheduler.due(miners, 130)] == ['A', 'B', 'C']
+
+    def test_flapping_miner_polled_fast(self):
+        from edge_collector.cgminer_collector import PollScheduler
+
+        scheduler = PollScheduler(base_interval=30, min_interval=10)
+        for online in (True, False, True, True):
+            interval = scheduler.record(self._data('A', online=online), 0)
+        assert interval == 10
+
+
+class TestOfflineCache:
+    """WAL-backed offline cache with byte budget and retry backoff"""
+
+    def test_eviction_chunking_and_backoff(self, tmp_path):
+        from edge_collector.cgminer_collector import OfflineCache
+
+        cache = OfflineCache(str(tmp_path), max_bytes=250)
+        assert cache._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        for i in range(4):
+            cache.save_batch(f'b{i}', bytes(100))
+
+        # Oldest batches evicted to stay under the byte budget
+        assert cache.total_bytes == 200 and cache.evicted == 2
+        assert [b for b, _ in cache.get_pending_batches(limit=1)] == ['b2']
+
+        # Failed batch is pushed back; the next one is still drained
+        cache.increment_retry('b2')
+        assert [b for b, _ in cache.get_pending_batches()] == ['b3']
+        cache.mark_uploaded('b3')
+        assert cache.total_bytes == 100 and cache.pending_count() == 1
+        cache.close()
+
+        # Budget accounting survives a restart
+        assert OfflineCache(str(tmp_path), max_bytes=250).total_bytes == 100
+
+
+class TestUploadPipeline:
+    """Collect/serialize/upload stages joined by bounded queues"""
+
+    class SlowUploader:
+        def __init__(self, fail_ids=()):
+            import threading
+            self.release = threading.Event()
+            self.sent = []
+            self.fail_ids = set(fail_ids)
+
+        def prepare(self, data):
+            return {'data': data, 'body': b'', 'headers': {}}
+
+        def send(self, prepared):
+            self.release.wait(5)
+            ids = [d.miner_id for d in prepared['data']]
+            self.sent.append(ids)
+            return not self.fail_ids.intersection(ids)
+
+    def _data(self, n):
+        from edge_collector.cgminer_collector import MinerData
+        return [MinerData(miner_id=f'M{i}', ip_address='10.0.0.1', timestamp='2026-01-01T00:00:00', online=True)
+                for i in range(n)]
+
+    def test_submit_does_not_wait_for_upload(self):
+        import time
+        from edge_collector.cgminer_collector import UploadPipeline
+
+        uploader = self.SlowUploader(fail_ids={'M4'})
+        failed = []
+        pipeline = UploadPipeline(uploader, failed.append, chunk_size=2, queue_size=1)
+        pipeline.start()
+        try:
+            start = time.time()
+            assert pipeline.submit(self._data(5)) >= 1
+            assert time.time() - start < 0.5
+            # Queue full while the uploader is stalled: overflow chunks are spilled to the cache callback
+            assert pipeline.get_stats()['collect']['spilled'] >= 1
+
+            spilled = len(failed)
+            uploader.release.set()
+            deadline = time.time() + 5
+            while pipeline.get_stats()['upload']['processed'] + pipeline.get_stats()['upload']['failed'] \
+                    < 3 - spilled and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            pipeline.stop()
+
+        assert all(len(ids) <= 2 for ids in uploader.sent)
+        uploaded = {i for ids in uploader.sent for i in ids} | {d.miner_id for chunk in failed for d in chunk}
+        assert uploaded == {f'M{i}' for i in range(5)}
+        stats = pipeline.get_stats()
+        assert stats['serialize']['processed'] == len(uploader.sent)
+        assert stats['upload']['backlog'] == 0
+
+    def test_default_collector_runs_pipelined_cycle(self, tmp_path):
+        import time
+        from edge_collector.cgminer_collector import EdgeCollector
+
+        collector = EdgeCollector({
+            'cache_dir': str(tmp_path),
+            'api_url': 'http://127.0.0.1:9',
+            'timeout': 0.5,
+            'miners': [{'id': 'M1', 'ip': '127.0.0.1', 'port': 9}],
+        })
+        assert collector.pipeline is not None and collector.pipeline.uploader is collector.uploader
+
+        collector.pipeline.start()
+        try:
+            result = collector.run_pipelined_cycle()
+            assert (result['collected'], result['offline'], result['chunks_queued']) == (1, 1, 1)
+            # Cloud unreachable: the chunk ends up in the offline cache
+            deadline = time.time() + 10
+            while collector.cache.pending_count() == 0 and time.time() < deadline:
+                time.sleep(0.05)
+            assert collector.cache.pending_count() == 1
+        finally:
+            collector.stop()
+            collector.cache.close()
+
+
+class TestSampleAggregator:
+    """Edge pre-aggregation of high-frequency samples"""
+
+    def _sample(self, online=True, hashrate=100000.0, temp=70.0):
+        from edge_collector.cgminer_collector import MinerData
+        return MinerData(miner_id='A', ip_address='10.0.0.1', timestamp='2026-01-01T00:00:00', online=online,
+                         hashrate_ghs=hashrate if online else 0.0, temperature_avg=temp - 5,
+                         temperature_max=temp if online else 0.0)
+
+    def test_window_summary(self):
+        from edge_collector.cgminer_collector import SampleAggregator
+
+        aggregator = SampleAggregator(window_seconds=60)
+        for i, hashrate in enumerate((90000.0, 100000.0, 110000.0)):
+            assert aggregator.add(self._sample(hashrate=hashrate, temp=70 + i), now=i * 10) is None
+        assert aggregator.flush(now=30) == []
+
+        [summary] = aggregator.flush(now=60)
+        assert summary.hashrate_ghs == 100000.0 and summary.temperature_max == 72
+        assert summary.window['samples'] == 3
+        assert summary.window['metrics']['hashrate_ghs'] == {'min': 90000.0, 'max': 110000.0,
+                                                             'avg': 100000.0, 'last': 110000.0}
+        assert aggregator.flush(now=200) == []
+
+    def test_threshold_crossings_are_sent_immediately(self):
+        from edge_collector.cgminer_collector import SampleAggregator
+
+        aggregator = SampleAggregator(window_seconds=60, temp_alert=85.0, hashrate_drop_ratio=0.5)
+        aggregator.add(self._sample(), now=0)
+
+        event = aggregator.add(self._sample(temp=90.0), now=5)
+        assert event.window['event'] == 'overheat' and event.temperature_max == 90.0
+        assert aggregator.add(self._sample(temp=91.0), now=10) is None
+
+        assert aggregator.add(self._sample(hashrate=20000.0, temp=91.0), now=15).window['event'] == 'hashrate_drop'
+        event = aggregator.add(self._sample(online=False), now=20)
+        assert event.window['event'] == 'offline' and not event.online
+        assert aggregator.add(self._sample(), now=25).window['event'] == 'online'
+        # The event closed the window: nothing left to summarise
+        assert aggregator.flush(now=100) == []
+
+
+class TestCommandFanout:
+    """Parallel command execution with per-miner ordering and per-group limits"""
+
+    def test_parallel_ordered_and_group_limited(self):
+        import threading
+        import time
+        from edge_collector.cgminer_collector import CommandFanout
+
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+        order = []
+
+        def job(miner, group, step):
+            def fn():
+                with lock:
+                    running[group] = running.get(group, 0) + 1
+                    peak[group] = max(peak.get(group, 0), running[group])
+                    order.append((miner, step))
+                time.sleep(0.05)
+                with lock:
+                    running[group] -= 1
+                if step == 'boom':
+                    raise RuntimeError('unreachable')
+                return f'{miner}:{step}'
+            return (miner, group, fn)
+
+        jobs = [job(f'M{i}', CommandFanout.group_of(f'10.0.{i % 2}.{i}'), 'reboot') for i in range(20)]
+        jobs += [job('M0', CommandFanout.group_of('10.0.0.0'), 'power_mode'),
+                 job('M1', CommandFanout.group_of('10.0.1.1'), 'boom')]
+
+        start = time.monotonic()
+        results = CommandFanout(max_workers=32, group_limit=3).run(jobs)
+        elapsed = time.monotonic() - start
+
+        assert results[0] == 'M0:reboot' and results[20] == 'M0:power_mode'
+        assert isinstance(results[21], RuntimeError)
+        assert peak == {'net:10.0.0': 3, 'net:10.0.1': 3}
+        # Same miner: commands run in submission order
+        assert [s for m, s in order if m == 'M0'] == ['reboot', 'power_mode']
+        # 22 jobs, 6 at a time across both subnets: far below 22 sequential round trips
+        assert elapsed < 22 * 0.05
+
+    def test_group_rate_spaces_starts(self):
+        import time
+        from edge_collector.cgminer_collector import CommandFanout
+
+        starts = []
+        jobs = [(f'M{i}', 'pdu:A', lambda: starts.append(time.monotonic())) for i in range(4)]
+        CommandFanout(max_workers=4, group_limit=4, group_rate=20).run(jobs)
+        starts.sort()
+        assert all(b - a >= 0.04 for a, b in zip(starts, starts[1:]))
+        assert CommandFanout.group_of('10.0.0.1', {'pdu': 'A'}) == 'pdu:A'
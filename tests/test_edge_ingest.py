@@ -0,0 +1,807 @@
+"""
+Edge Ingest Service Tests
+边缘遥测接收服务测试
+
+Exercises ingest_miner_records against an in-memory SQLite schema that only
+contains the telemetry tables the ingest path touches.
+"""
+
+import os
+import uuid
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+
+os.environ.setdefault('SESSION_SECRET', 'test-secret-key-for-testing-only')
+
+INGEST_TABLES = [
+    'user_access', 'hi_orgs', 'hosting_sites', 'miner_models', 'edge_devices',
+    'hosting_miners', 'miner_board_telemetry', 'miner_telemetry_live',
+    'miner_telemetry_history', 'collector_upload_logs', 'collector_keys',
+    'telemetry_raw_24h', 'telemetry_ingest_queue', 'edge_ingest_watermarks',
+]
+
+
+@pytest.fixture
+def ingest_app():
+    """Flask app with only the ingest-related tables created"""
+    from flask import Flask
+    from db import db
+    import models  # noqa: F401
+    import models_hi  # noqa: F401
+    import models_device_encryption  # noqa: F401
+    import api.collector_api  # noqa: F401
+    import services.telemetry_storage  # noqa: F401
+    import services.telemetry_ingest_queue  # noqa: F401
+    from services.ingest_watermark import sequence_watermarks
+    from services.telemetry_delta import delta_snapshots
+    from services.live_snapshot_store import live_snapshots
+
+    test_app = Flask(__name__)
+    test_app.config['TESTING'] = True
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [db.metadata.tables[name] for name in INGEST_TABLES]
+        db.metadata.create_all(db.engine, tables=tables)
+    sequence_watermarks.clear()
+    delta_snapshots.clear()
+    live_snapshots.clear()
+
+    yield test_app
+
+    with test_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def ingest_site(ingest_app):
+    from db import db
+    from models import HostingSite
+
+    with ingest_app.app_context():
+        site = HostingSite(
+            name='Ingest Site',
+            slug=f'ingest-site-{uuid.uuid4().hex[:8]}',
+            location='Test Location',
+            capacity_mw=10.0,
+            electricity_rate=0.05,
+            operator_name='Test Operator'
+        )
+        db.session.add(site)
+        db.session.commit()
+        yield site.id
+
+
+def _make_records(count, prefix='SN', online=True, boards=0):
+    records = []
+    for i in range(count):
+        record = {
+            'miner_id': f'{prefix}{i:05d}',
+            'ip_address': f'10.{i // 65536}.{(i // 256) % 256}.{i % 256}',
+            'online': online,
+            'hashrate_ghs': 110000.0,
+            'temperature_avg': 65.0,
+            'temperature_max': 72.0,
+            'fan_speeds': [5400, 5600],
+            'power_consumption': 3250,
+            'accepted_shares': 1000,
+            'rejected_shares': 5,
+        }
+        if boards:
+            record['boards'] = [
+                {'board_index': b, 'hashrate_ths': 36.6, 'temperature_c': 64.0, 'health': 'healthy'}
+                for b in range(boards)
+            ]
+        records.append(record)
+    return records
+
+
+class _StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def count(self, prefix):
+        return sum(1 for s in self.statements if s.lstrip().upper().startswith(prefix))
+
+
+class _FakeRedis:
+    """Dict-backed stand-in for the redis commands used by the live snapshot store"""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def pipeline(self, transaction=True):
+        return _FakeRedisPipeline(self)
+
+    def exists(self, key):
+        self.commands.append('EXISTS')
+        return int(key in self.data)
+
+    def run(self, name, key, *args, **kwargs):
+        self.commands.append(name.upper())
+        if name == 'get':
+            return self.data.get(key)
+        if name == 'exists':
+            return int(key in self.data)
+        if name == 'hgetall':
+            return dict(self.data.get(key, {}))
+        if name == 'hset':
+            self.data.setdefault(key, {}).update(kwargs['mapping'])
+            return len(kwargs['mapping'])
+        if name == 'incr':
+            self.data[key] = str(int(self.data.get(key, 0)) + 1)
+            return int(self.data[key])
+        return True  # expire
+
+
+class _FakeRedisPipeline:
+    def __init__(self, client):
+        self.client = client
+        self.queued = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.queued.append((name, args, kwargs))
+
+    def execute(self):
+        return [self.client.run(name, *args, **kwargs) for name, args, kwargs in self.queued]
+
+
+class TestResolveHostingMiners:
+    """Set-based HostingMiner resolution"""
+
+    def test_matches_by_serial_then_ip_and_creates_missing(self, ingest_app, ingest_site):
+        from db import db
+        from models import HostingMiner
+        from api.collector_api import resolve_hosting_miners
+
+        with ingest_app.app_context():
+            db.session.add_all([
+                HostingMiner(site_id=ingest_site, customer_id=7, miner_model_id=1,
+                             serial_number='SN-A', ip_address='10.0.0.1',
+                             actual_hashrate=110, actual_power=3250),
+                HostingMiner(site_id=ingest_site, customer_id=7, miner_model_id=1,
+                             serial_number='SN-OLD', ip_address='10.0.0.2',
+                             actual_hashrate=110, actual_power=3250),
+            ])
+            db.session.commit()
+
+            resolved = resolve_hosting_miners(ingest_site, [
+                {'miner_id': 'SN-A', 'ip_address': '10.0.0.9'},
+                {'miner_id': 'SN-B', 'ip_address': '10.0.0.2'},
+                {'miner_id': 'SN-NEW', 'ip_address': '10.0.0.3', 'hashrate_ghs': 100000},
+                {'miner_id': 'SN-NEW', 'ip_address': '10.0.0.3'},
+            ])
+            db.session.commit()
+
+            assert resolved[0].serial_number == 'SN-A'
+            assert resolved[0].ip_address == '10.0.0.9'
+            assert resolved[1].serial_number == 'SN-B'
+            assert resolved[2].id is not None
+            assert resolved[2] is resolved[3]
+            assert HostingMiner.query.count() == 3
+
+    def test_statement_count_independent_of_batch_size(self, ingest_app, ingest_site):
+        from db import db
+        from api.collector_api import resolve_hosting_miners
+
+        with ingest_app.app_context():
+            with _StatementCounter(db.engine) as small:
+                resolve_hosting_miners(ingest_site, _make_records(20, prefix='S'))
+            db.session.commit()
+
+            with _StatementCounter(db.engine) as large:
+                resolve_hosting_miners(ingest_site, _make_records(800, prefix='L'))
+            db.session.commit()
+
+            assert large.count('SELECT') == small.count('SELECT')
+
+
+class TestIngestMinerRecords:
+    """End-to-end ingest into live, history, raw and board tables"""
+
+    def test_ingest_creates_and_updates(self, ingest_app, ingest_site):
+        from api.collector_api import MinerTelemetryLive, MinerTelemetryHistory
+        from services.telemetry_storage import TelemetryRaw24h
+        from services.edge_ingest_service import ingest_miner_records
+        from models import MinerBoardTelemetry
+
+        with ingest_app.app_context():
+            records = _make_records(10, boards=3)
+            result = ingest_miner_records(ingest_site, records, datetime.utcnow())
+            assert result['inserted'] == 10
+            assert result['online_count'] == 10
+
+            result = ingest_miner_records(ingest_site, _make_records(10, boards=3), datetime.utcnow())
+            assert result['updated'] == 10
+
+            assert MinerTelemetryLive.query.count() == 10
+            assert MinerTelemetryHistory.query.count() == 20
+            assert TelemetryRaw24h.query.count() == 20
+            assert MinerBoardTelemetry.query.count() == 60
+            assert MinerBoardTelemetry.query.filter(MinerBoardTelemetry.miner_id.is_(None)).count() == 0
+
+    def test_window_summary_keeps_sample_time_and_extremes(self, ingest_app, ingest_site, caplog):
+        import logging
+        from dataclasses import asdict
+        from api.collector_api import MinerTelemetryHistory
+        from services.telemetry_storage import TelemetryRaw24h
+        from services.edge_ingest_service import ingest_miner_records
+        from edge_collector.cgminer_collector import MinerData, SampleAggregator
+
+        def sample(temp, online=True):
+            return MinerData(miner_id='W1', ip_address='10.0.0.9', timestamp='', online=online,
+                             hashrate_ghs=100000.0 if online else 0.0, temperature_avg=temp - 5,
+                             temperature_max=temp if online else 0.0)
+
+        received = datetime.utcnow().replace(microsecond=0)
+        start = received.timestamp() - 300
+        aggregator = SampleAggregator(window_seconds=60)
+        for i, temp in enumerate((70.0, 80.0, 75.0)):
+            aggregator.add(sample(temp), now=start + i * 10)
+        [summary] = aggregator.flush(now=start + 60)
+        aggregator.add(sample(75.0), now=start + 70)
+        event = aggregator.add(sample(0.0, online=False), now=start + 80)
+
+        with ingest_app.app_context(), caplog.at_level(logging.INFO, logger='services.edge_ingest_service'):
+            ingest_miner_records(ingest_site, [asdict(summary)], received)
+            ingest_miner_records(ingest_site, [asdict(event)], received)
+
+            history = MinerTelemetryHistory.query.filter_by(miner_id='W1').one()
+            assert history.timestamp == datetime.utcfromtimestamp(start + 60)
+            assert (history.temperature_min, history.temperature_max) == (65.0, 80.0)
+            raw_ts = sorted(r.ts for r in TelemetryRaw24h.query.filter_by(miner_id='W1'))
+            assert raw_ts == [datetime.utcfromtimestamp(start + 60), datetime.utcfromtimestamp(start + 80)]
+        assert 'edge event offline' in caplog.text
+
+
+class TestLiveSnapshots:
+    """Monitor endpoints served from the in-process live snapshot store"""
+
+    def test_ingest_updates_snapshot_without_sql(self, ingest_app, ingest_site):
+        from db import db
+        from services.edge_ingest_service import ingest_miner_records
+        from services.live_snapshot_store import live_snapshots
+
+        with ingest_app.app_context():
+            ingest_miner_records(ingest_site, _make_records(3), datetime.utcnow())
+            first = live_snapshots.get_site(ingest_site)
+            assert sorted(first.miners) == ['SN00000', 'SN00001', 'SN00002']
+
+            records = _make_records(3)
+            records[1]['hashrate_ghs'] = 90000.0
+            ingest_miner_records(ingest_site, records, datetime.utcnow())
+
+            with _StatementCounter(db.engine) as reads:
+                second = live_snapshots.get_site(ingest_site)
+                assert live_snapshots.get_site(ingest_site).version == second.version
+            assert reads.statements == []
+            assert second.version > first.version
+            assert second.miners['SN00001'].hashrate_ghs == 90000.0
+
+            # Rolled-back ingests never reach the snapshot
+            ingest_miner_records(ingest_site, _make_records(1, prefix='RB'), datetime.utcnow(), commit=False)
+            db.session.rollback()
+            assert 'RB00000' not in live_snapshots.get_site(ingest_site).miners
+
+    def test_latest_endpoint_etag(self, ingest_app, ingest_site):
+        from api.collector_api import get_miners_latest
+        from services.edge_ingest_service import ingest_miner_records
+
+        with ingest_app.app_context():
+            ingest_miner_records(ingest_site, _make_records(5), datetime.utcnow())
+
+            with ingest_app.test_request_context('/?per_page=2&page=2'):
+                response = get_miners_latest(ingest_site)
+            assert response.status_code == 200
+            data = response.get_json()['data']
+            assert data['pagination'] == {'page': 2, 'per_page': 2, 'total': 5, 'pages': 3}
+            assert len(data['miners']) == 2
+            etag = response.headers['ETag']
+
+            with ingest_app.test_request_context(headers={'If-None-Match': etag}):
+                assert get_miners_latest(ingest_site).status_code == 304
+
+            ingest_miner_records(ingest_site, _make_records(1, prefix='N'), datetime.utcnow())
+            with ingest_app.test_request_context(headers={'If-None-Match': etag}):
+                response = get_miners_latest(ingest_site)
+            assert response.status_code == 200
+            assert response.get_json()['data']['miners'][0]['miner_id'] == 'N00000'
+
+
+    def test_not_modified_skips_reading_miners(self, ingest_app, ingest_site, monkeypatch):
+        from api.collector_api import get_miners_latest
+        from services.edge_ingest_service import ingest_miner_records
+        from services.live_snapshot_store import live_snapshots
+
+        fake = _FakeRedis()
+        monkeypatch.setattr(live_snapshots, '_redis_checked', True)
+        monkeypatch.setattr(live_snapshots, '_redis', fake)
+
+        with ingest_app.app_context():
+            ingest_miner_records(ingest_site, _make_records(3), datetime.utcnow())
+            with ingest_app.test_request_context('/'):
+                response = get_miners_latest(ingest_site)
+            assert len(response.get_json()['data']['miners']) == 3
+            etag = response.headers['ETag']
+
+            fake.commands.clear()
+            with ingest_app.test_request_context(headers={'If-None-Match': etag}):
+                assert get_miners_latest(ingest_site).status_code == 304
+            assert fake.commands == ['GET', 'EXISTS']
+
+            # A new version reads the hash again
+            ingest_miner_records(ingest_site, _make_records(1, prefix='N'), datetime.utcnow())
+            fake.commands.clear()
+            with ingest_app.test_request_context(headers={'If-None-Match': etag}):
+                response = get_miners_latest(ingest_site)
+            assert response.status_code == 200 and len(response.get_json()['data']['miners']) == 4
+            assert 'HGETALL' in fake.commands
+
+        # In-process store: a fresh snapshot answers 304 without copying it
+        monkeypatch.setattr(live_snapshots, '_redis', None)
+        with ingest_app.app_context():
+            with ingest_app.test_request_context('/'):
+                etag = get_miners_latest(ingest_site).headers['ETag']
+            monkeypatch.setattr(live_snapshots, 'get_site', None)
+            with ingest_app.test_request_context(headers={'If-None-Match': etag}):
+                assert get_miners_latest(ingest_site).status_code == 304
+
+
+class TestLiveStreaming:
+    """Keyset streaming of the live layer for the feature-store job"""
+
+    def test_iter_live_visits_every_miner_once(self, ingest_app, ingest_site):
+        from db import db
+        from models import HostingSite
+        from services.edge_ingest_service import ingest_miner_records
+        from services.telemetry_service import TelemetryService
+
+        with ingest_app.app_context():
+            other = HostingSite(name='Second Site', slug=f'second-{uuid.uuid4().hex[:8]}',
+                                location='Test', capacity_mw=1.0, electricity_rate=0.05,
+                                operator_name='Test Operator')
+            db.session.add(other)
+            db.session.commit()
+            ingest_miner_records(ingest_site, _make_records(17), datetime.utcnow())
+            ingest_miner_records(other.id, _make_records(5, prefix='B'), datetime.utcnow())
+
+            chunks = list(TelemetryService.iter_live(chunk_size=7))
+            assert [len(c) for c in chunks] == [7, 7, 7, 1]
+            keys = [(r['site_id'], r['miner_id']) for c in chunks for r in c]
+            assert keys == sorted(keys) and len(set(keys)) == 22
+
+
+
+class TestCopyWriter:
+    """COPY CSV encoding and ORM fallback"""
+
+    def test_encode_copy_csv_round_trip(self, ingest_app):
+        import csv
+        from services.telemetry_storage import TelemetryRaw24h
+        from services.telemetry_copy_writer import encode_copy_csv, COPY_NULL
+
+        ts = datetime(2026, 1, 1, 12, 0, 30)
+        columns, buf = encode_copy_csv(TelemetryRaw24h, [
+            {'ts': ts, 'site_id': 1, 'miner_id': 'SN"1', 'hashrate_ths': 110.5,
+             'fan_rpm': 5500.0, 'pool_url': ''},
+            {'ts': ts, 'site_id': 1, 'miner_id': 'SN2', 'pool_url': None},
+        ])
+
+        assert 'id' not in columns
+        rows = [dict(zip(columns, r)) for r in csv.reader(buf)]
+        assert rows[0]['miner_id'] == 'SN"1'
+        assert rows[0]['fan_rpm'] == '5500'
+        assert rows[0]['ts'] == ts.isoformat()
+        assert rows[0]['pool_url'] == ''
+        assert rows[1]['pool_url'] == COPY_NULL
+        assert rows[1]['status'] == 'online'
+
+    def test_sqlite_falls_back_to_orm(self, ingest_app):
+        from db import db
+        from services.telemetry_storage import TelemetryRaw24h
+        from services.telemetry_copy_writer import copy_insert_mappings
+
+        with ingest_app.app_context():
+            written = copy_insert_mappings(TelemetryRaw24h, [
+                {'ts': datetime.utcnow(), 'site_id': 1, 'miner_id': f'SN{i}'} for i in range(5)
+            ])
+            db.session.commit()
+
+            assert written == 5
+            assert TelemetryRaw24h.query.count() == 5
+
+
+class TestIngestQueue:
+    """Async ingest queue: enqueue, coalesced drain, receipts"""
+
+    def test_async_mode_requires_opt_in(self, monkeypatch):
+        from services import telemetry_ingest_queue as q
+
+        class _Req:
+            def __init__(self, headers):
+                self.headers = headers
+
+        monkeypatch.setattr(q, 'INGEST_MODE', 'sync')
+        assert not q.async_ingest_requested(_Req({'Prefer': 'respond-async'}))
+
+        monkeypatch.setattr(q, 'INGEST_MODE', 'async')
+        assert q.async_ingest_requested(_Req({'Prefer': 'respond-async'}))
+        assert not q.async_ingest_requested(_Req({}))
+
+    def test_drain_coalesces_sites_and_completes_receipts(self, ingest_app, ingest_site):
+        from db import db
+        from models import HostingSite
+        from api.collector_api import MinerTelemetryLive
+        from services.telemetry_ingest_queue import (
+            enqueue_ingest, claim_jobs, process_claimed_jobs, get_receipt, get_queue_stats
+        )
+
+        with ingest_app.app_context():
+            other = HostingSite(name='Other', slug=f'other-{uuid.uuid4().hex[:8]}', location='X',
+                                capacity_mw=1.0, electricity_rate=0.05, operator_name='Op')
+            db.session.add(other)
+            db.session.commit()
+
+            now = datetime.utcnow()
+            job_a = enqueue_ingest(ingest_site, _make_records(5, prefix='A'), now)
+            job_b = enqueue_ingest(other.id, _make_records(3, prefix='B'), now)
+
+            stats = get_queue_stats()
+            assert stats['queued'] == 2
+            assert stats['queued_records'] == 8
+            assert get_queue_stats(site_id=other.id)['queued_records'] == 3
+
+            claimed = claim_jobs('test-worker')
+            assert set(claimed) == {job_a.id, job_b.id}
+            assert process_claimed_jobs(claimed) == 2
+
+            receipt = get_receipt(job_a.id, ingest_site)
+            assert receipt['status'] == 'completed'
+            assert receipt['result']['inserted'] == 5
+            assert get_receipt(job_a.id, other.id) is None
+            assert MinerTelemetryLive.query.count() == 8
+            assert get_queue_stats()['queued'] == 0
+
+    def test_bad_payload_is_isolated(self, ingest_app, ingest_site):
+        from db import db
+        from services.telemetry_ingest_queue import (
+            TelemetryIngestJob, enqueue_ingest, claim_jobs, process_claimed_jobs, get_receipt
+        )
+
+        with ingest_app.app_context():
+            now = datetime.utcnow()
+            good = enqueue_ingest(ingest_site, _make_records(2), now)
+            bad = enqueue_ingest(ingest_site, _make_records(2, prefix='X'), now)
+            db.session.get(TelemetryIngestJob, bad.id).payload = b'not gzip'
+            db.session.commit()
+
+            assert process_claimed_jobs(claim_jobs('test-worker')) == 1
+            assert get_receipt(good.id, ingest_site)['status'] == 'completed'
+            bad_receipt = get_receipt(bad.id, ingest_site)
+            assert bad_receipt['status'] == 'queued'
+            assert bad_receipt['error']
+
+    def test_coalesced_jobs_applied_in_received_order(self, ingest_app, ingest_site):
+        from datetime import timedelta
+        from api.collector_api import MinerTelemetryLive
+        from services.telemetry_ingest_queue import enqueue_ingest, claim_jobs, process_claimed_jobs
+
+        with ingest_app.app_context():
+            now = datetime.utcnow()
+            newer = _make_records(1)
+            newer[0]['hashrate_ghs'] = 120000.0
+            older = _make_records(1)
+            older[0]['hashrate_ghs'] = 90000.0
+            # Enqueued newest first: the reload must not follow insertion order
+            enqueue_ingest(ingest_site, newer, now)
+            enqueue_ingest(ingest_site, older, now - timedelta(seconds=60))
+
+            assert process_claimed_jobs(claim_jobs('test-worker')) == 2
+            live = MinerTelemetryLive.query.one()
+            assert live.hashrate_ghs == 120000.0
+            assert live.last_seen == now
+
+
+class TestSequenceWatermark:
+    """Retransmit dedup by (device_id, zone_id) sequence watermark"""
+
+    def test_replay_rejected_and_overlap_trimmed(self, ingest_app, ingest_site):
+        from db import db
+        from api.collector_api import MinerTelemetryHistory
+        from services.edge_ingest_service import ingest_miner_records
+
+        with ingest_app.app_context():
+            meta = {'device_id': '7', 'zone_id': 1, 'source_seq_start': 0, 'source_seq_end': 4}
+            result = ingest_miner_records(ingest_site, _make_records(5), datetime.utcnow(), edge_meta=meta)
+            assert result['processed_count'] == 5
+
+            with _StatementCounter(db.engine) as replay:
+                result = ingest_miner_records(ingest_site, _make_records(5), datetime.utcnow(),
+                                              edge_meta=dict(meta))
+            assert result['processed_count'] == 0
+            assert result['duplicate_skipped'] == 5
+            assert replay.statements == []
+
+            overlap = dict(meta, source_seq_start=3, source_seq_end=7)
+            result = ingest_miner_records(ingest_site, _make_records(5, prefix='O'), datetime.utcnow(),
+                                          edge_meta=overlap)
+            assert result['processed_count'] == 3
+            assert result['duplicate_skipped'] == 2
+            assert MinerTelemetryHistory.query.count() == 8
+
+    def test_db_backstop_survives_cache_loss(self, ingest_app, ingest_site):
+        from services.edge_ingest_service import ingest_miner_records
+        from services.ingest_watermark import sequence_watermarks
+
+        with ingest_app.app_context():
+            meta = {'device_id': '7', 'zone_id': None, 'source_seq_start': 10, 'source_seq_end': 11}
+            ingest_miner_records(ingest_site, _make_records(2), datetime.utcnow(), edge_meta=dict(meta))
+            sequence_watermarks.clear()
+
+            result = ingest_miner_records(ingest_site, _make_records(2), datetime.utcnow(), edge_meta=dict(meta))
+            assert result['duplicate_skipped'] == 2
+            assert sequence_watermarks.cached(('7', '')) == 11
+
+            other_zone = dict(meta, zone_id=2)
+            result = ingest_miner_records(ingest_site, _make_records(2), datetime.utcnow(), edge_meta=other_zone)
+            assert result['processed_count'] == 2
+
+
+class TestDeltaProtocol:
+    """Keyframe/delta encoding between edge and cloud"""
+
+    def _miner(self, miner_id, hashrate):
+        from edge_collector.cgminer_collector import MinerData
+        return MinerData(miner_id=miner_id, ip_address='10.0.0.1', timestamp='2026-01-01T00:00:00',
+                         online=True, hashrate_ghs=hashrate, model='S19', pool_url='stratum+tcp://pool:3333')
+
+    def test_round_trip_and_resync(self, ingest_app):
+        from edge_collector.cgminer_collector import DeltaEncoder
+        from services.telemetry_delta import decode_delta_payload, delta_snapshots
+
+        encoder = DeltaEncoder(keyframe_interval=3)
+        payload, pending = encoder.encode([self._miner('A', 100.0)])
+        assert payload['miners'][0]['kind'] == 'key'
+        records, resync, _ = decode_delta_payload(1, payload)
+        encoder.commit(pending, resync)
+
+        payload, pending = encoder.encode([self._miner('A', 101.0)])
+        entry = payload['miners'][0]
+        assert entry['kind'] == 'delta'
+        assert entry['changed'] == {'hashrate_ghs': 101.0}
+        records, resync, _ = decode_delta_payload(1, payload)
+        encoder.commit(pending, resync)
+        assert resync == []
+        assert records[0]['hashrate_ghs'] == 101.0
+        assert records[0]['model'] == 'S19'
+
+        # Server lost its snapshot (restart / other worker): miner is sent back for a keyframe
+        delta_snapshots.clear()
+        payload, pending = encoder.encode([self._miner('A', 102.0)])
+        records, resync, _ = decode_delta_payload(1, payload)
+        encoder.commit(pending, resync)
+        assert records == [] and resync == ['A']
+        payload, _ = encoder.encode([self._miner('A', 102.0)])
+        assert payload['miners'][0]['kind'] == 'key'
+
+    class FakeSession:
+        """Records uploaded payloads and answers with queued (status, accept header) pairs"""
+
+        def __init__(self, replies):
+            self.replies = list(replies)
+            self.payloads = []
+
+        def post(self, url, data=None, headers=None, timeout=None):
+            import gzip
+            import json
+            from unittest.mock import Mock
+            self.payloads.append(json.loads(gzip.decompress(data)))
+            status, accept = self.replies.pop(0)
+            return Mock(status_code=status, headers={'X-Telemetry-Accept': accept} if accept else {},
+                        json=lambda: {'success': status == 200})
+
+    def test_uploader_pauses_delta_only_for_servers_without_it(self):
+        from edge_collector.cgminer_collector import CloudUploader, DeltaEncoder
+
+        def kinds(session):
+            return ['delta' if isinstance(p, dict) else 'full' for p in session.payloads]
+
+        # Older server: rejects the delta payload without advertising delta support
+        uploader = CloudUploader('http://cloud', 'key', '1', DeltaEncoder(), payload_format='json')
+        uploader.session = self.FakeSession([(400, None), (200, None), (200, None), (200, None)])
+        assert uploader.upload([self._miner('A', 100.0)])
+        assert uploader.delta_paused == CloudUploader.DELTA_RETRY_UPLOADS - 1
+        uploader.delta_paused = 1
+        assert uploader.upload([self._miner('A', 100.0)])
+        assert uploader.upload([self._miner('A', 100.0)])
+        assert kinds(uploader.session) == ['delta', 'full', 'full', 'delta']
+
+        # Server that speaks delta: a 400 is an ordinary upload error, delta stays on
+        uploader = CloudUploader('http://cloud', 'key', '1', DeltaEncoder(), payload_format='json')
+        uploader.session = self.FakeSession([(400, 'columnar, delta, gzip'), (200, 'columnar, delta, gzip')])
+        assert not uploader.upload([self._miner('A', 100.0)])
+        assert uploader.upload([self._miner('A', 100.0)])
+        assert uploader.delta_paused == 0 and kinds(uploader.session) == ['delta', 'delta']
+
+    def test_update_touches_only_changed_columns(self, ingest_app, ingest_site):
+        from db import db
+        from services.edge_ingest_service import ingest_miner_records
+
+        with ingest_app.app_context():
+            ingest_miner_records(ingest_site, _make_records(3), datetime.utcnow())
+            records = _make_records(3)
+            records[0]['hashrate_ghs'] = 90000.0
+
+            with _StatementCounter(db.engine) as counter:
+                ingest_miner_records(ingest_site, records, datetime.utcnow())
+
+            updates = [s for s in counter.statements if s.lstrip().upper().startswith('UPDATE MINER_TELEMETRY_LIVE')]
+            assert len(updates) == 1
+            assert 'hashrate_ghs' in updates[0]
+            assert 'pool_url' not in updates[0]
+
+
+class TestTelemetryCodec:
+    """Columnar / msgpack / zstd request bodies"""
+
+    def _columnar_body(self, count):
+        from edge_collector.cgminer_collector import MinerData, encode_columnar
+        miners = [
+            MinerData(miner_id=f'C{i:04d}', ip_address=f'10.1.0.{i}', timestamp='2026-01-01T00:00:00',
+                      online=True, hashrate_ghs=100000.0 + i, fan_speeds=[5000, 5100])
+            for i in range(count)
+        ]
+        return encode_columnar(miners)
+
+    def test_gzip_json_columnar_ingest(self, ingest_app, ingest_site):
+        import gzip
+        import json
+        from api.collector_api import MinerTelemetryLive
+        from flask import request
+        from services.telemetry_codec import read_telemetry_body, ColumnarRecords
+        from services.edge_ingest_service import ingest_miner_records
+
+        body = gzip.compress(json.dumps(self._columnar_body(4)).encode('utf-8'))
+        with ingest_app.test_request_context('/upload', method='POST', data=body,
+                                              headers={'Content-Encoding': 'gzip'},
+                                              content_type='application/octet-stream'):
+            records = read_telemetry_body(request)
+
+        assert isinstance(records, ColumnarRecords)
+        assert len(records) == 4
+        assert records[1]['miner_id'] == 'C0001'
+        assert records[1].get('temperature_min', 'default') == 'default'
+        assert dict(records[2:3][0])['hashrate_ghs'] == 100002.0
+
+        with ingest_app.app_context():
+            result = ingest_miner_records(ingest_site, records, datetime.utcnow())
+            assert result['inserted'] == 4
+            assert MinerTelemetryLive.query.filter_by(miner_id='C0003').one().fan_speeds == [5000, 5100]
+
+    def test_msgpack_zstd_envelope(self, ingest_app):
+        msgpack = pytest.importorskip('msgpack')
+        zstandard = pytest.importorskip('zstandard')
+        from flask import request
+        from services.telemetry_codec import read_telemetry_body, ColumnarRecords
+
+        envelope = {'schema': 'telemetry_envelope.v1', 'site_id': 1, 'records': self._columnar_body(3)}
+        body = zstandard.ZstdCompressor().compress(msgpack.packb(envelope, use_bin_type=True))
+        with ingest_app.test_request_context('/ingest', method='POST', data=body,
+                                              headers={'Content-Encoding': 'zstd'},
+                                              content_type='application/x-msgpack'):
+            data = read_telemetry_body(request)
+
+        assert isinstance(data['records'], ColumnarRecords)
+        assert data['records'].column('miner_id') == ['C0000', 'C0001', 'C0002']
+
+    def test_unknown_encoding_is_unsupported(self, ingest_app):
+        from flask import request
+        from services.telemetry_codec import read_telemetry_body, UnsupportedTelemetryFormat
+
+        with ingest_app.test_request_context('/upload', method='POST', data=b'xx',
+                                              headers={'Content-Encoding': 'br'}):
+            with pytest.raises(UnsupportedTelemetryFormat):
+                read_telemetry_body(request)
+
+
+class TestStreamingIngest:
+    """Incremental gunzip + JSON array parsing of large uploads"""
+
+    def test_reader_handles_split_elements_and_gzip_members(self):
+        import gzip
+        import io
+        import json
+        from services.telemetry_codec import JSONArrayStreamReader
+
+        records = _make_records(25, boards=2)
+        text = json.dumps(records, indent=1).encode('utf-8')
+        # Two concatenated gzip members, read 7 bytes at a time
+        body = gzip.compress(text[:500]) + gzip.compress(text[500:])
+        reader = JSONArrayStreamReader(io.BytesIO(body), 'gzip', read_bytes=7)
+
+        assert reader.is_array()
+        chunks = list(reader.iter_chunks(chunk_records=10))
+        assert [len(c) for c in chunks] == [10, 10, 5]
+        assert [r for c in chunks for r in c] == records
+
+        numbers = JSONArrayStreamReader(io.BytesIO(b' [ 12345, -6.5e2 ,true] '), None, read_bytes=2)
+        assert list(numbers.iter_chunks()) == [[12345, -650.0, True]]
+
+    def test_reader_rejects_truncated_body_and_buffers_objects(self):
+        import io
+        from services.telemetry_codec import JSONArrayStreamReader
+
+        truncated = JSONArrayStreamReader(io.BytesIO(b'[{"miner_id": "A"}, {"miner_id"'), None, read_bytes=4)
+        with pytest.raises(ValueError):
+            list(truncated.iter_chunks())
+
+        envelope = JSONArrayStreamReader(io.BytesIO(b'  {"records": []}'), None, read_bytes=3)
+        assert not envelope.is_array()
+        assert envelope.read_document() == {'records': []}
+
+    def test_stream_ingest_commits_all_chunks(self, ingest_app, ingest_site):
+        import gzip
+        import io
+        import json
+        from api.collector_api import MinerTelemetryLive
+        from services.telemetry_codec import JSONArrayStreamReader
+        from services.edge_ingest_service import ingest_record_stream
+
+        body = gzip.compress(json.dumps(_make_records(50)).encode('utf-8'))
+        reader = JSONArrayStreamReader(io.BytesIO(body), 'gzip', read_bytes=256)
+
+        with ingest_app.app_context():
+            result = ingest_record_stream(ingest_site, reader.iter_chunks(chunk_records=20), datetime.utcnow())
+            assert result['received'] == 50
+            assert result['chunks'] == 3
+            assert result['inserted'] == 50
+            assert MinerTelemetryLive.query.count() == 50
+
+    def test_upload_endpoint_streams_large_gzip_body(self, ingest_app, ingest_site, monkeypatch, caplog):
+        import gzip
+        import hashlib
+        import json
+        from db import db
+        from api.collector_api import collector_bp, CollectorKey, MinerTelemetryLive, CollectorUploadLog
+        from services import telemetry_codec
+
+        monkeypatch.setattr(telemetry_codec, 'STREAM_MIN_BYTES', 0)
+        monkeypatch.setattr(telemetry_codec, 'STREAM_CHUNK_RECORDS', 7)
+        caplog.set_level('INFO', logger='services.edge_ingest_service')
+        ingest_app.register_blueprint(collector_bp)
+
+        with ingest_app.app_context():
+            db.session.add(CollectorKey(key_hash=hashlib.sha256(b'stream-key').hexdigest(),
+                                        site_id=ingest_site, name='stream'))
+            db.session.commit()
+
+        body = gzip.compress(json.dumps(_make_records(30)).encode('utf-8'))
+        response = ingest_app.test_client().post(
+            '/api/collector/upload', data=body,
+            headers={'X-Collector-Key': 'stream-key', 'Content-Encoding': 'gzip',
+                     'Content-Type': 'application/octet-stream'}
+        )
+
+        assert response.status_code == 200
+        assert response.get_json()['data']['processed'] == 30
+        assert any('chunks=5' in r.getMessage() for r in caplog.records)
+        assert 'columnar' in response.headers['X-Telemetry-Accept']
+        with ingest_app.app_context():
+            assert MinerTelemetryLive.query.count() == 30
+            assert CollectorUploadLog.query.one().data_size_bytes == len(body)
@@ -0,0 +1,178 @@
+"""
+IP Scan Tests
+IP扫描测试
+
+Scan engine (port 4028 pre-filter, adaptive concurrency, streamed results),
+the hosting IPScanner on top of it, and the incremental scan planner.
+Miners are simulated by the mock_server fixture (tests/conftest.py).
+"""
+
+import pytest
+
+
+class TestScanEngine:
+    """IP scan engine: port 4028 pre-filter, adaptive concurrency, streamed results"""
+
+    COMMANDS = ('summary', 'stats', 'version', 'pools')
+
+    def _combine(self, server):
+        server.responses['version']['VERSION'][0]['Type'] = 'Antminer S19 Pro'
+        combined = {c: [server.responses[c]] for c in self.COMMANDS}
+        combined['id'] = 1
+        server.set_response('+'.join(self.COMMANDS), combined)
+
+    def test_stream_probes_only_open_hosts(self, mock_server):
+        import asyncio
+        from edge_collector.ip_scanner import MinerScanner
+        self._combine(mock_server)
+        scanner = MinerScanner(cgminer_port=mock_server.port, connect_timeout=0.5, timeout=1)
+        # Only 127.0.0.1 listens; the rest of 127.0.1.0/24 refuses the pre-filter connect
+        ips = [f'127.0.1.{i}' for i in range(1, 101)] + ['127.0.0.1']
+
+        async def collect():
+            return [r async for r in scanner.scan_stream(ips)]
+        found = asyncio.run(collect())
+
+        assert [r.ip_address for r in found] == ['127.0.0.1']
+        assert found[0].detected_model == 'Antminer S19 Pro'
+        assert found[0].detected_hashrate_ghs == 95.5
+        assert found[0].raw_response['POOLS'][0]['User'] == 'worker1'
+        assert mock_server.commands == ['summary+stats+version+pools']
+        stats = scanner.get_stats()
+        assert (stats['scanned'], stats['open'], stats['miners']) == (101, 1, 1)
+
+        # scan_range keeps returning one result per address, in input order
+        results = scanner.scan_range_sync(['127.0.1.1', '127.0.0.1', '127.0.1.2'])
+        assert [(r.ip_address, r.is_miner) for r in results] == [
+            ('127.0.1.1', False), ('127.0.0.1', True), ('127.0.1.2', False)]
+
+    def test_limiter_slow_start_then_backs_off(self):
+        import asyncio
+        from edge_collector.ip_scanner import AdaptiveLimiter
+
+        async def cycle(limiter, n, overloaded=False):
+            for _ in range(n):
+                await limiter.acquire()
+                await limiter.release(overloaded)
+
+        async def run():
+            limiter = AdaptiveLimiter(16, minimum=8, maximum=256, step=8)
+            await cycle(limiter, 16)
+            await cycle(limiter, 32)
+            assert limiter.limit == 64
+            # Halved once on overload; the next overloads of the same round keep it
+            await cycle(limiter, 3, overloaded=True)
+            assert limiter.limit == 32 and limiter.overloads == 3
+            # Additive growth after the first overload
+            await cycle(limiter, 32)
+            assert limiter.limit == 40
+        asyncio.run(run())
+
+    def test_overloaded_attempts_are_retried(self):
+        import asyncio
+        from edge_collector.ip_scanner import MinerScanner, MinerProbeResult, ScanOverload
+
+        attempts = {}
+
+        class Flaky(MinerScanner):
+            async def _check_ip(self, ip):
+                attempts[ip] = attempts.get(ip, 0) + 1
+                if attempts[ip] == 1:
+                    raise ScanOverload('Too many open files')
+                return MinerProbeResult(ip_address=ip, is_miner=ip.endswith('.7'))
+
+        scanner = Flaky(max_concurrent=16, connect_timeout=0.1)
+        ips = [f'10.0.0.{i}' for i in range(1, 51)]
+
+        async def collect():
+            return [r async for r in scanner.scan_stream(ips, include_all=True)]
+        results = asyncio.run(collect())
+
+        assert sorted(r.ip_address for r in results) == sorted(ips)
+        assert all(r.error is None for r in results)
+        assert set(attempts.values()) == {2}
+        assert scanner.get_stats()['overloads'] == 50
+
+    def test_hosting_scanner_uses_engine(self, mock_server):
+        from services.ip_scanner import IPScanner
+        self._combine(mock_server)
+        scanner = IPScanner(timeout=1, connect_timeout=0.5)
+        scanner.CGMINER_PORT = mock_server.port
+        calls = []
+
+        scan_id, miners = scanner.scan_range('127.0.0.1', '127.0.0.20', site_id=1,
+                                             callback=lambda *args: calls.append(args))
+
+        assert len(miners) == 1
+        miner = miners[0]
+        assert (miner.ip_address, miner.miner_type, miner.model) == ('127.0.0.1', 'antminer', 'Antminer S19 Pro')
+        assert miner.worker == 'worker1' and miner.temperature == 68.0 and miner.uptime_hours == 24
+        assert calls[-1] == (20, 20, 1)
+        assert scanner.get_scan_progress(scan_id)['status'] == 'completed'
+        assert scanner.get_scan_results(scan_id)[0]['pool_url'] == 'stratum+tcp://pool.example.com:3333'
+
+    def test_async_scan_reports_miners_and_progress(self, mock_server):
+        import threading
+        from services.ip_scanner import IPScanner
+        self._combine(mock_server)
+        scanner = IPScanner(timeout=1, connect_timeout=0.5)
+        scanner.CGMINER_PORT = mock_server.port
+        scanner.RECORD_INTERVAL = 0
+        batches, completed, done = [], [], threading.Event()
+
+        def on_discovered(scanned, miners):
+            if not batches:
+                batches.append(None)
+                raise RuntimeError('database unavailable')  # handed over again with the next batch
+            batches.append((scanned, [m.ip_address for m in miners]))
+
+        scanner.scan_range_async('127.0.0.1', '127.0.0.20', site_id=1, on_discovered=on_discovered,
+                                 on_complete=lambda *args: (completed.append(args), done.set()))
+
+        assert done.wait(30)
+        assert len(batches) > 2
+        assert [ip for _, ips in batches[1:] for ip in ips] == ['127.0.0.1']
+        assert batches[-1][0] == 20
+        assert completed == [('completed', 20, None)]
+
+    def test_whole_slash16_accepted(self):
+        from services.ip_scanner import IPScanner
+        assert len(IPScanner.parse_cidr('10.1.0.0/16')) == 65534
+        assert len(IPScanner.parse_ip_range('10.1.0.0', '10.1.255.255')) == 65536
+        with pytest.raises(ValueError):
+            IPScanner.parse_ip_range('10.1.0.0', '10.2.0.0')
+
+
+class TestIncrementalScanPlan:
+    """Known-host map: known miners first, confirmed-empty addresses skipped"""
+
+    def _ips(self, start, end):
+        return [f'10.0.0.{i}' for i in range(start, end + 1)]
+
+    def test_plan_orders_known_and_skips_confirmed_empty(self):
+        from services.scan_planner import KnownHostMap
+        full_scans = [  # newest first
+            ('10.0.0.1', '10.0.0.20', ['10.0.0.5']),
+            ('10.0.0.1', '10.0.0.20', ['10.0.0.5', '10.0.0.9']),
+            ('10.0.0.1', '10.0.0.10', []),
+        ]
+        known_hosts = KnownHostMap(['10.0.0.5', '10.0.0.12'], full_scans, confirmations=3)
+
+        plan = known_hosts.plan(self._ips(1, 25))
+
+        assert plan.known == ['10.0.0.5', '10.0.0.12']
+        # .1-.10 empty in all three scans except .9 (found two scans ago)
+        assert plan.skipped == [ip for ip in self._ips(1, 10) if ip not in ('10.0.0.5', '10.0.0.9')]
+        # .11-.20 were covered by only two scans; .21-.25 never scanned
+        assert plan.unknown == ['10.0.0.9'] + [ip for ip in self._ips(11, 25) if ip != '10.0.0.12']
+        assert plan.ip_list[:2] == plan.known
+        assert plan.to_dict() == {'known_ips': 2, 'probe_ips': 15, 'skipped_ips': 8}
+
+    def test_no_history_probes_everything(self):
+        from services.scan_planner import KnownHostMap
+        plan = KnownHostMap([], []).plan(self._ips(1, 10))
+        assert plan.unknown == self._ips(1, 10) and not plan.skipped and not plan.known
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
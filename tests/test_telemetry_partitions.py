@@ -0,0 +1,96 @@
+"""
+Telemetry Partition Manager Tests
+遥测分区管理测试
+
+Partition naming / range math, plus the DELETE fallback that non-PostgreSQL
+databases keep using.
+"""
+
+import os
+import pytest
+from datetime import datetime, timedelta
+
+os.environ.setdefault('SESSION_SECRET', 'test-secret-key-for-testing-only')
+
+
+@pytest.fixture
+def storage_app():
+    from flask import Flask
+    from db import db
+    import services.telemetry_storage  # noqa: F401
+
+    test_app = Flask(__name__)
+    test_app.config['TESTING'] = True
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [db.metadata.tables[name] for name in ('telemetry_raw_24h', 'telemetry_history_5min')]
+        db.metadata.create_all(db.engine, tables=tables)
+
+    yield test_app
+
+    with test_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+class TestPartitionLayout:
+
+    def test_hourly_ranges_and_names(self):
+        from services.telemetry_partitions import (
+            PARTITION_SPECS, partition_ranges, parse_partition_name
+        )
+        spec = PARTITION_SPECS['telemetry_raw_24h']
+        start = datetime(2026, 10, 16, 22, 41, 7)
+        ranges = partition_ranges(spec, start, start + timedelta(hours=2))
+
+        assert [r[0] for r in ranges] == [
+            'telemetry_raw_24h_p2026101622',
+            'telemetry_raw_24h_p2026101623',
+            'telemetry_raw_24h_p2026101700',
+        ]
+        assert ranges[0][1] == datetime(2026, 10, 16, 22)
+        assert ranges[-1][2] == datetime(2026, 10, 17, 1)
+        assert parse_partition_name('telemetry_raw_24h', ranges[2][0], 'hour') == datetime(2026, 10, 17, 0)
+        assert parse_partition_name('telemetry_raw_24h', 'telemetry_raw_24h_default', 'hour') is None
+
+    def test_daily_ranges_and_names(self):
+        from services.telemetry_partitions import (
+            PARTITION_SPECS, partition_ranges, parse_partition_name
+        )
+        spec = PARTITION_SPECS['telemetry_history_5min']
+        ranges = partition_ranges(spec, datetime(2026, 2, 28, 13), datetime(2026, 3, 1, 0, 5))
+
+        assert [(r[0], r[1], r[2]) for r in ranges] == [
+            ('telemetry_history_5min_p20260228', datetime(2026, 2, 28), datetime(2026, 3, 1)),
+            ('telemetry_history_5min_p20260301', datetime(2026, 3, 1), datetime(2026, 3, 2)),
+        ]
+        # An hourly-looking suffix is not one of this table's partitions
+        assert parse_partition_name('telemetry_history_5min',
+                                    'telemetry_history_5min_p2026030100', 'day') is None
+
+
+class TestNonPostgresFallback:
+
+    def test_sqlite_keeps_plain_tables_and_delete_cleanup(self, storage_app):
+        from db import db
+        from services.telemetry_partitions import partition_manager
+        from services.telemetry_storage import TelemetryRaw24h, TelemetryStorageManager
+
+        with storage_app.app_context():
+            assert partition_manager.is_supported() is False
+            assert partition_manager.is_partitioned('telemetry_raw_24h') is False
+            assert partition_manager.migrate_table(TelemetryRaw24h) is False
+            assert partition_manager.ensure_partitions('telemetry_raw_24h') == 0
+
+            now = datetime.utcnow()
+            db.session.add_all([
+                TelemetryRaw24h(ts=now - timedelta(hours=30), site_id=1, miner_id='old'),
+                TelemetryRaw24h(ts=now - timedelta(hours=1), site_id=1, miner_id='new'),
+            ])
+            db.session.commit()
+
+            assert TelemetryStorageManager.cleanup_old_raw_data() == 1
+            assert [r.miner_id for r in TelemetryRaw24h.query.all()] == ['new']
@@ -0,0 +1,328 @@
+"""
+Incremental Rollup Engine Tests
+增量聚合引擎测试
+
+Runs the rollup tiers against in-memory SQLite: only new raw ids are read,
+late samples refresh their own bucket and closed days flow into telemetry_daily.
+"""
+
+import os
+import pytest
+from datetime import datetime, timedelta
+
+os.environ.setdefault('SESSION_SECRET', 'test-secret-key-for-testing-only')
+
+ROLLUP_TABLES = [
+    'telemetry_raw_24h', 'telemetry_history_5min', 'telemetry_history_hourly', 'telemetry_daily',
+    'telemetry_rollup_watermarks', 'telemetry_rollup_dirty', 'telemetry_archive_manifest',
+]
+
+
+@pytest.fixture
+def rollup_app():
+    from flask import Flask
+    from db import db
+    import services.telemetry_storage  # noqa: F401
+    import services.telemetry_rollup  # noqa: F401
+    import services.telemetry_archive  # noqa: F401
+
+    test_app = Flask(__name__)
+    test_app.config['TESTING'] = True
+    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(test_app)
+
+    with test_app.app_context():
+        tables = [db.metadata.tables[name] for name in ROLLUP_TABLES]
+        db.metadata.create_all(db.engine, tables=tables)
+        yield test_app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _raw(ts, miner_id='M1', hashrate=100.0, status='online'):
+    from services.telemetry_storage import TelemetryRaw24h
+    return TelemetryRaw24h(ts=ts, site_id=1, miner_id=miner_id, status=status,
+                           hashrate_ths=hashrate, temperature_c=60, power_w=3000, fan_rpm=5000)
+
+
+def _bucket(ts):
+    return ts.replace(minute=ts.minute - ts.minute % 5, second=0, microsecond=0)
+
+
+class TestIncrementalRollup:
+
+    def test_only_new_rows_and_late_samples_refresh_their_bucket(self, rollup_app):
+        from db import db
+        from services.telemetry_rollup import rollup_engine, TelemetryRollupWatermark
+        from services.telemetry_storage import TelemetryHistory5min
+
+        now = datetime.utcnow()
+        first = _bucket(now - timedelta(minutes=10))
+        db.session.add_all([
+            _raw(first + timedelta(seconds=30), hashrate=100.0),
+            _raw(first + timedelta(seconds=90), hashrate=120.0, status='offline'),
+            _raw(first + timedelta(minutes=5, seconds=10), hashrate=90.0),
+        ])
+        db.session.commit()
+
+        result = rollup_engine.run_tier('5min')
+        assert result['rows'] == 3 and result['buckets'] == 2
+
+        row = TelemetryHistory5min.query.filter_by(miner_id='M1', bucket_ts=first).one()
+        assert row.samples == 2
+        assert row.avg_hashrate_ths == pytest.approx(110.0)
+        assert row.online_ratio == pytest.approx(0.5)
+
+        # Nothing new: no source rows read
+        assert rollup_engine.run_tier('5min')['rows'] == 0
+
+        # Late sample for the first bucket: only that bucket is recomputed
+        db.session.add(_raw(first + timedelta(minutes=2), hashrate=140.0))
+        db.session.commit()
+        result = rollup_engine.run_tier('5min')
+        assert result['rows'] == 1 and result['buckets'] == 1
+
+        db.session.expire_all()
+        row = TelemetryHistory5min.query.filter_by(miner_id='M1', bucket_ts=first).one()
+        assert row.samples == 3
+        assert row.max_hashrate_ths == pytest.approx(140.0)
+
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        assert wm.last_source_id == 4 and wm.gap_since is None
+        assert rollup_engine.get_status()['5min']['lag_seconds'] is not None
+
+    def test_id_holes_settle_only_past_ids_seen_with_the_hole(self, rollup_app):
+        from db import db
+        from services.telemetry_rollup import (
+            rollup_engine, TelemetryRollupWatermark, ROLLUP_GAP_MAX_WAIT_SECONDS
+        )
+
+        ts = datetime.utcnow() - timedelta(minutes=1)
+        db.session.add(TelemetryRollupWatermark(tier='5min', last_source_id=0, high_source_id=0))
+        for raw_id in (1, 2, 4, 6):
+            row = _raw(ts)
+            row.id = raw_id
+            db.session.add(row)
+        db.session.commit()
+
+        assert rollup_engine.run_tier('5min')['to_id'] == 2
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        assert wm.gap_since is not None and wm.gap_source_id == 6
+
+        # A slow transaction commits id 3: the watermark moves up to the next hole
+        late = _raw(ts)
+        late.id = 3
+        db.session.add(late)
+        db.session.commit()
+        assert rollup_engine.run_tier('5min')['to_id'] == 4
+
+        # Without transaction evidence (SQLite) the hole at 5 waits for the max wait;
+        # the newer hole at 7 was not there when the wait started and stays open
+        newer = _raw(ts)
+        newer.id = 8
+        db.session.add(newer)
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        wm.gap_since = datetime.utcnow() - timedelta(seconds=ROLLUP_GAP_MAX_WAIT_SECONDS - 60)
+        db.session.commit()
+        assert rollup_engine.run_tier('5min')['to_id'] == 4
+
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        wm.gap_since = datetime.utcnow() - timedelta(seconds=ROLLUP_GAP_MAX_WAIT_SECONDS + 60)
+        db.session.commit()
+        assert rollup_engine.run_tier('5min')['to_id'] == 6
+
+        db.session.expire_all()
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        assert wm.last_source_id == 6 and wm.gap_source_id == 8
+        assert (datetime.utcnow() - wm.gap_since).total_seconds() < 60
+
+    def test_row_committed_into_hole_during_run_is_not_passed(self, rollup_app, monkeypatch):
+        from db import db
+        from services.telemetry_rollup import (
+            rollup_engine, TelemetryRollupEngine, TelemetryRollupWatermark, ROLLUP_GAP_MAX_WAIT_SECONDS
+        )
+        from services.telemetry_storage import TelemetryHistory5min
+
+        base = _bucket(datetime.utcnow() - timedelta(minutes=30))
+        db.session.add(TelemetryRollupWatermark(tier='5min', last_source_id=0, high_source_id=0))
+        for raw_id in (1, 2, 4, 6):
+            row = _raw(base)
+            row.id = raw_id
+            db.session.add(row)
+        db.session.commit()
+
+        # The slow transaction of each hole commits in the middle of a run
+        first_gap = TelemetryRollupEngine._first_gap
+        racing = {}
+
+        def first_gap_with_race(lo, hi):
+            if racing.get('before'):
+                db.session.add(racing.pop('before'))
+                db.session.flush()
+            gap = first_gap(lo, hi)
+            if racing.get('after'):
+                db.session.add(racing.pop('after'))
+                db.session.flush()
+            return gap
+
+        monkeypatch.setattr(TelemetryRollupEngine, '_first_gap', staticmethod(first_gap_with_race))
+
+        # Committed before the ids are read: rolled up in this run
+        racing['before'] = _raw(base + timedelta(minutes=5), miner_id='M3')
+        racing['before'].id = 3
+        assert rollup_engine.run_tier('5min')['to_id'] == 4
+        assert TelemetryHistory5min.query.filter_by(miner_id='M3').count() == 1
+
+        # Committed after the ids are read in the run that settles the hole at 5:
+        # the aggregation still reads it
+        wm = TelemetryRollupWatermark.query.filter_by(tier='5min').one()
+        wm.gap_since = datetime.utcnow() - timedelta(seconds=ROLLUP_GAP_MAX_WAIT_SECONDS + 60)
+        db.session.commit()
+        racing['after'] = _raw(base + timedelta(minutes=10), miner_id='M5')
+        racing['after'].id = 5
+        assert rollup_engine.run_tier('5min')['to_id'] == 6
+        assert TelemetryHistory5min.query.filter_by(miner_id='M5').count() == 1
+
+    def test_closed_days_roll_up_from_dirty_buckets(self, rollup_app):
+        from db import db
+        from services.telemetry_rollup import rollup_engine, TelemetryRollupDirty
+        from services.telemetry_storage import TelemetryDaily, TelemetryHistoryHourly
+
+        now = datetime.utcnow()
+        yesterday = (now - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+        # Within the current hour (and day) even right after the hour turns
+        recent = max(now - timedelta(minutes=1), now.replace(minute=0, second=0, microsecond=0))
+        db.session.add_all([
+            _raw(yesterday, miner_id='M1', hashrate=100.0),
+            _raw(yesterday + timedelta(hours=1), miner_id='M1', hashrate=80.0),
+            _raw(recent, miner_id='M1', hashrate=90.0),
+        ])
+        db.session.commit()
+
+        # Late rows are older than the initial lookback: start the tier from id 0
+        from services.telemetry_rollup import TelemetryRollupWatermark
+        db.session.add(TelemetryRollupWatermark(tier='5min', last_source_id=0, high_source_id=0))
+        db.session.commit()
+
+        results = {r['tier']: r for r in rollup_engine.run()}
+        assert results['5min']['buckets'] == 3
+        assert results['hourly']['buckets'] == 3
+        assert results['daily']['buckets'] == 1
+
+        daily = TelemetryDaily.query.filter_by(miner_id='M1').one()
+        assert daily.day == yesterday.date()
+        assert daily.avg_hashrate_ths == pytest.approx(90.0)
+        assert daily.samples == 2
+
+        # Today's bucket stays dirty until the day closes; the open hour is already materialized
+        pending = TelemetryRollupDirty.query.all()
+        assert [(p.tier, p.bucket_ts.date()) for p in pending] == [('daily', now.date())]
+
+        hourly = TelemetryHistoryHourly.query.filter_by(miner_id='M1').order_by(TelemetryHistoryHourly.bucket_ts).all()
+        assert [h.bucket_ts for h in hourly[:2]] == [yesterday, yesterday + timedelta(hours=1)]
+        assert hourly[-1].bucket_ts == now.replace(minute=0, second=0, microsecond=0)
+
+
+class TestHistoryResolution:
+
+    def test_auto_picks_coarsest_tier_meeting_point_budget(self):
+        from services.telemetry_service import TelemetryService
+
+        now = datetime(2026, 10, 16, 12, 0)
+        pick = lambda days, **kw: TelemetryService.select_resolution(  # noqa: E731
+            now - timedelta(days=days), now, now=now, **kw)[0]
+
+        assert pick(1) == '5min'          # 288 five-minute points < budget: finest tier
+        assert pick(30) == 'hourly'       # 720 hourly points, 30 daily points
+        assert pick(90) == 'hourly'       # 5min no longer covers the range
+        assert pick(365) == 'daily'       # past hourly retention
+        assert pick(30, points=20) == 'daily'
+        assert pick(2, points=20) == 'hourly'
+
+    def test_explicit_resolution_falls_back_to_covering_tier(self):
+        from services.telemetry_service import TelemetryService
+
+        now = datetime(2026, 10, 16, 12, 0)
+        start = now - timedelta(days=90)
+        assert TelemetryService.select_resolution(start, now, resolution='5min', now=now)[0] == 'hourly'
+        assert TelemetryService.select_resolution(start, now, resolution='daily', now=now)[:3] == (
+            'daily', 'telemetry_daily', 'day')
+
+
+class TestDownsampling:
+
+    def test_lttb_and_minmax_keep_spikes(self):
+        import numpy as np
+        from services.telemetry_service import lttb_indices, minmax_indices, downsample_indices
+
+        x = np.arange(5000, dtype=float)
+        y = np.sin(x / 200)
+        y[1234], y[3210] = 10.0, -10.0
+
+        kept = lttb_indices(x, y, 100)
+        assert len(kept) == 100 and kept[0] == 0 and kept[-1] == 4999
+        assert np.all(np.diff(kept) > 0)
+        assert {1234, 3210} <= set(kept.tolist())
+
+        kept = minmax_indices(y, 100)
+        assert len(kept) <= 100 and {1234, 3210} <= set(kept.tolist())
+
+        # None samples are skipped, short series are returned whole
+        assert downsample_indices(range(4), [1.0, None, 2.0, 3.0], 10).tolist() == [0, 2, 3]
+
+    def test_get_history_max_points(self, rollup_app):
+        from db import db
+        from services.telemetry_service import TelemetryService
+        from services.telemetry_storage import TelemetryHistory5min
+
+        start = _bucket(datetime.utcnow() - timedelta(hours=20))
+        for i in range(200):
+            db.session.add(TelemetryHistory5min(bucket_ts=start + timedelta(minutes=5 * i), site_id=1,
+                                                miner_id='M1', avg_hashrate_ths=500.0 if i == 77 else 100.0,
+                                                avg_temp_c=60.0, avg_power_w=3000.0, samples=10))
+        db.session.commit()
+
+        result = TelemetryService.get_history(1, start, start + timedelta(days=1), resolution='5min',
+                                              max_points=30)
+        data = result['series'][0]['data']
+        assert result['_meta']['total_points'] == 200
+        assert len(data) <= 30
+        assert max(p['hashrate_ths'] for p in data) == 500.0
+        assert [p['ts'] for p in data] == sorted(p['ts'] for p in data)
+
+
+class TestColdArchive:
+
+    def test_expired_days_are_archived_and_read_back(self, rollup_app, tmp_path, monkeypatch):
+        pytest.importorskip('pyarrow')
+        from db import db
+        import services.telemetry_archive as archive
+        from services.telemetry_service import TelemetryService
+        from services.telemetry_storage import TelemetryHistory5min
+
+        archiver = archive.TelemetryArchiver(uri=str(tmp_path))
+        monkeypatch.setattr(archive, 'telemetry_archiver', archiver)
+
+        now = datetime.utcnow()
+        old_day = (now - timedelta(days=70)).replace(hour=0, minute=0, second=0, microsecond=0)
+        recent = _bucket(now - timedelta(hours=1))
+        for ts, hashrate in ((old_day + timedelta(hours=3), 100.0), (old_day + timedelta(hours=4), 110.0),
+                             (recent, 120.0)):
+            db.session.add(TelemetryHistory5min(bucket_ts=ts, site_id=1, miner_id='M1',
+                                                avg_hashrate_ths=hashrate, samples=10))
+        db.session.add(TelemetryHistory5min(bucket_ts=old_day + timedelta(hours=5), site_id=2,
+                                            miner_id='M9', avg_hashrate_ths=1.0, samples=1))
+        db.session.commit()
+
+        cutoff = (now - timedelta(days=60)).replace(hour=0, minute=0, second=0, microsecond=0)
+        assert archiver.archive_before('telemetry_history_5min', cutoff) is True
+        assert archiver.archived_through('telemetry_history_5min') == old_day.date() + timedelta(days=1)
+        TelemetryHistory5min.query.filter(TelemetryHistory5min.bucket_ts < cutoff).delete()
+        db.session.commit()
+
+        result = TelemetryService.get_history(1, old_day, now, resolution='5min')
+        points = result['series'][0]['data']
+        assert result['_meta']['resolution'] == '5min'
+        assert result['_meta']['archived_rows'] == 2
+        assert [p['hashrate_ths'] for p in points] == [100.0, 110.0, 120.0]
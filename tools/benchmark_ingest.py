@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+遥测接收吞吐基准测试 (ingest / rollup / live queries)
+
+Generates synthetic megafarm payloads (MinerData records with board health),
+replays them through the Flask test client against /api/collector/upload and
+times the 5-minute rollup and the live/history queries that read the result.
+
+For every stage and farm size it reports records/sec, p50/p99 latency,
+SQL statements per batch and peak RSS, and writes everything to a JSON file
+so runs can be compared between commits (``--compare``).
+
+The run uses a throwaway hosting site and collector key that are deleted
+afterwards (``--keep`` to inspect the data). Point DATABASE_URL at a local
+PostgreSQL; the rollup SQL is PostgreSQL-only.
+
+Usage:
+    python tools/benchmark_ingest.py
+    python tools/benchmark_ingest.py --miners 1000 10000 --repeat 3
+    python tools/benchmark_ingest.py --compare tools/benchmark_results/ingest-abc1234.json
+"""
+
+import sys
+import os
+import gzip
+import json
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import platform
+import subprocess
+import threading
+from datetime import datetime, timedelta
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event, text
+
+from app import app, db
+from models import HostingSite
+from api.collector_api import CollectorKey
+from services.telemetry_service import telemetry_service
+from services.telemetry_storage import TelemetryStorageManager
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is a project dependency
+    psutil = None
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'benchmark_results')
+BENCH_KEY = 'bench-ingest-key'
+
+# 清理顺序: 子表在前
+CLEANUP_TABLES = [
+    'miner_board_telemetry', 'miner_telemetry_live', 'miner_telemetry_history',
+    'telemetry_raw_24h', 'telemetry_history_5min', 'telemetry_rollup_dirty', 'collector_upload_logs',
+    'hosting_miners', 'collector_keys',
+]
+
+
+# ==================== 负载生成 ====================
+
+def build_payload(miner_count, boards_per_miner, cycle):
+    """生成一个采集周期的 MinerData 列表 (与 edge_collector 上传格式一致)"""
+    rng = random.Random(cycle)
+    now = datetime.utcnow().isoformat()
+    records = []
+
+    for i in range(miner_count):
+        online = rng.random() > 0.03
+        hashrate_ths = rng.uniform(100, 120) if online else 0.0
+        temps = [round(rng.uniform(58, 78), 1) for _ in range(boards_per_miner * 2)] if online else []
+        boards = [
+            {
+                'board_index': b,
+                'hashrate_ths': round(hashrate_ths / max(boards_per_miner, 1), 2),
+                'temperature_c': temps[b * 2] if temps else 0,
+                'chips_total': 76,
+                'chips_ok': 76 if rng.random() > 0.01 else 74,
+                'chips_failed': 0,
+                'chip_status': 'o' * 76,
+                'frequency_mhz': 650.0,
+                'voltage_mv': 1300.0,
+                'health': 'healthy',
+            }
+            for b in range(boards_per_miner)
+        ] if online else []
+
+        records.append({
+            'miner_id': f'BENCH{i:06d}',
+            'ip_address': f'10.{i // 65536}.{(i // 256) % 256}.{i % 256}',
+            'timestamp': now,
+            'online': online,
+            'hashrate_ghs': hashrate_ths * 1000,
+            'hashrate_5s_ghs': hashrate_ths * 1000 * rng.uniform(0.97, 1.03),
+            'temperature_avg': sum(temps) / len(temps) if temps else 0.0,
+            'temperature_max': max(temps) if temps else 0.0,
+            'temperature_chips': temps,
+            'fan_speeds': [rng.randint(4800, 6200) for _ in range(4)] if online else [],
+            'frequency_avg': 650.0 if online else 0.0,
+            'accepted_shares': 1000 * cycle + rng.randint(0, 500),
+            'rejected_shares': rng.randint(0, 20),
+            'hardware_errors': rng.randint(0, 3),
+            'uptime_seconds': 86400 + cycle * 30,
+            'power_consumption': rng.uniform(3100, 3400) if online else 0.0,
+            'efficiency': 29.5,
+            'pool_url': 'stratum+tcp://btc.f2pool.com:3333',
+            'worker_name': f'bench.{i:06d}',
+            'firmware_version': '2024.06',
+            'error_message': '' if online else 'Connection failed',
+            'model': 'Antminer S19 Pro',
+            'boards': boards,
+            'boards_total': boards_per_miner,
+            'boards_healthy': boards_per_miner if online else 0,
+            'overall_health': 'healthy' if online else 'offline',
+        })
+
+    return records
+
+
+# ==================== 度量工具 ====================
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class StatementCounter:
+    """统计 SQLAlchemy 执行的语句数 (COPY 走原始游标, 不计入)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, *args, **kwargs):
+        self.count += 1
+
+
+class PeakRSS:
+    """后台线程采样进程 RSS, 记录阶段内峰值 (MB)"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _current(self):
+        if psutil is not None:
+            return psutil.Process().memory_info().rss
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._current()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._current())
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def run_stage(name, miners, fn, iterations, records_per_call):
+    """执行一个阶段 iterations 次, 返回结果字典"""
+    latencies = []
+    statements = []
+
+    with PeakRSS() as rss:
+        for i in range(iterations):
+            with StatementCounter(db.engine) as counter:
+                start = time.perf_counter()
+                fn(i)
+                latencies.append(time.perf_counter() - start)
+            statements.append(counter.count)
+
+    total = sum(latencies)
+    return {
+        'stage': name,
+        'miners': miners,
+        'iterations': iterations,
+        'records_per_sec': round(records_per_call * iterations / total, 1) if total else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 2),
+            'p99': round(percentile(latencies, 99) * 1000, 2),
+            'mean': round(total / iterations * 1000, 2),
+        },
+        'statements_per_batch': round(sum(statements) / iterations, 1),
+        'peak_rss_mb': rss.peak_mb,
+    }
+
+
+# ==================== 阶段 ====================
+
+def setup_site():
+    site = HostingSite(
+        name='Ingest Benchmark',
+        slug=f'ingest-bench-{uuid.uuid4().hex[:8]}',
+        location='Benchmark',
+        capacity_mw=50.0,
+        electricity_rate=0.05,
+        operator_name='Benchmark'
+    )
+    db.session.add(site)
+    db.session.flush()
+    db.session.add(CollectorKey(
+        key_hash=hashlib.sha256(BENCH_KEY.encode()).hexdigest(),
+        site_id=site.id,
+        name='ingest-benchmark'
+    ))
+    db.session.commit()
+    return site.id
+
+
+def cleanup_site(site_id):
+    for table in CLEANUP_TABLES:
+        db.session.execute(text(f"DELETE FROM {table} WHERE site_id = :site_id"), {'site_id': site_id})
+    db.session.execute(text("DELETE FROM hosting_sites WHERE id = :site_id"), {'site_id': site_id})
+    db.session.commit()
+
+
+def bench_farm(client, site_id, miners, boards, repeat):
+    """单个矿场规模的全部阶段"""
+    results = []
+    payloads = [
+        gzip.compress(json.dumps(build_payload(miners, boards, cycle)).encode('utf-8'))
+        for cycle in range(repeat + 1)
+    ]
+    headers = {
+        'X-Collector-Key': BENCH_KEY,
+        'Content-Type': 'application/octet-stream',
+        'Content-Encoding': 'gzip',
+    }
+
+    def post(cycle):
+        response = client.post('/api/collector/upload', data=payloads[cycle], headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"upload failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+
+    # 首个周期: 插入 live 行并创建 HostingMiner
+    results.append(run_stage('ingest_cold', miners, post, 1, miners))
+    # 稳态: 全部为更新
+    results.append(run_stage('ingest', miners, lambda i: post(i + 1), repeat, miners))
+    db.session.remove()
+
+    if db.engine.dialect.name == 'postgresql':
+        # The rollup is incremental: one run picks up every raw row the ingest stages wrote
+        results.append(run_stage('rollup_5min', miners, lambda i: TelemetryStorageManager.rollup_to_5min(),
+                                 1, miners * (repeat + 1)))
+
+    results.append(run_stage(
+        'query_live', miners,
+        lambda i: telemetry_service.get_live(site_id=site_id, limit=miners),
+        repeat, miners
+    ))
+    end = datetime.utcnow() + timedelta(minutes=5)
+    results.append(run_stage(
+        'query_history', miners,
+        lambda i: telemetry_service.get_history(site_id, end - timedelta(hours=24), end),
+        repeat, miners
+    ))
+    db.session.remove()
+    return results
+
+
+# ==================== 报告 ====================
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def print_results(results, baseline=None):
+    base_map = {(r['stage'], r['miners']): r for r in (baseline or {}).get('results', [])}
+    print(f"{'stage':<14} {'miners':>7} {'rec/s':>12} {'p50 ms':>10} {'p99 ms':>10} {'stmts':>8} {'rss MB':>8} {'vs base':>9}")
+    for r in results:
+        base = base_map.get((r['stage'], r['miners']))
+        change = ''
+        if base and base['records_per_sec']:
+            change = f"{(r['records_per_sec'] / base['records_per_sec'] - 1) * 100:+.1f}%"
+        print(f"{r['stage']:<14} {r['miners']:>7} {r['records_per_sec']:>12,.0f} "
+              f"{r['latency_ms']['p50']:>10.1f} {r['latency_ms']['p99']:>10.1f} "
+              f"{r['statements_per_batch']:>8.0f} {r['peak_rss_mb']:>8.1f} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark telemetry ingest, rollup and queries')
+    parser.add_argument('--miners', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--boards', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5, help='steady-state iterations per stage')
+    parser.add_argument('--output', help='result JSON path (default tools/benchmark_results/ingest-<commit>.json)')
+    parser.add_argument('--compare', help='baseline result JSON to compare records/sec against')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark site and its telemetry')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    commit = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'boards_per_miner': args.boards,
+            'repeat': args.repeat,
+        },
+        'results': [],
+    }
+
+    with app.app_context():
+        report['meta']['database'] = db.engine.dialect.name
+        if db.engine.dialect.name != 'postgresql':
+            print("⚠️ 非 PostgreSQL 数据库: 跳过 rollup 阶段, 结果不可与生产对比")
+
+        site_id = setup_site()
+        client = app.test_client()
+        print("=" * 90)
+        print(f"Telemetry ingest benchmark @ {commit} (site {site_id}, {args.boards} boards/miner)")
+        print("=" * 90)
+
+        try:
+            for miners in args.miners:
+                results = bench_farm(client, site_id, miners, args.boards, args.repeat)
+                report['results'].extend(results)
+                print_results(results, baseline)
+                # 每个规模独立: 清空上一轮数据
+                if not args.keep:
+                    cleanup_site(site_id)
+                    site_id = setup_site()
+        finally:
+            if not args.keep:
+                db.session.rollback()
+                cleanup_site(site_id)
+
+    output = args.output or os.path.join(RESULTS_DIR, f'ingest-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n结果已保存: {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+遥测写入基准测试: bulk_insert_mappings vs COPY FROM STDIN
+
+Compares the ORM bulk insert path with the COPY writer for the three
+append-only telemetry tables on megafarm-sized batches. Every run happens
+inside a transaction that is rolled back, so the database is left untouched.
+
+Requires a PostgreSQL DATABASE_URL (COPY is unavailable on SQLite).
+
+Usage:
+    python tools/benchmark_telemetry_copy.py
+    python tools/benchmark_telemetry_copy.py --miners 6000 20000 --boards 3 --repeat 3
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+from datetime import datetime
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app, db
+from models import HostingMiner, MinerBoardTelemetry
+from api.collector_api import MinerTelemetryHistory
+from services.telemetry_storage import TelemetryRaw24h
+from services.telemetry_copy_writer import copy_insert_mappings, _dbapi_connection
+
+
+def build_rows(site_id, miner_count, boards_per_miner, hosting_miner_ids):
+    """生成一个采集周期的 raw / history / board 行"""
+    now = datetime.utcnow()
+    raw_rows, history_rows, board_rows = [], [], []
+
+    for i in range(miner_count):
+        miner_id = f"BENCH{i:06d}"
+        hashrate_ths = random.uniform(100, 120)
+        temp = random.uniform(60, 80)
+        power = random.uniform(3100, 3400)
+
+        raw_rows.append({
+            'ts': now, 'site_id': site_id, 'miner_id': miner_id, 'status': 'online',
+            'hashrate_ths': hashrate_ths, 'temperature_c': temp, 'power_w': power,
+            'fan_rpm': random.randint(3000, 6000), 'reject_rate': random.uniform(0, 2),
+            'pool_url': 'stratum+tcp://btc.f2pool.com:3333',
+        })
+        history_rows.append({
+            'miner_id': miner_id, 'site_id': site_id, 'timestamp': now,
+            'hashrate_ghs': hashrate_ths * 1000, 'temperature_avg': temp,
+            'temperature_min': temp - 3, 'temperature_max': temp + 5,
+            'fan_speed_avg': random.randint(3000, 6000), 'power_consumption': power,
+            'accepted_shares': random.randint(10000, 100000), 'rejected_shares': random.randint(0, 500),
+            'online': True, 'boards_healthy': boards_per_miner, 'boards_total': boards_per_miner,
+            'overall_health': 'healthy', 'net_profit_usd': 0.0, 'revenue_usd': 0.0,
+        })
+        if not hosting_miner_ids:
+            continue
+        for b in range(boards_per_miner):
+            board_rows.append({
+                # miner_board_telemetry.miner_id 外键指向 hosting_miners.id
+                'miner_id': hosting_miner_ids[i % len(hosting_miner_ids)], 'site_id': site_id, 'board_index': b,
+                'hashrate_ths': hashrate_ths / boards_per_miner, 'temperature_c': temp,
+                'chips_total': 76, 'chips_ok': 76, 'chips_failed': 0, 'chip_status': 'o' * 76,
+                'frequency_mhz': 650.0, 'voltage_mv': 1300.0, 'health': 'healthy', 'recorded_at': now,
+            })
+
+    return [
+        (TelemetryRaw24h, raw_rows),
+        (MinerTelemetryHistory, history_rows),
+        (MinerBoardTelemetry, board_rows),
+    ]
+
+
+def write_orm(model, rows):
+    db.session.bulk_insert_mappings(model, rows)
+    db.session.flush()
+
+
+def write_copy(model, rows):
+    copy_insert_mappings(model, rows)
+
+
+def time_path(writer, tables):
+    """在回滚事务中执行一次写入，返回每张表耗时 (秒)"""
+    timings = {}
+    try:
+        for model, rows in tables:
+            start = time.perf_counter()
+            writer(model, rows)
+            timings[model.__tablename__] = time.perf_counter() - start
+    finally:
+        db.session.rollback()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ORM bulk insert vs COPY for telemetry tables')
+    parser.add_argument('--site-id', type=int, default=5, help='HashPower MegaFarm by default')
+    parser.add_argument('--miners', type=int, nargs='+', default=[1000, 6000, 20000])
+    parser.add_argument('--boards', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with app.app_context():
+        if _dbapi_connection() is None:
+            print("❌ COPY 需要 PostgreSQL DATABASE_URL")
+            db.session.rollback()
+            return 1
+        db.session.rollback()
+
+        hosting_miner_ids = [
+            row[0] for row in db.session.query(HostingMiner.id).filter_by(site_id=args.site_id).all()
+        ]
+        if not hosting_miner_ids:
+            print(f"⚠️ 站点 {args.site_id} 没有矿机, 跳过 miner_board_telemetry")
+
+        print("=" * 80)
+        print("Telemetry write benchmark: bulk_insert_mappings vs COPY")
+        print("=" * 80)
+        print(f"{'miners':>8} {'table':<26} {'orm (ms)':>10} {'copy (ms)':>10} {'rows/s copy':>12} {'speedup':>8}")
+
+        for miner_count in args.miners:
+            tables = build_rows(args.site_id, miner_count, args.boards, hosting_miner_ids)
+            orm_best, copy_best = {}, {}
+
+            for _ in range(args.repeat):
+                for name, elapsed in time_path(write_orm, tables).items():
+                    orm_best[name] = min(elapsed, orm_best.get(name, float('inf')))
+                for name, elapsed in time_path(write_copy, tables).items():
+                    copy_best[name] = min(elapsed, copy_best.get(name, float('inf')))
+
+            for model, rows in tables:
+                name = model.__tablename__
+                if not rows:
+                    continue
+                orm_ms = orm_best[name] * 1000
+                copy_ms = copy_best[name] * 1000
+                rate = len(rows) / copy_best[name] if copy_best[name] else 0
+                speedup = orm_ms / copy_ms if copy_ms else 0
+                print(f"{miner_count:>8} {name:<26} {orm_ms:>10.1f} {copy_ms:>10.1f} {rate:>12,.0f} {speedup:>7.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())